@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Chunking benchmark for the RAG knowledge base.
+
+Times every chunking.strategy on a large document (by default a generated ~10 MB
+markdown file shaped like crawl4ai output: headings, paragraphs, lists and code
+blocks) and reports throughput, chunk counts and chunk sizes. The target is under
+one second for a 10 MB document.
+
+Token-sized runs use the embedding model's tokenizer when transformers is installed
+(--tokenizer), otherwise a regex word-piece counter standing in for it; the
+stand-in shows the engine's cost, not the tokenizer's.
+
+Usage:
+    python benchmarks/chunking_benchmark.py
+    python benchmarks/chunking_benchmark.py --size-mb 20 --chunk-size 800
+    python benchmarks/chunking_benchmark.py --file page.md --tokenizer BAAI/bge-m3
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+import statistics
+import importlib.util
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import tools.rag_knowledge_base_tool as rag
+
+WORDS = ("the of and to in is that for it as with was on be by this are from at or an have not "
+         "vector index query chunk embedding model server search collection document retrieval "
+         "latency throughput memory configuration pipeline crawler heading section install usage").split()
+
+STAND_IN_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def synthetic_markdown(size_mb: float, seed: int) -> str:
+    """Generate markdown with a crawl4ai-like mix of headings, prose, lists and code."""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts, size = [], 0
+
+    def sentence():
+        words = rng.choices(WORDS, k=rng.randint(6, 24))
+        return " ".join(words).capitalize() + rng.choice(".!?")
+
+    while size < target:
+        block = rng.random()
+        if block < 0.08:
+            part = f"{'#' * rng.randint(1, 4)} {sentence()[:-1]}\n\n"
+        elif block < 0.15:
+            part = "".join(f"- {sentence()}\n" for _ in range(rng.randint(2, 6))) + "\n"
+        elif block < 0.19:
+            part = "```python\n" + "".join(f"value_{i} = compute({i})  # {rng.choice(WORDS)}\n"
+                                           for i in range(rng.randint(3, 12))) + "```\n\n"
+        else:
+            part = " ".join(sentence() for _ in range(rng.randint(2, 9))) + "\n\n"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def stand_in_measure():
+    """Token measure counting regex word pieces, used when no tokenizer is available."""
+    def token_starts(text):
+        return [match.start() for match in STAND_IN_TOKEN.finditer(text)]
+
+    return {"unit": "tokens", "token_starts": token_starts}
+
+
+def make_splitter(strategy, chunk_size, chunk_overlap, measure):
+    """Build the splitter for one strategy, or None when its dependency is missing."""
+    if strategy == "fixed_size":
+        if importlib.util.find_spec("langchain_text_splitters") is None:
+            return None
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              length_function=len,
+                                              separators=["\n\n", "\n", ". ", " ", ""])
+    return rag._TextChunker(strategy, chunk_size, chunk_overlap, measure=measure)
+
+
+def timed_measure(measure, timings):
+    """Wrap a token measure so each tokenization pass is timed separately from chunking."""
+    def token_starts(text):
+        started = time.perf_counter()
+        starts = measure["token_starts"](text)
+        timings.append(time.perf_counter() - started)
+        return starts
+
+    return {"unit": measure["unit"], "token_starts": token_starts}
+
+
+def run(splitter, text, repeats):
+    """Chunk text repeats times, returning (best seconds, chunks)."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        chunks = splitter.split_text(text)
+        timings.append(time.perf_counter() - started)
+    return min(timings), chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG chunking strategies")
+    parser.add_argument("--size-mb", type=float, default=10.0, help="Size of the generated document")
+    parser.add_argument("--file", help="Chunk this file instead of a generated document")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="chunk_size in characters")
+    parser.add_argument("--chunk-overlap", type=int, default=100, help="chunk_overlap in characters")
+    parser.add_argument("--token-chunk-size", type=int, default=256, help="chunk_size for token runs")
+    parser.add_argument("--token-chunk-overlap", type=int, default=32, help="chunk_overlap for token runs")
+    parser.add_argument("--tokenizer", help="Hugging Face tokenizer for token runs (e.g. BAAI/bge-m3)")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per strategy (best is reported)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.file:
+        text = Path(args.file).read_text(encoding="utf-8")
+    else:
+        text = synthetic_markdown(args.size_mb, args.seed)
+    megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+
+    if args.tokenizer:
+        token_measure, token_label = rag._load_token_measure(args.tokenizer), args.tokenizer
+    else:
+        token_measure, token_label = stand_in_measure(), "stand-in regex counter"
+
+    runs = [
+        ("fixed_size", "chars", args.chunk_size, args.chunk_overlap, None),
+        ("sentence", "chars", args.chunk_size, args.chunk_overlap, None),
+        ("markdown", "chars", args.chunk_size, args.chunk_overlap, None),
+        ("token", "tokens", args.token_chunk_size, args.token_chunk_overlap, token_measure),
+        ("sentence", "tokens", args.token_chunk_size, args.token_chunk_overlap, token_measure),
+        ("markdown", "tokens", args.token_chunk_size, args.token_chunk_overlap, token_measure),
+    ]
+
+    print(f"document={megabytes:.2f} MB tokens via {token_label}")
+    print("seconds = best total; tokenize = share of it spent in the tokenizer; engine = the rest")
+    print(f"{'strategy':<12}{'unit':<8}{'size':>6}{'seconds':>10}{'tokenize':>10}{'engine':>9}{'MB/s':>9}"
+          f"{'chunks':>9}{'avg chars':>11}{'max chars':>11}{'engine<1s/10MB':>16}")
+    for strategy, unit, size, overlap, measure in runs:
+        tokenize_timings = []
+        if measure is not None:
+            measure = timed_measure(measure, tokenize_timings)
+        splitter = make_splitter(strategy, size, overlap, measure)
+        if splitter is None:
+            print(f"{strategy:<12}{unit:<8}{size:>6}  skipped (langchain-text-splitters not installed)")
+            continue
+        seconds, chunks = run(splitter, text, args.repeats)
+        tokenize = min(tokenize_timings) if tokenize_timings else 0.0
+        engine = seconds - tokenize
+        lengths = [len(chunk) for chunk in chunks] or [0]
+        per_10mb = engine * 10 / megabytes
+        print(f"{strategy:<12}{unit:<8}{size:>6}{seconds:>10.3f}{tokenize:>10.3f}{engine:>9.3f}"
+              f"{megabytes / seconds:>9.1f}{len(chunks):>9}{statistics.mean(lengths):>11.0f}{max(lengths):>11}"
+              f"{'yes' if per_10mb < 1 else 'no':>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Embedding backend benchmark for the RAG knowledge base.
+
+Encodes the same corpus with each embedding.model_type backend (sentence-transformers,
+onnx, static) and reports load time, encode throughput and memory, so CPU-only hosts
+can pick a backend. Each backend runs in its own subprocess, so peak RSS covers that
+backend alone. Backends that serve the same model as the first one are also compared
+with it: mean and minimum cosine similarity of their vectors for the same texts show
+whether an ONNX export (or a quantized one) can share a collection with it.
+
+Backends are given as model_type:model_name. The corpus is a generated markdown
+document chunked the way ingestion chunks it, or one text per line of --texts.
+
+Usage:
+    python benchmarks/embedding_backend_benchmark.py
+    python benchmarks/embedding_backend_benchmark.py --chunks 2000 --threads 4
+    python benchmarks/embedding_backend_benchmark.py --texts corpus.txt \\
+        --backend sentence-transformers:BAAI/bge-m3 onnx:BAAI/bge-m3 static:minishlab/potion-multilingual-128M
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import tools.rag_knowledge_base_tool as rag
+from chunking_benchmark import synthetic_markdown
+
+DEFAULT_BACKENDS = [
+    "sentence-transformers:BAAI/bge-m3",
+    "onnx:BAAI/bge-m3",
+    "static:minishlab/potion-multilingual-128M"
+]
+
+
+def rss_mb(peak: bool = False) -> float:
+    """Current (or peak) resident set size of this process in MB (0 where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    if peak:
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        return 0.0
+
+
+def corpus_texts(args) -> list:
+    """One text per line of --texts, or a generated document chunked like ingestion does."""
+    if args.texts:
+        lines = Path(args.texts).read_text(encoding="utf-8").splitlines()
+        return [line.strip() for line in lines if line.strip()][:args.chunks]
+    chunker = rag._TextChunker("markdown", args.chunk_size, args.chunk_size // 10)
+    text = synthetic_markdown(args.chunks * args.chunk_size / (1024 * 1024) * 1.2, args.seed)
+    return chunker.split_text(text)[:args.chunks]
+
+
+def run_worker(spec: str, texts_path: str, vectors_path: str, batch_size: int, threads: int):
+    """Load one backend through the tool, encode the corpus and print a JSON result line."""
+    model_type, model_name = spec.split(":", 1)
+    config = json.loads(rag._get_config_path().read_text(encoding="utf-8"))
+    config["embedding"].update({"model_type": model_type, "model_name": model_name})
+    config["embedding"].setdefault("onnx", {})["intra_op_threads"] = threads
+    rag._config = config
+    texts = json.loads(Path(texts_path).read_text(encoding="utf-8"))
+
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    baseline = rss_mb()
+    started = time.perf_counter()
+    rag._initialize_embedding_model()
+    rag._encode_local(texts[:2])
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(rag._encode_local(texts[start:start + batch_size]))
+    encode_seconds = time.perf_counter() - started
+    vectors = np.asarray(vectors, dtype=np.float32)
+    np.save(vectors_path, vectors)
+
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "encode_seconds": encode_seconds,
+        "texts_per_second": len(texts) / encode_seconds,
+        "dimension": int(vectors.shape[1]),
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": rss_mb(peak=True)
+    }))
+
+
+def run_backend(spec, texts_path, vectors_path, args):
+    """Run one backend in a fresh interpreter, returning its result or an error string."""
+    command = [sys.executable, __file__, "--worker", spec, "--texts-file", texts_path,
+               "--vectors-out", vectors_path, "--batch-size", str(args.batch_size), "--threads", str(args.threads)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return None, lines[-1] if lines else f"exit code {completed.returncode}"
+    return json.loads(completed.stdout.strip().splitlines()[-1]), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG embedding backends")
+    parser.add_argument("--backend", nargs="+", default=DEFAULT_BACKENDS, help="model_type:model_name to compare")
+    parser.add_argument("--texts", help="Encode one text per line of this file")
+    parser.add_argument("--chunks", type=int, default=500, help="Number of texts to encode")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Characters per generated chunk")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per encode call")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per backend (0 = library default)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--texts-file", help=argparse.SUPPRESS)
+    parser.add_argument("--vectors-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.texts_file, args.vectors_out, args.batch_size, args.threads)
+        return
+
+    texts = corpus_texts(args)
+    print(f"texts={len(texts)} avg chars={np.mean([len(t) for t in texts]):.0f} batch={args.batch_size} "
+          f"threads={args.threads or 'default'}")
+    print(f"{'backend':<48}{'dim':>6}{'load s':>9}{'texts/s':>10}{'peak MB':>9}{'model MB':>10}"
+          f"{'cos mean':>10}{'cos min':>9}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        texts_path = str(Path(work_dir) / "texts.json")
+        Path(texts_path).write_text(json.dumps(texts), encoding="utf-8")
+        reference = None
+        for i, spec in enumerate(args.backend):
+            vectors_path = str(Path(work_dir) / f"vectors_{i}.npy")
+            result, error = run_backend(spec, texts_path, vectors_path, args)
+            if error:
+                print(f"{spec:<48}  failed: {error}")
+                continue
+
+            vectors = np.load(vectors_path)
+            agreement = ""
+            if reference is None:
+                reference = (spec.split(":", 1)[1], vectors)
+            elif reference[0] == spec.split(":", 1)[1] and reference[1].shape == vectors.shape:
+                cosines = np.sum(reference[1] * vectors, axis=1)
+                agreement = f"{cosines.mean():>10.4f}{cosines.min():>9.4f}"
+            print(f"{spec:<48}{result['dimension']:>6}{result['load_seconds']:>9.1f}"
+                  f"{result['texts_per_second']:>10.1f}{result['peak_rss_mb']:>9.0f}"
+                  f"{result['peak_rss_mb'] - result['baseline_rss_mb']:>10.0f}{agreement}")
+
+
+if __name__ == "__main__":
+    main()
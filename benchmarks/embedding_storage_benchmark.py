@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Embedding storage benchmark for the RAG knowledge base.
+
+Compares the full-precision index (the current setup) with reduced-size layouts
+configured under embedding.storage in kb_config.json:
+
+- index_dimension: Matryoshka-style truncation of the vectors stored in Chroma
+- rescore_precision: full-dimension int8/float32 vectors kept in the
+  rescore_vectors.sqlite3 sidecar and used to re-rank the top candidates
+
+For each layout it reports bytes per vector, recall@k against exact
+full-precision search, and p50/p95 query latency. The first-stage search is a
+brute-force numpy scan standing in for Chroma's index; rescoring runs through
+the tool's own sidecar code.
+
+Usage:
+    python benchmarks/embedding_storage_benchmark.py
+    python benchmarks/embedding_storage_benchmark.py --corpus-size 20000 --dims 256 512
+    python benchmarks/embedding_storage_benchmark.py --texts corpus.txt --model BAAI/bge-m3
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import tools.rag_knowledge_base_tool as rag
+
+
+def synthetic_embeddings(count: int, dimension: int, seed: int) -> np.ndarray:
+    """
+    Generate clustered unit vectors whose variance decays across dimensions, the
+    property Matryoshka-trained models have and truncation relies on.
+    """
+    rng = np.random.default_rng(seed)
+    spectrum = 1.0 / np.sqrt(1.0 + np.arange(dimension) / 16.0)
+    centers = rng.normal(size=(max(count // 50, 1), dimension)) * spectrum
+    vectors = centers[rng.integers(0, len(centers), size=count)]
+    vectors = vectors + 0.6 * rng.normal(size=(count, dimension)) * spectrum
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def model_embeddings(texts_path: str, model_name: str) -> np.ndarray:
+    """Embed one text per line of texts_path with a sentence-transformers model."""
+    from sentence_transformers import SentenceTransformer
+
+    texts = [line.strip() for line in Path(texts_path).read_text(encoding="utf-8").splitlines() if line.strip()]
+    model = SentenceTransformer(model_name)
+    return np.asarray(model.encode(texts, normalize_embeddings=True, batch_size=64), dtype=np.float32)
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """Perturb random corpus vectors to get queries with known near neighbours."""
+    rng = np.random.default_rng(seed + 1)
+    picked = corpus[rng.integers(0, len(corpus), size=count)]
+    queries = picked + 0.05 * rng.normal(size=picked.shape) / np.sqrt(corpus.shape[1])
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Exact inner-product top-k (unit vectors, so the same order as Chroma's L2)."""
+    scores = matrix @ query
+    candidates = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def run_layout(corpus, queries, truth, k, index_dimension, precision, multiplier):
+    """Benchmark one storage layout, returning a result row."""
+    dimension = corpus.shape[1]
+    index = corpus
+    if index_dimension:
+        index = corpus[:, :index_dimension]
+        index = index / np.linalg.norm(index, axis=1, keepdims=True)
+
+    collection_name = f"bench_{index_dimension or dimension}_{precision}"
+    ids = [f"chunk_{i}" for i in range(len(corpus))]
+    if precision != "none":
+        rag._rescore_store_write(collection_name, precision, dict(zip(ids, corpus.tolist())), [])
+
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        index_query = query[:index_dimension] if index_dimension else query
+        if index_dimension:
+            index_query = index_query / np.linalg.norm(index_query)
+
+        if precision == "none":
+            found = top_k(index, index_query, k)
+        else:
+            candidates = top_k(index, index_query, k * multiplier)
+            distances = rag._rescore_candidates(
+                collection_name, precision, query.tolist(), [ids[i] for i in candidates]
+            )
+            found = sorted(candidates, key=lambda i: distances[ids[i]])[:k]
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(set(found) & set(expected)) / k)
+
+    index_bytes = (index_dimension or dimension) * 4
+    rescore_bytes = {"none": 0, "int8": dimension + 8, "float32": dimension * 4 + 8}[precision]
+    return {
+        "layout": f"dim={index_dimension or dimension} rescore={precision}",
+        "index_bytes": index_bytes,
+        "rescore_bytes": rescore_bytes,
+        "recall": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reduced-size embedding storage layouts")
+    parser.add_argument("--corpus-size", type=int, default=10000, help="Synthetic corpus size")
+    parser.add_argument("--dimension", type=int, default=1024, help="Synthetic embedding dimension (BGE-M3: 1024)")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512], help="Index dimensions to try")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (recall@k)")
+    parser.add_argument("--multiplier", type=int, default=4, help="Rescore candidates per result")
+    parser.add_argument("--texts", help="Embed this file (one text per line) instead of synthetic vectors")
+    parser.add_argument("--model", default="BAAI/bge-m3", help="Model used with --texts")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.texts:
+        corpus = model_embeddings(args.texts, args.model)
+    else:
+        corpus = synthetic_embeddings(args.corpus_size, args.dimension, args.seed)
+    queries = make_queries(corpus, args.queries, args.seed)
+    truth = [set(top_k(corpus, query, args.k)) for query in queries]
+
+    layouts = [(None, "none"), (None, "int8")]
+    for index_dimension in args.dims:
+        layouts += [(index_dimension, "none"), (index_dimension, "int8"), (index_dimension, "float32")]
+
+    with tempfile.TemporaryDirectory() as kb_dir:
+        rag._get_kb_dir = lambda: Path(kb_dir)
+        rows = [run_layout(corpus, queries, truth, args.k, dim, precision, args.multiplier)
+                for dim, precision in layouts]
+
+    print(f"corpus={len(corpus)} dim={corpus.shape[1]} queries={len(queries)} k={args.k} multiplier={args.multiplier}")
+    print(f"{'layout':<28}{'index B/vec':>12}{'rescore B/vec':>15}{'recall@k':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        print(f"{row['layout']:<28}{row['index_bytes']:>12}{row['rescore_bytes']:>15}"
+              f"{row['recall']:>10.3f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
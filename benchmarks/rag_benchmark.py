@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality and latency benchmark for the RAG knowledge base.
+
+Builds a labeled corpus offline, ingests it with add_text_to_kb and queries it
+with search_kb at several corpus sizes, so the effect of a kb_config.json change
+(chunk size, overlap, strategy, search mode, model) can be measured. For each
+size it reports:
+
+- ingestion throughput (documents and chunks per second)
+- p50/p95 search latency per search mode
+- recall@k and MRR against the labeled queries
+- peak resident memory and on-disk size of the knowledge base
+
+The generated corpus plants one fact per document ("The <attribute> of <entity>
+is <value>.") inside filler text; each query asks for one fact and is labeled
+with the document holding it. A fixture corpus can be used instead (--corpus,
+--queries).
+
+By default a small hashing embedding model stands in for BGE-M3, so the harness
+runs in CI without downloading a model; pass --model to benchmark a real
+sentence-transformers model. ChromaDB is required. Everything is written to a
+temporary knowledge base directory, never to the configured one.
+
+Usage:
+    python benchmarks/rag_benchmark.py
+    python benchmarks/rag_benchmark.py --sizes 200 1000 5000 --modes vector hybrid
+    python benchmarks/rag_benchmark.py --config my_kb_config.json --k 5 --json results.json
+    python benchmarks/rag_benchmark.py --corpus docs.jsonl --queries queries.jsonl --model BAAI/bge-m3
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import tools.rag_knowledge_base_tool as rag
+
+FILLER = ("the of and to in is that for it as with was on be by this are from at or an have not "
+          "system service team process report update review release design support customer data "
+          "network storage policy request change schedule budget project quality access account "
+          "platform feature workflow meeting document region partner vendor contract standard").split()
+ATTRIBUTES = ("launch year", "maintainer", "default port", "license", "home region", "release codename",
+              "storage backend", "on-call team", "primary language", "retention period")
+SYLLABLES = ("ka", "lo", "mi", "ner", "tak", "vu", "zo", "rin", "pel", "dra", "qui", "sen", "tor", "bex")
+
+
+class StandInEmbeddingModel:
+    """
+    Hashing embedding model with the SentenceTransformer.encode interface: word unigrams
+    and bigrams are hashed into a fixed number of signed buckets. Deterministic, instant
+    to load, and good enough to rank texts by shared vocabulary.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self._buckets = {}
+
+    def _bucket(self, feature: str):
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            value = int.from_bytes(rag.hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            bucket = self._buckets[feature] = (value % self.dimension, 1.0 if value >> 63 else -1.0)
+        return bucket
+
+    def encode(self, texts, normalize_embeddings: bool = True, **kwargs):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                index, sign = self._bucket(feature)
+                vectors[row, index] += sign
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1.0)
+        return vectors
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+
+def synthetic_corpus(size: int, seed: int, words_per_document: int):
+    """Generate (documents, labeled queries); every document holds one retrievable fact."""
+    rng = random.Random(seed)
+    entities = set()
+    while len(entities) < size:
+        entities.add("".join(rng.choices(SYLLABLES, k=3)) + f"-{rng.randint(10, 99)}")
+
+    documents, queries = [], []
+    for i, entity in enumerate(sorted(entities)):
+        attribute = rng.choice(ATTRIBUTES)
+        value = "".join(rng.choices(SYLLABLES, k=2)) + str(rng.randint(100, 999))
+        filler = [" ".join(rng.choices(FILLER, k=rng.randint(8, 20))).capitalize() + "."
+                  for _ in range(max(1, words_per_document // 14))]
+        filler.insert(rng.randrange(len(filler) + 1), f"The {attribute} of {entity} is {value}.")
+        # Other documents mention the entity in passing, without the fact
+        if i and rng.random() < 0.5:
+            filler.insert(rng.randrange(len(filler) + 1), f"See also {rng.choice(sorted(entities))} for details.")
+        source_name = f"doc_{i:06d}"
+        documents.append({"source_name": source_name, "text": " ".join(filler)})
+        queries.append({"query": f"What is the {attribute} of {entity}?", "relevant": [source_name]})
+    return documents, queries
+
+
+def read_jsonl(path: str):
+    """Read one JSON object per non-empty line."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (0 where the resource module is missing)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def directory_mb(path: Path) -> float:
+    """Total size of the files under path in MB."""
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / (1024 * 1024)
+
+
+def configure(kb_dir: Path, args):
+    """Point the tool at a temporary knowledge base using the given config, overrides and model."""
+    config = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    chunking = config.setdefault("chunking", {})
+    for key in ("strategy", "chunk_size", "chunk_overlap"):
+        if getattr(args, key) is not None:
+            chunking[key] = getattr(args, key)
+    config.setdefault("storage", {}).update({
+        "database_path": str(kb_dir / "chroma_db"),
+        "persist_directory": str(kb_dir)
+    })
+    embedding = config.setdefault("embedding", {})
+    embedding["model_name"] = args.model or "stand-in/hashing-384"
+    embedding.setdefault("shared_server", {})["enabled"] = False
+    embedding.setdefault("warmup", {})["enabled"] = False
+    # Repeated runs must measure searches, not the result cache
+    config.setdefault("search", {}).setdefault("cache", {})["enabled"] = False
+
+    rag._config = config
+    rag._chroma_client = None
+    rag._text_splitter = None
+    rag._embedding_model = None if args.model else StandInEmbeddingModel()
+    return config
+
+
+async def ingest(documents, collection_name: str, concurrency: int):
+    """Add documents with add_text_to_kb, returning (seconds, chunks added, failures)."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def add(document):
+        async with semaphore:
+            return await rag.add_text_to_kb(document["text"], document["source_name"], collection_name,
+                                            metadata=document.get("metadata"))
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[add(document) for document in documents])
+    elapsed = time.perf_counter() - started
+    failures = [r for r in results if r.get("status") != "success"]
+    if failures:
+        print(f"  {len(failures)} documents failed, e.g.: {failures[0].get('error')}", file=sys.stderr)
+    return elapsed, sum(r.get("chunks_added", 0) for r in results), len(failures)
+
+
+async def evaluate(queries, collection_name: str, mode: str, k: int):
+    """Run every query once, returning latency percentiles, recall@k and MRR."""
+    latencies, recalls, reciprocal_ranks = [], [], []
+    for labeled in queries:
+        started = time.perf_counter()
+        result = await rag.search_kb(labeled["query"], collection_name, limit=k, mode=mode)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if result.get("status") != "success":
+            raise RuntimeError(f"search_kb failed: {result.get('error')}")
+
+        ranked_sources = list(dict.fromkeys(r.get("metadata", {}).get("source") for r in result.get("results", [])))
+        relevant = set(labeled["relevant"])
+        recalls.append(len(relevant & set(ranked_sources)) / len(relevant))
+        first_hit = next((rank for rank, source in enumerate(ranked_sources, start=1) if source in relevant), None)
+        reciprocal_ranks.append(1 / first_hit if first_hit else 0.0)
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall_at_k": statistics.mean(recalls),
+        "mrr": statistics.mean(reciprocal_ranks)
+    }
+
+
+async def run(args):
+    """Benchmark every corpus size, returning one row per (size, mode)."""
+    if args.corpus:
+        all_documents = read_jsonl(args.corpus)
+        all_queries = read_jsonl(args.queries) if args.queries else []
+    else:
+        all_documents, all_queries = synthetic_corpus(max(args.sizes), args.seed, args.words_per_document)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as kb_dir:
+        kb_dir = Path(kb_dir)
+        config = configure(kb_dir, args)
+        modes = args.modes or [config.get("search", {}).get("default_mode", "vector")]
+        rng = random.Random(args.seed)
+
+        for size in args.sizes:
+            documents = all_documents[:size]
+            sources = {document["source_name"] for document in documents}
+            # Only queries whose answers were ingested at this size
+            answerable = [q for q in all_queries if set(q["relevant"]) & sources]
+            queries = rng.sample(answerable, min(args.queries_per_size, len(answerable)))
+            collection_name = f"bench_{size}"
+
+            seconds, chunks, failed = await ingest(documents, collection_name, args.concurrency)
+            for mode in modes:
+                # One unmeasured query loads indexes (e.g. the keyword index) first
+                await rag.search_kb("warm up query", collection_name, limit=args.k, mode=mode)
+                quality = await evaluate(queries, collection_name, mode, args.k) if queries else {}
+                rows.append({
+                    "documents": len(documents),
+                    "chunks": chunks,
+                    "failed": failed,
+                    "mode": mode,
+                    "queries": len(queries),
+                    "ingest_seconds": seconds,
+                    "docs_per_second": len(documents) / seconds if seconds else 0.0,
+                    "chunks_per_second": chunks / seconds if seconds else 0.0,
+                    **quality,
+                    "peak_rss_mb": peak_rss_mb(),
+                    "disk_mb": directory_mb(kb_dir)
+                })
+
+        await rag._stop_job_workers()
+    return config, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG ingestion, search latency and recall")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500], help="Corpus sizes (documents)")
+    parser.add_argument("--modes", nargs="+", choices=rag.SEARCH_MODES, help="Search modes (default: config's)")
+    parser.add_argument("--k", type=int, default=5, help="Results per query (recall@k)")
+    parser.add_argument("--queries-per-size", type=int, default=100, help="Labeled queries run per size")
+    parser.add_argument("--words-per-document", type=int, default=400, help="Length of generated documents")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent add_text_to_kb calls")
+    parser.add_argument("--config", default=str(rag._get_config_path()), help="kb_config.json to benchmark")
+    parser.add_argument("--strategy", choices=rag.CHUNKING_STRATEGIES, help="Override chunking.strategy")
+    parser.add_argument("--chunk-size", type=int, help="Override chunking.chunk_size")
+    parser.add_argument("--chunk-overlap", type=int, help="Override chunking.chunk_overlap")
+    parser.add_argument("--model", help="sentence-transformers model (default: hashing stand-in)")
+    parser.add_argument("--corpus", help="JSONL fixture corpus: {source_name, text, metadata?} per line")
+    parser.add_argument("--queries", help="JSONL labeled queries: {query, relevant: [source_name, ...]} per line")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if not rag.CHROMADB_AVAILABLE:
+        sys.exit("chromadb is required: pip install chromadb")
+    strategy = args.strategy or json.loads(Path(args.config).read_text(encoding="utf-8")).get(
+        "chunking", {}).get("strategy", "fixed_size")
+    if strategy == "fixed_size" and not rag.LANGCHAIN_AVAILABLE:
+        sys.exit("The fixed_size strategy needs langchain-text-splitters; install it or pass --strategy")
+    if args.model and not rag.SENTENCE_TRANSFORMERS_AVAILABLE:
+        sys.exit("--model needs sentence-transformers: pip install sentence-transformers")
+    if args.corpus and not args.queries:
+        print("No --queries given: reporting ingestion only", file=sys.stderr)
+
+    config, rows = asyncio.run(run(args))
+
+    chunking = config.get("chunking", {})
+    print(f"model={config['embedding']['model_name']} strategy={chunking.get('strategy', 'fixed_size')} "
+          f"chunk_size={chunking.get('chunk_size')} overlap={chunking.get('chunk_overlap')} k={args.k}")
+    print(f"{'docs':>7}{'chunks':>8}{'mode':>8}{'docs/s':>9}{'chunks/s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'recall@k':>10}{'MRR':>7}{'peak MB':>9}{'disk MB':>9}")
+    for row in rows:
+        print(f"{row['documents']:>7}{row['chunks']:>8}{row['mode']:>8}{row['docs_per_second']:>9.1f}"
+              f"{row['chunks_per_second']:>10.1f}{row.get('p50_ms', 0):>9.2f}{row.get('p95_ms', 0):>9.2f}"
+              f"{row.get('recall_at_k', 0):>10.3f}{row.get('mrr', 0):>7.3f}{row['peak_rss_mb']:>9.0f}"
+              f"{row['disk_mb']:>9.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"config": config, "results": rows}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
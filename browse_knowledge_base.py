@@ -2,6 +2,14 @@
 """
 Knowledge Base Browser Script
 Browse and display all entries in your RAG knowledge base with detailed metadata.
+
+Entries are read from ChromaDB one page at a time and printed (or exported) as
+they arrive, so multi-GB collections can be inspected without loading them whole.
+
+Usage:
+    python browse_knowledge_base.py -c research --offset 1000 --limit 50
+    python browse_knowledge_base.py -c research --source https://example.com/docs
+    python browse_knowledge_base.py -c research --jsonl research.jsonl
 """
 
 import asyncio
@@ -9,7 +17,7 @@ import json
 import sys
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator, TextIO
 
 # Add the current directory to Python path to import the RAG tool
 sys.path.append(str(Path(__file__).parent))
@@ -72,15 +80,135 @@ def truncate_text(text: str, max_length: int = 200) -> str:
         return text
     return text[:max_length] + "..."
 
+def get_client():
+    """Get the ChromaDB client at the MCP server's database path."""
+    with suppress_stdout_stderr():
+        return _initialize_chroma()
+
+def list_collection_names(client) -> List[str]:
+    """List collection names (older ChromaDB versions return collection objects)."""
+    collections = client.list_collections()
+    return [col.name if hasattr(col, 'name') else col for col in collections]
+
+def build_source_filter(sources: Optional[List[str]] = None, source_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Build a ChromaDB where clause for exact source names/URLs and a source type."""
+    clauses = []
+    if sources:
+        clauses.append({"$or": [{"source_name": {"$in": sources}}, {"source_url": {"$in": sources}}]})
+    if source_type:
+        clauses.append({"source_type": source_type})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def iter_entries(
+    collection,
+    page_size: int = 500,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    where: Optional[Dict[str, Any]] = None,
+    filter_source: Optional[str] = None,
+    include_documents: bool = True
+) -> Iterator[tuple]:
+    """
+    Stream a collection's entries as (position, id, document, metadata), one page at a time.
+    
+    Args:
+        collection: ChromaDB collection
+        page_size: Entries fetched per collection.get call
+        offset: Matching entries to skip
+        limit: Maximum entries to yield (None for all)
+        where: ChromaDB where clause, applied by ChromaDB before paging
+        filter_source: Partial, case-insensitive match on source name/URL, applied while streaming
+        include_documents: Whether to fetch document text
+    """
+    include = ['documents', 'metadatas'] if include_documents else ['metadatas']
+    needle = filter_source.lower() if filter_source else None
+    
+    # Without a partial filter ChromaDB can skip to the offset itself
+    skip = offset if needle else 0
+    cursor = 0 if needle else offset
+    yielded = 0
+    while limit is None or yielded < limit:
+        # Fetch no more than the limit still needs (unless entries are filtered while streaming)
+        fetch = page_size if needle or limit is None else min(page_size, limit - yielded)
+        get_kwargs = {"include": include, "limit": fetch, "offset": cursor}
+        if where:
+            get_kwargs["where"] = where
+        page = collection.get(**get_kwargs)
+        ids = page.get('ids') or []
+        documents = page.get('documents') or [None] * len(ids)
+        metadatas = page.get('metadatas') or [None] * len(ids)
+        
+        for i, (doc_id, doc, meta) in enumerate(zip(ids, documents, metadatas)):
+            meta = meta or {}
+            if needle:
+                source = (meta.get('source_name') or '') + (meta.get('source_url') or '')
+                if needle not in source.lower():
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+            yield cursor + i, doc_id, doc, meta
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+        
+        if len(ids) < fetch:
+            return
+        cursor += fetch
+
+def export_jsonl(collection_name: str, entries: Iterator[tuple], output: TextIO) -> int:
+    """Write entries as JSON lines ({collection, id, document, metadata}), returning the count."""
+    count = 0
+    for _, doc_id, doc, meta in entries:
+        output.write(json.dumps({"collection": collection_name, "id": doc_id, "document": doc, "metadata": meta},
+                                ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+def print_entries(entries: Iterator[tuple], show_content: bool, max_content_length: int, show_metadata: bool) -> int:
+    """Print entries as they stream in, with a source heading whenever the source changes."""
+    count = 0
+    current_source = None
+    for position, doc_id, doc, meta in entries:
+        source = meta.get('source_name') or meta.get('source_url', 'Unknown Source')
+        if source != current_source:
+            print(f"\n  📄 Source: {source}")
+            current_source = source
+        
+        print(f"\n    🔹 Entry #{position + 1} (ID: {doc_id})")
+        
+        if show_metadata and meta:
+            print("    📋 Metadata:")
+            print(format_metadata(meta))
+        
+        if show_content and doc is not None:
+            print("    📝 Content:")
+            content = truncate_text(doc, max_content_length)
+            # Indent content for better readability
+            indented_content = '\n'.join(f"       {line}" for line in content.split('\n'))
+            print(indented_content)
+        
+        print()  # Empty line between entries
+        count += 1
+    return count
+
 async def browse_knowledge_base(
     collection_name: Optional[str] = None,
     show_content: bool = True,
     max_content_length: int = 200,
     show_metadata: bool = True,
-    filter_source: Optional[str] = None
+    filter_source: Optional[str] = None,
+    sources: Optional[List[str]] = None,
+    source_type: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    page_size: int = 500,
+    jsonl_path: Optional[str] = None
 ):
     """
-    Browse all entries in the knowledge base.
+    Browse entries in the knowledge base, streaming them page by page.
     
     Args:
         collection_name: Specific collection to browse (None for all)
@@ -88,9 +216,18 @@ async def browse_knowledge_base(
         max_content_length: Maximum content length to display
         show_metadata: Whether to show metadata
         filter_source: Filter by source name/URL (partial match)
+        sources: Only these exact source names/URLs (filtered inside ChromaDB)
+        source_type: Only this source type, e.g. "webpage" or "text"
+        offset: Matching entries to skip in each collection
+        limit: Maximum entries to show per collection (None for all)
+        page_size: Entries fetched from ChromaDB per request
+        jsonl_path: Export entries as JSON lines to this file ("-" for stdout) instead of printing
     """
+    # Keep stdout clean for the JSONL stream
+    log = (lambda *args, **kwargs: print(*args, file=sys.stderr, **kwargs)) if jsonl_path == "-" else print
     
-    print_header("🔍 KNOWLEDGE BASE BROWSER")
+    if not jsonl_path:
+        print_header("🔍 KNOWLEDGE BASE BROWSER")
     
     # Check dependencies
     if not all([CHROMADB_AVAILABLE, SENTENCE_TRANSFORMERS_AVAILABLE, LANGCHAIN_AVAILABLE]):
@@ -102,132 +239,78 @@ async def browse_knowledge_base(
         if not LANGCHAIN_AVAILABLE:
             missing.append("langchain-text-splitters")
         
-        print(f"❌ Missing dependencies: {', '.join(missing)}")
-        print(f"Install with: pip install {' '.join(missing)}")
+        log(f"❌ Missing dependencies: {', '.join(missing)}")
+        log(f"Install with: pip install {' '.join(missing)}")
         return
     
     try:
-        # Initialize ChromaDB client using MCP server location
-        with suppress_stdout_stderr():
-            import chromadb
-            from chromadb.config import Settings
-            
-            # Use MCP server database path directly
-            mcp_db_path = "C:/Users/usuario/agent_playground/knowledge_base/chroma_db"
-            
-            client = chromadb.PersistentClient(
-                path=mcp_db_path,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
-            config = _load_config()
+        # Initialize ChromaDB client at the MCP server's database path
+        client = get_client()
+        config = _load_config()
         
-        # Get collections
-        collections = client.list_collections()
-        
-        if not collections:
-            print("📭 No collections found in the knowledge base.")
+        collection_names = list_collection_names(client)
+        if not collection_names:
+            log("📭 No collections found in the knowledge base.")
             return
         
-        collection_names = []
-        if hasattr(collections[0], 'name'):
-            collection_names = [col.name for col in collections]
-        else:
-            collection_names = collections  # Newer ChromaDB versions
-        
-        print(f"📚 Found {len(collection_names)} collection(s): {', '.join(collection_names)}")
+        log(f"📚 Found {len(collection_names)} collection(s): {', '.join(collection_names)}")
         
         # Filter collections if specified
         if collection_name:
             if collection_name not in collection_names:
-                print(f"❌ Collection '{collection_name}' not found.")
-                print(f"Available collections: {', '.join(collection_names)}")
+                log(f"❌ Collection '{collection_name}' not found.")
+                log(f"Available collections: {', '.join(collection_names)}")
                 return
             collection_names = [collection_name]
         
-        total_entries = 0
+        where = build_source_filter(sources, source_type)
+        output = None
+        if jsonl_path:
+            output = sys.stdout if jsonl_path == "-" else open(jsonl_path, "w", encoding="utf-8")
         
-        # Browse each collection
-        for col_name in collection_names:
-            print_subheader(f"Collection: {col_name}")
-            
-            try:
-                collection = client.get_collection(col_name)
-                
-                # Get all data
-                all_data = collection.get(include=['documents', 'metadatas'])
-                
-                documents = all_data.get('documents', [])
-                metadatas = all_data.get('metadatas', [])
-                ids = all_data.get('ids', [])  # IDs are returned by default
-                
-                if not documents:
-                    print("  📭 No entries found in this collection.")
-                    continue
-                
-                # Apply source filter if specified
-                filtered_entries = []
-                for i, (doc, meta, doc_id) in enumerate(zip(documents, metadatas, ids)):
-                    if filter_source:
-                        source = meta.get('source_name', '') + meta.get('source_url', '')
-                        if filter_source.lower() not in source.lower():
-                            continue
+        total_entries = 0
+        try:
+            # Browse each collection
+            for col_name in collection_names:
+                try:
+                    collection = client.get_collection(col_name)
+                    entries = iter_entries(collection, page_size=page_size, offset=offset, limit=limit,
+                                           where=where, filter_source=filter_source,
+                                           include_documents=show_content or output is not None)
                     
-                    filtered_entries.append((doc, meta, doc_id, i))
-                
-                if not filtered_entries:
-                    if filter_source:
-                        print(f"  📭 No entries found matching source filter: '{filter_source}'")
-                    continue
-                
-                print(f"  📊 Found {len(filtered_entries)} entries")
-                
-                # Group by source for better organization
-                sources = {}
-                for doc, meta, doc_id, original_idx in filtered_entries:
-                    source = meta.get('source_name') or meta.get('source_url', 'Unknown Source')
-                    if source not in sources:
-                        sources[source] = []
-                    sources[source].append((doc, meta, doc_id, original_idx))
-                
-                # Display entries grouped by source
-                for source, entries in sources.items():
-                    print(f"\n  📄 Source: {source}")
-                    print(f"     Chunks: {len(entries)}")
+                    if output is not None:
+                        count = export_jsonl(col_name, entries, output)
+                        log(f"  📤 {col_name}: exported {count} entries")
+                    else:
+                        print_subheader(f"Collection: {col_name}")
+                        print(f"  📊 {collection.count()} entries in collection"
+                              f" (showing from #{offset + 1}{f', up to {limit}' if limit else ''})")
+                        count = print_entries(entries, show_content, max_content_length, show_metadata)
+                        if not count:
+                            print("  📭 No entries found matching the filters." if (where or filter_source)
+                                  else "  📭 No entries found in this collection.")
+                    total_entries += count
                     
-                    for doc, meta, doc_id, original_idx in entries:
-                        print(f"\n    🔹 Entry #{original_idx + 1} (ID: {doc_id})")
-                        
-                        if show_metadata and meta:
-                            print("    📋 Metadata:")
-                            print(format_metadata(meta))
-                        
-                        if show_content:
-                            print("    📝 Content:")
-                            content = truncate_text(doc, max_content_length)
-                            # Indent content for better readability
-                            indented_content = '\n'.join(f"       {line}" for line in content.split('\n'))
-                            print(indented_content)
-                        
-                        print()  # Empty line between entries
-                
-                total_entries += len(filtered_entries)
-                
-            except Exception as e:
-                print(f"  ❌ Error accessing collection '{col_name}': {e}")
+                except Exception as e:
+                    log(f"  ❌ Error accessing collection '{col_name}': {e}")
+        finally:
+            if output is not None and output is not sys.stdout:
+                output.close()
+        
+        if output is not None:
+            log(f"✅ Exported {total_entries} entries to {'stdout' if jsonl_path == '-' else jsonl_path}")
+            return
         
         print_header(f"📊 SUMMARY: {total_entries} total entries browsed")
         
         # Show configuration info
         print(f"\n🔧 Configuration:")
-        print(f"   Database path: {mcp_db_path}")
+        print(f"   Database path: {config['storage']['database_path']}")
         print(f"   Embedding model: {config['embedding']['model_name']}")
         print(f"   Chunk size: {config['chunking']['chunk_size']}")
         
     except Exception as e:
-        print(f"❌ Error browsing knowledge base: {e}")
+        log(f"❌ Error browsing knowledge base: {e}")
 
 async def main():
     """Main function with command-line interface."""
@@ -239,6 +322,13 @@ async def main():
     parser.add_argument("--no-metadata", action="store_true", help="Don't show metadata") 
     parser.add_argument("--max-length", "-l", type=int, default=200, help="Max content length to show")
     parser.add_argument("--filter-source", "-s", help="Filter by source name/URL (partial match)")
+    parser.add_argument("--source", action="append", dest="sources",
+                        help="Only this exact source name/URL (repeatable; filtered inside ChromaDB)")
+    parser.add_argument("--source-type", help="Only this source type (e.g. webpage, text)")
+    parser.add_argument("--offset", type=int, default=0, help="Matching entries to skip per collection")
+    parser.add_argument("--limit", "-n", type=int, help="Maximum entries to show per collection")
+    parser.add_argument("--page-size", type=int, default=500, help="Entries fetched from ChromaDB per request")
+    parser.add_argument("--jsonl", metavar="PATH", help="Export entries as JSON lines to PATH ('-' for stdout)")
     parser.add_argument("--stats-only", action="store_true", help="Show only statistics")
     
     args = parser.parse_args()
@@ -247,27 +337,8 @@ async def main():
         # Quick stats view
         print_header("📊 KNOWLEDGE BASE STATISTICS")
         try:
-            with suppress_stdout_stderr():
-                import chromadb
-                from chromadb.config import Settings
-                
-                # Use MCP server database path directly
-                mcp_db_path = "C:/Users/usuario/agent_playground/knowledge_base/chroma_db"
-                
-                client = chromadb.PersistentClient(
-                    path=mcp_db_path,
-                    settings=Settings(
-                        anonymized_telemetry=False,
-                        allow_reset=True
-                    )
-                )
-            
-            collections = client.list_collections()
-            collection_names = []
-            if hasattr(collections[0], 'name'):
-                collection_names = [col.name for col in collections]
-            else:
-                collection_names = collections
+            client = get_client()
+            collection_names = list_collection_names(client)
             
             total_entries = 0
             for col_name in collection_names:
@@ -286,7 +357,13 @@ async def main():
             show_content=not args.no_content,
             max_content_length=args.max_length,
             show_metadata=not args.no_metadata,
-            filter_source=args.filter_source
+            filter_source=args.filter_source,
+            sources=args.sources,
+            source_type=args.source_type,
+            offset=max(0, args.offset),
+            limit=args.limit,
+            page_size=max(1, args.page_size),
+            jsonl_path=args.jsonl
         )
 
 if __name__ == "__main__":
@@ -14,6 +14,7 @@ warnings.filterwarnings("ignore", message="Support for class-based `config` is d
 import os
 import sys
 import logging
+import contextlib
 
 from fastmcp import FastMCP
 
@@ -31,6 +32,7 @@ from tools import file_system_tool
 from tools import file_writing_tool
 from tools import screen_capture_tool
 from tools import rag_knowledge_base_tool
+from tools import http_client
 
 # Optional: Load .env file for local development
 try:
@@ -54,8 +56,14 @@ logger.info(f"🤖 Starting MCP Server for Claude Desktop")
 logger.info(f"Server: {MCP_SERVER_NAME}")
 logger.info(f"Transport: stdio")
 
-# Initialize FastMCP server
-mcp = FastMCP(MCP_SERVER_NAME)
+@contextlib.asynccontextmanager
+async def server_lifespan(server):
+    """Resume unfinished RAG ingestion jobs on start-up and close the shared HTTP clients on shutdown."""
+    async with http_client.lifespan(server), rag_knowledge_base_tool.lifespan(server):
+        yield {}
+
+# Initialize FastMCP server with the start-up/shutdown hooks above
+mcp = FastMCP(MCP_SERVER_NAME, lifespan=server_lifespan)
 
 # --- Register Tools ---
 logger.info("📦 Registering tools...")
@@ -173,6 +181,12 @@ def main():
     logger.info("")
     logger.info("🚀 Starting stdio transport...")
     
+    # Optional RAG warm-up (embedding.warmup in kb_config.json or RAG_WARMUP=1).
+    # Always blocking here: it finishes before the stdio transport takes over stdout.
+    warmup_state = rag_knowledge_base_tool.warm_up(blocking=True)
+    if warmup_state.get("status") != "disabled":
+        logger.info(f"🔥 RAG warm-up: {warmup_state.get('status')}")
+    
     try:
         # Start the MCP server with stdio transport
         mcp.run(transport="stdio")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Shared embedding server for the RAG knowledge base.
+Loads the embedding model once and serves encode requests to every MCP server
+process on this machine over a local socket, so each process does not hold
+its own copy of the model.
+
+Enable it with embedding.shared_server.enabled in kb_config.json. Servers start
+this script on demand when auto_start is set, or run it yourself:
+    python run_embedding_server.py
+    python run_embedding_server.py --host 127.0.0.1 --port 8765
+"""
+
+import sys
+import logging
+import argparse
+
+from tools import rag_knowledge_base_tool
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stderr
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Parse arguments and run the embedding server until interrupted."""
+    server_config = rag_knowledge_base_tool._get_shared_server_config()
+    parser = argparse.ArgumentParser(description="Shared embedding server for the RAG knowledge base")
+    parser.add_argument("--host", default=server_config["host"], help="Address to listen on")
+    parser.add_argument("--port", type=int, default=server_config["port"], help="Port to listen on")
+    args = parser.parse_args()
+
+    logger.info(f"🧠 Starting shared embedding server on {args.host}:{args.port}")
+    try:
+        rag_knowledge_base_tool.serve_embeddings(args.host, args.port)
+    except KeyboardInterrupt:
+        logger.info("🛑 Embedding server stopped by user")
+    except OSError as e:
+        logger.error(f"❌ Embedding server error: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
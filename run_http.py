@@ -14,6 +14,7 @@ warnings.filterwarnings("ignore", message="Support for class-based `config` is d
 import os
 import sys
 import logging
+import contextlib
 from fastmcp import FastMCP
 
 # Import tool registration functions
@@ -30,6 +31,7 @@ from tools import file_system_tool
 from tools import file_writing_tool
 from tools import screen_capture_tool
 from tools import rag_knowledge_base_tool
+from tools import http_client
 
 # Optional: Load .env file for local development
 try:
@@ -55,8 +57,14 @@ logger.info(f"🚀 Starting MCP Server for n8n")
 logger.info(f"Server: {MCP_SERVER_NAME}")
 logger.info(f"Address: http://{MCP_HOST}:{MCP_PORT}")
 
-# Initialize FastMCP server with settings
-mcp = FastMCP(name=MCP_SERVER_NAME)
+@contextlib.asynccontextmanager
+async def server_lifespan(server):
+    """Resume unfinished RAG ingestion jobs on start-up and close the shared HTTP clients on shutdown."""
+    async with http_client.lifespan(server), rag_knowledge_base_tool.lifespan(server):
+        yield {}
+
+# Initialize FastMCP server with the start-up/shutdown hooks above
+mcp = FastMCP(name=MCP_SERVER_NAME, lifespan=server_lifespan)
 
 # --- Register Tools ---
 logger.info("📦 Registering tools...")
@@ -119,6 +127,11 @@ def main():
     logger.info("")
     logger.info("⚡ Starting server...")
     
+    # Optional RAG warm-up (embedding.warmup in kb_config.json or RAG_WARMUP=1)
+    warmup_state = rag_knowledge_base_tool.warm_up()
+    if warmup_state.get("status") != "disabled":
+        logger.info(f"🔥 RAG warm-up: {warmup_state.get('status')}")
+    
     try:
         # Method 1: Try HTTP Streamable
         logger.info("🔄 Attempting HTTP transport...")
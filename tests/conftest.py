@@ -31,8 +31,9 @@ sys.path.insert(0, str(project_root))
 # Mock fastmcp module at the module level to prevent import errors
 if 'fastmcp' not in sys.modules:
     class MockFastMCP:
-        def __init__(self, name):
+        def __init__(self, name, **settings):
             self.name = name
+            self.settings = settings
             self._tool_manager = Mock()
             self._tool_manager._tools = {}
             
@@ -51,6 +52,15 @@ if 'fastmcp' not in sys.modules:
 
 # Removed deprecated event_loop fixture - using pytest-asyncio's default
 
+@pytest.fixture(autouse=True)
+def reset_http_clients():
+    """Give every test a fresh shared HTTP client registry, so patched clients never leak between tests."""
+    from tools import http_client
+    
+    http_client._clients.clear()
+    yield
+    http_client._clients.clear()
+
 @pytest.fixture
 def mock_env_vars():
     """Mock environment variables for testing."""
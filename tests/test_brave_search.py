@@ -2,7 +2,19 @@ import pytest
 from unittest.mock import AsyncMock, Mock, patch, MagicMock
 import httpx
 import os
-from tools.brave_search import brave_web_search, brave_local_search, register
+import asyncio
+from tools import brave_search
+from tools.brave_search import brave_web_search, brave_batch_search, brave_local_search, register
+
+
+@pytest.fixture(autouse=True)
+def empty_search_cache():
+    """Start every test with an empty web search cache, no searches in flight and a fresh rate limiter."""
+    brave_search.clear_cache()
+    brave_search._inflight_searches.clear()
+    brave_search._rate_limiter.reset()
+    yield
+    brave_search.clear_cache()
 
 
 class TestBraveSearchTool:
@@ -175,21 +187,23 @@ class TestBraveSearchTool:
             assert_error_response(result, "BRAVE_API_KEY is not configured")
     
     def test_registration(self, fastmcp_server):
-        """Test that both search tools register correctly."""
+        """Test that all search tools register correctly."""
         # Call the register function
         register(fastmcp_server)
         
-        # Verify both functions were registered
+        # Verify all functions were registered
         assert 'brave_web_search' in fastmcp_server._registered_functions
+        assert 'brave_batch_search' in fastmcp_server._registered_functions
         assert 'brave_local_search' in fastmcp_server._registered_functions
         
         # Verify they were added to the tool manager
         tool_manager = fastmcp_server._tool_manager
         assert 'brave_web_search' in tool_manager._tools
+        assert 'brave_batch_search' in tool_manager._tools
         assert 'brave_local_search' in tool_manager._tools
         
-        # Verify tool method was called twice (once for each function)
-        assert fastmcp_server.tool.call_count == 2
+        # Verify tool method was called once for each function
+        assert fastmcp_server.tool.call_count == 3
     
     @pytest.mark.asyncio
     async def test_web_search_response_format(self, mock_env_vars, mock_brave_search_response):
@@ -279,4 +293,418 @@ class TestBraveSearchTool:
                 headers = call_args[1]["headers"]
                 assert headers["Accept"] == "application/json"
                 assert headers["Accept-Encoding"] == "gzip"
-                assert headers["X-Subscription-Token"] == "test_brave_key" 
\ No newline at end of file
+                assert headers["X-Subscription-Token"] == "test_brave_key" 
+
+
+class TestBraveSearchCache:
+    """Test the web search response cache and request coalescing."""
+    
+    @pytest.fixture
+    def upstream(self):
+        """Replace the Brave API call with a counting fake that succeeds unless the query says "fail"."""
+        calls = []
+        
+        async def fetch(query, count, offset, priority=None, max_wait=None):
+            calls.append((query, count, offset))
+            await asyncio.sleep(0.01)
+            if "fail" in query:
+                return {"error": "Brave Search API returned status code 503", "status": "error"}
+            return {"query": query, "results": [{"title": f"{query} {count} {offset}"}], "status": "success"}
+        
+        with patch('tools.brave_search.BRAVE_API_KEY', 'test_brave_key'), \
+             patch('tools.brave_search._fetch_web_search', side_effect=fetch):
+            yield calls
+    
+    @pytest.mark.asyncio
+    async def test_repeated_search_served_from_memory(self, upstream):
+        """Test that normalized repeats hit the cache and different parameters do not."""
+        first = await brave_web_search("Python  Asyncio")
+        second = await brave_web_search("python asyncio")
+        third = await brave_web_search("python asyncio", count=5)
+        
+        assert [first["cache"], second["cache"], third["cache"]] == ["miss", "memory", "miss"]
+        assert second["query"] == "python asyncio"
+        assert second["results"] == first["results"]
+        assert len(upstream) == 2
+    
+    @pytest.mark.asyncio
+    async def test_cached_result_is_a_copy(self, upstream):
+        """Test that callers mutating a result do not change what the cache returns."""
+        first = await brave_web_search("copy")
+        first["results"].clear()
+        
+        assert len((await brave_web_search("copy"))["results"]) == 1
+    
+    @pytest.mark.asyncio
+    async def test_ttl_expiry_and_lru_eviction(self, upstream):
+        """Test that entries expire after the TTL and the least recently used entry is evicted."""
+        with patch.dict(os.environ, {"BRAVE_CACHE_TTL": "60", "BRAVE_CACHE_MAX_ENTRIES": "2"}):
+            await brave_web_search("a")
+            await brave_web_search("b")
+            await brave_web_search("a")
+            await brave_web_search("c")  # evicts "b"
+            assert (await brave_web_search("a"))["cache"] == "memory"
+            assert (await brave_web_search("b"))["cache"] == "miss"
+            
+            with patch('tools.brave_search.time.time', return_value=brave_search.time.time() + 61):
+                assert (await brave_web_search("a"))["cache"] == "miss"
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_searches_coalesced(self, upstream):
+        """Test that concurrent identical searches share one upstream call."""
+        results = await asyncio.gather(*[brave_web_search("same query") for _ in range(3)])
+        
+        assert len(upstream) == 1
+        assert sorted(r["cache"] for r in results) == ["coalesced", "coalesced", "miss"]
+        assert brave_search.get_cache_stats()["coalesced"] == 2
+        assert brave_search._inflight_searches == {}
+    
+    @pytest.mark.asyncio
+    async def test_errors_not_cached(self, upstream):
+        """Test that failed searches are retried upstream instead of served from the cache."""
+        await brave_web_search("fail")
+        result = await brave_web_search("fail")
+        
+        assert result["status"] == "error"
+        assert len(upstream) == 2
+    
+    @pytest.mark.asyncio
+    async def test_disk_tier_survives_restart(self, upstream, tmp_path):
+        """Test that results stored on disk are served after the in-memory cache is lost."""
+        with patch.dict(os.environ, {"BRAVE_CACHE_DIR": str(tmp_path)}):
+            await brave_web_search("persisted")
+            brave_search.clear_cache()
+            result = await brave_web_search("persisted")
+            again = await brave_web_search("persisted")
+        
+        assert result["cache"] == "disk"
+        assert again["cache"] == "memory"
+        assert len(upstream) == 1
+        assert (tmp_path / brave_search.BRAVE_CACHE_FILE).exists()
+
+    @pytest.mark.asyncio
+    async def test_disk_schema_created_once(self, upstream, tmp_path):
+        """Test that the disk tier runs its schema script on the first open only."""
+        import sqlite3
+        real_connect = sqlite3.connect
+        scripts = []
+
+        class RecordingConnection:
+            def __init__(self, conn):
+                self.conn = conn
+
+            def executescript(self, script):
+                scripts.append(script)
+                return self.conn.executescript(script)
+
+            def __getattr__(self, name):
+                return getattr(self.conn, name)
+
+        with patch.dict(os.environ, {"BRAVE_CACHE_DIR": str(tmp_path)}), \
+             patch('tools.brave_search.sqlite3.connect', side_effect=lambda *a, **k: RecordingConnection(real_connect(*a, **k))):
+            for query in ("first", "second", "third"):
+                await brave_web_search(query)
+                brave_search.clear_cache()
+            assert (await brave_web_search("first"))["cache"] == "disk"
+
+        assert scripts == [brave_search.BRAVE_CACHE_SCHEMA]
+
+    @pytest.mark.asyncio
+    async def test_disk_cache_warnings_go_to_stderr(self, upstream, tmp_path, capsys):
+        """Test that disk cache problems are reported on stderr, away from the stdio protocol stream."""
+        not_a_dir = tmp_path / "file"
+        not_a_dir.write_text("")
+        with patch.dict(os.environ, {"BRAVE_CACHE_DIR": str(not_a_dir)}):
+            result = await brave_web_search("unwritable")
+
+        captured = capsys.readouterr()
+        assert result["status"] == "success"
+        assert "disk cache unavailable" in captured.err
+        assert "disk cache unavailable" not in captured.out
+
+    @pytest.mark.asyncio
+    async def test_zero_ttl_disables_cache(self, upstream):
+        """Test that BRAVE_CACHE_TTL=0 sends every search upstream."""
+        with patch.dict(os.environ, {"BRAVE_CACHE_TTL": "0"}):
+            await brave_web_search("uncached")
+            result = await brave_web_search("uncached")
+        
+        assert "cache" not in result
+        assert len(upstream) == 2
+
+
+class TestBraveRateLimiter:
+    """Test the shared token bucket that paces Brave API calls."""
+    
+    @staticmethod
+    def response(status_code=200, headers=None):
+        """Build an httpx response carrying X-RateLimit-* headers."""
+        return httpx.Response(status_code, headers=headers or {}, json={"web": {"results": []}})
+    
+    @pytest.mark.asyncio
+    async def test_burst_then_queue_in_priority_order(self):
+        """Test that calls beyond the burst queue and are released highest priority first."""
+        limiter = brave_search._rate_limiter
+        order = []
+        
+        async def call(name, priority):
+            await limiter.acquire(priority, max_wait=5)
+            order.append(name)
+        
+        with patch.dict(os.environ, {"BRAVE_RATE_LIMIT": "50", "BRAVE_RATE_BURST": "1"}):
+            await asyncio.gather(
+                call("first", brave_search.PRIORITY_NORMAL),
+                call("low", brave_search.PRIORITY_LOW),
+                call("normal", brave_search.PRIORITY_NORMAL),
+                call("high", brave_search.PRIORITY_HIGH)
+            )
+            stats = brave_search.get_rate_limiter_stats()
+        
+        assert order == ["first", "high", "normal", "low"]
+        assert stats["granted"] == 4
+        assert stats["queued"] == 3
+        assert stats["queue_depth"] == 0
+        assert stats["wait_ms"]["max"] >= 40
+    
+    @pytest.mark.asyncio
+    async def test_fail_fast_when_wait_exceeds_deadline(self):
+        """Test that a call is rejected up front when its estimated wait is too long."""
+        with patch.dict(os.environ, {"BRAVE_RATE_LIMIT": "1", "BRAVE_RATE_BURST": "1"}):
+            await brave_search._rate_limiter.acquire(max_wait=0)
+            with pytest.raises(brave_search._QueueWaitExceeded):
+                await brave_search._rate_limiter.acquire(max_wait=0.5)
+        
+        assert brave_search.get_rate_limiter_stats()["rejected"] == 1
+    
+    def test_limits_learned_from_headers(self):
+        """Test that the plan's per-second limit is read from the response headers."""
+        brave_search._rate_limiter.observe(self.response(headers={
+            "X-RateLimit-Limit": "20, 20000000",
+            "X-RateLimit-Policy": "20;w=1, 20000000;w=2592000",
+            "X-RateLimit-Remaining": "19, 19999990",
+            "X-RateLimit-Reset": "1, 1419704"
+        }))
+        
+        assert brave_search.get_rate_limiter_stats()["rate_per_second"] == 20
+        assert brave_search.get_rate_limiter_stats()["burst"] == 20
+        with patch.dict(os.environ, {"BRAVE_RATE_LIMIT": "5"}):
+            assert brave_search.get_rate_limiter_stats()["rate_per_second"] == 5
+    
+    def test_policy_header_with_extra_parameters(self):
+        """Test that extra or malformed X-RateLimit-Policy parameters don't break limit learning."""
+        brave_search._rate_limiter.observe(self.response(headers={
+            "X-RateLimit-Limit": "10, 2000",
+            "X-RateLimit-Policy": "10;w=2;burst=5, 2000;w=2592000;comment=\"monthly\"",
+            "X-RateLimit-Remaining": "9, 1999",
+            "X-RateLimit-Reset": "1, 86400"
+        }))
+        assert brave_search.get_rate_limiter_stats()["rate_per_second"] == 5
+        
+        brave_search._rate_limiter.observe(self.response(headers={
+            "X-RateLimit-Limit": "1",
+            "X-RateLimit-Policy": "1;burst=5;w=soon, oops",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": "1"
+        }))
+        stats = brave_search.get_rate_limiter_stats()
+        assert stats["rate_per_second"] == 1
+        assert stats["block_reason"] == "rate limit"
+    
+    @pytest.mark.asyncio
+    async def test_exhausted_quota_rejects_with_retry_after(self, mock_env_vars, capsys):
+        """Test that an exhausted monthly quota fails fast with a tool error instead of queueing."""
+        exhausted = self.response(headers={
+            "X-RateLimit-Limit": "1, 2000",
+            "X-RateLimit-Remaining": "0, 0",
+            "X-RateLimit-Reset": "1, 86400"
+        })
+        with patch('tools.brave_search.BRAVE_API_KEY', 'test_brave_key'), \
+             patch('httpx.AsyncClient') as mock_client:
+            mock_context = AsyncMock()
+            mock_context.get.return_value = exhausted
+            mock_client.return_value.__aenter__.return_value = mock_context
+            
+            await brave_web_search("first")
+            result = await brave_web_search("second")
+        
+        assert result["status"] == "error"
+        assert "quota exhausted" in result["error"]
+        assert result["retry_after_seconds"] > 86000
+        assert mock_context.get.call_count == 1
+        # Logged on stderr so the stdio protocol stream on stdout stays clean
+        captured = capsys.readouterr()
+        assert "brave_web_search rejected" in captured.err
+        assert "rejected" not in captured.out
+    
+    @pytest.mark.asyncio
+    async def test_throttled_response_retried_after_reset(self, mock_env_vars):
+        """Test that a 429 blocks the bucket until the reset and the call is retried once."""
+        throttled = self.response(429, {"X-RateLimit-Remaining": "0, 100", "X-RateLimit-Reset": "0.05, 1000"})
+        with patch.dict(os.environ, {"BRAVE_RATE_LIMIT": "100"}), \
+             patch('tools.brave_search.BRAVE_API_KEY', 'test_brave_key'), \
+             patch('httpx.AsyncClient') as mock_client:
+            mock_context = AsyncMock()
+            mock_context.get.side_effect = [throttled, self.response()]
+            mock_client.return_value.__aenter__.return_value = mock_context
+            
+            result = await brave_web_search("throttled")
+        
+        assert result["status"] == "success"
+        assert mock_context.get.call_count == 2
+        assert brave_search.get_rate_limiter_stats()["throttled_responses"] == 1
+
+
+class TestBraveBatchSearch:
+    """Test running several searches in one tool call."""
+    
+    PAGES = {
+        "python asyncio": ["https://docs.python.org/3/library/asyncio.html", "https://realpython.com/async-io-python/"],
+        "python event loop": ["https://docs.python.org/3/library/asyncio.html#event-loop", "https://example.com/loop"],
+        "asyncio tutorial": ["https://RealPython.com/async-io-python", "https://example.com/tutorial"]
+    }
+    
+    @pytest.fixture
+    def upstream(self):
+        """Serve canned results for PAGES, failing any other query, and record concurrency."""
+        state = {"active": 0, "peak": 0, "priorities": []}
+        
+        async def fetch(query, count, offset, priority=None, max_wait=None):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            state["priorities"].append(priority)
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            if query not in self.PAGES:
+                return {"error": "Brave Search API returned status code 503", "status": "error"}
+            results = [{"title": url, "url": url, "description": f"About {query}", "age": "2 days ago",
+                        "profile": {"name": "raw"}} for url in self.PAGES[query][:count]]
+            return {"query": query, "results": results, "status": "success"}
+        
+        with patch('tools.brave_search.BRAVE_API_KEY', 'test_brave_key'), \
+             patch('tools.brave_search._fetch_web_search', side_effect=fetch):
+            yield state
+    
+    @pytest.mark.asyncio
+    async def test_queries_run_concurrently_and_urls_deduplicated(self, upstream):
+        """Test that queries overlap and pages found by several queries are merged."""
+        result = await brave_batch_search(list(self.PAGES))
+        
+        assert result["status"] == "success"
+        assert upstream["peak"] == 3
+        assert upstream["priorities"] == [brave_search.PRIORITY_LOW] * 3
+        assert [q["result_count"] for q in result["queries"]] == [2, 2, 2]
+        assert result["unique_count"] == 4
+        assert result["duplicate_count"] == 2
+        
+        # Fragments, case in the host and trailing slashes do not make a page new
+        urls = [r["url"] for r in result["results"]]
+        assert urls == [
+            "https://docs.python.org/3/library/asyncio.html",
+            "https://realpython.com/async-io-python/",
+            "https://example.com/loop",
+            "https://example.com/tutorial"
+        ]
+        assert result["results"][0]["queries"] == ["python asyncio", "python event loop"]
+        merged = result["results"][1]
+        assert merged["queries"] == ["python asyncio", "asyncio tutorial"]
+        assert set(merged) == {"title", "url", "snippet", "age", "queries"}
+    
+    @pytest.mark.asyncio
+    async def test_partial_failure_reported_per_query(self, upstream):
+        """Test that a failed query is reported without failing the batch."""
+        result = await brave_batch_search(["python asyncio", "broken"], count=1)
+        
+        assert result["status"] == "success"
+        assert result["queries"][1] == {
+            "query": "broken", "error": "Brave Search API returned status code 503", "status": "error"
+        }
+        assert [r["url"] for r in result["results"]] == ["https://docs.python.org/3/library/asyncio.html"]
+        
+        failed = await brave_batch_search(["broken"])
+        assert failed["status"] == "error"
+        assert failed["queries"][0]["status"] == "error"
+    
+    @pytest.mark.asyncio
+    async def test_invalid_batches_rejected(self, upstream):
+        """Test input validation for the batch tool."""
+        assert "At least one query" in (await brave_batch_search(["", "  "]))["error"]
+        assert "At most 20" in (await brave_batch_search([f"q{i}" for i in range(21)]))["error"]
+        assert "Count must be" in (await brave_batch_search(["python asyncio"], count=0))["error"]
+        assert upstream["priorities"] == []
+
+
+class TestBraveResultProjection:
+    """Test the compact projection of web search results."""
+    
+    RAW_RESULT = {
+        "title": "Asyncio docs",
+        "url": "https://docs.python.org/3/library/asyncio.html",
+        "description": "asyncio is a library to write concurrent code using the async/await syntax.",
+        "page_age": "2024-05-01T00:00:00",
+        "language": "en",
+        "profile": {"name": "Python", "img": "https://imgs.search.brave.com/python.png"},
+        "deep_results": {"buttons": [{"title": "Coroutines"}]}
+    }
+    
+    @pytest.fixture
+    def upstream(self):
+        """Serve one raw result with a mixed ranking block."""
+        async def fetch(query, count, offset, priority=None, max_wait=None):
+            return {
+                "query": query, "results": [dict(self.RAW_RESULT)], "total_count": 1, "web_count": 1,
+                "news_count": 0, "videos_count": 0, "mixed": {"main": [{"type": "web", "index": 0}]},
+                "search_info": {"available_sections": ["web", "mixed"]}, "status": "success"
+            }
+        
+        with patch('tools.brave_search.BRAVE_API_KEY', 'test_brave_key'), \
+             patch('tools.brave_search._fetch_web_search', side_effect=fetch):
+            yield
+    
+    @pytest.mark.asyncio
+    async def test_compact_by_default(self, upstream):
+        """Test that results are projected to title, url, snippet and age without the mixed block."""
+        result = await brave_web_search("asyncio")
+        
+        assert result["results"] == [{
+            "title": "Asyncio docs",
+            "url": "https://docs.python.org/3/library/asyncio.html",
+            "snippet": "asyncio is a library to write concurrent code using the async/await syntax.",
+            "age": "2024-05-01T00:00:00"
+        }]
+        assert "mixed" not in result and "search_info" not in result
+        assert result["total_count"] == 1
+        assert result["cache"] == "miss"
+    
+    @pytest.mark.asyncio
+    async def test_call_logging_stays_off_stdout(self, upstream, capsys):
+        """Test that per-call log lines go to stderr, since stdout carries the stdio protocol stream."""
+        await brave_web_search("asyncio")
+        await brave_batch_search(["asyncio", "asyncio tasks"])
+        
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert "brave_web_search called" in captured.err
+        assert "brave_batch_search called" in captured.err
+    
+    @pytest.mark.asyncio
+    async def test_fields_and_snippet_truncation(self, upstream):
+        """Test choosing fields, including raw result keys, and truncating snippets at a word."""
+        result = await brave_web_search("asyncio", fields=["url", "snippet", "language"], snippet_length=30)
+        
+        assert result["results"] == [{
+            "url": "https://docs.python.org/3/library/asyncio.html",
+            "snippet": "asyncio is a library to write…",
+            "language": "en"
+        }]
+        assert "Snippet length" in (await brave_web_search("asyncio", snippet_length=0))["error"]
+        assert "Fields must" in (await brave_web_search("asyncio", fields=[]))["error"]
+    
+    @pytest.mark.asyncio
+    async def test_raw_response_on_request(self, upstream):
+        """Test that raw=True returns the full results and mixed block, also when served from the cache."""
+        await brave_web_search("asyncio")
+        result = await brave_web_search("asyncio", raw=True)
+        
+        assert result["cache"] == "memory"
+        assert result["results"] == [self.RAW_RESULT]
+        assert result["mixed"] == {"main": [{"type": "web", "index": 0}]}
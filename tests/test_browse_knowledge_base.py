@@ -0,0 +1,149 @@
+"""
+Test suite for the knowledge base browser script (browse_knowledge_base.py).
+Tests paging, streaming, source filters and JSONL export against a fake collection.
+"""
+
+import pytest
+import sys
+import json
+from io import StringIO
+from unittest.mock import patch, Mock
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import browse_knowledge_base as browser
+
+
+def matches(meta, where):
+    """Evaluate the where clauses build_source_filter emits."""
+    if "$and" in where:
+        return all(matches(meta, clause) for clause in where["$and"])
+    if "$or" in where:
+        return any(matches(meta, clause) for clause in where["$or"])
+    field, condition = next(iter(where.items()))
+    if isinstance(condition, dict):
+        return meta.get(field) in condition["$in"]
+    return meta.get(field) == condition
+
+
+@pytest.fixture
+def collection():
+    """A collection of 25 chunks from five sources that records every get() call."""
+    entries = [
+        (f"chunk_{i}", f"Chunk {i} text", {
+            "source_url" if i % 5 < 3 else "source_name": f"source_{i % 5}",
+            "source_type": "webpage" if i % 5 < 3 else "text",
+            "chunk_index": i
+        })
+        for i in range(25)
+    ]
+    calls = []
+
+    def collection_get(include=None, limit=None, offset=0, where=None):
+        calls.append({"include": include, "limit": limit, "offset": offset, "where": where})
+        selected = [entry for entry in entries if where is None or matches(entry[2], where)]
+        page = selected[offset:offset + limit]
+        result = {'ids': [e[0] for e in page], 'metadatas': [e[2] for e in page]}
+        if 'documents' in include:
+            result['documents'] = [e[1] for e in page]
+        return result
+
+    mock_collection = Mock()
+    mock_collection.get = Mock(side_effect=collection_get)
+    mock_collection.count = Mock(return_value=len(entries))
+    mock_collection.calls = calls
+    return mock_collection
+
+
+class TestIterEntries:
+    """Test the page-by-page entry iterator."""
+
+    def test_streams_in_pages(self, collection):
+        """Test that entries are fetched page_size at a time, never all at once."""
+        entries = list(browser.iter_entries(collection, page_size=10))
+
+        assert [e[1] for e in entries] == [f"chunk_{i}" for i in range(25)]
+        assert [call["offset"] for call in collection.calls] == [0, 10, 20]
+        assert all(call["limit"] == 10 for call in collection.calls)
+
+    def test_is_lazy(self, collection):
+        """Test that the iterator only fetches pages as they are consumed."""
+        entries = browser.iter_entries(collection, page_size=10)
+        next(entries)
+
+        assert len(collection.calls) == 1
+
+    def test_offset_and_limit(self, collection):
+        """Test that offset is passed to ChromaDB and limit caps how much is fetched."""
+        entries = list(browser.iter_entries(collection, page_size=5, offset=12, limit=7))
+
+        assert [e[0] for e in entries] == list(range(12, 19))
+        assert [(call["offset"], call["limit"]) for call in collection.calls] == [(12, 5), (17, 2)]
+
+    def test_source_filter_pushed_down(self, collection):
+        """Test that exact source and type filters reach ChromaDB's where clause."""
+        where = browser.build_source_filter(["source_1", "source_4"], source_type="webpage")
+        entries = list(browser.iter_entries(collection, page_size=10, where=where))
+
+        assert {e[3]["source_url"] for e in entries} == {"source_1"}
+        assert len(entries) == 5
+        assert collection.calls[0]["where"] == where
+
+    def test_partial_source_filter_with_offset(self, collection):
+        """Test that partial matches are filtered while streaming and offset counts matches only."""
+        entries = list(browser.iter_entries(collection, page_size=7, offset=2, limit=2, filter_source="SOURCE_3"))
+
+        assert [e[1] for e in entries] == ["chunk_13", "chunk_18"]
+        assert collection.calls[0]["offset"] == 0
+
+    def test_metadata_only(self, collection):
+        """Test that documents are not fetched when content is not needed."""
+        entries = list(browser.iter_entries(collection, page_size=10, include_documents=False))
+
+        assert collection.calls[0]["include"] == ['metadatas']
+        assert entries[0][2] is None
+
+
+class TestJsonlExport:
+    """Test JSONL export through browse_knowledge_base."""
+
+    @pytest.mark.asyncio
+    async def test_export_to_file(self, collection, tmp_path):
+        """Test that each entry becomes one JSON line with collection, id, document and metadata."""
+        listed = Mock()
+        listed.name = "docs"
+        client = Mock()
+        client.list_collections = Mock(return_value=[listed])
+        client.get_collection = Mock(return_value=collection)
+        output = tmp_path / "docs.jsonl"
+
+        with patch.object(browser, 'get_client', return_value=client), \
+             patch.multiple(browser, CHROMADB_AVAILABLE=True, SENTENCE_TRANSFORMERS_AVAILABLE=True,
+                            LANGCHAIN_AVAILABLE=True), \
+             patch('sys.stdout', new_callable=StringIO):
+            await browser.browse_knowledge_base("docs", source_type="text", page_size=4, jsonl_path=str(output))
+
+        lines = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+        assert len(lines) == 10
+        assert lines[0] == {"collection": "docs", "id": "chunk_3", "document": "Chunk 3 text",
+                            "metadata": {"source_name": "source_3", "source_type": "text", "chunk_index": 3}}
+
+    @pytest.mark.asyncio
+    async def test_export_to_stdout_keeps_stream_clean(self, collection):
+        """Test that status messages go to stderr when JSON lines are written to stdout."""
+        client = Mock()
+        client.list_collections = Mock(return_value=["docs"])
+        client.get_collection = Mock(return_value=collection)
+
+        with patch.object(browser, 'get_client', return_value=client), \
+             patch.multiple(browser, CHROMADB_AVAILABLE=True, SENTENCE_TRANSFORMERS_AVAILABLE=True,
+                            LANGCHAIN_AVAILABLE=True), \
+             patch('sys.stdout', new_callable=StringIO) as stdout, \
+             patch('sys.stderr', new_callable=StringIO) as stderr:
+            await browser.browse_knowledge_base("docs", limit=3, jsonl_path="-")
+
+        lines = stdout.getvalue().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == ["chunk_0", "chunk_1", "chunk_2"]
+        assert "Exported 3 entries" in stderr.getvalue()
@@ -0,0 +1,75 @@
+import pytest
+import asyncio
+import httpx
+from unittest.mock import patch
+from tools import http_client
+from tools.http_client import get_http_client, close_http_clients, lifespan
+
+
+class TestSharedHttpClient:
+    """Test suite for the shared pooled HTTP client."""
+    
+    @pytest.mark.asyncio
+    async def test_client_reused_until_closed(self):
+        """Test that every caller gets the same open client until the registry is closed."""
+        client = await get_http_client()
+        
+        assert await get_http_client() is client
+        assert await get_http_client("other") is not client
+        
+        await close_http_clients()
+        
+        assert client.is_closed
+        assert http_client._clients == {}
+        assert await get_http_client() is not client
+        await close_http_clients()
+    
+    def test_client_replaced_on_new_event_loop(self):
+        """Test that a client opened on a finished event loop is not handed to another loop."""
+        first = asyncio.run(get_http_client())
+        second = asyncio.run(get_http_client())
+        
+        assert first is not second
+        assert http_client._clients["default"][0] is second
+    
+    def test_settings_from_environment(self):
+        """Test that pool limits and HTTP/2 come from the environment."""
+        env = {"HTTP_MAX_CONNECTIONS": "8", "HTTP_MAX_KEEPALIVE": "4", "HTTP_KEEPALIVE_EXPIRY": "5", "HTTP_HTTP2": "0"}
+        with patch.dict("os.environ", env):
+            settings = http_client._client_settings()
+        
+        assert settings["http2"] is False
+        assert settings["limits"] == httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=5.0)
+    
+    def test_http2_auto_follows_h2(self):
+        """Test that HTTP/2 is only negotiated by default when h2 is installed."""
+        with patch.dict("os.environ", {"HTTP_HTTP2": "auto"}):
+            with patch.object(http_client, "H2_AVAILABLE", True):
+                assert http_client._client_settings()["http2"] is True
+            with patch.object(http_client, "H2_AVAILABLE", False):
+                assert http_client._client_settings()["http2"] is False
+    
+    @pytest.mark.asyncio
+    async def test_lifespan_closes_clients(self):
+        """Test that the server lifespan closes the shared clients on shutdown."""
+        async with lifespan(None):
+            client = await get_http_client()
+            assert not client.is_closed
+        
+        assert client.is_closed
+    
+    @pytest.mark.asyncio
+    async def test_overlapping_sessions_share_client_until_last_exits(self):
+        """Test that one session ending does not close the client another session is using."""
+        first = lifespan(None)
+        second = lifespan(None)
+        await first.__aenter__()
+        await second.__aenter__()
+        client = await get_http_client()
+        
+        await first.__aexit__(None, None, None)
+        assert not client.is_closed
+        assert await get_http_client() is client
+        
+        await second.__aexit__(None, None, None)
+        assert client.is_closed
@@ -313,7 +313,20 @@ class TestClaudeLauncherScript:
         
         # Verify that the server run method was called
         mock_run.assert_called_once_with(transport="stdio")
-    
+
+    @patch('run_claude.mcp.run')
+    def test_main_warms_up_before_stdio_transport(self, mock_run, clean_env, mock_tool_imports):
+        """Test that RAG warm-up finishes (blocking) before the stdio transport starts."""
+        import run_claude
+
+        calls = []
+        mock_run.side_effect = lambda **kwargs: calls.append(("run", kwargs))
+        with patch('run_claude.rag_knowledge_base_tool') as mock_rag:
+            mock_rag.warm_up.side_effect = lambda **kwargs: calls.append(("warm_up", kwargs)) or {"status": "ready"}
+            run_claude.main()
+
+        assert calls == [("warm_up", {"blocking": True}), ("run", {"transport": "stdio"})]
+
     @patch('run_claude.mcp.run')
     def test_main_keyboard_interrupt(self, mock_run, clean_env, mock_tool_imports):
         """Test main function handling KeyboardInterrupt."""
@@ -1,6 +1,7 @@
 import pytest
 import asyncio
 from unittest.mock import patch, AsyncMock, Mock, MagicMock
+from types import SimpleNamespace
 from typing import Dict, Any
 import sys
 from pathlib import Path
@@ -17,14 +18,40 @@ from tools.rag_knowledge_base_tool import (
     get_kb_health,
     add_url_to_kb,
     add_text_to_kb,
+    add_urls_to_kb,
     search_kb,
     list_kb_sources,
     get_kb_stats,
+    rebuild_kb_summary,
+    export_kb_collection,
+    import_kb_collection,
+    submit_kb_ingestion,
+    get_kb_job_status,
     CHROMADB_AVAILABLE,
     SENTENCE_TRANSFORMERS_AVAILABLE,
     LANGCHAIN_AVAILABLE
 )
 
+
+@pytest.fixture(autouse=True)
+def isolated_kb_dir(tmp_path):
+    """Keep sidecar stores (embedding cache etc.) in a per-test directory."""
+    with patch('tools.rag_knowledge_base_tool._get_kb_dir', return_value=tmp_path):
+        yield tmp_path
+
+
+@pytest.fixture(autouse=True)
+def empty_search_caches():
+    """Start every test with empty in-memory query-embedding and result caches."""
+    from tools import rag_knowledge_base_tool as rag
+    
+    rag._query_embedding_cache.clear()
+    rag._search_result_cache.clear()
+    rag._collection_generations.clear()
+    for counter in rag._search_cache_stats:
+        rag._search_cache_stats[counter] = 0
+    yield
+
 # Test class for RAG infrastructure operations
 @pytest.mark.unit
 @pytest.mark.external_api
@@ -208,6 +235,7 @@ class TestRAGContentIngestion:
             # Mock collection
             mock_collection = Mock()
             mock_collection.add = Mock()
+            mock_collection.get = Mock(return_value={'ids': [], 'metadatas': []})
             
             # Mock client
             mock_client = Mock()
@@ -634,50 +662,2378 @@ class TestRAGSearchRetrieval:
             assert "Failed to get stats" in result["error"]
 
 
-# Test class for RAG tool registration and error handling
+# Test class for the worker pool layer
 @pytest.mark.unit
-class TestRAGToolRegistration:
-    """Test RAG tool registration and error handling."""
+class TestRAGWorkerPool:
+    """Test that blocking RAG calls run in bounded worker pools."""
     
-    def test_tool_registration_available(self, fastmcp_server):
-        """Test tool registration when dependencies are available."""
-        from tools.rag_knowledge_base_tool import register
+    @pytest.fixture
+    def worker_mocks(self):
+        """Setup mocks that record which thread runs the embedding model."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            encode_threads = []
+            
+            def record_encode(texts, **kwargs):
+                import threading
+                encode_threads.append(threading.current_thread().name)
+                return Mock(tolist=Mock(return_value=[[0.1, 0.2]] * len(texts)))
+            
+            mock_collection = Mock()
+            mock_collection.get = Mock(return_value={'ids': [], 'metadatas': []})
+            mock_collection.query = Mock(return_value={
+                'documents': [['worker result']],
+                'metadatas': [[{'source_name': 'worker_doc'}]],
+                'distances': [[0.1]]
+            })
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=record_encode)
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(return_value=['worker chunk one', 'worker chunk two'])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'collection': mock_collection, 'encode_threads': encode_threads}
+    
+    @pytest.mark.asyncio
+    async def test_search_and_ingest_use_separate_lanes(self, worker_mocks):
+        """Test that search and ingestion encode in their own worker threads."""
+        add_result = await add_text_to_kb("Worker pool content for the ingest lane", "worker_doc")
+        search_result = await search_kb("worker pool query")
+        
+        assert add_result["status"] == "success"
+        assert search_result["status"] == "success"
+        assert worker_mocks['encode_threads'][0].startswith("rag-ingest")
+        assert worker_mocks['encode_threads'][-1].startswith("rag-search")
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects_new_work(self, worker_mocks):
+        """Test that a lane at max_queue_depth fails fast instead of queueing."""
+        with patch('tools.rag_knowledge_base_tool._get_worker_config', return_value={
+            "pool_type": "thread", "search_workers": 1, "ingest_workers": 1, "max_queue_depth": 0
+        }):
+            result = await search_kb("worker pool query")
+        
+        assert result["status"] == "error"
+        assert "queue is full" in result["error"]
+    
+    @pytest.mark.asyncio
+    async def test_health_reports_worker_metrics(self, worker_mocks):
+        """Test that get_kb_health exposes per-lane worker metrics."""
+        await search_kb("worker pool query")
+        health = await get_kb_health()
+        
+        workers = health["components"]["workers"]
+        assert workers["pool_type"] == "thread"
+        assert workers["lanes"]["search"]["completed"] > 0
+        assert "avg_wait_ms" in workers["lanes"]["search"]
+        assert "rejected" in workers["lanes"]["ingest"]
+
+    def test_chunk_lane_defaults_to_threads(self):
+        """Test that chunking stays on threads unless a process pool is configured."""
+        from concurrent.futures import ThreadPoolExecutor
+        from tools.rag_knowledge_base_tool import _get_worker_config, _get_worker_pool
+
+        with patch('tools.rag_knowledge_base_tool._load_config', return_value={}), \
+             patch.dict('tools.rag_knowledge_base_tool._worker_pools', clear=True):
+            assert _get_worker_config()["chunk_pool_type"] == "thread"
+            assert isinstance(_get_worker_pool("chunk", cpu_bound=True), ThreadPoolExecutor)
+
+    def test_process_pool_is_spawned(self):
+        """Test that an opted-in process pool uses spawn and silences the child's stdout."""
+        from concurrent.futures import ProcessPoolExecutor
+        from tools.rag_knowledge_base_tool import _get_worker_pool, _init_process_worker
+
+        with patch('tools.rag_knowledge_base_tool._get_worker_config', return_value={
+            "pool_type": "thread", "chunk_workers": 1, "chunk_pool_type": "process"
+        }), patch.dict('tools.rag_knowledge_base_tool._worker_pools', clear=True):
+            pool = _get_worker_pool("chunk", cpu_bound=True)
+            try:
+                assert isinstance(pool, ProcessPoolExecutor)
+                assert pool._mp_context.get_start_method() == "spawn"
+                assert pool._initializer is _init_process_worker
+                assert pool.submit(abs, -3).result(timeout=60) == 3
+            finally:
+                pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_calls_free_their_queue_slots(self, worker_mocks):
+        """Test that cancelled calls are counted as cancelled and leave pending back at 0."""
+        import threading
+        from tools.rag_knowledge_base_tool import _run_in_worker, _worker_stats
         
+        release = threading.Event()
+        with patch.dict(_worker_stats, clear=True):
+            tasks = [asyncio.create_task(_run_in_worker("search", release.wait, 5)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            for task in tasks:
+                task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            release.set()
+            
+            stats = _worker_stats["search"]
+            assert all(isinstance(r, asyncio.CancelledError) for r in results)
+            assert stats["pending"] == 0
+            assert stats["cancelled"] == 3
+            assert stats["failed"] == 0
+            assert await _run_in_worker("search", lambda: "still accepting") == "still accepting"
+    
+    @pytest.mark.asyncio
+    async def test_worker_call_keeps_concurrent_output(self, worker_mocks, capsys):
+        """Test that output written elsewhere while a worker call runs is not swallowed."""
+        import threading
+        from tools.rag_knowledge_base_tool import _run_in_worker
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_call():
+            started.set()
+            release.wait(5)
+            return "done"
+
+        task = asyncio.create_task(_run_in_worker("search", blocking_call))
+        assert await asyncio.to_thread(started.wait, 5)
+        print("written during worker call")
+        release.set()
+
+        assert await task == "done"
+        assert "written during worker call" in capsys.readouterr().out
+
+
+# Test class for search query micro-batching
+@pytest.mark.unit
+class TestRAGQueryBatching:
+    """Test that concurrent search queries share embedding calls."""
+    
+    @pytest.fixture
+    def batching_mocks(self):
+        """Setup search mocks whose model returns one vector per input text."""
         with patch.multiple(
             'tools.rag_knowledge_base_tool',
             CHROMADB_AVAILABLE=True,
             SENTENCE_TRANSFORMERS_AVAILABLE=True,
             LANGCHAIN_AVAILABLE=True
         ):
-            # Mock server instance
-            mock_server = Mock()
-            mock_server.tool = Mock(return_value=lambda func: func)
+            mock_collection = Mock()
+            mock_collection.query = Mock(return_value={
+                'documents': [['batched result']],
+                'metadatas': [[{'source_name': 'batch_doc'}]],
+                'distances': [[0.1]]
+            })
             
-            # Should not raise any exceptions
-            register(mock_server)
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[float(i), 0.5] for i in range(len(texts))])
+            ))
             
-            # Verify tools were registered (7 calls for 7 functions)
-            assert mock_server.tool.call_count == 7
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model):
+                yield {'model': mock_model, 'collection': mock_collection}
     
-    def test_tool_registration_unavailable(self, fastmcp_server):
-        """Test tool registration when dependencies are unavailable."""
-        from tools.rag_knowledge_base_tool import register
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_encoded_in_one_batch(self, batching_mocks):
+        """Test that queries arriving within max_wait_ms are encoded together."""
+        with patch('tools.rag_knowledge_base_tool._get_query_batching_config', return_value={
+            "enabled": True, "max_wait_ms": 50, "max_batch_size": 32
+        }):
+            queries = [f"batched query {i}" for i in range(5)]
+            results = await asyncio.gather(*(search_kb(q) for q in queries))
+        
+        assert all(r["status"] == "success" for r in results)
+        batching_mocks['model'].encode.assert_called_once()
+        assert sorted(batching_mocks['model'].encode.call_args[0][0]) == sorted(queries)
+        
+        # Each caller gets its own vector back
+        sent_vectors = [c.kwargs["query_embeddings"][0] for c in batching_mocks['collection'].query.call_args_list]
+        assert sorted(v[0] for v in sent_vectors) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    
+    @pytest.mark.asyncio
+    async def test_batch_flushes_at_max_size(self, batching_mocks):
+        """Test that a full batch is encoded without waiting for the timer."""
+        with patch('tools.rag_knowledge_base_tool._get_query_batching_config', return_value={
+            "enabled": True, "max_wait_ms": 10000, "max_batch_size": 2
+        }):
+            results = await asyncio.wait_for(
+                asyncio.gather(*(search_kb(f"sized query {i}") for i in range(4))),
+                timeout=5
+            )
+        
+        assert all(r["status"] == "success" for r in results)
+        assert batching_mocks['model'].encode.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_queries_share_one_embedding(self, batching_mocks):
+        """Test that identical concurrent queries are encoded once."""
+        with patch('tools.rag_knowledge_base_tool._get_query_batching_config', return_value={
+            "enabled": True, "max_wait_ms": 50, "max_batch_size": 32
+        }):
+            results = await asyncio.gather(*(search_kb("same query") for _ in range(3)))
         
+        assert all(r["status"] == "success" for r in results)
+        assert batching_mocks['model'].encode.call_args[0][0] == ["same query"]
+
+
+# Test class for the persistent embedding cache
+@pytest.mark.unit
+class TestRAGEmbeddingCache:
+    """Test that unchanged chunks skip the embedding model on re-ingestion."""
+    
+    @pytest.fixture
+    def cache_mocks(self):
+        """Setup ingestion mocks whose model returns one vector per input text."""
         with patch.multiple(
             'tools.rag_knowledge_base_tool',
-            CHROMADB_AVAILABLE=False,
-            SENTENCE_TRANSFORMERS_AVAILABLE=False,
-            LANGCHAIN_AVAILABLE=False
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
         ):
-            # Mock server instance
-            mock_server = Mock()
-            mock_server.tool = Mock(return_value=lambda func: func)
+            mock_collection = Mock()
+            mock_collection.get = Mock(return_value={'ids': [], 'metadatas': []})
+            mock_client = Mock()
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            mock_client.list_collections = Mock(return_value=[])
             
-            # Should return early without registering tools
-            register(mock_server)
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[float(len(t)), 0.5] for t in texts])
+            ))
             
-            # Verify no tools were registered
-            assert mock_server.tool.call_count == 0
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'model': mock_model, 'collection': mock_collection}
+    
+    @pytest.mark.asyncio
+    async def test_reingesting_same_text_hits_cache(self, cache_mocks):
+        """Test that re-adding identical content does not call the model again."""
+        text = "first cached chunk | second cached chunk"
+        first = await add_text_to_kb(text, "cached_doc")
+        second = await add_text_to_kb(text, "cached_doc")
+        
+        assert first["embedding_cache_hits"] == 0
+        assert second["embedding_cache_hits"] == 2
+        cache_mocks['model'].encode.assert_called_once()
+        
+        # Cached vectors are passed to Chroma unchanged
+        first_vectors = cache_mocks['collection'].add.call_args_list[0].kwargs["embeddings"]
+        second_vectors = cache_mocks['collection'].add.call_args_list[1].kwargs["embeddings"]
+        assert first_vectors == second_vectors
+    
+    @pytest.mark.asyncio
+    async def test_only_changed_chunks_are_encoded(self, cache_mocks):
+        """Test that a partially edited document encodes only its new chunks."""
+        await add_text_to_kb("stable chunk text | old ending chunk", "edited_doc")
+        result = await add_text_to_kb("stable   chunk text | brand new ending chunk", "edited_doc")
+        
+        assert result["embedding_cache_hits"] == 1
+        assert cache_mocks['model'].encode.call_args[0][0] == ["brand new ending chunk"]
+    
+    @pytest.mark.asyncio
+    async def test_cache_evicts_least_recently_used(self, cache_mocks):
+        """Test that the cache stays within max_entries."""
+        with patch('tools.rag_knowledge_base_tool._get_embedding_cache_config', return_value={
+            "enabled": True, "max_entries": 2
+        }):
+            await add_text_to_kb("alpha chunk one | beta chunk two | gamma chunk three", "evict_doc")
+            stats = await get_kb_stats()
+        
+        assert stats["embedding_cache"]["entries"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_stats_report_hit_rate(self, cache_mocks):
+        """Test that get_kb_stats reports embedding cache hit rates."""
+        await add_text_to_kb("hit rate chunk one | hit rate chunk two", "rate_doc")
+        await add_text_to_kb("hit rate chunk one | hit rate chunk two", "rate_doc")
+        stats = await get_kb_stats()
+        
+        cache_stats = stats["embedding_cache"]
+        assert cache_stats["enabled"] is True
+        assert cache_stats["hits"] >= 2
+        assert 0 < cache_stats["hit_rate"] <= 1
+
+
+# Test class for stable chunk IDs and diff-based re-ingestion
+@pytest.mark.unit
+class TestRAGReingestion:
+    """Test deterministic chunk IDs and re-ingest diffs."""
+    
+    @pytest.fixture
+    def reingest_mocks(self):
+        """Setup ingestion mocks with a collection that already stores some chunks."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            mock_collection = Mock()
+            mock_client = Mock()
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.1, 0.2] for _ in texts])
+            ))
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'model': mock_model, 'collection': mock_collection}
+    
+    def test_chunk_ids_are_deterministic(self):
+        """Test that chunk IDs depend only on source and content."""
+        from tools.rag_knowledge_base_tool import _make_chunk_ids
+        
+        first = _make_chunk_ids("doc", ["alpha", "beta", "alpha"])
+        second = _make_chunk_ids("doc", ["alpha", "beta", "alpha"])
+        
+        assert first == second
+        assert len(set(first)) == 3  # Repeated chunk gets its own ID
+        assert first[0].startswith("doc_")
+        # Inserting a chunk in front does not change the other IDs
+        assert set(first[:2]) <= set(_make_chunk_ids("doc", ["new", "alpha", "beta"]))
+    
+    @pytest.mark.asyncio
+    async def test_reingest_upserts_only_changed_chunks(self, reingest_mocks):
+        """Test that re-ingesting adds new chunks, updates moved ones and deletes stale ones."""
+        from tools.rag_knowledge_base_tool import _make_chunk_ids
+        
+        old_ids = _make_chunk_ids("nightly_doc", ["removed chunk text", "kept chunk text"])
+        reingest_mocks['collection'].get = Mock(return_value={
+            'ids': old_ids,
+            'metadatas': [{'chunk_index': 0}, {'chunk_index': 1}]
+        })
+        
+        result = await add_text_to_kb("kept chunk text | added chunk text", "nightly_doc", reingest=True)
+        
+        assert result["status"] == "success"
+        assert result["chunks_added"] == 1
+        assert result["chunks_updated"] == 1
+        assert result["chunks_deleted"] == 1
+        
+        collection = reingest_mocks['collection']
+        collection.get.assert_called_once()
+        assert collection.get.call_args.kwargs["where"] == {"source_name": "nightly_doc"}
+        assert collection.add.call_args.kwargs["documents"] == ["added chunk text"]
+        assert collection.update.call_args.kwargs["ids"] == [old_ids[1]]
+        assert collection.delete.call_args.kwargs["ids"] == [old_ids[0]]
+        reingest_mocks['model'].encode.assert_called_once()
+        assert reingest_mocks['model'].encode.call_args[0][0] == ["added chunk text"]
+    
+    @pytest.mark.asyncio
+    async def test_reingest_unchanged_source_writes_nothing(self, reingest_mocks):
+        """Test that re-ingesting identical content leaves the collection untouched."""
+        from tools.rag_knowledge_base_tool import _make_chunk_ids
+        
+        chunks = ["same chunk one", "same chunk two"]
+        stored_meta = []
+        for i, chunk in enumerate(chunks):
+            stored_meta.append({
+                "source_name": "steady_doc", "source_type": "text", "timestamp": "2024-01-01T00:00:00",
+                "collection": "default", "total_chunks": 2, "content_length": 31,
+                "chunk_index": i, "chunk_length": len(chunk), "token_count": 3
+            })
+        reingest_mocks['collection'].get = Mock(return_value={
+            'ids': _make_chunk_ids("steady_doc", chunks),
+            'metadatas': stored_meta
+        })
+        
+        result = await add_text_to_kb("same chunk one | same chunk two", "steady_doc", reingest=True)
+        
+        assert result["chunks_added"] == 0
+        assert result["chunks_updated"] == 0
+        assert result["chunks_deleted"] == 0
+        reingest_mocks['collection'].add.assert_not_called()
+        reingest_mocks['model'].encode.assert_not_called()
+
+
+# Test class for the per-source summary index
+@pytest.mark.unit
+class TestRAGSummaryIndex:
+    """Test that source listings and stats come from the summary index."""
+    
+    @pytest.fixture
+    def summary_mocks(self):
+        """Setup a collection whose full-scan results are recorded."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            scanned_metadatas = [
+                {'source_url': 'https://example.com/a', 'source_type': 'webpage', 'chunk_length': 100, 'token_count': 20},
+                {'source_url': 'https://example.com/a', 'source_type': 'webpage', 'chunk_length': 50, 'token_count': 10},
+                {'source_name': 'notes', 'source_type': 'text', 'chunk_length': 30, 'token_count': 5}
+            ]
+            scan_calls = []
+            
+            def collection_get(**kwargs):
+                if 'ids' in kwargs or 'where' in kwargs:
+                    return {'ids': [], 'metadatas': []}
+                scan_calls.append(kwargs)
+                return {'ids': [f'id{i}' for i in range(len(scanned_metadatas))], 'metadatas': scanned_metadatas}
+            
+            mock_collection = Mock()
+            mock_collection.get = Mock(side_effect=collection_get)
+            mock_collection.count = Mock(return_value=0)
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            mock_client.list_collections = Mock(return_value=[Mock(name='default')])
+            mock_client.list_collections.return_value[0].name = 'default'
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.1, 0.2] for _ in texts])
+            ))
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'collection': mock_collection, 'scan_calls': scan_calls}
+    
+    @pytest.mark.asyncio
+    async def test_ingestion_updates_summary_without_scans(self, summary_mocks):
+        """Test that sources added to a new collection are listed from the summary."""
+        await add_text_to_kb("first summary chunk | second summary chunk", "summary_doc")
+        await add_text_to_kb("another source chunk here", "other_doc")
+        
+        result = await list_kb_sources("default")
+        
+        assert result["status"] == "success"
+        assert result["total_sources"] == 2
+        assert result["total_chunks"] == 3
+        assert result["sources"][0]["source"] == "summary_doc"
+        assert result["sources"][0]["chunk_count"] == 2
+        assert result["sources"][0]["total_characters"] == len("first summary chunk") + len("second summary chunk")
+        assert summary_mocks['scan_calls'] == []
+    
+    @pytest.mark.asyncio
+    async def test_reingest_adjusts_summary_counts(self, summary_mocks):
+        """Test that deleted chunks are subtracted from the source totals."""
+        from tools.rag_knowledge_base_tool import _make_chunk_ids
+        
+        await add_text_to_kb("keep this chunk | drop this chunk", "refresh_doc")
+        stored_ids = _make_chunk_ids("refresh_doc", ["keep this chunk", "drop this chunk"])
+        summary_mocks['collection'].get = Mock(return_value={
+            'ids': stored_ids,
+            'metadatas': [{'chunk_index': 0, 'chunk_length': 15, 'token_count': 3},
+                          {'chunk_index': 1, 'chunk_length': 15, 'token_count': 3}]
+        })
+        
+        await add_text_to_kb("keep this chunk", "refresh_doc", reingest=True)
+        result = await list_kb_sources("default")
+        
+        assert result["total_chunks"] == 1
+        assert result["sources"][0]["total_characters"] == 15
+    
+    @pytest.mark.asyncio
+    async def test_untracked_collection_is_rebuilt_once(self, summary_mocks):
+        """Test that an existing collection is scanned once, then served from the summary."""
+        summary_mocks['collection'].count.return_value = 3
+        
+        first = await list_kb_sources("default")
+        second = await list_kb_sources("default")
+        stats = await get_kb_stats()
+        
+        assert first["total_sources"] == 2
+        assert second["total_chunks"] == 3
+        assert stats["collections"]["default"]["chunk_count"] == 3
+        assert len(summary_mocks['scan_calls']) == 1
+    
+    @pytest.mark.asyncio
+    async def test_rebuild_kb_summary(self, summary_mocks):
+        """Test the maintenance action that recovers the summary from Chroma."""
+        result = await rebuild_kb_summary()
+        
+        assert result["status"] == "success"
+        assert result["collections"]["default"] == {"source_count": 2, "chunk_count": 3, "ingested_at_backfilled": 0,
+                                                    "fingerprints_indexed": 3}
+        assert summary_mocks['scan_calls'][0]["limit"] > 0
+
+
+@pytest.mark.unit
+class TestRAGHybridSearch:
+    """Test keyword and hybrid (BM25 + vector) search modes."""
+    
+    @pytest.fixture
+    def hybrid_mocks(self):
+        """Setup a collection backed by a dict, with a scripted vector ranking."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            store = {}
+            vector_ranking = []
+            
+            def collection_add(documents, embeddings, metadatas, ids):
+                for doc_id, doc, meta in zip(ids, documents, metadatas):
+                    store[doc_id] = (doc, meta)
+            
+            def collection_get(ids=None, where=None, include=None, limit=None, offset=0):
+                if ids is not None:
+                    selected = [doc_id for doc_id in ids if doc_id in store]
+                elif where is not None:
+                    field, value = next(iter(where.items()))
+                    selected = [doc_id for doc_id, (_, meta) in store.items() if meta.get(field) == value]
+                else:
+                    selected = list(store)[offset:offset + limit]
+                return {
+                    'ids': selected,
+                    'documents': [store[doc_id][0] for doc_id in selected],
+                    'metadatas': [store[doc_id][1] for doc_id in selected]
+                }
+            
+            def collection_delete(ids):
+                for doc_id in ids:
+                    store.pop(doc_id, None)
+            
+            def collection_query(query_embeddings, n_results, include):
+                ranked = [doc_id for doc_id in vector_ranking if doc_id in store][:n_results]
+                return {
+                    'ids': [ranked],
+                    'documents': [[store[doc_id][0] for doc_id in ranked]],
+                    'metadatas': [[store[doc_id][1] for doc_id in ranked]],
+                    'distances': [[0.1 * (i + 1) for i in range(len(ranked))]]
+                }
+            
+            mock_collection = Mock()
+            mock_collection.add = Mock(side_effect=collection_add)
+            mock_collection.get = Mock(side_effect=collection_get)
+            mock_collection.delete = Mock(side_effect=collection_delete)
+            mock_collection.query = Mock(side_effect=collection_query)
+            mock_collection.count = Mock(side_effect=lambda: len(store))
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.1, 0.2] for _ in texts])
+            ))
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'store': store, 'vector_ranking': vector_ranking, 'collection': mock_collection}
+    
+    @pytest.mark.asyncio
+    async def test_keyword_mode_matches_exact_terms(self, hybrid_mocks):
+        """Test that BM25 finds identifiers that embeddings tend to miss."""
+        await add_text_to_kb(
+            "Proxy restarts fixed ERR_CONN_RESET on proxy-01 | The deployment guide covers rollouts | Caching notes for the CDN",
+            "ops_notes"
+        )
+        
+        result = await search_kb("ERR_CONN_RESET proxy-01", mode="keyword")
+        
+        assert result["status"] == "success"
+        assert result["mode"] == "keyword"
+        assert result["total_results"] == 1
+        assert "ERR_CONN_RESET" in result["results"][0]["content"]
+        assert result["results"][0]["lexical_rank"] == 1
+        assert result["results"][0]["similarity_score"] is None
+        hybrid_mocks['collection'].query.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_hybrid_mode_fuses_both_rankings(self, hybrid_mocks):
+        """Test that RRF promotes chunks found by both retrievers and keeps keyword-only hits."""
+        from tools.rag_knowledge_base_tool import _make_chunk_ids
+        
+        chunks = ["general networking overview", "tuning proxy timeouts", "ERR_CONN_RESET after proxy timeouts"]
+        await add_text_to_kb(" | ".join(chunks), "ops_notes")
+        ids = _make_chunk_ids("ops_notes", chunks)
+        hybrid_mocks['vector_ranking'].extend([ids[0], ids[1]])
+        
+        result = await search_kb("ERR_CONN_RESET proxy timeouts", mode="hybrid", limit=3)
+        
+        assert result["status"] == "success"
+        contents = [r["content"] for r in result["results"]]
+        assert contents[0] == "tuning proxy timeouts"
+        assert "ERR_CONN_RESET after proxy timeouts" in contents
+        keyword_only = next(r for r in result["results"] if r["vector_rank"] is None)
+        assert keyword_only["similarity_score"] is None
+        assert keyword_only["fusion_score"] > 0
+        assert result["search_stats"]["rrf_k"] == 60
+    
+    @pytest.mark.asyncio
+    async def test_reingest_removes_stale_chunks_from_keyword_index(self, hybrid_mocks):
+        """Test that the keyword index follows deletions made by re-ingestion."""
+        await add_text_to_kb("retired widget-9000 chunk | current widget chunk", "catalog")
+        await add_text_to_kb("current widget chunk", "catalog", reingest=True)
+        
+        result = await search_kb("widget-9000", mode="keyword")
+        
+        assert result["total_results"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_existing_collection_indexed_in_background(self, hybrid_mocks):
+        """Test that a collection predating the index gets vector results while it is indexed off the search lane."""
+        import tools.rag_knowledge_base_tool as rag
+        
+        hybrid_mocks['store']['legacy_1'] = ("legacy quarterly roadmap", {'source_name': 'legacy'})
+        hybrid_mocks['store']['legacy_2'] = ("unrelated text", {'source_name': 'legacy'})
+        hybrid_mocks['vector_ranking'].extend(['legacy_2', 'legacy_1'])
+        ingest_runs = rag._get_worker_metrics()["lanes"]["ingest"]["completed"]
+        
+        fallback = await search_kb("roadmap", mode="keyword")
+        
+        assert fallback["status"] == "success"
+        assert fallback["fallback"]["mode"] == "vector"
+        assert fallback["search_stats"]["lexical_index"] == "building"
+        assert [r["content"] for r in fallback["results"]] == ["unrelated text", "legacy quarterly roadmap"]
+        assert fallback["results"][0]["similarity_score"] is not None
+        
+        await asyncio.gather(*list(rag._lexical_builds.values()))
+        assert rag._get_worker_metrics()["lanes"]["ingest"]["completed"] == ingest_runs + 1
+        result = await search_kb("roadmap", mode="keyword")
+        
+        assert "fallback" not in result
+        assert result["total_results"] == 1
+        assert result["results"][0]["content"] == "legacy quarterly roadmap"
+    
+    @pytest.mark.asyncio
+    async def test_invalid_mode(self, hybrid_mocks):
+        """Test that unknown search modes are rejected."""
+        result = await search_kb("some query", mode="fuzzy")
+        
+        assert result["status"] == "error"
+        assert "Mode must be one of" in result["error"]
+
+
+@pytest.mark.unit
+class TestRAGVectorStorage:
+    """Test truncated index storage with full-precision rescoring."""
+    
+    VECTORS = {
+        "alpha chunk": [0.6, 0.0, 0.8, 0.0],
+        "beta chunk": [0.0, 1.0, 0.0, 0.0],
+        "query about beta": [0.6, 0.8, 0.0, 0.0]
+    }
+    
+    @pytest.fixture
+    def storage_mocks(self):
+        """Setup a collection whose vector query returns a fixed (truncated-index) order."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            store = {}
+            
+            def collection_add(documents, embeddings, metadatas, ids):
+                for doc_id, doc, meta in zip(ids, documents, metadatas):
+                    store[doc_id] = (doc, meta)
+            
+            def collection_query(query_embeddings, n_results, include):
+                ranked = list(store)[:n_results]
+                return {
+                    'ids': [ranked],
+                    'documents': [[store[doc_id][0] for doc_id in ranked]],
+                    'metadatas': [[store[doc_id][1] for doc_id in ranked]],
+                    'distances': [[0.0 for _ in ranked]]
+                }
+            
+            mock_collection = Mock()
+            mock_collection.add = Mock(side_effect=collection_add)
+            mock_collection.get = Mock(return_value={'ids': [], 'metadatas': []})
+            mock_collection.query = Mock(side_effect=collection_query)
+            mock_collection.count = Mock(side_effect=lambda: len(store))
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            mock_client.list_collections = Mock(return_value=[Mock()])
+            mock_client.list_collections.return_value[0].name = 'default'
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[self.VECTORS[text] for text in texts])
+            ))
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            storage_config = {"index_dimension": 1, "rescore_precision": "float32", "rescore_multiplier": 4}
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter), \
+                 patch('tools.rag_knowledge_base_tool._get_vector_storage_config', return_value=storage_config):
+                yield {'collection': mock_collection, 'storage_config': storage_config}
+    
+    @pytest.mark.asyncio
+    async def test_index_stores_truncated_vectors(self, storage_mocks):
+        """Test that Chroma receives vectors cut to index_dimension."""
+        await add_text_to_kb("alpha chunk | beta chunk", "storage_doc")
+        
+        embeddings = storage_mocks['collection'].add.call_args.kwargs['embeddings']
+        assert [len(vector) for vector in embeddings] == [1, 1]
+    
+    @pytest.mark.asyncio
+    async def test_search_rescored_at_full_precision(self, storage_mocks):
+        """Test that candidates are re-ranked by full-dimension distance."""
+        await add_text_to_kb("alpha chunk | beta chunk", "storage_doc")
+        
+        result = await search_kb("query about beta", limit=1)
+        
+        assert result["status"] == "success"
+        assert result["results"][0]["content"] == "beta chunk"
+        assert result["results"][0]["distance"] == pytest.approx(2 - 2 * 0.8)
+        assert result["search_stats"]["rescored_candidates"] == 2
+        assert storage_mocks['collection'].query.call_args.kwargs['n_results'] == 4
+        assert len(storage_mocks['collection'].query.call_args.kwargs['query_embeddings'][0]) == 1
+    
+    @pytest.mark.asyncio
+    async def test_layout_fixed_when_collection_is_created(self, storage_mocks):
+        """Test that later config changes do not change an existing collection's layout."""
+        await add_text_to_kb("alpha chunk", "storage_doc")
+        storage_mocks['storage_config'].update({"index_dimension": None, "rescore_precision": "none"})
+        await add_text_to_kb("beta chunk", "storage_doc_2")
+        
+        embeddings = storage_mocks['collection'].add.call_args.kwargs['embeddings']
+        assert len(embeddings[0]) == 1
+        stats = await get_kb_stats()
+        assert stats["collections"]["default"]["vector_storage"] == {"index_dimension": 1, "rescore_precision": "float32"}
+    
+    def test_int8_quantization_round_trip(self):
+        """Test that int8 rescore vectors stay close to the originals."""
+        from tools.rag_knowledge_base_tool import _pack_rescore_vector, _unpack_rescore_vector
+        
+        vector = [0.5, -0.25, 0.125, -0.0625]
+        blob, scale = _pack_rescore_vector(vector, "int8")
+        restored = [x * scale for x in _unpack_rescore_vector(blob, "int8")]
+        
+        assert len(blob) == len(vector)
+        assert restored == pytest.approx(vector, abs=scale)
+
+
+@pytest.mark.unit
+class TestRAGIngestionJobs:
+    """Test background ingestion jobs and progress polling."""
+    
+    @pytest.fixture
+    async def job_mocks(self):
+        """Replace the per-item ingestion calls and stop job workers afterwards."""
+        from tools.rag_knowledge_base_tool import _stop_job_workers
+        
+        async def fake_add_text(text, source_name, collection_name, metadata, reingest):
+            if "broken" in text:
+                return {"status": "error", "error": "Embedding failed"}
+            return {"status": "success", "chunks_added": 2}
+        
+        add_text = AsyncMock(side_effect=fake_add_text)
+        add_url = AsyncMock(return_value={"status": "success", "chunks_added": 5})
+        with patch('tools.rag_knowledge_base_tool.add_text_to_kb', add_text), \
+             patch('tools.rag_knowledge_base_tool.add_url_to_kb', add_url):
+            yield {'add_text': add_text, 'add_url': add_url}
+            await _stop_job_workers()
+    
+    async def _wait_for_job(self, job_id):
+        for _ in range(200):
+            status = await get_kb_job_status(job_id)
+            if status["job_status"] not in ("queued", "running"):
+                return status
+            await asyncio.sleep(0.01)
+        raise AssertionError("job did not finish")
+    
+    @pytest.mark.asyncio
+    async def test_submit_returns_job_and_completes(self, job_mocks):
+        """Test that submission returns immediately and progress reaches 100%."""
+        result = await submit_kb_ingestion(
+            urls=["https://example.com/a"],
+            texts=[{"text": "some text to ingest", "source_name": "notes", "metadata": {"team": "ops"}}],
+            collection_name="docs",
+            metadata={"batch": "1"}
+        )
+        
+        assert result["status"] == "success"
+        assert result["job_status"] == "queued"
+        assert result["total_items"] == 2
+        
+        status = await self._wait_for_job(result["job_id"])
+        assert status["job_status"] == "completed"
+        assert status["progress"]["percent"] == 100.0
+        assert status["chunks_added"] == 7
+        job_mocks['add_url'].assert_awaited_once_with("https://example.com/a", "docs", {"batch": "1"}, False)
+        job_mocks['add_text'].assert_awaited_once_with(
+            "some text to ingest", "notes", "docs", {"batch": "1", "team": "ops"}, False
+        )
+    
+    @pytest.mark.asyncio
+    async def test_failed_items_are_reported(self, job_mocks):
+        """Test that item failures are recorded without stopping the job."""
+        result = await submit_kb_ingestion(texts=[
+            {"text": "good text", "source_name": "good"},
+            {"text": "broken text", "source_name": "bad"}
+        ])
+        
+        status = await self._wait_for_job(result["job_id"])
+        
+        assert status["job_status"] == "completed_with_errors"
+        assert status["progress"]["failed_items"] == 1
+        assert status["errors"] == [{"source": "bad", "error": "Embedding failed"}]
+    
+    @pytest.mark.asyncio
+    async def test_unfinished_jobs_resume_after_restart(self, job_mocks):
+        """Test that jobs persisted by an earlier process are picked up on the next poll."""
+        from tools.rag_knowledge_base_tool import _create_job, _start_job, _update_job_item
+        
+        job_id = _create_job("default", False, [
+            {"kind": "text", "source": "done", "content": "already ingested"},
+            {"kind": "text", "source": "interrupted", "content": "was running at shutdown"}
+        ])
+        _start_job(job_id)
+        _update_job_item(job_id, 0, "completed", 2)
+        _update_job_item(job_id, 1, "running")
+        
+        status = await self._wait_for_job(job_id)
+        
+        assert status["job_status"] == "completed"
+        assert status["progress"]["completed_items"] == 2
+        job_mocks['add_text'].assert_awaited_once()
+        assert job_mocks['add_text'].await_args.args[1] == "interrupted"
+
+    @pytest.mark.asyncio
+    async def test_server_lifespan_resumes_jobs_without_a_tool_call(self, job_mocks):
+        """Test that the server lifespan requeues persisted jobs at start-up, before any client polls."""
+        from tools.rag_knowledge_base_tool import _create_job, _start_job, _get_job_report, lifespan
+
+        job_id = _create_job("default", False, [{"kind": "text", "source": "stuck", "content": "running at crash"}])
+        _start_job(job_id)
+
+        with patch('tools.rag_knowledge_base_tool.CHROMADB_AVAILABLE', True):
+            async with lifespan(None):
+                for _ in range(200):
+                    if _get_job_report(job_id, 1)["job_status"] == "completed":
+                        break
+                    await asyncio.sleep(0.01)
+
+        assert _get_job_report(job_id, 1)["job_status"] == "completed"
+        job_mocks['add_text'].assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_pending_job_limit(self, job_mocks):
+        """Test that submissions are refused once max_pending_jobs are active."""
+        with patch('tools.rag_knowledge_base_tool._get_jobs_config', return_value={
+            "max_concurrent_jobs": 1, "max_pending_jobs": 0, "max_items_per_job": 10
+        }):
+            result = await submit_kb_ingestion(urls=["https://example.com"])
+        
+        assert result["status"] == "error"
+        assert "Too many pending" in result["error"]
+    
+    @pytest.mark.asyncio
+    async def test_invalid_submissions(self, job_mocks):
+        """Test validation of empty jobs, bad text entries and unknown job IDs."""
+        assert (await submit_kb_ingestion())["status"] == "error"
+        assert (await submit_kb_ingestion(texts=[{"text": "no source"}]))["status"] == "error"
+        
+        missing = await get_kb_job_status("does-not-exist")
+        assert missing["status"] == "error"
+        assert "not found" in missing["error"]
+    
+    @pytest.mark.asyncio
+    async def test_list_recent_jobs(self, job_mocks):
+        """Test listing jobs when no job ID is given."""
+        await submit_kb_ingestion(urls=["https://example.com/1"])
+        await submit_kb_ingestion(urls=["https://example.com/2"])
+        
+        result = await get_kb_job_status()
+        
+        assert result["status"] == "success"
+        assert result["total_jobs"] == 2
+
+
+@pytest.mark.unit
+class TestRAGBulkIngestion:
+    """Test the pipelined bulk URL ingestion tool."""
+    
+    PAGES = {
+        "https://example.com/a": "Alpha page first paragraph with enough words | Alpha page second paragraph with more words",
+        "https://example.com/b": "Beta page has a single paragraph that is long enough to keep",
+        "https://example.com/short": "too short"
+    }
+    
+    @pytest.fixture
+    def bulk_mocks(self):
+        """Setup crawl, Chroma and model mocks with the chunk lane on threads."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            crawl_batches = []
+            
+            async def fake_crawl_multiple(urls, output_format="markdown", max_concurrent=3, **kwargs):
+                crawl_batches.append(list(urls))
+                results = {}
+                for url in urls:
+                    if url in self.PAGES:
+                        results[url] = {"status": "success", "markdown": self.PAGES[url]}
+                    else:
+                        results[url] = {"status": "error", "error": "404 Not Found"}
+                return {"status": "success", "results": results}
+            
+            mock_collection = Mock()
+            mock_collection.get = Mock(return_value={'ids': [], 'metadatas': []})
+            mock_collection.count = Mock(return_value=0)
+            
+            mock_client = Mock()
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.1, 0.2] for _ in texts])
+            ))
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            bulk_config = {"max_urls": 10, "crawl_batch_size": 2, "max_concurrent_crawls": 2,
+                           "queue_size": 1, "embed_batch_size": 100}
+            worker_config = {"pool_type": "thread", "search_workers": 1, "ingest_workers": 1,
+                             "chunk_workers": 2, "chunk_pool_type": "thread", "max_queue_depth": 32}
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter), \
+                 patch('tools.rag_knowledge_base_tool._get_bulk_ingestion_config', return_value=bulk_config), \
+                 patch('tools.rag_knowledge_base_tool._get_worker_config', return_value=worker_config), \
+                 patch('tools.crawl4ai_tool.crawl_multiple_webpages', side_effect=fake_crawl_multiple):
+                yield {'collection': mock_collection, 'model': mock_model, 'crawl_batches': crawl_batches,
+                       'bulk_config': bulk_config}
+    
+    @pytest.mark.asyncio
+    async def test_bulk_ingestion_reports_per_url_results(self, bulk_mocks):
+        """Test that URLs flow through all stages and failures are reported per URL."""
+        urls = ["https://example.com/a", "https://example.com/missing", "https://example.com/b",
+                "https://example.com/short", "https://example.com/a"]
+        
+        result = await add_urls_to_kb(urls, "bulk", metadata={"batch": "q1"})
+        
+        assert result["status"] == "success"
+        assert result["urls_submitted"] == 4
+        assert result["urls_ingested"] == 2
+        assert result["chunks_added"] == 3
+        assert [r["url"] for r in result["results"]] == urls[:4]
+        assert result["results"][1]["error"].startswith("Failed to scrape URL")
+        assert result["results"][3]["error"] == "No meaningful content extracted from URL"
+        assert bulk_mocks['crawl_batches'] == [urls[:2], urls[2:4]]
+        
+        added_metadatas = bulk_mocks['collection'].add.call_args.kwargs['metadatas']
+        assert all(meta["batch"] == "q1" for meta in added_metadatas)
+    
+    @pytest.mark.asyncio
+    async def test_chunks_encoded_and_written_in_batches(self, bulk_mocks):
+        """Test that chunks from several pages share one encode and one add call."""
+        result = await add_urls_to_kb(["https://example.com/a", "https://example.com/b"])
+        
+        assert result["urls_ingested"] == 2
+        assert bulk_mocks['model'].encode.call_count == 1
+        assert bulk_mocks['collection'].add.call_count == 1
+        assert len(bulk_mocks['collection'].add.call_args.kwargs['ids']) == 3
+    
+    @pytest.mark.asyncio
+    async def test_embed_batch_size_bounds_write_batches(self, bulk_mocks):
+        """Test that a full batch is written before more pages are accepted."""
+        bulk_mocks['bulk_config']['embed_batch_size'] = 1
+        
+        result = await add_urls_to_kb(["https://example.com/a", "https://example.com/b"])
+        
+        assert result["urls_ingested"] == 2
+        assert bulk_mocks['collection'].add.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_stage_stats_and_chunk_lane(self, bulk_mocks):
+        """Test per-stage throughput reporting and that chunking runs in the chunk lane."""
+        from tools.rag_knowledge_base_tool import _get_worker_metrics
+        
+        result = await add_urls_to_kb(["https://example.com/a", "https://example.com/b"])
+        
+        stages = result["stage_stats"]
+        assert set(stages) == {"crawl", "chunk", "write"}
+        assert stages["crawl"]["items"] == 2
+        assert stages["chunk"]["chunks"] == 3
+        assert stages["write"]["items"] == 2
+        assert "items_per_second" in stages["write"]
+        assert _get_worker_metrics()["lanes"]["chunk"]["completed"] >= 2
+    
+    @pytest.mark.asyncio
+    async def test_invalid_url_lists(self, bulk_mocks):
+        """Test empty and oversized URL lists."""
+        assert (await add_urls_to_kb([]))["status"] == "error"
+        
+        too_many = await add_urls_to_kb([f"https://example.com/{i}" for i in range(11)])
+        assert too_many["status"] == "error"
+        assert "limit is 10" in too_many["error"]
+
+
+@pytest.mark.unit
+class TestRAGMultiCollectionSearch:
+    """Test searching several collections with one merged ranking."""
+    
+    @pytest.fixture
+    def fanout_mocks(self):
+        """Setup two collections with scripted vector results."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            def make_collection(name, distances):
+                collection = Mock()
+                collection.query = Mock(return_value={
+                    'ids': [[f'{name}_{i}' for i in range(len(distances))]],
+                    'documents': [[f'{name} result {i}' for i in range(len(distances))]],
+                    'metadatas': [[{'source_name': f'{name}_doc'} for _ in distances]],
+                    'distances': [distances]
+                })
+                return collection
+            
+            collections = {
+                'research': make_collection('research', [0.1, 0.5]),
+                'company_docs': make_collection('company_docs', [0.3, 0.4])
+            }
+            
+            def get_collection(name):
+                if name not in collections:
+                    raise Exception(f"Collection {name} does not exist")
+                return collections[name]
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(side_effect=get_collection)
+            listed = []
+            for name in collections:
+                entry = Mock()
+                entry.name = name
+                listed.append(entry)
+            mock_client.list_collections = Mock(return_value=listed)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.1, 0.2] for _ in texts])
+            ))
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model):
+                yield {'collections': collections, 'model': mock_model}
+    
+    @pytest.mark.asyncio
+    async def test_results_merged_by_score(self, fanout_mocks):
+        """Test that results from each collection are interleaved by similarity."""
+        result = await search_kb("quarterly planning", ["research", "company_docs"], limit=3)
+        
+        assert result["status"] == "success"
+        assert result["collections"] == ["research", "company_docs"]
+        assert [r["content"] for r in result["results"]] == [
+            "research result 0", "company_docs result 0", "company_docs result 1"
+        ]
+        assert [r["rank"] for r in result["results"]] == [1, 2, 3]
+        assert result["results"][1]["collection"] == "company_docs"
+        assert result["search_stats"]["merged_by"] == "similarity_score"
+
+    @pytest.mark.asyncio
+    async def test_keyword_results_merged_by_collection_rank(self, fanout_mocks):
+        """Test that keyword fan-out ignores raw BM25 magnitudes and merges by per-collection rank."""
+        bm25 = {"research": [2.0, 1.5], "company_docs": [40.0, 35.0, 30.0]}
+
+        async def scripted_search(collection, name, query, query_embedding, limit, *args, **kwargs):
+            results = [{"rank": i, "content": f"{name} hit {i}", "bm25_score": score}
+                       for i, score in enumerate(bm25[name], start=1)]
+            return results, {}
+
+        with patch('tools.rag_knowledge_base_tool._search_collection', side_effect=scripted_search):
+            result = await search_kb("quarterly planning", ["research", "company_docs"], limit=4, mode="keyword")
+
+        assert result["status"] == "success"
+        assert [r["content"] for r in result["results"]] == [
+            "research hit 1", "company_docs hit 1", "research hit 2", "company_docs hit 2"
+        ]
+        assert result["search_stats"]["merged_by"] == "fusion_score"
+        assert result["results"][0]["fusion_score"] == pytest.approx(1 / (result["search_stats"]["rrf_k"] + 1))
+
+    @pytest.mark.asyncio
+    async def test_query_embedded_once(self, fanout_mocks):
+        """Test that the fan-out reuses one query embedding for every collection."""
+        await search_kb("quarterly planning", "*")
+        
+        assert fanout_mocks['model'].encode.call_count == 1
+        for collection in fanout_mocks['collections'].values():
+            assert collection.query.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_wildcard_reports_per_collection_timing(self, fanout_mocks):
+        """Test that "*" searches every collection and reports timing per collection."""
+        result = await search_kb("quarterly planning", "*", limit=10)
+        
+        per_collection = result["search_stats"]["per_collection"]
+        assert set(per_collection) == {"research", "company_docs"}
+        assert per_collection["research"]["results"] == 2
+        assert per_collection["research"]["elapsed_ms"] >= 0
+        assert result["total_results"] == 4
+    
+    @pytest.mark.asyncio
+    async def test_missing_collections(self, fanout_mocks):
+        """Test that unknown collections are reported, and an all-missing list is an error."""
+        partial = await search_kb("quarterly planning", ["research", "archive"])
+        assert partial["status"] == "success"
+        assert partial["search_stats"]["missing_collections"] == ["archive"]
+        
+        missing = await search_kb("quarterly planning", ["archive"])
+        assert missing["status"] == "error"
+        assert set(missing["available_collections"]) == {"research", "company_docs"}
+
+
+@pytest.mark.unit
+class TestRAGSearchCache:
+    """Test the query-embedding LRU and the per-collection result cache."""
+    
+    @pytest.fixture
+    def cache_search_mocks(self):
+        """Setup a collection that can be both searched and written."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            mock_collection = Mock()
+            mock_collection.get = Mock(return_value={'ids': [], 'metadatas': []})
+            mock_collection.count = Mock(return_value=1)
+            mock_collection.query = Mock(return_value={
+                'ids': [['doc_1']],
+                'documents': [['cached result']],
+                'metadatas': [[{'source_name': 'cache_doc'}]],
+                'distances': [[0.2]]
+            })
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            
+            encoded = []
+            
+            def record_encode(texts, **kwargs):
+                encoded.extend(texts)
+                return Mock(tolist=Mock(return_value=[[0.1, 0.2] for _ in texts]))
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=record_encode)
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(return_value=['new chunk written to the collection'])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'collection': mock_collection, 'encoded': encoded}
+    
+    @pytest.mark.asyncio
+    async def test_repeated_query_served_from_caches(self, cache_search_mocks):
+        """Test that a repeat (differing only in case/whitespace) skips encoding and Chroma."""
+        first = await search_kb("What is the  roadmap?")
+        second = await search_kb("what is the roadmap?")
+        
+        assert second["results"] == first["results"]
+        assert second["search_stats"]["result_cache_hit"] is True
+        assert cache_search_mocks['encoded'] == ["What is the  roadmap?"]
+        assert cache_search_mocks['collection'].query.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_write_invalidates_collection_results(self, cache_search_mocks):
+        """Test that adding content drops cached results but keeps the query embedding."""
+        await search_kb("roadmap query")
+        await add_text_to_kb("New content for the default collection", "cache_doc")
+        await search_kb("roadmap query")
+        
+        assert cache_search_mocks['collection'].query.call_count == 2
+        assert cache_search_mocks['encoded'].count("roadmap query") == 1
+    
+    @pytest.mark.asyncio
+    async def test_results_expire_after_ttl(self, cache_search_mocks):
+        """Test that result entries are not served past ttl_seconds."""
+        with patch('tools.rag_knowledge_base_tool._get_search_cache_config', return_value={
+            "query_embeddings": {"enabled": True, "max_entries": 10},
+            "results": {"enabled": True, "ttl_seconds": 0, "max_entries": 10}
+        }):
+            await search_kb("roadmap query")
+            await search_kb("roadmap query")
+        
+        assert cache_search_mocks['collection'].query.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_query_embedding_lru_evicts_oldest(self, cache_search_mocks):
+        """Test that the query-embedding LRU holds at most max_entries queries."""
+        from tools.rag_knowledge_base_tool import _query_embedding_cache
+        
+        with patch('tools.rag_knowledge_base_tool._get_search_cache_config', return_value={
+            "query_embeddings": {"enabled": True, "max_entries": 2},
+            "results": {"enabled": False, "ttl_seconds": 60, "max_entries": 10}
+        }):
+            for query in ("first query", "second query", "third query"):
+                await search_kb(query)
+        
+        assert list(_query_embedding_cache) == ["second query", "third query"]
+    
+    @pytest.mark.asyncio
+    async def test_health_reports_cache_stats(self, cache_search_mocks):
+        """Test that get_kb_health exposes cache sizes and hit rates."""
+        await search_kb("roadmap query")
+        await search_kb("roadmap query")
+        
+        cache = (await get_kb_health())["components"]["search_cache"]
+        
+        assert cache["results"]["hits"] == 1
+        assert cache["results"]["hit_rate"] == 0.5
+        assert cache["query_embeddings"]["entries"] == 1
+
+
+@pytest.mark.unit
+class TestRAGWarmupAndSharedServer:
+    """Test the startup warm-up and the shared embedding server."""
+    
+    @pytest.fixture
+    def warmup_mocks(self):
+        """Mock every component warm_up() loads and reset the warm-up state."""
+        from tools import rag_knowledge_base_tool as rag
+        
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            mock_model = Mock()
+            mock_model.encode = Mock(
+                side_effect=lambda texts, **kwargs: Mock(tolist=Mock(return_value=[[0.5, 0.5] for _ in texts]))
+            )
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=Mock()) as mock_chroma, \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=Mock()), \
+                 patch.dict(rag._warmup_state, {"status": "not_started", "error": None}):
+                yield {'model': mock_model, 'chroma': mock_chroma}
+    
+    @pytest.fixture
+    def shared_server(self, warmup_mocks, monkeypatch):
+        """Serve embeddings from a real localhost listener on a free port."""
+        from multiprocessing.connection import Listener
+        import threading
+        from tools import rag_knowledge_base_tool as rag
+        
+        monkeypatch.setenv("RAG_EMBEDDING_AUTHKEY", "test-secret")
+        rag._shared_client_local.conn = None
+        for counter in rag._shared_server_stats:
+            rag._shared_server_stats[counter] = 0
+        
+        def start(model_name=None):
+            listener = Listener(("127.0.0.1", 0), authkey=b"test-secret")
+            model_info = {"model_name": model_name or rag._load_config()["embedding"]["model_name"], "pid": 1}
+            threading.Thread(target=rag._serve_embedding_listener, args=(listener, model_info), daemon=True).start()
+            return {
+                "enabled": True, "host": "127.0.0.1", "port": listener.address[1],
+                "auto_start": False, "start_timeout_seconds": 1, "fallback_to_local": False
+            }
+        
+        yield start
+        rag._shared_client_local.conn = None
+    
+    def test_warm_up_disabled_by_default(self, warmup_mocks, monkeypatch):
+        """Test that warm_up() is a no-op unless enabled in config or RAG_WARMUP."""
+        from tools.rag_knowledge_base_tool import warm_up
+        
+        monkeypatch.delenv("RAG_WARMUP", raising=False)
+        with patch('tools.rag_knowledge_base_tool._get_warmup_config',
+                   return_value={"enabled": False, "blocking": False}):
+            assert warm_up() == {"status": "disabled"}
+        warmup_mocks['chroma'].assert_not_called()
+    
+    def test_warm_up_loads_components_and_encodes(self, warmup_mocks, monkeypatch):
+        """Test that RAG_WARMUP=1 warms every component and runs one encode."""
+        from tools.rag_knowledge_base_tool import warm_up
+        
+        monkeypatch.setenv("RAG_WARMUP", "1")
+        state = warm_up(blocking=True)
+        
+        assert state["status"] == "ready"
+        assert state["embedding_mode"] == "local"
+        assert state["duration_ms"] >= 0
+        warmup_mocks['chroma'].assert_called_once()
+        warmup_mocks['model'].encode.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_health_reports_warmup_state(self, warmup_mocks):
+        """Test that get_kb_health exposes the warm-up status and embedding mode."""
+        from tools.rag_knowledge_base_tool import warm_up
+        
+        warm_up(blocking=True, force=True)
+        health = await get_kb_health()
+        
+        assert health["components"]["warmup"]["status"] == "ready"
+        assert health["components"]["embedding_model"]["mode"] == "local"
+
+    def test_background_warm_up_leaves_stdio_transport_alone(self, warmup_mocks, monkeypatch):
+        """Test that a stdio transport starting mid warm-up still writes to the real stdout."""
+        import io
+        import threading
+        from tools.rag_knowledge_base_tool import warm_up
+
+        real_stdout = io.BytesIO()
+        monkeypatch.setattr(sys, "stdout", io.TextIOWrapper(real_stdout, encoding="utf-8", write_through=True))
+        loading = threading.Event()
+        release = threading.Event()
+
+        def slow_chroma_load():
+            print("model loading noise")
+            loading.set()
+            release.wait(5)
+            return Mock()
+
+        warmup_mocks['chroma'].side_effect = slow_chroma_load
+        assert warm_up(blocking=False, force=True)["status"] == "running"
+        assert loading.wait(5)
+
+        # What mcp's stdio_server does when the transport starts
+        transport_out = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+        transport_out.write('{"jsonrpc": "2.0", "id": 1, "result": {}}\n')
+        transport_out.flush()
+        transport_out.detach()
+
+        release.set()
+        warmup_thread = next(t for t in threading.enumerate() if t.name == "rag-warmup")
+        warmup_thread.join(5)
+
+        output = real_stdout.getvalue().decode("utf-8")
+        assert '"jsonrpc": "2.0"' in output
+        assert "model loading noise" not in output
+        sys.stdout.write("after warm-up\n")
+        assert "after warm-up" in real_stdout.getvalue().decode("utf-8")
+
+    def test_concurrent_model_loads_share_one_instance(self):
+        """Test that a warm-up thread and a tool call racing to load the model load it once."""
+        import threading
+        import time
+        from tools import rag_knowledge_base_tool as rag
+        
+        loads = []
+        
+        def slow_model(name):
+            loads.append(name)
+            time.sleep(0.05)
+            return Mock()
+        
+        fake_module = Mock(SentenceTransformer=Mock(side_effect=slow_model))
+        with patch.dict(sys.modules, {'sentence_transformers': fake_module}), \
+             patch('tools.rag_knowledge_base_tool.SENTENCE_TRANSFORMERS_AVAILABLE', True), \
+             patch('tools.rag_knowledge_base_tool._embedding_model', None):
+            threads = [threading.Thread(target=rag._initialize_embedding_model) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        assert len(loads) == 1
+    
+    def test_encode_routed_to_shared_server(self, shared_server):
+        """Test that encoding goes over the socket when the shared server is enabled."""
+        from tools import rag_knowledge_base_tool as rag
+        
+        with patch('tools.rag_knowledge_base_tool._get_shared_server_config', return_value=shared_server()):
+            vectors = rag._encode_sync(["first", "second"])
+            rag._encode_sync(["third"])
+        
+        assert vectors == [[0.5, 0.5], [0.5, 0.5]]
+        assert rag._shared_server_stats["remote_batches"] == 2
+        assert rag._shared_server_stats["remote_texts"] == 3
+    
+    def test_shared_server_model_mismatch_rejected(self, shared_server):
+        """Test that a server running a different model is never used."""
+        from tools import rag_knowledge_base_tool as rag
+        
+        with patch('tools.rag_knowledge_base_tool._get_shared_server_config',
+                   return_value=shared_server(model_name="other/model")):
+            with pytest.raises(RuntimeError, match="other/model"):
+                rag._encode_sync(["text"])
+    
+    def test_unreachable_server_falls_back_to_local(self, shared_server):
+        """Test fallback_to_local when nothing listens on the configured port."""
+        from tools import rag_knowledge_base_tool as rag
+        
+        server_config = shared_server()
+        server_config.update({"port": 1, "fallback_to_local": True})
+        with patch('tools.rag_knowledge_base_tool._get_shared_server_config', return_value=server_config):
+            assert rag._encode_sync(["text"]) == [[0.5, 0.5]]
+            
+            server_config["fallback_to_local"] = False
+            with pytest.raises(ConnectionError):
+                rag._encode_sync(["text"])
+        
+        assert rag._shared_server_stats["local_fallbacks"] == 1
+    
+    def test_authkey_file_created_once(self, monkeypatch, isolated_kb_dir):
+        """Test that the server key is generated on first use and then reused."""
+        from tools import rag_knowledge_base_tool as rag
+        
+        monkeypatch.delenv("RAG_EMBEDDING_AUTHKEY", raising=False)
+        first = rag._get_embedding_server_authkey()
+        
+        assert first == rag._get_embedding_server_authkey()
+        assert len(first) == 64
+        assert (isolated_kb_dir / rag.EMBEDDING_SERVER_KEY_FILE).exists()
+
+
+@pytest.mark.unit
+class TestRAGChunking:
+    """Test the token, markdown and sentence chunking strategies."""
+    
+    @staticmethod
+    def word_measure():
+        """Token measure counting whitespace-separated words (stands in for a tokenizer)."""
+        import re
+        
+        return {"unit": "tokens", "token_starts": lambda text: [m.start() for m in re.finditer(r"\S+", text)]}
+    
+    def test_strategy_selected_from_config(self):
+        """Test that chunking.strategy picks the splitter."""
+        from tools import rag_knowledge_base_tool as rag
+        
+        with patch('tools.rag_knowledge_base_tool._text_splitter', None), \
+             patch('tools.rag_knowledge_base_tool._get_chunking_config', return_value={
+                 "strategy": "sentence", "chunk_size": 300, "chunk_overlap": 30,
+                 "length_unit": "chars", "tokenizer": None, "include_heading_path": True
+             }):
+            splitter = rag._initialize_text_splitter()
+        
+        assert isinstance(splitter, rag._TextChunker)
+        assert splitter.strategy == "sentence"
+        assert splitter.chunk_size == 300
+    
+    def test_unknown_strategy_rejected(self):
+        """Test that a typo in chunking.strategy fails loudly instead of falling back."""
+        from tools import rag_knowledge_base_tool as rag
+        
+        with patch('tools.rag_knowledge_base_tool._text_splitter', None), \
+             patch('tools.rag_knowledge_base_tool._get_chunking_config', return_value={"strategy": "semantic"}):
+            with pytest.raises(ValueError, match="Unknown chunking strategy"):
+                rag._initialize_text_splitter()
+    
+    def test_sentence_chunks_end_at_sentence_boundaries(self):
+        """Test that sentence packing keeps sentences whole, within size, with overlap."""
+        from tools.rag_knowledge_base_tool import _TextChunker
+        
+        sentences = [f"Sentence number {i} talks about topic {i}." for i in range(40)]
+        chunks = _TextChunker("sentence", 200, 50).split_text(" ".join(sentences))
+        
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk) <= 200
+            assert chunk.endswith(".")
+        for previous, current in zip(chunks, chunks[1:]):
+            assert current.split(". ")[0] in previous
+        assert all(sentence in " ".join(chunks) for sentence in sentences)
+    
+    def test_token_chunks_respect_token_budget(self):
+        """Test that token sizing counts tokens, not characters, and hard-cuts long runs."""
+        from tools.rag_knowledge_base_tool import _TextChunker
+        
+        text = "\n\n".join(" ".join(f"w{p}_{i}" for i in range(25)) for p in range(6)) + " " + "x" * 5000
+        chunks = _TextChunker("token", 20, 0, measure=self.word_measure()).split_text(text)
+        
+        assert all(len(chunk.split()) <= 20 for chunk in chunks)
+        assert [word for chunk in chunks for word in chunk.split()] == text.split()
+    
+    def test_markdown_splits_at_headings_with_path(self):
+        """Test heading-aware splitting: no straddling, heading path prefixes, fenced '#' ignored."""
+        from tools.rag_knowledge_base_tool import _TextChunker
+        
+        text = (
+            "# Guide\n\nShort intro.\n\n"
+            "## Install\n\n```bash\n# not a heading\npip install tool\n```\n\n"
+            "### Linux\n\n" + " ".join(f"step{i}" for i in range(60)) + "\n\n"
+            "## Usage\n\nRun it."
+        )
+        chunks = _TextChunker("markdown", 150, 0).split_text(text)
+        
+        assert chunks[0].startswith("# Guide") and "# not a heading" in chunks[0]
+        linux_chunks = [chunk for chunk in chunks if "step" in chunk]
+        assert linux_chunks[0].startswith("Guide > Install\n\n### Linux")
+        assert all(chunk.startswith("Guide > Install > Linux") for chunk in linux_chunks[1:])
+        assert not any("step" in chunk and "Usage" in chunk for chunk in chunks)
+        assert chunks[-1] == "Guide\n\n## Usage\n\nRun it."
+    
+    def test_markdown_heading_path_counts_toward_chunk_size(self):
+        """Test that no markdown chunk, heading path included, exceeds chunk_size in chars or tokens."""
+        from tools.rag_knowledge_base_tool import _TextChunker
+        
+        text = "".join(
+            f"# Part {p} of the reference manual\n\n## Configuration options for part {p}\n\n"
+            + " ".join(f"option{p}_{i} explained." for i in range(40)) + "\n\n"
+            for p in range(4)
+        )
+        for size in (120, 200, 1000):
+            chunks = _TextChunker("markdown", size, 20).split_text(text)
+            assert max(len(chunk) for chunk in chunks) <= size
+        # Paths longer than half a chunk are dropped rather than crowding out the content
+        assert not any(" > " in chunk for chunk in _TextChunker("markdown", 120, 20).split_text(text))
+        assert any(chunk.startswith("Part 1 of the reference manual > ")
+                   for chunk in _TextChunker("markdown", 200, 20).split_text(text))
+        
+        token_chunks = _TextChunker("markdown", 30, 5, measure=self.word_measure()).split_text(text)
+        assert max(len(chunk.split()) for chunk in token_chunks) <= 30
+    
+    def test_large_document_chunks_quickly(self):
+        """Test that chunking stays linear: 2 MB of prose in well under a second."""
+        import time
+        from tools.rag_knowledge_base_tool import _TextChunker
+        
+        text = ("Retrieval quality depends on chunk boundaries. Keep sentences whole! " * 15 + "\n\n") * 2000
+        started = time.perf_counter()
+        chunks = _TextChunker("sentence", 1000, 100).split_text(text)
+        
+        assert time.perf_counter() - started < 1.0
+        assert len(chunks) > 1000
+
+
+@pytest.mark.unit
+class TestRAGMetadataFilters:
+    """Test where-filter pushdown and ingestion-time range filters in search_kb."""
+    
+    @staticmethod
+    def matches(meta, where):
+        """Evaluate the subset of Chroma's where syntax the tool emits."""
+        if "$and" in where:
+            return all(TestRAGMetadataFilters.matches(meta, clause) for clause in where["$and"])
+        if "$or" in where:
+            return any(TestRAGMetadataFilters.matches(meta, clause) for clause in where["$or"])
+        field, condition = next(iter(where.items()))
+        operator, value = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+        actual = meta.get(field)
+        if actual is None:
+            return False
+        return {
+            "$eq": lambda: actual == value, "$ne": lambda: actual != value,
+            "$gte": lambda: actual >= value, "$lt": lambda: actual < value,
+            "$in": lambda: actual in value
+        }[operator]()
+    
+    @pytest.fixture
+    def filter_mocks(self):
+        """Setup a dict-backed collection whose query and get honour where filters."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            store = {}
+            
+            def collection_add(documents, embeddings, metadatas, ids):
+                for doc_id, doc, meta in zip(ids, documents, metadatas):
+                    store[doc_id] = (doc, meta)
+            
+            def select(ids=None, where=None):
+                candidates = ids if ids is not None else list(store)
+                return [doc_id for doc_id in candidates
+                        if doc_id in store and (where is None or self.matches(store[doc_id][1], where))]
+            
+            def collection_get(ids=None, where=None, include=None, limit=None, offset=0):
+                selected = select(ids, where)
+                if limit is not None:
+                    selected = selected[offset:offset + limit]
+                return {
+                    'ids': selected,
+                    'documents': [store[doc_id][0] for doc_id in selected],
+                    'metadatas': [store[doc_id][1] for doc_id in selected]
+                }
+            
+            def collection_update(ids, metadatas):
+                for doc_id, meta in zip(ids, metadatas):
+                    store[doc_id] = (store[doc_id][0], meta)
+            
+            def collection_query(query_embeddings, n_results, include, where=None):
+                ranked = select(where=where)[:n_results]
+                return {
+                    'ids': [ranked],
+                    'documents': [[store[doc_id][0] for doc_id in ranked]],
+                    'metadatas': [[store[doc_id][1] for doc_id in ranked]],
+                    'distances': [[0.1 * (i + 1) for i in range(len(ranked))]]
+                }
+            
+            mock_collection = Mock()
+            mock_collection.add = Mock(side_effect=collection_add)
+            mock_collection.get = Mock(side_effect=collection_get)
+            mock_collection.update = Mock(side_effect=collection_update)
+            mock_collection.query = Mock(side_effect=collection_query)
+            mock_collection.count = Mock(side_effect=lambda: len(store))
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.1, 0.2] for _ in texts])
+            ))
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'store': store, 'collection': mock_collection}
+    
+    async def add_documents(self, filter_mocks):
+        """Store an alpha and a beta document, the beta one ingested 30 days ago."""
+        import time
+        
+        await add_text_to_kb("Alpha release notes for the search engine", "alpha_notes", metadata={"project": "alpha"})
+        await add_text_to_kb("Beta release notes for the search engine", "beta_notes", metadata={"project": "beta"})
+        for doc_id, (doc, meta) in list(filter_mocks['store'].items()):
+            if meta["project"] == "beta":
+                filter_mocks['store'][doc_id] = (doc, {**meta, "ingested_at": time.time() - 30 * 86400})
+    
+    def test_filter_normalized_for_chroma(self):
+        """Test that several fields become $and and time bounds become numeric ingested_at ranges."""
+        import time
+        from tools.rag_knowledge_base_tool import _build_search_filter
+        
+        where = _build_search_filter({"source_type": "webpage", "project": {"$in": ["a", "b"]}},
+                                     added_after="7d", added_before="2100-01-01")
+        clauses = where["$and"]
+        
+        assert clauses[0] == {"$and": [{"source_type": "webpage"}, {"project": {"$in": ["a", "b"]}}]}
+        assert abs(clauses[1]["ingested_at"]["$gte"] - (time.time() - 7 * 86400)) < 5
+        assert clauses[2]["ingested_at"]["$lt"] > time.time()
+        assert _build_search_filter(None) is None
+    
+    @pytest.mark.asyncio
+    async def test_where_pushed_into_chroma_query(self, filter_mocks):
+        """Test that the filter reaches collection.query instead of being applied afterwards."""
+        await self.add_documents(filter_mocks)
+        
+        result = await search_kb("release notes", where={"project": "alpha"})
+        
+        assert result["status"] == "success"
+        assert result["filter"] == {"project": "alpha"}
+        assert [r["metadata"]["custom"]["project"] for r in result["results"]] == ["alpha"]
+        assert filter_mocks['collection'].query.call_args.kwargs["where"] == {"project": "alpha"}
+    
+    @pytest.mark.asyncio
+    async def test_added_after_excludes_older_chunks(self, filter_mocks):
+        """Test the ingestion-time range filter, alone and in keyword mode."""
+        await self.add_documents(filter_mocks)
+        
+        vector = await search_kb("release notes", added_after="7d")
+        keyword = await search_kb("release notes", added_after="7d", mode="keyword")
+        older = await search_kb("release notes", added_before="7d")
+        
+        assert [r["metadata"]["custom"]["project"] for r in vector["results"]] == ["alpha"]
+        assert [r["metadata"]["custom"]["project"] for r in keyword["results"]] == ["alpha"]
+        assert [r["metadata"]["custom"]["project"] for r in older["results"]] == ["beta"]
+    
+    @pytest.mark.asyncio
+    async def test_ingestion_stores_numeric_time(self, filter_mocks):
+        """Test that chunks carry ingested_at as epoch seconds (not shown as custom metadata)."""
+        import time
+        
+        await add_text_to_kb("Some content", "timed_doc")
+        meta = next(iter(filter_mocks['store'].values()))[1]
+        
+        assert isinstance(meta["ingested_at"], float)
+        assert abs(meta["ingested_at"] - time.time()) < 60
+        result = await search_kb("some content")
+        assert "ingested_at" not in result["results"][0]["metadata"].get("custom", {})
+    
+    @pytest.mark.asyncio
+    async def test_rebuild_backfills_older_chunks(self, filter_mocks):
+        """Test that rebuild_kb_summary adds ingested_at to chunks stored without it."""
+        filter_mocks['store']['legacy'] = ("Legacy chunk", {"source_name": "old", "source_type": "text",
+                                                            "timestamp": "2024-01-01T00:00:00"})
+        
+        result = await rebuild_kb_summary("default")
+        
+        assert result["collections"]["default"]["ingested_at_backfilled"] == 1
+        assert filter_mocks['store']['legacy'][1]["ingested_at"] > 0
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("kwargs", [
+        {"where": {"project": {"$regex": "a.*"}}},
+        {"where": {"project": {"nested": {"too": "deep"}}}},
+        {"where": {"$or": [{"project": "alpha"}]}},
+        {"added_after": "last tuesday"}
+    ])
+    async def test_invalid_filters_rejected(self, filter_mocks, kwargs):
+        """Test that malformed filters return an error before touching Chroma."""
+        result = await search_kb("release notes", **kwargs)
+        
+        assert result["status"] == "error"
+        assert "Invalid filter" in result["error"]
+        filter_mocks['collection'].query.assert_not_called()
+
+
+class TestRAGNearDuplicates:
+    """Test MinHash near-duplicate detection during ingestion."""
+    
+    FOOTER = ("Home Products Pricing Documentation Blog Careers Contact us Follow us on social media for the "
+              "latest product news and release announcements Subscribe to our newsletter to receive monthly "
+              "updates about new features security advisories and community events All rights reserved "
+              "Privacy policy Terms of service Cookie settings Accessibility statement Sitemap Status page")
+    
+    @pytest.fixture
+    def dedup_mocks(self):
+        """Setup a dict-backed collection (empty, so its fingerprint index is tracked from the start)."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            store = {}
+            
+            def collection_add(documents, embeddings, metadatas, ids):
+                for doc_id, doc, meta in zip(ids, documents, metadatas):
+                    store[doc_id] = (doc, meta)
+            
+            def collection_get(ids=None, where=None, include=None, limit=None, offset=0):
+                selected = [doc_id for doc_id in (ids if ids is not None else list(store)) if doc_id in store]
+                if where:
+                    selected = [doc_id for doc_id in selected
+                                if all(store[doc_id][1].get(k) == v for k, v in where.items())]
+                if limit is not None:
+                    selected = selected[offset:offset + limit]
+                return {
+                    'ids': selected,
+                    'documents': [store[doc_id][0] for doc_id in selected],
+                    'metadatas': [store[doc_id][1] for doc_id in selected]
+                }
+            
+            def collection_delete(ids):
+                for doc_id in ids:
+                    store.pop(doc_id, None)
+            
+            mock_collection = Mock()
+            mock_collection.add = Mock(side_effect=collection_add)
+            mock_collection.get = Mock(side_effect=collection_get)
+            mock_collection.delete = Mock(side_effect=collection_delete)
+            mock_collection.count = Mock(side_effect=lambda: len(store))
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            mock_client.get_or_create_collection = Mock(return_value=mock_collection)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.1, 0.2] for _ in texts])
+            ))
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'store': store, 'collection': mock_collection}
+    
+    def test_signatures_estimate_similarity(self):
+        """Test that a lightly edited chunk keeps most of its MinHash signature and unrelated text does not."""
+        import numpy as np
+        from tools.rag_knowledge_base_tool import _minhash_signatures
+        
+        edited = self.FOOTER.replace("Sitemap", "Site map")
+        signatures = _minhash_signatures([self.FOOTER, edited, "Vector search tuning guide for large collections"], 3)
+        
+        assert np.mean(signatures[0] == signatures[1]) >= 0.8
+        assert np.mean(signatures[0] == signatures[2]) < 0.2
+        assert (_minhash_signatures([self.FOOTER], 3) == signatures[:1]).all()
+    
+    @pytest.mark.asyncio
+    async def test_boilerplate_skipped_across_sources(self, dedup_mocks):
+        """Test that a footer repeated on another page is skipped and reported."""
+        first = await add_text_to_kb(f"Installing the search engine on Linux | {self.FOOTER}", "install_page")
+        second = await add_text_to_kb(f"Configuring search relevance settings | {self.FOOTER} 2024", "config_page")
+        
+        assert first["chunks_added"] == 2
+        assert first["near_duplicates_skipped"] == 0
+        assert second["chunks_added"] == 1
+        assert second["near_duplicates_skipped"] == 1
+        assert len(dedup_mocks['store']) == 3
+    
+    @pytest.mark.asyncio
+    async def test_near_duplicates_within_one_document(self, dedup_mocks):
+        """Test that repeated chunks inside one batch are caught before anything is stored."""
+        result = await add_text_to_kb(f"{self.FOOTER} | Unique body text about ranking | {self.FOOTER} Top", "page")
+        
+        assert result["chunks_added"] == 2
+        assert result["near_duplicates_skipped"] == 1
+        assert len(result["chunk_ids"]) == 2
+    
+    @pytest.mark.asyncio
+    async def test_reingest_replaces_edited_chunk(self, dedup_mocks):
+        """Test that an edited chunk is not swallowed by the old version it replaces."""
+        await add_text_to_kb(f"Release notes | {self.FOOTER}", "notes")
+        result = await add_text_to_kb(f"Release notes | {self.FOOTER} Imprint", "notes", reingest=True)
+        
+        assert result["chunks_added"] == 1
+        assert result["chunks_deleted"] == 1
+        assert result["near_duplicates_skipped"] == 0
+        assert any(doc.endswith("Imprint") for doc, _ in dedup_mocks['store'].values())
+    
+    @pytest.mark.asyncio
+    async def test_existing_collection_indexed_by_rebuild(self, dedup_mocks):
+        """Test that collections predating the index only dedupe against stored chunks after a rebuild."""
+        dedup_mocks['store']['legacy'] = (self.FOOTER, {"source_name": "legacy", "source_type": "text"})
+        
+        before = await add_text_to_kb(f"{self.FOOTER} Jobs", "page_one")
+        rebuilt = await rebuild_kb_summary("default")
+        after = await add_text_to_kb(f"{self.FOOTER} Press", "page_two")
+        
+        assert before["near_duplicates_skipped"] == 0
+        assert rebuilt["collections"]["default"]["fingerprints_indexed"] == 2
+        assert after["near_duplicates_skipped"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_deduplication_can_be_disabled(self, dedup_mocks):
+        """Test that near-duplicates are stored when deduplication is off."""
+        with patch('tools.rag_knowledge_base_tool._get_dedup_config',
+                   return_value={"enabled": False, "similarity_threshold": 0.8, "shingle_size": 3}):
+            await add_text_to_kb(f"First page | {self.FOOTER}", "page_one")
+            result = await add_text_to_kb(f"Second page | {self.FOOTER} 2024", "page_two")
+        
+        assert result["chunks_added"] == 2
+        assert result["near_duplicates_skipped"] == 0
+
+
+class TestRAGSnapshots:
+    """Test collection snapshot export and model-free import."""
+    
+    @pytest.fixture
+    def snapshot_mocks(self, tmp_path):
+        """Setup a Chroma client with dict-backed named collections that keep embeddings."""
+        with patch('tools.rag_knowledge_base_tool._get_snapshot_dir', return_value=tmp_path), patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            collections = {}
+            
+            def make_collection(name):
+                store = {}
+                
+                def collection_add(ids, embeddings, documents, metadatas):
+                    for doc_id, embedding, doc, meta in zip(ids, embeddings, documents, metadatas):
+                        store[doc_id] = (list(embedding), doc, meta)
+                
+                def collection_get(ids=None, where=None, include=None, limit=None, offset=0):
+                    selected = [doc_id for doc_id in (ids if ids is not None else list(store)) if doc_id in store]
+                    if limit is not None:
+                        selected = selected[offset:offset + limit]
+                    return {
+                        'ids': selected,
+                        'embeddings': [store[doc_id][0] for doc_id in selected],
+                        'documents': [store[doc_id][1] for doc_id in selected],
+                        'metadatas': [store[doc_id][2] for doc_id in selected]
+                    }
+                
+                collection = Mock()
+                collection.name = name
+                collection.store = store
+                collection.add = Mock(side_effect=collection_add)
+                collection.get = Mock(side_effect=collection_get)
+                collection.count = Mock(side_effect=lambda: len(store))
+                return collection
+            
+            def get_collection(name):
+                if name not in collections:
+                    raise ValueError(f"Collection {name} does not exist")
+                return collections[name]
+            
+            mock_client = Mock()
+            mock_client.get_collection = Mock(side_effect=get_collection)
+            mock_client.get_or_create_collection = Mock(
+                side_effect=lambda name: collections.setdefault(name, make_collection(name))
+            )
+            mock_client.delete_collection = Mock(side_effect=lambda name: collections.pop(name))
+            mock_client.list_collections = Mock(side_effect=lambda: list(collections.values()))
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.6, 0.0, 0.8, 0.0] if "alpha" in text else [0.0, 0.6, 0.0, 0.8]
+                                          for text in texts])
+            ))
+            
+            mock_splitter = Mock()
+            mock_splitter.split_text = Mock(side_effect=lambda text: [p.strip() for p in text.split("|")])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_text_splitter', return_value=mock_splitter):
+                yield {'collections': collections, 'model': mock_model}
+    
+    async def export_sample(self, tmp_path):
+        """Ingest two sources into "docs" and export the collection."""
+        await add_text_to_kb("Setting up the alpha cluster | Scaling alpha nodes", "alpha_guide", "docs",
+                             metadata={"team": "infra"})
+        await add_text_to_kb("Beta release checklist for reviewers", "beta_notes", "docs")
+        return await export_kb_collection("docs", str(tmp_path / "docs_snapshot"))
+    
+    @pytest.mark.asyncio
+    async def test_export_writes_columnar_snapshot(self, snapshot_mocks, tmp_path):
+        """Test that embeddings land in one contiguous float32 file next to records and a manifest."""
+        import gzip
+        import numpy as np
+        
+        result = await self.export_sample(tmp_path)
+        snapshot = tmp_path / "docs_snapshot"
+        manifest = json.loads((snapshot / "manifest.json").read_text())
+        records = [json.loads(line) for line in gzip.open(snapshot / "records.jsonl.gz", "rt")]
+        vectors = np.fromfile(snapshot / "embeddings.f32", dtype="<f4").reshape(manifest["count"], manifest["dimension"])
+        
+        assert result["status"] == "success"
+        assert result["chunk_count"] == manifest["count"] == 3
+        assert manifest["dimension"] == 4
+        assert [r["id"] for r in records] == list(snapshot_mocks['collections']["docs"].store)
+        for record, vector in zip(records, vectors):
+            assert vector.tolist() == pytest.approx(snapshot_mocks['collections']["docs"].store[record["id"]][0])
+    
+    @pytest.mark.asyncio
+    async def test_import_round_trip_without_model(self, snapshot_mocks, tmp_path):
+        """Test that an import restores chunks, summary and keyword index without encoding anything."""
+        await self.export_sample(tmp_path)
+        snapshot_mocks['model'].encode.reset_mock()
+        
+        with patch('tools.rag_knowledge_base_tool._initialize_embedding_model',
+                   side_effect=AssertionError("model loaded during import")):
+            result = await import_kb_collection(str(tmp_path / "docs_snapshot"), "docs_copy")
+            keyword = await search_kb("checklist", "docs_copy", mode="keyword")
+        sources = await list_kb_sources("docs_copy")
+        
+        original = snapshot_mocks['collections']["docs"].store
+        copy = snapshot_mocks['collections']["docs_copy"].store
+        assert result["status"] == "success"
+        assert result["chunks_imported"] == 3
+        assert copy.keys() == original.keys()
+        assert all(copy[k][0] == pytest.approx(original[k][0]) and copy[k][1:] == original[k][1:] for k in copy)
+        assert {s["source"] for s in sources["sources"]} == {"alpha_guide", "beta_notes"}
+        assert keyword["results"][0]["content"] == "Beta release checklist for reviewers"
+        snapshot_mocks['model'].encode.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_import_restores_rescore_vectors(self, snapshot_mocks, tmp_path):
+        """Test that a reduced-dimension collection keeps its full-precision rescore vectors."""
+        from tools.rag_knowledge_base_tool import _get_vector_layout, _open_sidecar, VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA
+        
+        storage = {"index_dimension": 2, "rescore_precision": "int8", "rescore_multiplier": 4}
+        with patch('tools.rag_knowledge_base_tool._get_vector_storage_config', return_value=storage):
+            await self.export_sample(tmp_path)
+        result = await import_kb_collection(str(tmp_path / "docs_snapshot"), "docs_copy")
+        
+        def rescore_rows(name):
+            with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+                return dict(conn.execute("SELECT chunk_id, vector FROM rescore_vectors WHERE collection = ?",
+                                         (name,)).fetchall())
+        
+        assert result["rescore_vectors_imported"] == 3
+        assert _get_vector_layout("docs_copy") == {"index_dimension": 2, "rescore_precision": "int8"}
+        assert rescore_rows("docs_copy") == rescore_rows("docs")
+        assert len(next(iter(snapshot_mocks['collections']["docs_copy"].store.values()))[0]) == 2
+    
+    @pytest.mark.asyncio
+    async def test_import_refuses_to_clobber_or_mix_models(self, snapshot_mocks, tmp_path):
+        """Test that imports into a populated collection need overwrite and models must match."""
+        await self.export_sample(tmp_path)
+        snapshot = str(tmp_path / "docs_snapshot")
+        
+        existing = await import_kb_collection(snapshot)
+        replaced = await import_kb_collection(snapshot, overwrite=True)
+        config = {"embedding": {"model_name": "other/model"}}
+        with patch('tools.rag_knowledge_base_tool._load_config', return_value=config):
+            mismatch = await import_kb_collection(snapshot, "docs_other")
+        missing = await import_kb_collection(str(tmp_path / "nowhere"))
+        
+        assert existing["status"] == "error" and "overwrite=True" in existing["error"]
+        assert replaced["status"] == "success" and replaced["chunks_imported"] == 3
+        assert len(snapshot_mocks['collections']["docs"].store) == 3
+        assert mismatch["status"] == "error" and "other/model" in mismatch["error"]
+        assert missing["status"] == "error" and "Invalid snapshot" in missing["error"]
+
+    @pytest.mark.asyncio
+    async def test_snapshot_paths_confined_to_snapshot_dir(self, snapshot_mocks, tmp_path):
+        """Test that export and import refuse paths outside the snapshots directory."""
+        await add_text_to_kb("Beta release checklist for reviewers", "beta_notes", "docs")
+        
+        relative = await export_kb_collection("docs", "nested/docs_snapshot")
+        escaped = await export_kb_collection("docs", "../outside")
+        absolute = await import_kb_collection(str(tmp_path.parent))
+        
+        assert relative["status"] == "success"
+        assert relative["snapshot_path"] == str((tmp_path / "nested" / "docs_snapshot").resolve())
+        assert escaped["status"] == "error" and "snapshots directory" in escaped["error"]
+        assert not (tmp_path.parent / "outside").exists()
+        assert absolute["status"] == "error" and "snapshots directory" in absolute["error"]
+    
+    @pytest.mark.asyncio
+    async def test_rescore_rows_aligned_when_first_chunk_has_none(self, snapshot_mocks, tmp_path):
+        """Test that a chunk without a rescore vector ahead of the stored ones does not shift later rows."""
+        from tools.rag_knowledge_base_tool import _open_sidecar, VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA
+        
+        storage = {"index_dimension": 2, "rescore_precision": "float32", "rescore_multiplier": 4}
+        with patch('tools.rag_knowledge_base_tool._get_vector_storage_config', return_value=storage):
+            await add_text_to_kb("Setting up the alpha cluster | Scaling alpha nodes", "alpha_guide", "docs")
+            await add_text_to_kb("Beta release checklist for reviewers", "beta_notes", "docs")
+        
+        def rescore_rows(name):
+            with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+                return dict(conn.execute("SELECT chunk_id, vector FROM rescore_vectors WHERE collection = ?",
+                                         (name,)).fetchall())
+        
+        first_chunk = next(iter(snapshot_mocks['collections']["docs"].store))
+        with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+            conn.execute("DELETE FROM rescore_vectors WHERE collection = 'docs' AND chunk_id = ?", (first_chunk,))
+        
+        exported = await export_kb_collection("docs", "docs_snapshot")
+        manifest = json.loads((tmp_path / "docs_snapshot" / "manifest.json").read_text())
+        result = await import_kb_collection("docs_snapshot", "docs_copy")
+        
+        assert exported["status"] == "success"
+        assert manifest["rescore"]["dimension"] == 4
+        assert (tmp_path / "docs_snapshot" / "rescore_vectors.bin").stat().st_size == 3 * 4 * 4
+        assert result["rescore_vectors_imported"] == 2
+        assert rescore_rows("docs_copy") == rescore_rows("docs")
+
+
+class TestRAGRerank:
+    """Test MMR diversification and cross-encoder re-ranking in search_kb."""
+    
+    # Two near-identical boilerplate chunks rank first; the distinct chunks follow
+    CANDIDATES = [
+        ("Cookie banner and navigation links", [1.0, 0.0, 0.0]),
+        ("Cookie banner and navigation links again", [0.99, 0.01, 0.0]),
+        ("How to rotate API keys safely", [0.0, 1.0, 0.0]),
+        ("API key rotation schedule", [0.0, 0.0, 1.0]),
+    ]
+    
+    @pytest.fixture
+    def rerank_mocks(self):
+        """Setup a collection returning fixed candidates (with embeddings) in retrieval order."""
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            def collection_query(query_embeddings, n_results, include):
+                ranked = self.CANDIDATES[:n_results]
+                response = {
+                    'ids': [[f"chunk_{i}" for i in range(len(ranked))]],
+                    'documents': [[doc for doc, _ in ranked]],
+                    'metadatas': [[{"source_name": f"page_{i}"} for i in range(len(ranked))]],
+                    'distances': [[0.1 * (i + 1) for i in range(len(ranked))]]
+                }
+                if 'embeddings' in include:
+                    response['embeddings'] = [[embedding for _, embedding in ranked]]
+                return response
+            
+            mock_collection = Mock()
+            mock_collection.query = Mock(side_effect=collection_query)
+            mock_client = Mock()
+            mock_client.get_collection = Mock(return_value=mock_collection)
+            
+            mock_model = Mock()
+            mock_model.encode = Mock(side_effect=lambda texts, **kwargs: Mock(
+                tolist=Mock(return_value=[[0.1, 0.2, 0.3] for _ in texts])
+            ))
+            
+            # The cross-encoder prefers anything mentioning rotation
+            mock_cross_encoder = Mock()
+            mock_cross_encoder.predict = Mock(side_effect=lambda pairs: [
+                5.0 if "rotat" in document else -5.0 for _, document in pairs
+            ])
+            
+            with patch('tools.rag_knowledge_base_tool._initialize_chroma', return_value=mock_client), \
+                 patch('tools.rag_knowledge_base_tool._initialize_embedding_model', return_value=mock_model), \
+                 patch('tools.rag_knowledge_base_tool._initialize_cross_encoder', return_value=mock_cross_encoder):
+                yield {'collection': mock_collection, 'cross_encoder': mock_cross_encoder}
+    
+    def test_mmr_order_skips_near_duplicates(self):
+        """Test that MMR picks a distinct candidate over a near-duplicate of the first pick."""
+        from tools.rag_knowledge_base_tool import _mmr_order
+        
+        embeddings = [embedding for _, embedding in self.CANDIDATES]
+        
+        assert _mmr_order([0.9, 0.89, 0.8, 0.7], embeddings, 0.5, 3) == [0, 2, 3]
+        assert _mmr_order([0.9, 0.89, 0.8, 0.7], embeddings, 1.0, 3) == [0, 1, 2]
+    
+    @pytest.mark.asyncio
+    async def test_mmr_diversifies_results(self, rerank_mocks):
+        """Test that rerank="mmr" fetches a larger candidate pool and drops the duplicate chunk."""
+        result = await search_kb("rotate api keys", limit=2, rerank="mmr")
+        
+        assert result["status"] == "success"
+        assert [r["content"] for r in result["results"]] == [self.CANDIDATES[0][0], self.CANDIDATES[2][0]]
+        assert [r["retrieval_rank"] for r in result["results"]] == [1, 3]
+        assert rerank_mocks['collection'].query.call_args.kwargs["n_results"] == 8
+        assert "embeddings" in rerank_mocks['collection'].query.call_args.kwargs["include"]
+        assert all("_embedding" not in r for r in result["results"])
+        assert {"embed", "retrieval", "mmr", "total"} <= set(result["search_stats"]["latency_ms"])
+        assert result["search_stats"]["rerank"]["candidates"] == 4
+    
+    @pytest.mark.asyncio
+    async def test_cross_encoder_reorders_candidates(self, rerank_mocks):
+        """Test that cross-encoder scores reorder the candidate pool and are reported."""
+        result = await search_kb("rotate api keys", limit=2, rerank="cross_encoder")
+        
+        assert [r["retrieval_rank"] for r in result["results"]] == [3, 4]
+        assert [r["rank"] for r in result["results"]] == [1, 2]
+        assert all(r["rerank_score"] == 5.0 for r in result["results"])
+        assert result["search_stats"]["rerank"]["cross_encoder_scored"] == 4
+        assert result["search_stats"]["rerank"]["budget_exhausted"] is False
+        assert "cross_encoder" in result["search_stats"]["latency_ms"]
+    
+    @pytest.mark.asyncio
+    async def test_cross_encoder_respects_latency_budget(self, rerank_mocks):
+        """Test that scoring stops once the next batch would overrun the budget."""
+        import time
+        
+        def slow_predict(pairs):
+            time.sleep(0.05)
+            return [1.0] * len(pairs)
+        
+        rerank_mocks['cross_encoder'].predict = Mock(side_effect=slow_predict)
+        config = {"embedding": {"model_name": "BAAI/bge-m3"},
+                  "search": {"rerank": {"cross_encoder_batch_size": 1, "latency_budget_ms": 60}}}
+        with patch('tools.rag_knowledge_base_tool._load_config', return_value=config):
+            result = await search_kb("rotate api keys", limit=4, rerank="cross_encoder", include_metadata=False)
+        
+        stats = result["search_stats"]["rerank"]
+        assert stats["budget_exhausted"] is True
+        assert 1 <= stats["cross_encoder_scored"] < 4
+        assert len(result["results"]) == 4
+        assert "rerank_score" not in result["results"][-1]
+    
+    @pytest.mark.asyncio
+    async def test_invalid_rerank_rejected(self, rerank_mocks):
+        """Test that unknown rerank modes return an error before searching."""
+        result = await search_kb("rotate api keys", rerank="random")
+        
+        assert result["status"] == "error"
+        assert "Rerank must be one of" in result["error"]
+        rerank_mocks['collection'].query.assert_not_called()
+
+
+@pytest.mark.unit
+class TestRAGEmbeddingBackends:
+    """Test the embedding backends selected by embedding.model_type."""
+    
+    @pytest.fixture
+    def fake_onnx(self):
+        """Fake onnxruntime and tokenizers: token ids are word lengths, hidden states are (id, 1)."""
+        import numpy as np
+        
+        class FakeEncoding:
+            def __init__(self, ids, length):
+                self.ids = ids + [0] * (length - len(ids))
+                self.attention_mask = [1] * len(ids) + [0] * (length - len(ids))
+        
+        class FakeTokenizer:
+            def enable_truncation(self, max_length):
+                pass
+            
+            def enable_padding(self, pad_id, pad_token):
+                pass
+            
+            def token_to_id(self, token):
+                return 0 if token == "<pad>" else None
+            
+            def encode_batch(self, texts):
+                ids = [[len(word) for word in text.split()] for text in texts]
+                return [FakeEncoding(row, max(map(len, ids))) for row in ids]
+        
+        feeds_seen = []
+        
+        class FakeSession:
+            def __init__(self, path, options, providers):
+                self.path = path
+            
+            def get_inputs(self):
+                return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+            
+            def run(self, output_names, feeds):
+                feeds_seen.append(set(feeds))
+                ids = feeds["input_ids"].astype(np.float32)
+                return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+        
+        onnxruntime = Mock(SessionOptions=Mock, InferenceSession=FakeSession)
+        tokenizers = Mock(Tokenizer=Mock(from_file=Mock(return_value=FakeTokenizer())))
+        with patch.dict(sys.modules, {'onnxruntime': onnxruntime, 'tokenizers': tokenizers}):
+            yield feeds_seen
+    
+    @pytest.mark.parametrize("pooling,expected", [("mean", [[2, 1], [4, 1]]), ("cls", [[1, 1], [4, 1]])])
+    def test_onnx_pooling_and_order(self, fake_onnx, tmp_path, pooling, expected):
+        """Test that ONNX outputs are pooled, normalized and returned in input order."""
+        import numpy as np
+        from tools import rag_knowledge_base_tool as rag
+        
+        with patch('tools.rag_knowledge_base_tool._load_config', return_value={"embedding": {"onnx": {"pooling": pooling}}}):
+            model = rag._OnnxEmbeddingModel(tmp_path, rag._get_onnx_config())
+        vectors = model.encode(["a bb ccc", "dddd"])
+        
+        expected = np.array(expected, dtype=np.float32)
+        expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+        assert np.allclose(vectors, expected)
+        # Only inputs the exported graph declares are fed
+        assert fake_onnx == [{"input_ids", "attention_mask"}]
+    
+    def test_onnx_backend_loads_without_sentence_transformers(self, fake_onnx, tmp_path):
+        """Test that model_type onnx loads a local export through ONNX Runtime."""
+        from tools import rag_knowledge_base_tool as rag
+        
+        config = {"embedding": {"model_name": str(tmp_path), "model_type": "onnx"}}
+        with patch('tools.rag_knowledge_base_tool._load_config', return_value=config), \
+             patch.multiple('tools.rag_knowledge_base_tool', SENTENCE_TRANSFORMERS_AVAILABLE=False,
+                            ONNX_RUNTIME_AVAILABLE=True, _embedding_model=None):
+            model = rag._initialize_embedding_model()
+            vectors = rag._encode_local(["a bb"])
+        
+        assert isinstance(model, rag._OnnxEmbeddingModel)
+        assert vectors[0] == pytest.approx([0.7071068, 0.7071068])  # CLS pooling by default
+        assert model.session.path == str(tmp_path / "onnx" / "model.onnx")
+    
+    def test_static_backend(self):
+        """Test that model_type static encodes with model2vec and normalizes the vectors."""
+        import numpy as np
+        from tools import rag_knowledge_base_tool as rag
+        
+        static_model = Mock(encode=Mock(return_value=np.array([[3.0, 4.0], [0.0, 2.0]])))
+        model2vec = Mock(StaticModel=Mock(from_pretrained=Mock(return_value=static_model)))
+        config = {"embedding": {"model_name": "minishlab/potion-base-8M", "model_type": "static"}}
+        with patch.dict(sys.modules, {'model2vec': model2vec}), \
+             patch('tools.rag_knowledge_base_tool._load_config', return_value=config), \
+             patch.multiple('tools.rag_knowledge_base_tool', MODEL2VEC_AVAILABLE=True, _embedding_model=None):
+            vectors = rag._encode_local(["first", "second"])
+        
+        model2vec.StaticModel.from_pretrained.assert_called_once_with("minishlab/potion-base-8M")
+        assert vectors[0] == pytest.approx([0.6, 0.8])
+        assert vectors[1] == pytest.approx([0.0, 1.0])
+    
+    @pytest.mark.asyncio
+    async def test_setup_reports_backend_dependencies(self):
+        """Test that setup names the configured backend's packages, or rejects an unknown backend."""
+        with patch.multiple('tools.rag_knowledge_base_tool', CHROMADB_AVAILABLE=True, LANGCHAIN_AVAILABLE=True,
+                            SENTENCE_TRANSFORMERS_AVAILABLE=True, ONNX_RUNTIME_AVAILABLE=False):
+            with patch('tools.rag_knowledge_base_tool._load_config', return_value={"embedding": {"model_type": "onnx"}}):
+                missing = await setup_knowledge_base()
+            with patch('tools.rag_knowledge_base_tool._load_config', return_value={"embedding": {"model_type": "tensorflow"}}):
+                unknown = await setup_knowledge_base()
+        
+        assert missing["status"] == "error"
+        assert missing["install_command"] == "pip install onnxruntime tokenizers"
+        assert unknown["status"] == "error"
+        assert "Unknown embedding model_type 'tensorflow'" in unknown["error"]
+
+
+# Test class for RAG tool registration and error handling
+@pytest.mark.unit
+class TestRAGToolRegistration:
+    """Test RAG tool registration and error handling."""
+    
+    def test_tool_registration_available(self, fastmcp_server):
+        """Test tool registration when dependencies are available."""
+        from tools.rag_knowledge_base_tool import register
+        
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=True
+        ):
+            # Mock server instance
+            mock_server = Mock()
+            mock_server.tool = Mock(return_value=lambda func: func)
+            
+            # Should not raise any exceptions
+            register(mock_server)
+            
+            # Verify tools were registered (13 calls for 13 functions)
+            assert mock_server.tool.call_count == 13
+    
+    def test_tool_registration_unavailable(self, fastmcp_server):
+        """Test tool registration when dependencies are unavailable."""
+        from tools.rag_knowledge_base_tool import register
+        
+        with patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=False,
+            SENTENCE_TRANSFORMERS_AVAILABLE=False,
+            LANGCHAIN_AVAILABLE=False
+        ):
+            # Mock server instance
+            mock_server = Mock()
+            mock_server.tool = Mock(return_value=lambda func: func)
+            
+            # Should return early without registering tools
+            register(mock_server)
+            
+            # Verify no tools were registered
+            assert mock_server.tool.call_count == 0
+
+    def test_langchain_only_required_for_fixed_size(self, fastmcp_server):
+        """Test that the token/markdown/sentence strategies register and warm up without langchain."""
+        from tools import rag_knowledge_base_tool as rag
+        from tools.rag_knowledge_base_tool import register, warm_up
+
+        with patch.dict(rag._warmup_state), patch.multiple(
+            'tools.rag_knowledge_base_tool',
+            CHROMADB_AVAILABLE=True,
+            SENTENCE_TRANSFORMERS_AVAILABLE=True,
+            LANGCHAIN_AVAILABLE=False
+        ), patch('tools.rag_knowledge_base_tool._warm_up_sync', return_value={"status": "ready"}):
+            for strategy, expected_tools in (("sentence", 13), ("fixed_size", 0)):
+                mock_server = Mock()
+                mock_server.tool = Mock(return_value=lambda func: func)
+                with patch('tools.rag_knowledge_base_tool._get_chunking_config', return_value={"strategy": strategy}):
+                    register(mock_server)
+                    warmup_status = warm_up(blocking=True, force=True)["status"]
+
+                assert mock_server.tool.call_count == expected_tools
+                assert warmup_status == ("ready" if expected_tools else "skipped")
 
 
 # Test class for comprehensive error handling and edge cases
@@ -698,6 +3054,7 @@ class TestRAGErrorHandling:
             # Mock components for full workflow
             mock_collection = Mock()
             mock_collection.add = Mock()
+            mock_collection.get = Mock(return_value={'ids': [], 'metadatas': []})
             mock_collection.query = Mock(return_value={
                 'documents': [['test result']],
                 'metadatas': [[{'source_name': 'workflow_test'}]],
@@ -1,5 +1,6 @@
 from typing import Dict, Any, Optional, List
 import httpx
+from tools.http_client import get_http_client
 import os
 from dotenv import load_dotenv
 
@@ -24,34 +25,34 @@ async def get_workspace_id_from_existing_base() -> str:
     Get workspace ID from an existing base since there's no public API to list workspaces.
     """
     try:
-        async with httpx.AsyncClient() as client:
-            # List existing bases to get a workspace ID
-            response = await client.get(
-                f"{AIRTABLE_BASE_URL}/meta/bases",
-                headers=get_airtable_headers(),
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                bases = result.get("bases", [])
-                if bases:
-                    # Try to get workspace info from the first base
-                    # Note: This is a workaround since workspace listing isn't public
-                    base_id = bases[0]["id"]
-                    
-                    # Get base schema which might include workspace info
-                    schema_response = await client.get(
-                        f"{AIRTABLE_BASE_URL}/meta/bases/{base_id}/tables",
-                        headers=get_airtable_headers(),
-                        timeout=30.0
-                    )
+        client = await get_http_client()
+        # List existing bases to get a workspace ID
+        response = await client.get(
+            f"{AIRTABLE_BASE_URL}/meta/bases",
+            headers=get_airtable_headers(),
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            bases = result.get("bases", [])
+            if bases:
+                # Try to get workspace info from the first base
+                # Note: This is a workaround since workspace listing isn't public
+                base_id = bases[0]["id"]
+                
+                # Get base schema which might include workspace info
+                schema_response = await client.get(
+                    f"{AIRTABLE_BASE_URL}/meta/bases/{base_id}/tables",
+                    headers=get_airtable_headers(),
+                    timeout=30.0
+                )
+                
+                if schema_response.status_code == 200:
+                    # For now, we'll return None and let Airtable create in default workspace
+                    return None
                     
-                    if schema_response.status_code == 200:
-                        # For now, we'll return None and let Airtable create in default workspace
-                        return None
-                        
-            return None
+        return None
     except Exception:
         return None
 
@@ -123,35 +124,35 @@ async def create_airtable_base(
     print(f"DEBUG: Payload being sent: {payload}")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{AIRTABLE_BASE_URL}/meta/bases",
-                headers=headers,
-                json=payload,
-                timeout=30.0
-            )
-            
-            print(f"DEBUG: Response status: {response.status_code}")
-            print(f"DEBUG: Response headers: {dict(response.headers)}")
-            print(f"DEBUG: Response text: {response.text}")
+        client = await get_http_client()
+        response = await client.post(
+            f"{AIRTABLE_BASE_URL}/meta/bases",
+            headers=headers,
+            json=payload,
+            timeout=30.0
+        )
+        
+        print(f"DEBUG: Response status: {response.status_code}")
+        print(f"DEBUG: Response headers: {dict(response.headers)}")
+        print(f"DEBUG: Response text: {response.text}")
+        
+        if response.status_code == 200:
+            result = response.json()
+            return {
+                "base_id": result.get("id"),
+                "name": result.get("name"),
+                "permission_level": result.get("permissionLevel"),
+                "tables": result.get("tables", []),
+                "status": "success"
+            }
+        else:
+            error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+            return {
+                "error": f"Failed to create base. Status: {response.status_code}",
+                "details": error_detail,
+                "status": "error"
+            }
             
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "base_id": result.get("id"),
-                    "name": result.get("name"),
-                    "permission_level": result.get("permissionLevel"),
-                    "tables": result.get("tables", []),
-                    "status": "success"
-                }
-            else:
-                error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
-                return {
-                    "error": f"Failed to create base. Status: {response.status_code}",
-                    "details": error_detail,
-                    "status": "error"
-                }
-                
     except Exception as e:
         print(f"ERROR: create_airtable_base failed: {str(e)}")
         return {
@@ -204,32 +205,32 @@ async def create_airtable_table(
         ]
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{AIRTABLE_BASE_URL}/meta/bases/{base_id}/tables",
-                headers=headers,
-                json=payload,
-                timeout=30.0
-            )
+        client = await get_http_client()
+        response = await client.post(
+            f"{AIRTABLE_BASE_URL}/meta/bases/{base_id}/tables",
+            headers=headers,
+            json=payload,
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            return {
+                "table_id": result.get("id"),
+                "name": result.get("name"),
+                "description": result.get("description"),
+                "fields": result.get("fields", []),
+                "views": result.get("views", []),
+                "status": "success"
+            }
+        else:
+            error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+            return {
+                "error": f"Failed to create table. Status: {response.status_code}",
+                "details": error_detail,
+                "status": "error"
+            }
             
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "table_id": result.get("id"),
-                    "name": result.get("name"),
-                    "description": result.get("description"),
-                    "fields": result.get("fields", []),
-                    "views": result.get("views", []),
-                    "status": "success"
-                }
-            else:
-                error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
-                return {
-                    "error": f"Failed to create table. Status: {response.status_code}",
-                    "details": error_detail,
-                    "status": "error"
-                }
-                
     except Exception as e:
         print(f"ERROR: create_airtable_table failed: {str(e)}")
         return {
@@ -254,28 +255,28 @@ async def list_airtable_bases() -> Dict[str, Any]:
         }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{AIRTABLE_BASE_URL}/meta/bases",
-                headers=headers,
-                timeout=30.0
-            )
+        client = await get_http_client()
+        response = await client.get(
+            f"{AIRTABLE_BASE_URL}/meta/bases",
+            headers=headers,
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            return {
+                "bases": result.get("bases", []),
+                "offset": result.get("offset"),
+                "status": "success"
+            }
+        else:
+            error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+            return {
+                "error": f"Failed to list bases. Status: {response.status_code}",
+                "details": error_detail,
+                "status": "error"
+            }
             
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "bases": result.get("bases", []),
-                    "offset": result.get("offset"),
-                    "status": "success"
-                }
-            else:
-                error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
-                return {
-                    "error": f"Failed to list bases. Status: {response.status_code}",
-                    "details": error_detail,
-                    "status": "error"
-                }
-                
     except Exception as e:
         print(f"ERROR: list_airtable_bases failed: {str(e)}")
         return {
@@ -303,28 +304,28 @@ async def get_base_schema(base_id: str) -> Dict[str, Any]:
         }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{AIRTABLE_BASE_URL}/meta/bases/{base_id}/tables",
-                headers=headers,
-                timeout=30.0
-            )
+        client = await get_http_client()
+        response = await client.get(
+            f"{AIRTABLE_BASE_URL}/meta/bases/{base_id}/tables",
+            headers=headers,
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            return {
+                "base_id": base_id,
+                "tables": result.get("tables", []),
+                "status": "success"
+            }
+        else:
+            error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+            return {
+                "error": f"Failed to get base schema. Status: {response.status_code}",
+                "details": error_detail,
+                "status": "error"
+            }
             
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "base_id": base_id,
-                    "tables": result.get("tables", []),
-                    "status": "success"
-                }
-            else:
-                error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
-                return {
-                    "error": f"Failed to get base schema. Status: {response.status_code}",
-                    "details": error_detail,
-                    "status": "error"
-                }
-                
     except Exception as e:
         print(f"ERROR: get_base_schema failed: {str(e)}")
         return {
@@ -588,47 +589,47 @@ async def list_records(
         params["view"] = view
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{AIRTABLE_BASE_URL}/{base_id}/{table_name}",
-                headers=headers,
-                params=params,
-                timeout=30.0
-            )
+        client = await get_http_client()
+        response = await client.get(
+            f"{AIRTABLE_BASE_URL}/{base_id}/{table_name}",
+            headers=headers,
+            params=params,
+            timeout=30.0
+        )
+        
+        print(f"DEBUG: Response status: {response.status_code}")
+        
+        if response.status_code == 200:
+            result = response.json()
+            records = result.get("records", [])
             
-            print(f"DEBUG: Response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                records = result.get("records", [])
-                
-                # Format records for better readability
-                formatted_records = []
-                for record in records:
-                    formatted_record = {
-                        "id": record.get("id"),
-                        "fields": record.get("fields", {}),
-                        "createdTime": record.get("createdTime")
-                    }
-                    formatted_records.append(formatted_record)
-                
-                return {
-                    "base_id": base_id,
-                    "table_name": table_name,
-                    "records": formatted_records,
-                    "count": len(formatted_records),
-                    "offset": result.get("offset"),
-                    "filter_used": filter_formula,
-                    "status": "success"
+            # Format records for better readability
+            formatted_records = []
+            for record in records:
+                formatted_record = {
+                    "id": record.get("id"),
+                    "fields": record.get("fields", {}),
+                    "createdTime": record.get("createdTime")
                 }
-            else:
-                error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
-                return {
-                    "error": f"Failed to list records. Status: {response.status_code}",
-                    "details": error_detail,
-                    "status": "error"
-                }
-                
+                formatted_records.append(formatted_record)
+            
+            return {
+                "base_id": base_id,
+                "table_name": table_name,
+                "records": formatted_records,
+                "count": len(formatted_records),
+                "offset": result.get("offset"),
+                "filter_used": filter_formula,
+                "status": "success"
+            }
+        else:
+            error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+            return {
+                "error": f"Failed to list records. Status: {response.status_code}",
+                "details": error_detail,
+                "status": "error"
+            }
+            
     except Exception as e:
         print(f"ERROR: list_records failed: {str(e)}")
         return {
@@ -709,36 +710,36 @@ async def get_record_by_id(
         }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{AIRTABLE_BASE_URL}/{base_id}/{table_name}/{record_id}",
-                headers=headers,
-                timeout=30.0
-            )
+        client = await get_http_client()
+        response = await client.get(
+            f"{AIRTABLE_BASE_URL}/{base_id}/{table_name}/{record_id}",
+            headers=headers,
+            timeout=30.0
+        )
+        
+        print(f"DEBUG: Response status: {response.status_code}")
+        
+        if response.status_code == 200:
+            result = response.json()
             
-            print(f"DEBUG: Response status: {response.status_code}")
+            return {
+                "base_id": base_id,
+                "table_name": table_name,
+                "record": {
+                    "id": result.get("id"),
+                    "fields": result.get("fields", {}),
+                    "createdTime": result.get("createdTime")
+                },
+                "status": "success"
+            }
+        else:
+            error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+            return {
+                "error": f"Failed to get record. Status: {response.status_code}",
+                "details": error_detail,
+                "status": "error"
+            }
             
-            if response.status_code == 200:
-                result = response.json()
-                
-                return {
-                    "base_id": base_id,
-                    "table_name": table_name,
-                    "record": {
-                        "id": result.get("id"),
-                        "fields": result.get("fields", {}),
-                        "createdTime": result.get("createdTime")
-                    },
-                    "status": "success"
-                }
-            else:
-                error_detail = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
-                return {
-                    "error": f"Failed to get record. Status: {response.status_code}",
-                    "details": error_detail,
-                    "status": "error"
-                }
-                
     except Exception as e:
         print(f"ERROR: get_record_by_id failed: {str(e)}")
         return {
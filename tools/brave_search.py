@@ -1,8 +1,22 @@
 # tools/brave_search.py
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from dotenv import load_dotenv
 import os
+import sys
+import time
+import copy
+import asyncio
+import hashlib
+import heapq
+import itertools
+import sqlite3
+import unicodedata
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
 import httpx
+from tools.http_client import get_http_client
 import json
 
 # Load environment variables from .env file
@@ -10,15 +24,400 @@ load_dotenv()
 
 # Get Brave API key from environment variables
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
-print(f"DEBUG: BRAVE_API_KEY loaded: {'Yes' if BRAVE_API_KEY else 'No'}")
+print(f"DEBUG: BRAVE_API_KEY loaded: {'Yes' if BRAVE_API_KEY else 'No'}", file=sys.stderr)
 
 BRAVE_SEARCH_URL = "https://api.search.brave.com/res/v1/web/search"
 BRAVE_LOCAL_SEARCH_URL = "https://api.search.brave.com/res/v1/web/local"
 
+# Rate limiting. Brave enforces a per-second limit and a monthly quota for each plan.
+# Every upstream call takes a token from one shared bucket refilled at BRAVE_RATE_LIMIT
+# requests per second when set, otherwise at the rate learned from X-RateLimit-*
+# response headers (1/s, the free plan, until the first response). Queued calls are
+# released by priority, then arrival; a call fails fast when its wait would exceed
+# BRAVE_MAX_QUEUE_WAIT seconds.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+class _QueueWaitExceeded(Exception):
+    """Raised when a call would wait in the rate limit queue longer than allowed."""
+    
+    def __init__(self, wait_seconds: float, max_wait_seconds: float, reason: Optional[str] = None):
+        self.wait_seconds = wait_seconds
+        reason = reason or "rate limit queue"
+        super().__init__(
+            f"Brave Search {reason}: estimated wait {wait_seconds:.1f}s exceeds the {max_wait_seconds:.1f}s limit"
+        )
+
+def _get_rate_limit_settings() -> Dict[str, Any]:
+    """Read rate limit settings from the environment (rate and burst are None unless configured)."""
+    rate = os.getenv("BRAVE_RATE_LIMIT")
+    burst = os.getenv("BRAVE_RATE_BURST")
+    return {
+        "rate_per_second": float(rate) if rate else None,
+        "burst": float(burst) if burst else None,
+        "max_wait_seconds": float(os.getenv("BRAVE_MAX_QUEUE_WAIT", "30"))
+    }
+
+def _parse_rate_header(value: Optional[str]) -> list:
+    """Parse a comma-separated X-RateLimit-* header (one number per window) into floats."""
+    if not value:
+        return []
+    try:
+        return [float(part.split(";")[0]) for part in value.split(",")]
+    except ValueError:
+        return []
+
+def _parse_policy_windows(value: Optional[str]) -> list:
+    """Window length in seconds per X-RateLimit-Policy entry (e.g. "20;w=1;burst=5"), None where it can't be read."""
+    windows = []
+    for entry in (value or "").split(","):
+        window = None
+        for param in entry.split(";")[1:]:
+            name, _, raw = param.partition("=")
+            if name.strip() == "w":
+                try:
+                    window = float(raw.strip().strip('"'))
+                except ValueError:
+                    pass
+                break
+        windows.append(window)
+    return windows
+
+class _TokenBucket:
+    """
+    Token bucket shared by all Brave API calls. Calls that cannot take a token right away
+    wait in a (priority, arrival) heap and are released by one dispatcher task as tokens
+    refill or a quota block ends.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Forget learned limits, queued calls and metrics."""
+        self.learned_rate = 1.0
+        self.tokens = None
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.block_reason = None
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.dispatcher = None
+        self.wait_ms = deque(maxlen=1024)
+        self.stats = {"granted": 0, "queued": 0, "rejected": 0, "throttled_responses": 0}
+    
+    def limits(self) -> tuple:
+        """Current (rate per second, burst): configured values win over learned ones."""
+        settings = _get_rate_limit_settings()
+        rate = settings["rate_per_second"] or self.learned_rate
+        return rate, settings["burst"] or max(1.0, rate)
+    
+    def _refill(self, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        if self.tokens is None:
+            self.tokens = burst
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        return now
+    
+    def estimate_wait(self, priority: int) -> float:
+        """Seconds a call with this priority would wait for a token if it queued now."""
+        rate, burst = self.limits()
+        now = self._refill(rate, burst)
+        ahead = sum(1 for waiter in self.waiters if waiter[0] <= priority and not waiter[2].done())
+        blocked = max(0.0, self.blocked_until - now)
+        tokens = 0.0 if blocked else self.tokens
+        return blocked + max(0.0, ahead + 1 - tokens) / rate
+    
+    async def acquire(self, priority: int = PRIORITY_NORMAL, max_wait: Optional[float] = None) -> float:
+        """
+        Take a token, waiting behind calls of the same or higher priority.
+        
+        Returns:
+            Seconds spent waiting
+        
+        Raises:
+            _QueueWaitExceeded: if the wait would exceed max_wait (BRAVE_MAX_QUEUE_WAIT by default)
+        """
+        if max_wait is None:
+            max_wait = _get_rate_limit_settings()["max_wait_seconds"]
+        started = time.monotonic()
+        estimate = self.estimate_wait(priority)
+        if estimate > max_wait:
+            self.stats["rejected"] += 1
+            raise _QueueWaitExceeded(estimate, max_wait, self.block_reason if self.blocked_until > started else None)
+        
+        if estimate == 0:
+            self.tokens -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+            self.stats["queued"] += 1
+            if self.dispatcher is None or self.dispatcher.done():
+                self.dispatcher = asyncio.create_task(self._dispatch())
+            try:
+                await asyncio.wait_for(future, timeout=max_wait)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += 1
+                raise _QueueWaitExceeded(time.monotonic() - started, max_wait)
+        
+        waited = time.monotonic() - started
+        self.stats["granted"] += 1
+        self.wait_ms.append(waited * 1000)
+        return waited
+    
+    async def _dispatch(self):
+        """Release queued calls one token at a time, highest priority first."""
+        while self.waiters:
+            future = self.waiters[0][2]
+            if future.done():
+                heapq.heappop(self.waiters)  # Gave up waiting
+                continue
+            rate, burst = self.limits()
+            now = self._refill(rate, burst)
+            delay = max(self.blocked_until - now, (1 - self.tokens) / rate)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(self.waiters)
+            self.tokens -= 1
+            future.set_result(None)
+    
+    def observe(self, response):
+        """Learn the plan's limits from a response's X-RateLimit-* headers and back off after a 429."""
+        headers = getattr(response, "headers", None)
+        if not isinstance(headers, Mapping):
+            return
+        now = time.monotonic()
+        limits = _parse_rate_header(headers.get("X-RateLimit-Limit"))
+        windows = _parse_policy_windows(headers.get("X-RateLimit-Policy"))
+        if limits and limits[0] > 0:
+            self.learned_rate = limits[0] / (windows[0] if windows and windows[0] and windows[0] > 0 else 1.0)
+        
+        remaining = _parse_rate_header(headers.get("X-RateLimit-Remaining"))
+        resets = _parse_rate_header(headers.get("X-RateLimit-Reset"))
+        for window, (left, reset) in enumerate(zip(remaining, resets)):
+            if left <= 0 and now + reset > self.blocked_until:
+                self.blocked_until = now + reset
+                self.block_reason = "rate limit" if window == 0 else "quota exhausted"
+        if response.status_code == 429:
+            self.stats["throttled_responses"] += 1
+            self.tokens = 0.0
+            if self.blocked_until <= now:
+                self.blocked_until = now + (resets[0] if resets else 1.0)
+                self.block_reason = "rate limit"
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Limits in force, queue depth and queue wait percentiles."""
+        rate, burst = self.limits()
+        waits = sorted(self.wait_ms)
+        
+        def percentile(fraction):
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))], 1) if waits else 0.0
+        
+        return {
+            "rate_per_second": rate,
+            "burst": burst,
+            "queue_depth": sum(1 for waiter in self.waiters if not waiter[2].done()),
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+            "block_reason": self.block_reason if self.blocked_until > time.monotonic() else None,
+            "wait_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": round(waits[-1], 1) if waits else 0.0},
+            **self.stats
+        }
+
+_rate_limiter = _TokenBucket()
+
+def get_rate_limiter_stats() -> Dict[str, Any]:
+    """Report the shared Brave rate limiter's limits, queue depth and wait times."""
+    return _rate_limiter.metrics()
+
+async def _rate_limited_get(url: str, params: Dict[str, Any], headers: Dict[str, str],
+                            priority: int, max_wait: Optional[float]):
+    """GET a Brave API URL through the shared rate limiter, retrying once after a 429."""
+    client = await get_http_client()
+    for attempt in range(2):
+        await _rate_limiter.acquire(priority, max_wait)
+        response = await client.get(url, params=params, headers=headers)
+        _rate_limiter.observe(response)
+        if response.status_code != 429:
+            break
+    return response
+
+def _rate_limit_error(error: _QueueWaitExceeded) -> Dict[str, Any]:
+    """Format a fail-fast rate limit rejection as a tool error."""
+    return {"error": str(error), "retry_after_seconds": round(error.wait_seconds, 1), "status": "error"}
+
+# Web search response cache. Successful results are kept for BRAVE_CACHE_TTL seconds
+# (0 disables caching) in a size-bounded in-memory LRU, and also on disk under
+# BRAVE_CACHE_DIR when it is set, so they survive restarts. Concurrent identical
+# searches share one upstream call.
+BRAVE_CACHE_FILE = "brave_search_cache.sqlite3"
+BRAVE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+"""
+_response_cache = OrderedDict()
+_disk_cache_ready = set()
+_inflight_searches = {}
+_cache_stats = {"memory_hits": 0, "disk_hits": 0, "coalesced": 0, "misses": 0}
+
+def _get_cache_settings() -> Dict[str, Any]:
+    """Read cache settings from the environment."""
+    return {
+        "ttl_seconds": float(os.getenv("BRAVE_CACHE_TTL", "300")),
+        "max_entries": int(os.getenv("BRAVE_CACHE_MAX_ENTRIES", "256")),
+        "disk_dir": os.getenv("BRAVE_CACHE_DIR"),
+        "disk_max_entries": int(os.getenv("BRAVE_CACHE_DISK_MAX_ENTRIES", "10000"))
+    }
+
+def _cache_key(query: str, count: int, offset: int) -> str:
+    """Key a search by its normalized parameters (unicode form, case and whitespace of the query)."""
+    normalized = " ".join(unicodedata.normalize("NFC", query).casefold().split())
+    return hashlib.sha256(json.dumps([normalized, count, offset]).encode("utf-8")).hexdigest()
+
+def _open_disk_cache(disk_dir: str) -> sqlite3.Connection:
+    """Open the on-disk cache tier; the directory and schema are created once per process."""
+    path = Path(disk_dir).expanduser() / BRAVE_CACHE_FILE
+    if str(path) in _disk_cache_ready:
+        return sqlite3.connect(str(path), timeout=30)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.executescript(BRAVE_CACHE_SCHEMA)
+    _disk_cache_ready.add(str(path))
+    return conn
+
+def _disk_cache_get(disk_dir: str, key: str) -> Optional[Dict[str, Any]]:
+    """Look up an unexpired response on disk (runs in a thread)."""
+    conn = _open_disk_cache(disk_dir)
+    try:
+        now = time.time()
+        row = conn.execute(
+            "SELECT response, expires_at FROM responses WHERE cache_key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE cache_key = ?", (now, key))
+        conn.commit()
+        return {"response": json.loads(row[0]), "expires_at": row[1]}
+    finally:
+        conn.close()
+
+def _disk_cache_put(disk_dir: str, key: str, response: Dict[str, Any], expires_at: float, max_entries: int):
+    """Store a response on disk, dropping expired and least recently used entries (runs in a thread)."""
+    conn = _open_disk_cache(disk_dir)
+    try:
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (cache_key, response, expires_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(response), expires_at, now)
+        )
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM responses WHERE cache_key IN "
+            "(SELECT cache_key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (max_entries,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def _memory_cache_put(key: str, response: Dict[str, Any], expires_at: float, max_entries: int):
+    """Store a response in the in-memory LRU, evicting the least recently used entries."""
+    _response_cache[key] = (expires_at, response)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > max_entries:
+        _response_cache.popitem(last=False)
+
+def _memory_cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """Find a fresh response in the in-memory LRU."""
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.time():
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return entry[1]
+
+async def _disk_cache_lookup(key: str, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Find a fresh response on disk and promote it to memory."""
+    try:
+        stored = await asyncio.to_thread(_disk_cache_get, settings["disk_dir"], key)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"WARNING: Brave search disk cache unavailable: {str(e)}", file=sys.stderr)
+        return None
+    if stored is None:
+        return None
+    _memory_cache_put(key, stored["response"], stored["expires_at"], settings["max_entries"])
+    return stored["response"]
+
+async def _cache_store(key: str, response: Dict[str, Any], settings: Dict[str, Any]):
+    """Keep a successful response in memory and, when configured, on disk."""
+    expires_at = time.time() + settings["ttl_seconds"]
+    _memory_cache_put(key, response, expires_at, settings["max_entries"])
+    if settings["disk_dir"]:
+        try:
+            await asyncio.to_thread(_disk_cache_put, settings["disk_dir"], key, response, expires_at,
+                                    settings["disk_max_entries"])
+        except (sqlite3.Error, OSError) as e:
+            print(f"WARNING: Brave search disk cache unavailable: {str(e)}", file=sys.stderr)
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Report web search cache hits, coalesced calls and misses."""
+    return {"entries": len(_response_cache), "in_flight": len(_inflight_searches), **_cache_stats}
+
+def clear_cache():
+    """Drop the in-memory cache and counters (the disk tier expires on its own)."""
+    _response_cache.clear()
+    for counter in _cache_stats:
+        _cache_stats[counter] = 0
+
+# Compact results. Raw Brave results carry profiles, thumbnails, deep links and more,
+# which bloat the tool response; by default only these fields are returned.
+COMPACT_FIELDS = ["title", "url", "snippet", "age"]
+
+def _truncate(text: str, length: Optional[int]) -> str:
+    """Shorten text to at most length characters, breaking at a word where possible."""
+    if not length or len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if not text[length - 1].isspace() and " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "…"
+
+def _project_result(result: Dict[str, Any], fields: List[str], snippet_length: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Keep only the requested fields of a Brave result. "snippet" is the result's
+    description and "age" falls back to its page age; other names are raw result keys.
+    """
+    projected = {}
+    for field in fields:
+        if field == "snippet":
+            projected["snippet"] = _truncate(result.get("description", ""), snippet_length)
+        elif field == "age":
+            projected["age"] = result.get("age") or result.get("page_age")
+        else:
+            projected[field] = result.get(field)
+    return projected
+
+def _compact_response(response: Dict[str, Any], fields: List[str], snippet_length: Optional[int]) -> Dict[str, Any]:
+    """Project a formatted web search response's results and drop the raw mixed and search_info blocks."""
+    compact = {key: value for key, value in response.items() if key not in ("results", "mixed", "search_info")}
+    compact["results"] = [_project_result(result, fields, snippet_length) for result in response.get("results", [])]
+    return compact
+
 async def brave_web_search(
     query: str, 
     count: Optional[int] = 10, 
-    offset: Optional[int] = 0
+    offset: Optional[int] = 0,
+    fields: Optional[List[str]] = None,
+    snippet_length: Optional[int] = None,
+    raw: bool = False
 ) -> Dict[str, Any]:
     """
     Execute web searches using Brave Search API with pagination and filtering.
@@ -27,11 +426,17 @@ async def brave_web_search(
         query: Search terms (required)
         count: Results per page (optional, max 20)
         offset: Pagination offset (optional, max 9)
+        fields: Result fields to return (optional, default title, url, snippet and age;
+                other names are taken from the raw Brave result, e.g. "language")
+        snippet_length: Truncate snippets to this many characters (optional)
+        raw: Return the full Brave results and the mixed ranking block instead (default False)
         
     Returns:
-        Dictionary containing search results, metadata, and status
+        Dictionary containing search results, metadata, and status. "cache" tells
+        whether the results came from the API (miss), the cache (memory or disk) or
+        an identical search already in flight (coalesced).
     """
-    print(f"INFO: brave_web_search called with query: {query}, count: {count}, offset: {offset}")
+    print(f"INFO: brave_web_search called with query: {query}, count: {count}, offset: {offset}", file=sys.stderr)
     
     if not BRAVE_API_KEY:
         return {"error": "BRAVE_API_KEY is not configured.", "status": "error"}
@@ -43,11 +448,74 @@ async def brave_web_search(
     if offset is not None and (offset < 0 or offset > 9):
         return {"error": "Offset must be between 0 and 9", "status": "error"}
     
+    if snippet_length is not None and snippet_length < 1:
+        return {"error": "Snippet length must be at least 1", "status": "error"}
+    
+    if fields is not None and not fields:
+        return {"error": "Fields must name at least one result field", "status": "error"}
+    
+    count = count if count is not None else 10
+    offset = offset if offset is not None else 0
+    result = await _web_search(query, count, offset, PRIORITY_NORMAL)
+    if raw or result.get("status") != "success":
+        return result
+    return _compact_response(result, fields or COMPACT_FIELDS, snippet_length)
+
+async def _web_search(query: str, count: int, offset: int, priority: int,
+                      max_wait: Optional[float] = None) -> Dict[str, Any]:
+    """Serve a validated web search from the cache, an identical search in flight, or the API."""
+    settings = _get_cache_settings()
+    if settings["ttl_seconds"] <= 0:
+        return await _fetch_web_search(query, count, offset, priority, max_wait)
+    
+    key = _cache_key(query, count, offset)
+    cached = _memory_cache_get(key)
+    if cached is not None:
+        _cache_stats["memory_hits"] += 1
+        return {**copy.deepcopy(cached), "query": query, "cache": "memory"}
+    
+    # Identical searches already in progress share that lookup and upstream call
+    inflight = _inflight_searches.get(key)
+    if inflight is not None:
+        _cache_stats["coalesced"] += 1
+        try:
+            result, _ = await asyncio.shield(inflight)
+            return {**copy.deepcopy(result), "query": query, "cache": "coalesced"}
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise
+            # The call we joined was cancelled; make our own
+            return await _fetch_web_search(query, count, offset, priority, max_wait)
+    
+    inflight = asyncio.get_running_loop().create_future()
+    _inflight_searches[key] = inflight
+    try:
+        result = await _disk_cache_lookup(key, settings) if settings["disk_dir"] else None
+        if result is not None:
+            _cache_stats["disk_hits"] += 1
+            tier = "disk"
+        else:
+            _cache_stats["misses"] += 1
+            result = await _fetch_web_search(query, count, offset, priority, max_wait)
+            tier = "miss"
+            if result.get("status") == "success":
+                await _cache_store(key, copy.deepcopy(result), settings)
+        inflight.set_result((result, tier))
+    except BaseException:
+        inflight.cancel()
+        raise
+    finally:
+        del _inflight_searches[key]
+    return {**copy.deepcopy(result), "query": query, "cache": tier}
+
+async def _fetch_web_search(query: str, count: int, offset: int, priority: int = PRIORITY_NORMAL,
+                            max_wait: Optional[float] = None) -> Dict[str, Any]:
+    """Call the Brave web search API through the rate limiter and format its response."""
     # Prepare request parameters
     params = {
         "q": query,
-        "count": count if count is not None else 10,
-        "offset": offset if offset is not None else 0
+        "count": count,
+        "offset": offset
     }
     
     headers = {
@@ -57,58 +525,147 @@ async def brave_web_search(
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                BRAVE_SEARCH_URL,
-                params=params,
-                headers=headers
-            )
-            
-            if response.status_code != 200:
-                return {
-                    "error": f"Brave Search API returned status code {response.status_code}",
-                    "details": response.text,
-                    "status": "error"
-                }
-            
-            search_results = response.json()
-            
-            # Debug the raw response structure
-            print(f"DEBUG: API response keys: {list(search_results.keys())}")
-            
-            # Extract results from the appropriate sections
-            web_results = search_results.get("web", {}).get("results", [])
-            news_results = search_results.get("news", {}).get("results", [])
-            videos_results = search_results.get("videos", {}).get("results", [])
-            
-            # Combine all results
-            all_results = web_results + news_results + videos_results
-            
-            # Format response structure
-            formatted_results = {
-                "query": query,
-                "results": all_results,
-                "total_count": search_results.get("web", {}).get("totalCount", 0),
-                "news_count": len(news_results),
-                "videos_count": len(videos_results),
-                "web_count": len(web_results),
-                "mixed": search_results.get("mixed", {}),
-                # Include the full response for debugging
-                "search_info": {
-                    "available_sections": list(search_results.keys())
-                },
-                "status": "success"
+        response = await _rate_limited_get(BRAVE_SEARCH_URL, params, headers, priority, max_wait)
+        
+        if response.status_code != 200:
+            return {
+                "error": f"Brave Search API returned status code {response.status_code}",
+                "details": response.text,
+                "status": "error"
             }
-            
-            return formatted_results
-            
+        
+        search_results = response.json()
+        
+        # Debug the raw response structure
+        print(f"DEBUG: API response keys: {list(search_results.keys())}", file=sys.stderr)
+        
+        # Extract results from the appropriate sections
+        web_results = search_results.get("web", {}).get("results", [])
+        news_results = search_results.get("news", {}).get("results", [])
+        videos_results = search_results.get("videos", {}).get("results", [])
+        
+        # Combine all results
+        all_results = web_results + news_results + videos_results
+        
+        # Format response structure
+        formatted_results = {
+            "query": query,
+            "results": all_results,
+            "total_count": search_results.get("web", {}).get("totalCount", 0),
+            "news_count": len(news_results),
+            "videos_count": len(videos_results),
+            "web_count": len(web_results),
+            "mixed": search_results.get("mixed", {}),
+            # Include the full response for debugging
+            "search_info": {
+                "available_sections": list(search_results.keys())
+            },
+            "status": "success"
+        }
+        
+        return formatted_results
+        
+    except _QueueWaitExceeded as e:
+        print(f"WARNING: brave_web_search rejected: {str(e)}", file=sys.stderr)
+        return _rate_limit_error(e)
     except Exception as e:
-        print(f"ERROR: brave_web_search failed: {str(e)}")
+        print(f"ERROR: brave_web_search failed: {str(e)}", file=sys.stderr)
         return {
             "error": f"Tool execution failed: {str(e)}",
             "status": "error"
         }
 
+BATCH_MAX_QUERIES = 20
+
+def _normalize_url(url: str) -> str:
+    """Reduce a result URL to the form used to spot duplicates across result sets."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+async def brave_batch_search(
+    queries: List[str],
+    count: Optional[int] = 10,
+    snippet_length: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Run several related web searches at once and merge their results.
+    
+    The searches run concurrently, sharing the web search cache and rate limit, so a
+    batch costs about one round trip instead of one per query. Pages found by more
+    than one query are listed once.
+    
+    Args:
+        queries: Search terms, one per search (max 20)
+        count: Results per query (optional, max 20)
+        snippet_length: Truncate snippets to this many characters (optional)
+        
+    Returns:
+        Dictionary with a summary per query, the merged results (title, url, snippet,
+        age and the queries that found each one) ordered by their best rank, and status
+    """
+    print(f"INFO: brave_batch_search called with {len(queries) if queries else 0} queries, count: {count}", file=sys.stderr)
+    
+    if not BRAVE_API_KEY:
+        return {"error": "BRAVE_API_KEY is not configured.", "status": "error"}
+    
+    # Validate inputs
+    queries = [query.strip() for query in (queries or []) if query and query.strip()]
+    if not queries:
+        return {"error": "At least one query is required", "status": "error"}
+    
+    if len(queries) > BATCH_MAX_QUERIES:
+        return {"error": f"At most {BATCH_MAX_QUERIES} queries can be searched at once", "status": "error"}
+    
+    if count is not None and (count < 1 or count > 20):
+        return {"error": "Count must be between 1 and 20", "status": "error"}
+    
+    if snippet_length is not None and snippet_length < 1:
+        return {"error": "Snippet length must be at least 1", "status": "error"}
+    
+    count = count if count is not None else 10
+    # Batch searches queue behind interactive ones when the rate limit is reached
+    responses = await asyncio.gather(*[_web_search(query, count, 0, PRIORITY_LOW) for query in queries])
+    
+    summaries = []
+    merged = {}
+    duplicates = 0
+    for query_index, (query, response) in enumerate(zip(queries, responses)):
+        if response.get("status") != "success":
+            summaries.append({"query": query, "error": response.get("error"), "status": "error"})
+            continue
+        
+        results = response.get("results", [])
+        summaries.append({"query": query, "result_count": len(results), "cache": response.get("cache"), "status": "success"})
+        for rank, result in enumerate(results):
+            if not result.get("url"):
+                continue
+            key = _normalize_url(result["url"])
+            entry = merged.get(key)
+            if entry is not None:
+                duplicates += 1
+            else:
+                merged[key] = entry = {**_project_result(result, COMPACT_FIELDS, snippet_length), "queries": [], "order": (rank, query_index)}
+            if query not in entry["queries"]:
+                entry["queries"].append(query)
+            entry["order"] = min(entry["order"], (rank, query_index))
+    
+    # Each page is ranked by the best position any query found it at
+    results = sorted(merged.values(), key=lambda entry: entry["order"])
+    for entry in results:
+        del entry["order"]
+    
+    if not any(summary["status"] == "success" for summary in summaries):
+        return {"error": "All searches failed", "queries": summaries, "status": "error"}
+    
+    return {
+        "queries": summaries,
+        "results": results,
+        "unique_count": len(results),
+        "duplicate_count": duplicates,
+        "status": "success"
+    }
+
 async def brave_local_search(
     query: str,
     count: Optional[int] = 10
@@ -124,7 +681,7 @@ async def brave_local_search(
     Returns:
         Dictionary containing local search results, metadata, and status
     """
-    print(f"INFO: brave_local_search called with query: {query}, count: {count}")
+    print(f"INFO: brave_local_search called with query: {query}, count: {count}", file=sys.stderr)
     
     if not BRAVE_API_KEY:
         return {"error": "BRAVE_API_KEY is not configured.", "status": "error"}
@@ -146,45 +703,43 @@ async def brave_local_search(
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                BRAVE_LOCAL_SEARCH_URL,
-                params=params,
-                headers=headers
-            )
-            
-            if response.status_code != 200:
-                return {
-                    "error": f"Brave Local Search API returned status code {response.status_code}",
-                    "details": response.text,
-                    "status": "error"
-                }
-            
-            search_results = response.json()
-            
-            # Debug the raw response structure
-            print(f"DEBUG: Local API response keys: {list(search_results.keys())}")
-            
-            # Check if we have local results
-            local_places = search_results.get("local", {}).get("places", [])
-            
-            if not local_places:
-                print(f"INFO: No local results found, falling back to web search")
-                # Fallback to web search
-                return await brave_web_search(query, count)
-            
-            # Format response structure
-            formatted_results = {
-                "query": query,
-                "places": local_places,
-                "total_count": len(local_places),
-                "status": "success"
+        response = await _rate_limited_get(BRAVE_LOCAL_SEARCH_URL, params, headers, PRIORITY_NORMAL, None)
+        
+        if response.status_code != 200:
+            return {
+                "error": f"Brave Local Search API returned status code {response.status_code}",
+                "details": response.text,
+                "status": "error"
             }
-            
-            return formatted_results
-            
+        
+        search_results = response.json()
+        
+        # Debug the raw response structure
+        print(f"DEBUG: Local API response keys: {list(search_results.keys())}", file=sys.stderr)
+        
+        # Check if we have local results
+        local_places = search_results.get("local", {}).get("places", [])
+        
+        if not local_places:
+            print(f"INFO: No local results found, falling back to web search", file=sys.stderr)
+            # Fallback to web search
+            return await brave_web_search(query, count)
+        
+        # Format response structure
+        formatted_results = {
+            "query": query,
+            "places": local_places,
+            "total_count": len(local_places),
+            "status": "success"
+        }
+        
+        return formatted_results
+        
+    except _QueueWaitExceeded as e:
+        print(f"WARNING: brave_local_search rejected: {str(e)}", file=sys.stderr)
+        return _rate_limit_error(e)
     except Exception as e:
-        print(f"ERROR: brave_local_search failed: {str(e)}")
+        print(f"ERROR: brave_local_search failed: {str(e)}", file=sys.stderr)
         return {
             "error": f"Tool execution failed: {str(e)}",
             "status": "error"
@@ -193,4 +748,5 @@ async def brave_local_search(
 def register(mcp_instance):
     """Register the Brave Search tools with the MCP server"""
     mcp_instance.tool()(brave_web_search)
+    mcp_instance.tool()(brave_batch_search)
     mcp_instance.tool()(brave_local_search)
\ No newline at end of file
@@ -0,0 +1,92 @@
+# tools/http_client.py
+"""
+Process-wide pooled HTTP client shared by the network tools.
+
+Tools borrow one long-lived httpx.AsyncClient instead of opening a new one per
+call, so connections to each host are pooled and kept alive between calls and
+only the first request to a host pays for the TCP and TLS handshake. HTTP/2 is
+negotiated when the h2 package is installed (pip install httpx[http2]).
+
+The launchers pass lifespan() to FastMCP so the clients are closed when the
+server shuts down. FastMCP enters the lifespan once per session under the http
+and sse transports, so the clients are only closed when the last open session
+ends, never while another session may still be using them.
+
+Pool limits can be tuned with environment variables:
+    HTTP_MAX_CONNECTIONS     open connections across all hosts (default 100)
+    HTTP_MAX_KEEPALIVE       idle connections kept for reuse (default 20)
+    HTTP_KEEPALIVE_EXPIRY    seconds an idle connection is kept (default 30)
+    HTTP_HTTP2               "auto" (default: on when h2 is installed), "1" or "0"
+"""
+from typing import Dict, Any
+import os
+import asyncio
+import contextlib
+import importlib.util
+import httpx
+
+H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Open clients by name, with the event loop each one was opened on
+_clients: Dict[str, tuple] = {}
+
+# Sessions currently inside lifespan()
+_active_sessions = 0
+
+def _client_settings() -> Dict[str, Any]:
+    """Build httpx.AsyncClient arguments from the environment."""
+    http2 = os.getenv("HTTP_HTTP2", "auto").lower()
+    return {
+        "http2": H2_AVAILABLE if http2 == "auto" else http2 in ("1", "true", "yes"),
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        )
+    }
+
+async def get_http_client(name: str = "default") -> httpx.AsyncClient:
+    """
+    Get the shared client, opening it on first use.
+
+    Clients are bound to the event loop they were opened on; a client from a loop
+    that has gone away is replaced. Do not close the returned client.
+
+    Args:
+        name: Pool name, for tools that need a separately configured client
+
+    Returns:
+        An open httpx.AsyncClient
+    """
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(name)
+    if entry is not None:
+        client, client_loop = entry
+        if client_loop is loop and not client.is_closed:
+            return client
+
+    # Enter the client as "async with" would, then keep it open until close_http_clients()
+    client = await httpx.AsyncClient(**_client_settings()).__aenter__()
+    _clients[name] = (client, loop)
+    return client
+
+async def close_http_clients():
+    """Close the clients opened on the running event loop and forget the rest."""
+    loop = asyncio.get_running_loop()
+    entries = list(_clients.values())
+    _clients.clear()
+    for client, client_loop in entries:
+        if client_loop is loop:
+            await client.__aexit__(None, None, None)
+
+@contextlib.asynccontextmanager
+async def lifespan(server=None):
+    """FastMCP lifespan that closes the shared clients when the last session ends."""
+    global _active_sessions
+    _active_sessions += 1
+    try:
+        yield {}
+    finally:
+        _active_sessions -= 1
+        if _active_sessions == 0:
+            await close_http_clients()
@@ -11,14 +11,33 @@ All print statements removed for MCP protocol compliance.
 Fixed: Silences all stdout/stderr output during model operations.
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Union
 import os
 import sys
+import re
 import json
+import time
+import uuid
+import asyncio
+import bisect
+import hashlib
+import secrets
+import sqlite3
+import subprocess
+import threading
+import multiprocessing
+import unicodedata
 import importlib.util
 import contextlib
 import io
+import copy
+import gzip
+import shutil
 import logging
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing.connection import Listener, Client
 from datetime import datetime
 from pathlib import Path
 
@@ -33,30 +52,282 @@ logging.getLogger("huggingface_hub").setLevel(logging.ERROR)
 CHROMADB_AVAILABLE = importlib.util.find_spec("chromadb") is not None
 SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
 LANGCHAIN_AVAILABLE = importlib.util.find_spec("langchain_text_splitters") is not None
+ONNX_RUNTIME_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("onnxruntime", "tokenizers"))
+MODEL2VEC_AVAILABLE = importlib.util.find_spec("model2vec") is not None
 
 # Global variables for RAG components
 _chroma_client = None
 _embedding_model = None
 _text_splitter = None
 _config = None
+_embedding_model_lock = threading.Lock()
+_cross_encoder = None
+_cross_encoder_lock = threading.Lock()
+
+# Startup warm-up (see warm_up()) and the optional shared embedding server that lets
+# several server processes use one loaded model over a local socket
+EMBEDDING_SERVER_KEY_FILE = "embedding_server.key"
+EMBEDDING_SERVER_SCRIPT = Path(__file__).parent.parent / "run_embedding_server.py"
+_warmup_state = {"status": "not_started", "started_at": None, "duration_ms": None, "error": None}
+_shared_client_local = threading.local()
+_shared_server_state = {"process": None, "start_failed": False}
+_shared_server_lock = threading.Lock()
+_shared_server_stats = {"remote_batches": 0, "remote_texts": 0, "local_fallbacks": 0, "auto_starts": 0}
+
+# Worker pools that keep embedding and Chroma calls off the event loop.
+# Searches and ingestion get separate lanes so a large ingest cannot starve queries.
+WORKER_LANES = ("search", "ingest", "chunk")
+_worker_pools: Dict[str, Any] = {}
+_worker_stats: Dict[str, Dict[str, Any]] = {}
+_worker_lock = threading.Lock()
+
+# Micro-batching of concurrent search query embeddings (bound to one event loop)
+_query_batch_state: Dict[str, Any] = {"loop": None, "pending": [], "flush_handle": None, "tasks": set()}
+_query_batch_stats = {"batches": 0, "queries": 0, "unique_queries": 0, "max_batch_size": 0}
+
+# In-memory search caches: query embeddings (LRU) and per-collection results (LRU + TTL).
+# Result entries are dropped when their collection is written; the generation counter
+# keeps a search that overlapped a write from caching pre-write results.
+_query_embedding_cache = OrderedDict()
+_search_result_cache = OrderedDict()
+_collection_generations = {}
+_search_cache_stats = {
+    "embedding_hits": 0, "embedding_misses": 0,
+    "result_hits": 0, "result_misses": 0, "result_expired": 0, "invalidations": 0
+}
+
+# SQLite sidecar stores kept next to chroma_db (schemas created once per file)
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite3"
+SUMMARY_FILE = "kb_summary.sqlite3"
+LEXICAL_INDEX_FILE = "lexical_index.sqlite3"
+VECTOR_STORE_FILE = "rescore_vectors.sqlite3"
+JOBS_FILE = "kb_jobs.sqlite3"
+FINGERPRINT_FILE = "chunk_fingerprints.sqlite3"
+_sidecar_schemas_ready = set()
+_embedding_cache_stats = {"hits": 0, "misses": 0}
+
+EMBEDDING_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model_name TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model_name, chunk_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+"""
+
+# Per-source totals so list_kb_sources/get_kb_stats do not scan every chunk.
+# A collection's rows are authoritative only once it appears in tracked_collections.
+SUMMARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_summary (
+    collection TEXT NOT NULL,
+    source TEXT NOT NULL,
+    source_type TEXT,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    total_characters INTEGER NOT NULL DEFAULT 0,
+    total_tokens INTEGER NOT NULL DEFAULT 0,
+    first_added TEXT,
+    last_updated TEXT,
+    PRIMARY KEY (collection, source)
+);
+CREATE TABLE IF NOT EXISTS tracked_collections (
+    collection TEXT PRIMARY KEY,
+    rebuilt_at TEXT
+);
+"""
+
+# BM25 keyword index for hybrid search: one FTS5 table per collection, listed in
+# lexical_collections once it mirrors the collection's documents
+LEXICAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lexical_collections (
+    collection TEXT PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    built_at TEXT
+);
+"""
+LEXICAL_TOKENIZER = "unicode61 remove_diacritics 2 tokenchars '-_'"
+# Background builds of missing keyword indexes, by collection name
+_lexical_builds = {}
+SEARCH_MODES = ("vector", "hybrid", "keyword")
+# Metadata filters passed through to Chroma's where clause. Ingestion time is stored as
+# numeric ingested_at (epoch seconds) because Chroma range operators only accept numbers.
+WHERE_OPERATORS = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin")
+RELATIVE_TIME_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+# Score that orders merged results when several collections are searched
+MERGE_SCORE_FIELDS = {"vector": "similarity_score", "hybrid": "fusion_score", "keyword": "bm25_score"}
+# Optional post-retrieval stage over a larger candidate pool (search.rerank in kb_config.json)
+RERANK_MODES = ("none", "mmr", "cross_encoder", "cross_encoder+mmr")
+
+# Reduced-size vector storage: a collection's layout (index dimension and rescore
+# precision) is fixed when it is created; full-dimension vectors used to rescore
+# the top-k live here rather than in Chroma
+VECTOR_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vector_layouts (
+    collection TEXT PRIMARY KEY,
+    index_dimension INTEGER,
+    rescore_precision TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS rescore_vectors (
+    collection TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    scale REAL NOT NULL,
+    PRIMARY KEY (collection, chunk_id)
+);
+"""
+RESCORE_PRECISIONS = ("none", "int8", "float32")
+
+# Near-duplicate detection: a MinHash signature per stored chunk, indexed by LSH bands
+# (MINHASH_BANDS bands of MINHASH_PERMUTATIONS / MINHASH_BANDS values). Chunks sharing a
+# band are candidates, confirmed by their estimated Jaccard similarity. A collection's
+# fingerprints are complete once it is listed in fingerprint_collections.
+FINGERPRINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprint_collections (
+    collection TEXT PRIMARY KEY,
+    built_at TEXT
+);
+CREATE TABLE IF NOT EXISTS chunk_fingerprints (
+    collection TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    source TEXT,
+    signature BLOB NOT NULL,
+    PRIMARY KEY (collection, chunk_id)
+);
+CREATE TABLE IF NOT EXISTS fingerprint_bands (
+    collection TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    band_key INTEGER NOT NULL,
+    chunk_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_bands_key ON fingerprint_bands (collection, band, band_key);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_bands_chunk ON fingerprint_bands (collection, chunk_id);
+"""
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+
+# Background ingestion jobs: items are stored with the job so unfinished jobs
+# resume after a restart (already-stored chunks are skipped by their IDs)
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    reingest INTEGER NOT NULL DEFAULT 0,
+    total_items INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    item_index INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    content TEXT,
+    metadata TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    chunks_added INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (job_id, item_index)
+);
+"""
+_job_state = {"loop": None, "queue": None, "workers": set()}
+
+# Collection snapshots: a directory per export holding embeddings as one contiguous
+# little-endian float32 array (row i belongs to line i of the records file), chunk IDs,
+# documents and metadata as gzipped JSON lines, optional rescore vectors, and a
+# manifest written last so a half-written snapshot is never imported
+SNAPSHOT_FORMAT = "kb-collection-snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_FILES = {
+    "manifest": "manifest.json",
+    "embeddings": "embeddings.f32",
+    "records": "records.jsonl.gz",
+    "rescore_vectors": "rescore_vectors.bin",
+    "rescore_scales": "rescore_scales.f32"
+}
+
+# Threads currently inside suppress_stdout_stderr() (per-thread nesting depth)
+_suppress_lock = threading.Lock()
+_suppressed_threads = threading.local()
+
+# Embedding backends selected by embedding.model_type, with the packages each needs
+EMBEDDING_BACKENDS = {
+    "sentence-transformers": "sentence-transformers",
+    "onnx": "onnxruntime tokenizers",
+    "static": "model2vec"
+}
+
+# Chunking strategies. Each boundary match ends a piece (the separator stays with the
+# text before it); pieces longer than chunk_size are re-split at the next level down.
+CHUNKING_STRATEGIES = ("fixed_size", "token", "markdown", "sentence")
+CHUNK_BOUNDARIES = {
+    "paragraph": re.compile(r"\n[ \t]*\n\s*"),
+    "line": re.compile(r"\n\s*"),
+    "sentence": re.compile(r"[.!?\n][\"')\]]*\s+"),
+    "word": re.compile(r"\s+")
+}
+STRATEGY_BOUNDARY_LEVELS = {
+    "token": ("paragraph", "line", "sentence", "word"),
+    "markdown": ("paragraph", "line", "sentence", "word"),
+    "sentence": ("sentence", "word")
+}
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+MARKDOWN_FENCE = re.compile(r"^[ \t]*(?:```|~~~)", re.MULTILINE)
+TOKENIZER_BLOCK_CHARS = 65536
 
 # Configuration file path (in MCP server root)
 CONFIG_FILE = "kb_config.json"
 KNOWLEDGE_BASE_DIR = Path("C:/Users/usuario/agent_playground/knowledge_base")
 
+class _ThreadSilencedStream:
+    """
+    Stand-in for sys.stdout/sys.stderr that drops text written by threads inside
+    suppress_stdout_stderr() and passes everything else to the real stream.
+    Other attributes (buffer, fileno, ...) are the real stream's, so a transport
+    that grabs sys.stdout.buffer always gets the real one.
+    """
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text):
+        if getattr(_suppressed_threads, "depth", 0):
+            return len(text)
+        return self._stream.write(text)
+    
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+    
+    def flush(self):
+        if not getattr(_suppressed_threads, "depth", 0):
+            self._stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
 @contextlib.contextmanager
 def suppress_stdout_stderr():
-    """Context manager to completely suppress stdout and stderr output."""
-    with open(os.devnull, "w") as devnull:
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        try:
-            sys.stdout = devnull
-            sys.stderr = devnull
-            yield
-        finally:
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
+    """
+    Context manager to suppress stdout and stderr output from the calling thread.
+    Safe to nest and to enter from several threads at once. The process-wide streams
+    are never pointed at devnull, so output from other threads (and the MCP stdio
+    transport) is untouched while a model loads in the background.
+    """
+    with _suppress_lock:
+        if sys.stdout is not None and not isinstance(sys.stdout, _ThreadSilencedStream):
+            sys.stdout = _ThreadSilencedStream(sys.stdout)
+        if sys.stderr is not None and not isinstance(sys.stderr, _ThreadSilencedStream):
+            sys.stderr = _ThreadSilencedStream(sys.stderr)
+    _suppressed_threads.depth = getattr(_suppressed_threads, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _suppressed_threads.depth -= 1
 
 def _get_config_path():
     """Get the path to the configuration file in the MCP server root directory."""
@@ -84,15 +355,77 @@ def _load_config() -> Dict[str, Any]:
                 "model_name": "BAAI/bge-m3",
                 "model_type": "sentence-transformers",
                 "embedding_dimension": 1024,
-                "normalize_embeddings": True
+                "normalize_embeddings": True,
+                "cache": {
+                    "enabled": True,
+                    "max_entries": 100000
+                },
+                "query_batching": {
+                    "enabled": True,
+                    "max_wait_ms": 5,
+                    "max_batch_size": 32
+                },
+                "query_cache": {
+                    "enabled": True,
+                    "max_entries": 1024
+                },
+                "storage": {
+                    "index_dimension": None,
+                    "rescore_precision": "none",
+                    "rescore_multiplier": 4
+                },
+                "warmup": {
+                    "enabled": False,
+                    "blocking": False
+                },
+                "onnx": {
+                    "model_file": "onnx/model.onnx",
+                    "pooling": "cls",
+                    "max_length": 8192,
+                    "batch_size": 32,
+                    "intra_op_threads": 0,
+                    "providers": ["CPUExecutionProvider"]
+                },
+                "shared_server": {
+                    "enabled": False,
+                    "host": "127.0.0.1",
+                    "port": 8765,
+                    "auto_start": True,
+                    "start_timeout_seconds": 120,
+                    "fallback_to_local": True
+                }
             },
             "chunking": {
+                "strategy": "fixed_size",
                 "chunk_size": 1000,
-                "chunk_overlap": 100
+                "chunk_overlap": 100,
+                "length_unit": "chars",
+                "tokenizer": None,
+                "include_heading_path": True
             },
             "storage": {
                 "database_path": "./knowledge_base/chroma_db",
                 "default_collection": "default"
+            },
+            "workers": {
+                "pool_type": "thread",
+                "search_workers": 2,
+                "ingest_workers": 2,
+                "chunk_workers": 2,
+                "chunk_pool_type": "thread",
+                "max_queue_depth": 32
+            },
+            "bulk_ingestion": {
+                "max_urls": 5000,
+                "crawl_batch_size": 10,
+                "max_concurrent_crawls": 3,
+                "queue_size": 16,
+                "embed_batch_size": 256
+            },
+            "jobs": {
+                "max_concurrent_jobs": 2,
+                "max_pending_jobs": 100,
+                "max_items_per_job": 10000
             }
         }
         
@@ -103,83 +436,2829 @@ def _load_config() -> Dict[str, Any]:
     
     return _config
 
+def _get_kb_dir() -> Path:
+    """Get the knowledge base directory that holds chroma_db and the sidecar stores."""
+    storage_config = _load_config().get("storage", {})
+    if storage_config.get("persist_directory"):
+        return Path(storage_config["persist_directory"])
+    return Path(storage_config.get("database_path", str(KNOWLEDGE_BASE_DIR / "chroma_db"))).parent
+
+@contextlib.contextmanager
+def _open_sidecar(filename: str, schema: str):
+    """Open a SQLite sidecar store in the knowledge base directory, committing on success."""
+    path = _get_kb_dir() / filename
+    if str(path) not in _sidecar_schemas_ready:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    
+    conn = sqlite3.connect(str(path), timeout=30)
+    try:
+        if str(path) not in _sidecar_schemas_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(schema)
+            _sidecar_schemas_ready.add(str(path))
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
 def _initialize_chroma():
     """Initialize Chroma database client."""
     global _chroma_client
     if _chroma_client is not None:
         return _chroma_client
     
-    if not CHROMADB_AVAILABLE:
-        raise ImportError("ChromaDB not available. Install with: pip install chromadb")
+    if not CHROMADB_AVAILABLE:
+        raise ImportError("ChromaDB not available. Install with: pip install chromadb")
+    
+    with suppress_stdout_stderr():
+        import chromadb
+        from chromadb.config import Settings
+        
+        config = _load_config()
+        db_path = config["storage"]["database_path"]
+        
+        # Ensure directory exists
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        
+        # Initialize persistent client
+        _chroma_client = chromadb.PersistentClient(
+            path=db_path,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+    
+    return _chroma_client
+
+def _get_embedding_backend() -> str:
+    """Get the configured embedding backend (embedding.model_type)."""
+    backend = _load_config().get("embedding", {}).get("model_type", "sentence-transformers")
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding model_type '{backend}'. Use one of: {', '.join(EMBEDDING_BACKENDS)}")
+    return backend
+
+def _embedding_backend_available(backend: str) -> bool:
+    """Check whether the packages an embedding backend needs are installed."""
+    return {
+        "sentence-transformers": SENTENCE_TRANSFORMERS_AVAILABLE,
+        "onnx": ONNX_RUNTIME_AVAILABLE,
+        "static": MODEL2VEC_AVAILABLE
+    }[backend]
+
+def _get_onnx_config() -> Dict[str, Any]:
+    """Get ONNX Runtime backend settings, filling in defaults missing from older config files."""
+    embedding_config = _load_config().get("embedding", {})
+    onnx_config = {
+        "model_file": "onnx/model.onnx",
+        "pooling": "cls",
+        "max_length": embedding_config.get("max_sequence_length", 512),
+        "batch_size": 32,
+        "intra_op_threads": 0,
+        "providers": ["CPUExecutionProvider"]
+    }
+    onnx_config.update(embedding_config.get("onnx", {}))
+    return onnx_config
+
+def _resolve_model_dir(model_name: str, allow_patterns: List[str]) -> Path:
+    """Use model_name as a local directory if it is one, otherwise fetch the files from the Hugging Face Hub."""
+    local_dir = Path(model_name).expanduser()
+    if local_dir.is_dir():
+        return local_dir
+    from huggingface_hub import snapshot_download
+    return Path(snapshot_download(repo_id=model_name, allow_patterns=allow_patterns))
+
+class _OnnxEmbeddingModel:
+    """
+    Transformer encoder exported to ONNX, run with ONNX Runtime and the tokenizers
+    library instead of PyTorch. Matches SentenceTransformer.encode for CLS or mean pooling.
+    """
+    
+    def __init__(self, model_dir: Path, onnx_config: Dict[str, Any]):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        
+        options = onnxruntime.SessionOptions()
+        if onnx_config["intra_op_threads"]:
+            options.intra_op_num_threads = int(onnx_config["intra_op_threads"])
+        self.session = onnxruntime.InferenceSession(
+            str(model_dir / onnx_config["model_file"]), options, providers=list(onnx_config["providers"])
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.pooling = onnx_config["pooling"]
+        self.batch_size = int(onnx_config["batch_size"])
+        
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(int(onnx_config["max_length"]))
+        pad_token = next((token for token in ("<pad>", "[PAD]") if self.tokenizer.token_to_id(token) is not None), "[PAD]")
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+    
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, **kwargs):
+        import numpy as np
+        
+        vectors = [None] * len(texts)
+        # Batch texts of similar length together so little of each batch is padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in batch])
+            input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": np.zeros_like(input_ids)}
+            output = self.session.run(None, {name: feeds[name] for name in self.input_names if name in feeds})[0]
+            
+            if output.ndim == 2:
+                pooled = output  # Exported with pooling included
+            elif self.pooling == "mean":
+                mask = attention_mask[..., None].astype(np.float32)
+                pooled = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            else:
+                pooled = output[:, 0]
+            for i, vector in zip(batch, pooled):
+                vectors[i] = vector
+        
+        vectors = np.array(vectors, dtype=np.float32)
+        if normalize_embeddings and len(texts):
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+class _StaticEmbeddingModel:
+    """Static (distilled) embeddings via model2vec: token vectors looked up and averaged, no encoder pass."""
+    
+    def __init__(self, model_name: str):
+        from model2vec import StaticModel
+        self.model = StaticModel.from_pretrained(model_name)
+    
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, **kwargs):
+        import numpy as np
+        
+        vectors = np.asarray(self.model.encode(texts), dtype=np.float32)
+        if normalize_embeddings and len(texts):
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+def _load_embedding_model(backend: str, model_name: str):
+    """Load model_name with the given embedding backend."""
+    if backend == "onnx":
+        onnx_config = _get_onnx_config()
+        model_file = onnx_config["model_file"]
+        model_dir = _resolve_model_dir(model_name, [model_file, f"{model_file}_data", "tokenizer.json"])
+        return _OnnxEmbeddingModel(model_dir, onnx_config)
+    if backend == "static":
+        return _StaticEmbeddingModel(model_name)
+    
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def _initialize_embedding_model():
+    """Initialize embedding model with complete output suppression."""
+    global _embedding_model
+    if _embedding_model is not None:
+        return _embedding_model
+    
+    backend = _get_embedding_backend()
+    if not _embedding_backend_available(backend):
+        raise ImportError(f"{backend} embedding backend not available. Install with: pip install {EMBEDDING_BACKENDS[backend]}")
+    
+    # A background warm-up and the first tool call may race to load the model
+    with _embedding_model_lock:
+        if _embedding_model is not None:
+            return _embedding_model
+        
+        with suppress_stdout_stderr():
+            config = _load_config()
+            model_name = config["embedding"]["model_name"]
+            
+            # Suppress transformers logging
+            os.environ["TRANSFORMERS_VERBOSITY"] = "error"
+            os.environ["TOKENIZERS_PARALLELISM"] = "false"
+            
+            # Model loading happens silently
+            _embedding_model = _load_embedding_model(backend, model_name)
+    
+    return _embedding_model
+
+def _get_chunking_config() -> Dict[str, Any]:
+    """Get chunking settings, filling in defaults missing from older config files."""
+    chunking_config = {
+        "strategy": "fixed_size",
+        "chunk_size": 1000,
+        "chunk_overlap": 100,
+        "length_unit": "chars",
+        "tokenizer": None,
+        "include_heading_path": True,
+        "separators": ["\n\n", "\n", ". ", " ", ""]
+    }
+    chunking_config.update(_load_config().get("chunking", {}))
+    return chunking_config
+
+def _chunker_available() -> bool:
+    """Check the configured chunking strategy can run; only fixed_size needs langchain."""
+    return LANGCHAIN_AVAILABLE or _get_chunking_config()["strategy"] != "fixed_size"
+
+def _segment_span(text: str, start: int, end: int, boundary) -> List[tuple]:
+    """Cut text[start:end] after each boundary match; the pieces tile the span exactly."""
+    cuts = [match.end() for match in boundary.finditer(text, start, end)]
+    if not cuts or cuts[-1] != end:
+        cuts.append(end)
+    return list(zip([start] + cuts[:-1], cuts))
+
+def _measure_spans(spans: List[tuple], token_starts: Optional[List[int]]) -> List[int]:
+    """Length of each span in characters, or in tokens given the document's token start offsets."""
+    if token_starts is None:
+        return [end - start for start, end in spans]
+    return [bisect.bisect_left(token_starts, end) - bisect.bisect_left(token_starts, start) for start, end in spans]
+
+def _fit_spans(text: str, spans: List[tuple], levels: tuple, size: int, token_starts: Optional[List[int]]):
+    """
+    Break spans longer than size at the coarsest boundary level that makes them fit,
+    falling back to hard cuts. Returns (spans, lengths).
+    """
+    lengths = _measure_spans(spans, token_starts)
+    if all(length <= size for length in lengths):
+        return spans, lengths
+    
+    fitted_spans, fitted_lengths = [], []
+    for (start, end), length in zip(spans, lengths):
+        if length <= size:
+            fitted_spans.append((start, end))
+            fitted_lengths.append(length)
+        elif levels:
+            pieces = _segment_span(text, start, end, CHUNK_BOUNDARIES[levels[0]])
+            sub_spans, sub_lengths = _fit_spans(text, pieces, levels[1:], size, token_starts)
+            fitted_spans.extend(sub_spans)
+            fitted_lengths.extend(sub_lengths)
+        else:
+            if token_starts is None:
+                cuts = list(range(start + size, end, size))
+            else:
+                first = bisect.bisect_left(token_starts, start)
+                cuts = token_starts[first + size:bisect.bisect_left(token_starts, end):size]
+            pieces = list(zip([start] + cuts, cuts + [end]))
+            fitted_spans.extend(pieces)
+            fitted_lengths.extend(_measure_spans(pieces, token_starts))
+    return fitted_spans, fitted_lengths
+
+def _pack_spans(spans: List[tuple], lengths: List[int], size: int, overlap: int) -> List[tuple]:
+    """
+    Greedily pack consecutive pieces into chunks of at most size, starting each chunk
+    with the trailing pieces of the previous one that fit within overlap.
+    """
+    chunks = []
+    first = 0
+    total = 0
+    for index, length in enumerate(lengths):
+        if total + length > size and index > first:
+            chunks.append((spans[first][0], spans[index - 1][1]))
+            while first < index and (total > overlap or total + length > size):
+                total -= lengths[first]
+                first += 1
+        total += length
+    if first < len(spans):
+        chunks.append((spans[first][0], spans[-1][1]))
+    return chunks
+
+def _markdown_sections(text: str) -> tuple:
+    """
+    Split markdown at headings (ignoring '#' lines inside code fences).
+    Returns (section spans, heading path of each section).
+    """
+    fences = [match.start() for match in MARKDOWN_FENCE.finditer(text)]
+    starts, paths = [0], [[]]
+    stack = []
+    for match in MARKDOWN_HEADING.finditer(text):
+        if bisect.bisect_left(fences, match.start()) % 2:
+            continue  # inside a code block
+        level = len(match.group(1))
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, match.group(2).strip()))
+        if match.start() == 0:
+            paths[0] = [title for _, title in stack]
+        else:
+            starts.append(match.start())
+            paths.append([title for _, title in stack])
+    return list(zip(starts, starts[1:] + [len(text)])), paths
+
+class _TextChunker:
+    """
+    Splitter for the token, markdown and sentence strategies. Works on offsets into
+    the original text, so chunking is a few regex passes plus one greedy packing pass.
+    """
+    
+    def __init__(self, strategy: str, chunk_size: int, chunk_overlap: int,
+                 measure: Optional[Dict[str, Any]] = None, include_heading_path: bool = True):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.strategy = strategy
+        self.chunk_size = chunk_size
+        self.chunk_overlap = max(0, min(chunk_overlap, chunk_size - 1))
+        self.measure = measure
+        self.include_heading_path = include_heading_path
+    
+    @staticmethod
+    def _join_heading_path(path: List[str]) -> str:
+        return " > ".join(path) + "\n\n" if path else ""
+    
+    def _measure_text(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self.measure["token_starts"](text)) if self.measure else len(text)
+    
+    def _heading_prefixes(self, paths: List[List[str]]) -> List[str]:
+        """Heading path prefix per section; dropped when it would take over half the chunk."""
+        if not self.include_heading_path:
+            return [""] * len(paths)
+        prefixes = [self._join_heading_path(path) for path in paths]
+        return [prefix if self._measure_text(prefix) <= self.chunk_size // 2 else "" for prefix in prefixes]
+    
+    def _pack(self, spans: List[tuple], lengths: List[int], reserve: int) -> List[tuple]:
+        """Pack spans into chunks that leave reserve units free for a heading path."""
+        size = self.chunk_size - reserve
+        return _pack_spans(spans, lengths, size, min(self.chunk_overlap, size - 1))
+    
+    def split_text(self, text: str) -> List[str]:
+        levels = STRATEGY_BOUNDARY_LEVELS[self.strategy]
+        # Tokenize once; any span's token count is then two bisections
+        token_starts = self.measure["token_starts"](text) if self.measure else None
+        if self.strategy == "markdown":
+            sections, paths = _markdown_sections(text)
+            section_starts = [start for start, _ in sections]
+            prefixes = self._heading_prefixes(paths)
+            reserves = [self._measure_text(prefix) for prefix in prefixes]
+            
+            # Short neighbouring sections share chunks; a section that has to be split
+            # is chunked on its own so none of its chunks straddle a heading. Each chunk's
+            # budget leaves room for the heading path prepended to it below.
+            packed = []
+            group_spans, group_lengths, group_reserve = [], [], 0
+            for section, length, reserve in zip(sections, _measure_spans(sections, token_starts), reserves):
+                if length > self.chunk_size - reserve:
+                    packed.extend(self._pack(group_spans, group_lengths, group_reserve))
+                    group_spans, group_lengths, group_reserve = [], [], 0
+                    spans, lengths = _fit_spans(text, [section], levels, self.chunk_size - reserve, token_starts)
+                    packed.extend(self._pack(spans, lengths, reserve))
+                    continue
+                if group_spans and max(group_lengths + [length]) > self.chunk_size - max(group_reserve, reserve):
+                    packed.extend(self._pack(group_spans, group_lengths, group_reserve))
+                    group_spans, group_lengths, group_reserve = [], [], 0
+                group_spans.append(section)
+                group_lengths.append(length)
+                group_reserve = max(group_reserve, reserve)
+            packed.extend(self._pack(group_spans, group_lengths, group_reserve))
+        else:
+            prefixes = None
+            spans, lengths = _fit_spans(text, [(0, len(text))], levels, self.chunk_size, token_starts)
+            packed = _pack_spans(spans, lengths, self.chunk_size, self.chunk_overlap)
+        
+        chunks = []
+        for start, end in packed:
+            chunk = text[start:end].strip()
+            if not chunk:
+                continue
+            if prefixes:
+                # Chunks starting at their heading repeat only the parent headings
+                section = bisect.bisect_right(section_starts, start) - 1
+                prefix = prefixes[section]
+                if prefix and start <= section_starts[section]:
+                    prefix = self._join_heading_path(paths[section][:-1])
+                chunk = prefix + chunk
+            chunks.append(chunk)
+        return chunks
+
+def _load_token_measure(tokenizer_name: str) -> Dict[str, Any]:
+    """Measure chunks with the embedding model's (fast) tokenizer."""
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        raise ImportError("transformers not available. Install with: pip install transformers")
+    
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    
+    def token_starts(text: str) -> List[int]:
+        # Tokenize ~64 KB blocks cut at whitespace as one batch (parallel in the Rust tokenizer)
+        blocks, start = [], 0
+        while start < len(text):
+            match = CHUNK_BOUNDARIES["word"].search(text, start + TOKENIZER_BLOCK_CHARS)
+            end = match.start() if match else len(text)
+            blocks.append((start, end))
+            start = end
+        if not blocks:
+            return []
+        encoded = tokenizer([text[start:end] for start, end in blocks], add_special_tokens=False,
+                            return_offsets_mapping=True)["offset_mapping"]
+        return [start + offset for (start, _), offsets in zip(blocks, encoded) for offset, _ in offsets]
+    
+    return {"unit": "tokens", "token_starts": token_starts}
+
+def _initialize_text_splitter():
+    """
+    Initialize the text splitter for chunking.strategy: fixed_size (langchain's recursive
+    character splitter), token, markdown or sentence (see _TextChunker).
+    """
+    global _text_splitter
+    if _text_splitter is not None:
+        return _text_splitter
+    
+    chunking_config = _get_chunking_config()
+    strategy = chunking_config["strategy"]
+    if strategy not in CHUNKING_STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy '{strategy}'. Use one of: {', '.join(CHUNKING_STRATEGIES)}")
+    
+    if strategy != "fixed_size":
+        measure = None
+        if strategy == "token" or chunking_config["length_unit"] == "tokens":
+            with suppress_stdout_stderr():
+                measure = _load_token_measure(
+                    chunking_config["tokenizer"] or _load_config()["embedding"]["model_name"]
+                )
+        _text_splitter = _TextChunker(
+            strategy,
+            int(chunking_config["chunk_size"]),
+            int(chunking_config["chunk_overlap"]),
+            measure=measure,
+            include_heading_path=chunking_config["include_heading_path"]
+        )
+        return _text_splitter
+    
+    if not LANGCHAIN_AVAILABLE:
+        raise ImportError("langchain-text-splitters not available. Install with: pip install langchain-text-splitters")
+    
+    with suppress_stdout_stderr():
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        
+        _text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunking_config["chunk_size"],
+            chunk_overlap=chunking_config["chunk_overlap"],
+            length_function=len,
+            separators=chunking_config["separators"]
+        )
+    
+    return _text_splitter
+
+def _get_worker_config() -> Dict[str, Any]:
+    """Get worker pool settings, filling in defaults missing from older config files."""
+    worker_config = {
+        "pool_type": "thread",
+        "search_workers": 2,
+        "ingest_workers": 2,
+        "chunk_workers": 2,
+        "chunk_pool_type": "thread",
+        "max_queue_depth": 32
+    }
+    worker_config.update(_load_config().get("workers", {}))
+    return worker_config
+
+def _init_process_worker():
+    """Process pool initializer: keep child output off the parent's stdout (the MCP stdio stream)."""
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    sys.stdout = open(os.devnull, "w")
+
+def _get_worker_pool(lane: str, cpu_bound: bool = False):
+    """
+    Get (or lazily create) the executor for a worker lane.
+    Threads by default. With pool_type "process" (or a per-lane <lane>_pool_type),
+    CPU-bound calls (embedding, chunking) go to a process pool instead; Chroma calls
+    always stay on threads because the client is not fork-safe. Process workers are
+    spawned rather than forked, since forking this process can copy a held lock into
+    the child.
+    """
+    worker_config = _get_worker_config()
+    pool_type = worker_config.get(f"{lane}_pool_type", worker_config["pool_type"])
+    use_processes = cpu_bound and pool_type == "process"
+    pool_key = f"{lane}:process" if use_processes else lane
+
+    with _worker_lock:
+        pool = _worker_pools.get(pool_key)
+        if pool is None:
+            max_workers = max(1, int(worker_config.get(f"{lane}_workers", 2)))
+            if use_processes:
+                pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process_worker
+                )
+            else:
+                pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"rag-{lane}")
+            _worker_pools[pool_key] = pool
+    return pool
+
+def _get_lane_stats(lane: str) -> Dict[str, Any]:
+    """Get the mutable metrics record for a worker lane. Caller must hold _worker_lock."""
+    if lane not in _worker_stats:
+        _worker_stats[lane] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "rejected": 0,
+            "pending": 0,
+            "running": 0,
+            "max_pending": 0,
+            "total_wait_ms": 0.0,
+            "total_run_ms": 0.0
+        }
+    return _worker_stats[lane]
+
+def _timed_call(func: Callable, args: tuple, kwargs: Dict[str, Any]):
+    """
+    Run a blocking call and report when it started and finished (wall clock).
+    Output is not suppressed here: the model loaders silence themselves, and the
+    library loggers are quietened at import, so other threads keep their output.
+    """
+    started_at = time.time()
+    result = func(*args, **kwargs)
+    return result, started_at, time.time()
+
+async def _run_in_worker(lane: str, func: Callable, *args, cpu_bound: bool = False, **kwargs):
+    """
+    Run a blocking embedding/Chroma call in the given worker lane.
+    Fails fast when the lane already has max_queue_depth tasks pending, so
+    callers get backpressure instead of an ever-growing queue.
+    """
+    max_queue_depth = int(_get_worker_config()["max_queue_depth"])
+
+    with _worker_lock:
+        stats = _get_lane_stats(lane)
+        if stats["pending"] >= max_queue_depth:
+            stats["rejected"] += 1
+            raise RuntimeError(f"RAG {lane} worker queue is full ({max_queue_depth} pending tasks), try again later")
+        stats["submitted"] += 1
+        stats["pending"] += 1
+        stats["max_pending"] = max(stats["max_pending"], stats["pending"])
+
+    submitted_at = time.time()
+    pool = _get_worker_pool(lane, cpu_bound=cpu_bound)
+    loop = asyncio.get_running_loop()
+    outcome = "failed"
+    try:
+        result, started_at, finished_at = await loop.run_in_executor(pool, _timed_call, func, args, kwargs)
+        outcome = "completed"
+    except asyncio.CancelledError:
+        # Client timeouts and aborted requests cancel the await (the call itself may still finish)
+        outcome = "cancelled"
+        raise
+    finally:
+        with _worker_lock:
+            stats["pending"] -= 1
+            stats[outcome] += 1
+            if outcome == "completed":
+                stats["total_wait_ms"] += max(0.0, started_at - submitted_at) * 1000
+                stats["total_run_ms"] += (finished_at - started_at) * 1000
+    return result
+
+def _get_worker_metrics() -> Dict[str, Any]:
+    """Snapshot worker pool metrics for health reporting."""
+    worker_config = _get_worker_config()
+    metrics = {
+        "pool_type": worker_config["pool_type"],
+        "max_queue_depth": worker_config["max_queue_depth"],
+        "lanes": {}
+    }
+    with _worker_lock:
+        for lane in WORKER_LANES:
+            stats = _get_lane_stats(lane)
+            completed = stats["completed"]
+            metrics["lanes"][lane] = {
+                "workers": worker_config.get(f"{lane}_workers"),
+                "pool_type": worker_config.get(f"{lane}_pool_type", worker_config["pool_type"]),
+                "pending": stats["pending"],
+                "max_pending": stats["max_pending"],
+                "submitted": stats["submitted"],
+                "completed": completed,
+                "failed": stats["failed"],
+                "cancelled": stats["cancelled"],
+                "rejected": stats["rejected"],
+                "avg_wait_ms": round(stats["total_wait_ms"] / completed, 2) if completed else 0.0,
+                "avg_run_ms": round(stats["total_run_ms"] / completed, 2) if completed else 0.0
+            }
+    return metrics
+
+def _split_text_sync(text: str) -> List[str]:
+    """Chunk text with the configured splitter (module-level so process pools can run it)."""
+    return _initialize_text_splitter().split_text(text)
+
+def _encode_local(texts: List[str]) -> List[List[float]]:
+    """Encode texts with the in-process embedding model."""
+    embedding_model = _initialize_embedding_model()
+    return embedding_model.encode(texts, normalize_embeddings=True).tolist()
+
+def _encode_sync(texts: List[str]) -> List[List[float]]:
+    """Encode texts with the shared embedding server or the local model (runs inside a worker)."""
+    server_config = _get_shared_server_config()
+    if server_config["enabled"]:
+        try:
+            return _remote_encode(texts, server_config)
+        except ConnectionError:
+            if not server_config["fallback_to_local"]:
+                raise
+            with _shared_server_lock:
+                _shared_server_stats["local_fallbacks"] += 1
+    return _encode_local(texts)
+
+async def _encode_texts(texts: List[str], lane: str) -> List[List[float]]:
+    """Encode texts off the event loop in the given worker lane."""
+    return await _run_in_worker(lane, _encode_sync, texts, cpu_bound=True)
+
+def _get_shared_server_config() -> Dict[str, Any]:
+    """Get shared embedding server settings, filling in defaults missing from older config files."""
+    server_config = {
+        "enabled": False,
+        "host": "127.0.0.1",
+        "port": 8765,
+        "auto_start": True,
+        "start_timeout_seconds": 120,
+        "fallback_to_local": True
+    }
+    server_config.update(_load_config().get("embedding", {}).get("shared_server", {}))
+    return server_config
+
+def _get_embedding_server_authkey() -> bytes:
+    """
+    Get the shared secret for the embedding server socket: RAG_EMBEDDING_AUTHKEY if set,
+    otherwise a key file in the knowledge base directory (created on first use).
+    """
+    if os.getenv("RAG_EMBEDDING_AUTHKEY"):
+        return os.environ["RAG_EMBEDDING_AUTHKEY"].encode("utf-8")
+    
+    key_path = _get_kb_dir() / EMBEDDING_SERVER_KEY_FILE
+    if not key_path.exists():
+        key_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(str(key_path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass  # Another process created it first
+    return key_path.read_text(encoding="utf-8").strip().encode("utf-8")
+
+def _shared_server_request(message: tuple, server_config: Dict[str, Any]):
+    """
+    Send one request to the shared embedding server over this thread's connection.
+    Raises ConnectionError when the server cannot be reached.
+    """
+    conn = getattr(_shared_client_local, "conn", None)
+    try:
+        if conn is None:
+            conn = Client((server_config["host"], int(server_config["port"])),
+                          authkey=_get_embedding_server_authkey())
+            _shared_client_local.conn = conn
+            
+            # Vectors from a different model would silently corrupt the collections
+            conn.send(("ping",))
+            status, info = conn.recv()
+            expected = _load_config()["embedding"]["model_name"]
+            if status == "ok" and info.get("model_name") != expected:
+                _shared_client_local.conn = None
+                conn.close()
+                raise RuntimeError(
+                    f"Shared embedding server runs model {info.get('model_name')}, expected {expected}"
+                )
+        conn.send(message)
+        status, payload = conn.recv()
+    except (OSError, EOFError) as e:
+        _shared_client_local.conn = None
+        if conn is not None:
+            conn.close()
+        raise ConnectionError(f"Shared embedding server unavailable: {e}") from e
+    
+    if status != "ok":
+        raise RuntimeError(f"Shared embedding server error: {payload}")
+    return payload
+
+def _start_embedding_server(server_config: Dict[str, Any]) -> bool:
+    """
+    Launch run_embedding_server.py once per process and wait until it answers.
+    Returns False if it did not come up within start_timeout_seconds.
+    """
+    with _shared_server_lock:
+        if _shared_server_state["start_failed"]:
+            return False
+        if _shared_server_state["process"] is None:
+            _shared_server_state["process"] = subprocess.Popen(
+                [sys.executable, str(EMBEDDING_SERVER_SCRIPT),
+                 "--host", str(server_config["host"]), "--port", str(server_config["port"])],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            _shared_server_stats["auto_starts"] += 1
+        process = _shared_server_state["process"]
+    
+    # The server binds before loading the model, so a ping connects early and is
+    # answered once the model is ready. A child that lost the port to another
+    # process's server exits at once; the ping then reaches the winner.
+    deadline = time.monotonic() + float(server_config["start_timeout_seconds"])
+    while time.monotonic() < deadline:
+        exited = process.poll() is not None
+        try:
+            _shared_server_request(("ping",), server_config)
+            return True
+        except ConnectionError:
+            if exited:
+                break
+            time.sleep(0.25)
+    
+    with _shared_server_lock:
+        _shared_server_state["start_failed"] = True
+    return False
+
+def _remote_encode(texts: List[str], server_config: Dict[str, Any]) -> List[List[float]]:
+    """Encode texts on the shared embedding server, starting it first if configured to."""
+    try:
+        vectors = _shared_server_request(("encode", list(texts)), server_config)
+    except ConnectionError:
+        if not server_config["auto_start"] or not _start_embedding_server(server_config):
+            raise
+        vectors = _shared_server_request(("encode", list(texts)), server_config)
+    
+    with _shared_server_lock:
+        _shared_server_stats["remote_batches"] += 1
+        _shared_server_stats["remote_texts"] += len(texts)
+    return vectors
+
+def _serve_embedding_connection(conn, model_info: Dict[str, Any], encode_lock: threading.Lock):
+    """Answer ping/encode requests on one client connection until it closes."""
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (OSError, EOFError):
+                return
+            
+            try:
+                if message[0] == "ping":
+                    reply = ("ok", model_info)
+                elif message[0] == "encode":
+                    # One encode at a time; the model already uses every core per batch
+                    with encode_lock:
+                        reply = ("ok", _encode_local(message[1]))
+                else:
+                    reply = ("error", f"Unknown request: {message[0]}")
+            except Exception as e:
+                reply = ("error", str(e))
+            
+            try:
+                conn.send(reply)
+            except (OSError, EOFError):
+                return
+
+def _serve_embedding_listener(listener, model_info: Dict[str, Any]):
+    """Accept clients on an open listener, one thread per connection, until it is closed."""
+    encode_lock = threading.Lock()
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception:
+            # Failed handshakes (wrong authkey) are dropped; a closed listener ends the loop
+            if getattr(listener, "_listener", None) is None:
+                return
+            continue
+        threading.Thread(
+            target=_serve_embedding_connection, args=(conn, model_info, encode_lock),
+            name="rag-embedding-conn", daemon=True
+        ).start()
+
+def serve_embeddings(host: Optional[str] = None, port: Optional[int] = None):
+    """
+    Run the shared embedding server in the foreground: load the model once and serve
+    encode requests from other server processes (see run_embedding_server.py).
+    """
+    server_config = _get_shared_server_config()
+    host = host or server_config["host"]
+    port = int(port or server_config["port"])
+    
+    # Bind first so a second server racing for the port fails before loading a model;
+    # clients that connect meanwhile wait in the backlog until the model is ready
+    with Listener((host, port), backlog=64, authkey=_get_embedding_server_authkey()) as listener:
+        _initialize_embedding_model()
+        _encode_local(["warm-up"])
+        model_info = {"model_name": _load_config()["embedding"]["model_name"], "pid": os.getpid()}
+        _serve_embedding_listener(listener, model_info)
+
+def _get_embedding_model_status() -> Dict[str, Any]:
+    """Load (or reach) the embedding model and describe where encoding happens."""
+    model_name = _load_config()["embedding"]["model_name"]
+    server_config = _get_shared_server_config()
+    shared_error = None
+    if server_config["enabled"]:
+        try:
+            try:
+                info = _shared_server_request(("ping",), server_config)
+            except ConnectionError:
+                if not server_config["auto_start"] or not _start_embedding_server(server_config):
+                    raise
+                info = _shared_server_request(("ping",), server_config)
+            return {
+                "status": "loaded",
+                "mode": "shared_server",
+                "model_name": model_name,
+                "address": f"{server_config['host']}:{server_config['port']}",
+                "server_pid": info.get("pid"),
+                **_shared_server_stats
+            }
+        except ConnectionError as e:
+            if not server_config["fallback_to_local"]:
+                raise
+            shared_error = str(e)
+    
+    _initialize_embedding_model()
+    status = {"status": "loaded", "mode": "local", "model_name": model_name, "backend": _get_embedding_backend()}
+    if shared_error:
+        status["shared_server_error"] = shared_error
+    return status
+
+def _get_warmup_config() -> Dict[str, Any]:
+    """Get warm-up settings; RAG_WARMUP=1/0 overrides the enabled flag."""
+    warmup_config = {"enabled": False, "blocking": False}
+    warmup_config.update(_load_config().get("embedding", {}).get("warmup", {}))
+    if os.getenv("RAG_WARMUP") is not None:
+        warmup_config["enabled"] = os.environ["RAG_WARMUP"].strip().lower() in ("1", "true", "yes", "on")
+    return warmup_config
+
+def _warm_up_sync():
+    """Load every component and run one encode so the first tool call pays no start-up cost."""
+    started = time.perf_counter()
+    _warmup_state.update({"status": "running", "started_at": datetime.now().isoformat(), "error": None})
+    try:
+        with suppress_stdout_stderr():
+            _initialize_chroma()
+            _warmup_state["embedding_mode"] = _get_embedding_model_status()["mode"]
+            _encode_sync(["warm-up"])
+            _initialize_text_splitter()
+            if "cross_encoder" in _get_rerank_config()["default"]:
+                _initialize_cross_encoder()
+        _warmup_state["status"] = "ready"
+    except Exception as e:
+        _warmup_state.update({"status": "failed", "error": str(e)})
+    _warmup_state["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return dict(_warmup_state)
+
+def warm_up(blocking: Optional[bool] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Warm up the knowledge base at server start (called by the launchers).
+    Does nothing unless embedding.warmup.enabled (or RAG_WARMUP=1) or force is set.
+    Runs in a background thread unless blocking, so the server starts accepting
+    requests immediately; tool calls that arrive first simply wait on the model lock.
+    
+    Returns:
+        The warm-up state (status: disabled, skipped, running, ready or failed)
+    """
+    warmup_config = _get_warmup_config()
+    if not (warmup_config["enabled"] or force):
+        return {"status": "disabled"}
+    try:
+        backend_available = _embedding_backend_available(_get_embedding_backend())
+    except ValueError:
+        backend_available = False
+    if not (CHROMADB_AVAILABLE and backend_available and _chunker_available()):
+        _warmup_state["status"] = "skipped"
+        _warmup_state["error"] = "Missing RAG dependencies"
+        return dict(_warmup_state)
+    if _warmup_state["status"] in ("running", "ready"):
+        return dict(_warmup_state)
+    
+    if blocking is None:
+        blocking = warmup_config["blocking"]
+    if blocking:
+        return _warm_up_sync()
+    
+    _warmup_state["status"] = "running"
+    threading.Thread(target=_warm_up_sync, name="rag-warmup", daemon=True).start()
+    return dict(_warmup_state)
+
+def _get_embedding_cache_config() -> Dict[str, Any]:
+    """Get embedding cache settings, filling in defaults missing from older config files."""
+    cache_config = {
+        "enabled": True,
+        "max_entries": 100000
+    }
+    cache_config.update(_load_config().get("embedding", {}).get("cache", {}))
+    return cache_config
+
+def _chunk_hash(text: str) -> str:
+    """Hash a chunk after normalizing unicode and whitespace, so cosmetic changes still hit the cache."""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _embedding_cache_lookup(model_name: str, chunk_hashes: List[str]) -> Dict[str, List[float]]:
+    """Fetch cached vectors for the given chunk hashes and mark them as recently used."""
+    found = {}
+    with _open_sidecar(EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_SCHEMA) as conn:
+        for start in range(0, len(chunk_hashes), 500):
+            batch = chunk_hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT chunk_hash, vector FROM embeddings WHERE model_name = ? AND chunk_hash IN ({placeholders})",
+                [model_name, *batch]
+            ).fetchall()
+            for chunk_hash, blob in rows:
+                vector = array("f")
+                vector.frombytes(blob)
+                found[chunk_hash] = vector.tolist()
+        
+        if found:
+            now = time.time()
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model_name = ? AND chunk_hash = ?",
+                [(now, model_name, chunk_hash) for chunk_hash in found]
+            )
+    return found
+
+def _embedding_cache_store(model_name: str, vectors_by_hash: Dict[str, List[float]], max_entries: int):
+    """Store new vectors and evict the least recently used entries beyond max_entries."""
+    now = time.time()
+    with _open_sidecar(EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_SCHEMA) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model_name, chunk_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+            [(model_name, chunk_hash, array("f", vector).tobytes(), now) for chunk_hash, vector in vectors_by_hash.items()]
+        )
+        
+        entry_count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if entry_count > max_entries:
+            conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (entry_count - max_entries,)
+            )
+
+async def _encode_chunks(chunks: List[str], lane: str = "ingest"):
+    """
+    Encode ingestion chunks, reusing vectors from the on-disk embedding cache.
+    Returns (embeddings, cache_hits); only chunks missing from the cache reach the model.
+    """
+    cache_config = _get_embedding_cache_config()
+    if not cache_config["enabled"]:
+        return await _encode_texts(chunks, lane=lane), 0
+    
+    model_name = _load_config()["embedding"]["model_name"]
+    chunk_hashes = [_chunk_hash(chunk) for chunk in chunks]
+    unique_hashes = list(dict.fromkeys(chunk_hashes))
+    vectors_by_hash = await _run_in_worker(lane, _embedding_cache_lookup, model_name, unique_hashes)
+    
+    missing = {}
+    for chunk, chunk_hash in zip(chunks, chunk_hashes):
+        if chunk_hash not in vectors_by_hash and chunk_hash not in missing:
+            missing[chunk_hash] = chunk
+    
+    if missing:
+        new_vectors = await _encode_texts(list(missing.values()), lane=lane)
+        if len(new_vectors) != len(missing):
+            raise RuntimeError(f"Embedding model returned {len(new_vectors)} vectors for {len(missing)} chunks")
+        fresh = dict(zip(missing.keys(), new_vectors))
+        await _run_in_worker(lane, _embedding_cache_store, model_name, fresh, int(cache_config["max_entries"]))
+        vectors_by_hash.update(fresh)
+    
+    cache_hits = len(chunks) - len(missing)
+    with _worker_lock:
+        _embedding_cache_stats["hits"] += cache_hits
+        _embedding_cache_stats["misses"] += len(missing)
+    
+    return [vectors_by_hash[chunk_hash] for chunk_hash in chunk_hashes], cache_hits
+
+def _get_embedding_cache_stats() -> Dict[str, Any]:
+    """Report embedding cache size and this process's hit rate (runs inside a worker)."""
+    cache_config = _get_embedding_cache_config()
+    with _worker_lock:
+        hits = _embedding_cache_stats["hits"]
+        misses = _embedding_cache_stats["misses"]
+    
+    stats = {
+        "enabled": cache_config["enabled"],
+        "max_entries": cache_config["max_entries"],
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+    }
+    if cache_config["enabled"]:
+        with _open_sidecar(EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_SCHEMA) as conn:
+            stats["entries"] = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    return stats
+
+def _get_vector_storage_config() -> Dict[str, Any]:
+    """Get vector storage settings, filling in defaults missing from older config files."""
+    storage_config = {
+        "index_dimension": None,
+        "rescore_precision": "none",
+        "rescore_multiplier": 4
+    }
+    storage_config.update(_load_config().get("embedding", {}).get("storage", {}))
+    if storage_config["rescore_precision"] not in RESCORE_PRECISIONS:
+        raise ValueError(f"embedding.storage.rescore_precision must be one of: {', '.join(RESCORE_PRECISIONS)}")
+    return storage_config
+
+def _truncate_embeddings(vectors: List[List[float]], dimension: Optional[int]) -> List[List[float]]:
+    """Keep the leading dimensions of each vector (Matryoshka-style) and re-normalize to unit length."""
+    if not dimension:
+        return vectors
+    truncated = []
+    for vector in vectors:
+        head = vector[:dimension]
+        norm = sum(x * x for x in head) ** 0.5 or 1.0
+        truncated.append([x / norm for x in head])
+    return truncated
+
+def _pack_rescore_vector(vector: List[float], precision: str):
+    """Serialize a full-dimension vector for the rescore store, returning (blob, scale)."""
+    if precision == "int8":
+        # Symmetric per-vector quantization: x ~= scale * q with q in [-127, 127]
+        scale = max((abs(x) for x in vector), default=0.0) / 127 or 1.0
+        return array("b", [max(-127, min(127, round(x / scale))) for x in vector]).tobytes(), scale
+    return array("f", vector).tobytes(), 1.0
+
+def _unpack_rescore_vector(blob: bytes, precision: str) -> array:
+    """Restore a vector written by _pack_rescore_vector (int8 values stay unscaled)."""
+    vector = array("b" if precision == "int8" else "f")
+    vector.frombytes(blob)
+    return vector
+
+def _get_vector_layout(collection_name: str) -> Optional[Dict[str, Any]]:
+    """Get a collection's recorded vector layout, or None for collections that predate it."""
+    with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+        row = conn.execute(
+            "SELECT index_dimension, rescore_precision FROM vector_layouts WHERE collection = ?", (collection_name,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {"index_dimension": row[0], "rescore_precision": row[1]}
+
+def _record_vector_layout(conn, collection_name: str) -> Dict[str, Any]:
+    """Fix a new collection's layout from the current embedding.storage settings."""
+    storage_config = _get_vector_storage_config()
+    layout = {
+        "index_dimension": storage_config["index_dimension"],
+        "rescore_precision": storage_config["rescore_precision"]
+    }
+    conn.execute(
+        "INSERT OR REPLACE INTO vector_layouts (collection, index_dimension, rescore_precision, created_at) VALUES (?, ?, ?, ?)",
+        (collection_name, layout["index_dimension"], layout["rescore_precision"], datetime.now().isoformat())
+    )
+    return layout
+
+def _rescore_store_write(collection_name: str, precision: str, added: Dict[str, List[float]], removed_ids: List[str]):
+    """Store full-dimension vectors for new chunks and drop those of deleted chunks."""
+    with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+        conn.executemany(
+            "DELETE FROM rescore_vectors WHERE collection = ? AND chunk_id = ?",
+            [(collection_name, chunk_id) for chunk_id in removed_ids]
+        )
+        rows = []
+        for chunk_id, vector in added.items():
+            blob, scale = _pack_rescore_vector(vector, precision)
+            rows.append((collection_name, chunk_id, blob, scale))
+        conn.executemany(
+            "INSERT OR REPLACE INTO rescore_vectors (collection, chunk_id, vector, scale) VALUES (?, ?, ?, ?)",
+            rows
+        )
+
+def _rescore_candidates(collection_name: str, precision: str, query_vector: List[float],
+                        candidate_ids: List[str]) -> Dict[str, float]:
+    """
+    Recompute candidate distances from full-dimension vectors (runs inside a worker).
+    Returns {chunk_id: distance} in Chroma's default squared-L2 space (2 - 2 * cosine for
+    unit vectors); candidates without a stored vector are left out.
+    """
+    distances = {}
+    with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+        for start in range(0, len(candidate_ids), 500):
+            batch = candidate_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT chunk_id, vector, scale FROM rescore_vectors WHERE collection = ? AND chunk_id IN ({placeholders})",
+                [collection_name, *batch]
+            ).fetchall()
+            for chunk_id, blob, scale in rows:
+                vector = _unpack_rescore_vector(blob, precision)
+                dot = sum(q * x for q, x in zip(query_vector, vector)) * scale
+                distances[chunk_id] = 2.0 - 2.0 * dot
+    return distances
+
+async def _query_vectors(collection, collection_name: str, query_vector: List[float], n_results: int,
+                         where: Optional[Dict[str, Any]] = None, include_embeddings: bool = False) -> Dict[str, Any]:
+    """
+    Run a vector query against a collection, honouring its storage layout.
+    Truncated indexes are queried with a truncated query vector; when the collection
+    keeps rescore vectors, n_results * rescore_multiplier candidates are re-ranked by
+    full-precision distance. A where filter is applied by Chroma before the nearest-
+    neighbour search. Returns Chroma's query result shape plus "rescored_candidates".
+    """
+    layout = await _run_in_worker("search", _get_vector_layout, collection_name)
+    index_dimension = layout["index_dimension"] if layout else None
+    precision = layout["rescore_precision"] if layout else "none"
+    rescore = precision != "none"
+    candidate_count = n_results * int(_get_vector_storage_config()["rescore_multiplier"]) if rescore else n_results
+    
+    query_kwargs = {"where": where} if where else {}
+    results = await _run_in_worker(
+        "search",
+        collection.query,
+        query_embeddings=_truncate_embeddings([query_vector], index_dimension),
+        n_results=candidate_count,
+        include=['documents', 'metadatas', 'distances'] + (['embeddings'] if include_embeddings else []),
+        **query_kwargs
+    )
+    if not rescore or not results.get('ids') or not results['ids'][0]:
+        return results
+    
+    ids = results['ids'][0]
+    rescored = await _run_in_worker("search", _rescore_candidates, collection_name, precision, query_vector, ids)
+    embeddings = results['embeddings'][0] if include_embeddings else [None] * len(ids)
+    candidates = sorted(
+        zip(ids, results['documents'][0], results['metadatas'][0], results['distances'][0], embeddings),
+        key=lambda candidate: rescored.get(candidate[0], candidate[3])
+    )[:n_results]
+    reranked = {
+        'ids': [[c[0] for c in candidates]],
+        'documents': [[c[1] for c in candidates]],
+        'metadatas': [[c[2] for c in candidates]],
+        'distances': [[rescored.get(c[0], c[3]) for c in candidates]],
+        'rescored_candidates': len(rescored)
+    }
+    if include_embeddings:
+        reranked['embeddings'] = [[c[4] for c in candidates]]
+    return reranked
+
+def _get_query_batching_config() -> Dict[str, Any]:
+    """Get query micro-batching settings, filling in defaults missing from older config files."""
+    batching_config = {
+        "enabled": True,
+        "max_wait_ms": 5,
+        "max_batch_size": 32
+    }
+    batching_config.update(_load_config().get("embedding", {}).get("query_batching", {}))
+    return batching_config
+
+def _get_search_cache_config() -> Dict[str, Any]:
+    """Get query-embedding and result cache settings, with defaults for older config files."""
+    config = _load_config()
+    query_cache = {"enabled": True, "max_entries": 1024}
+    query_cache.update(config.get("embedding", {}).get("query_cache", {}))
+    result_cache = {"enabled": True, "ttl_seconds": 60, "max_entries": 256}
+    result_cache.update(config.get("search", {}).get("cache", {}))
+    return {"query_embeddings": query_cache, "results": result_cache}
+
+def _normalize_query(query: str) -> str:
+    """Normalize query text for cache keys (unicode form, case and whitespace)."""
+    return " ".join(unicodedata.normalize("NFC", query).casefold().split())
+
+def _cached_query_embedding(query: str) -> Optional[List[float]]:
+    """Look up a query embedding in the LRU, counting the hit or miss."""
+    key = _normalize_query(query)
+    with _worker_lock:
+        vector = _query_embedding_cache.get(key)
+        if vector is None:
+            _search_cache_stats["embedding_misses"] += 1
+            return None
+        _query_embedding_cache.move_to_end(key)
+        _search_cache_stats["embedding_hits"] += 1
+        return vector
+
+def _store_query_embedding(query: str, vector: List[float], max_entries: int):
+    """Add a query embedding to the LRU, evicting the least recently used beyond max_entries."""
+    with _worker_lock:
+        _query_embedding_cache[_normalize_query(query)] = vector
+        _query_embedding_cache.move_to_end(_normalize_query(query))
+        while len(_query_embedding_cache) > max_entries:
+            _query_embedding_cache.popitem(last=False)
+
+def _collection_generation(collection_name: str) -> int:
+    """Get a collection's write generation (bumped by every write)."""
+    with _worker_lock:
+        return _collection_generations.get(collection_name, 0)
+
+def _cached_search_results(key: tuple):
+    """Get a fresh copy of cached (results, search_stats) for a search key, or None."""
+    with _worker_lock:
+        entry = _search_result_cache.get(key)
+        if entry is None:
+            _search_cache_stats["result_misses"] += 1
+            return None
+        expires_at, generation, value = entry
+        if expires_at < time.monotonic() or generation != _collection_generations.get(key[0], 0):
+            del _search_result_cache[key]
+            _search_cache_stats["result_expired"] += 1
+            _search_cache_stats["result_misses"] += 1
+            return None
+        _search_result_cache.move_to_end(key)
+        _search_cache_stats["result_hits"] += 1
+    # Callers annotate results (ranks, collection names), so hand out copies
+    return copy.deepcopy(value)
+
+def _store_search_results(key: tuple, value, generation: int, ttl_seconds: float, max_entries: int):
+    """Cache (results, search_stats) unless the collection was written since the search began."""
+    with _worker_lock:
+        if generation != _collection_generations.get(key[0], 0):
+            return
+        _search_result_cache[key] = (time.monotonic() + ttl_seconds, generation, copy.deepcopy(value))
+        _search_result_cache.move_to_end(key)
+        while len(_search_result_cache) > max_entries:
+            _search_result_cache.popitem(last=False)
+
+def _invalidate_search_results(collection_name: str):
+    """Drop cached results for a collection after it is written."""
+    with _worker_lock:
+        _collection_generations[collection_name] = _collection_generations.get(collection_name, 0) + 1
+        stale_keys = [key for key in _search_result_cache if key[0] == collection_name]
+        for key in stale_keys:
+            del _search_result_cache[key]
+        _search_cache_stats["invalidations"] += 1
+
+def _get_search_cache_metrics() -> Dict[str, Any]:
+    """Snapshot search cache sizes and hit rates for health reporting."""
+    cache_config = _get_search_cache_config()
+    with _worker_lock:
+        stats = dict(_search_cache_stats)
+        embedding_entries = len(_query_embedding_cache)
+        result_entries = len(_search_result_cache)
+    
+    def _hit_rate(hits, misses):
+        return round(hits / (hits + misses), 4) if hits + misses else 0.0
+    
+    return {
+        "query_embeddings": {
+            **cache_config["query_embeddings"],
+            "entries": embedding_entries,
+            "hits": stats["embedding_hits"],
+            "misses": stats["embedding_misses"],
+            "hit_rate": _hit_rate(stats["embedding_hits"], stats["embedding_misses"])
+        },
+        "results": {
+            **cache_config["results"],
+            "entries": result_entries,
+            "hits": stats["result_hits"],
+            "misses": stats["result_misses"],
+            "expired": stats["result_expired"],
+            "invalidations": stats["invalidations"],
+            "hit_rate": _hit_rate(stats["result_hits"], stats["result_misses"])
+        }
+    }
+
+async def _encode_query(query: str) -> List[float]:
+    """
+    Encode one search query, batched with other queries arriving concurrently.
+    A batch is flushed when it reaches max_batch_size or max_wait_ms after its
+    first query, then encoded with a single model call in the search lane.
+    Repeated queries are served from the query-embedding LRU.
+    """
+    query_cache = _get_search_cache_config()["query_embeddings"]
+    if query_cache["enabled"]:
+        cached = _cached_query_embedding(query)
+        if cached is not None:
+            return cached
+    
+    vector = await _encode_query_uncached(query)
+    if query_cache["enabled"]:
+        _store_query_embedding(query, vector, max(1, int(query_cache["max_entries"])))
+    return vector
+
+async def _encode_query_uncached(query: str) -> List[float]:
+    """Encode one query through the micro-batcher (or directly when batching is disabled)."""
+    batching_config = _get_query_batching_config()
+    if not batching_config["enabled"]:
+        return (await _encode_texts([query], lane="search"))[0]
+    
+    loop = asyncio.get_running_loop()
+    state = _query_batch_state
+    if state["loop"] is not loop:
+        state.update(loop=loop, pending=[], flush_handle=None, tasks=set())
+    
+    future = loop.create_future()
+    state["pending"].append((query, future))
+    
+    if len(state["pending"]) >= max(1, int(batching_config["max_batch_size"])):
+        _flush_query_batch()
+    elif state["flush_handle"] is None:
+        state["flush_handle"] = loop.call_later(batching_config["max_wait_ms"] / 1000, _flush_query_batch)
+    
+    return await future
+
+def _flush_query_batch():
+    """Hand the pending queries to an encoding task (called on the event loop)."""
+    state = _query_batch_state
+    if state["flush_handle"] is not None:
+        state["flush_handle"].cancel()
+        state["flush_handle"] = None
+    
+    batch, state["pending"] = state["pending"], []
+    if batch:
+        task = state["loop"].create_task(_encode_query_batch(batch))
+        state["tasks"].add(task)
+        task.add_done_callback(state["tasks"].discard)
+
+async def _encode_query_batch(batch: List[tuple]):
+    """Encode a batch of queries once and resolve each caller's future."""
+    unique_queries = list(dict.fromkeys(query for query, _ in batch))
+    try:
+        vectors = await _encode_texts(unique_queries, lane="search")
+        if len(vectors) != len(unique_queries):
+            raise RuntimeError(f"Embedding model returned {len(vectors)} vectors for {len(unique_queries)} queries")
+    except Exception as e:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+    
+    with _worker_lock:
+        _query_batch_stats["batches"] += 1
+        _query_batch_stats["queries"] += len(batch)
+        _query_batch_stats["unique_queries"] += len(unique_queries)
+        _query_batch_stats["max_batch_size"] = max(_query_batch_stats["max_batch_size"], len(batch))
+    
+    vectors_by_query = dict(zip(unique_queries, vectors))
+    for query, future in batch:
+        if not future.done():
+            future.set_result(vectors_by_query[query])
+
+def _get_query_batching_metrics() -> Dict[str, Any]:
+    """Snapshot query micro-batching settings and metrics for health reporting."""
+    with _worker_lock:
+        stats = dict(_query_batch_stats)
+    stats["avg_batch_size"] = round(stats["queries"] / stats["batches"], 2) if stats["batches"] else 0.0
+    stats.update(_get_query_batching_config())
+    return stats
+
+def _open_ingest_collection(collection_name: str):
+    """Get the target collection and text splitter for ingestion (runs inside a worker)."""
+    client = _initialize_chroma()
+    text_splitter = _initialize_text_splitter()
+    return client.get_or_create_collection(collection_name), text_splitter
+
+def _open_search_collection(collection_name: str):
+    """
+    Get an existing collection for reading (runs inside a worker).
+    Returns (collection, None) or (None, available_collection_names) when missing.
+    """
+    client = _initialize_chroma()
+    try:
+        return client.get_collection(collection_name), None
+    except Exception:
+        return None, [col.name for col in client.list_collections()]
+
+def _make_chunk_ids(source: str, chunks: List[str]) -> List[str]:
+    """
+    Build deterministic chunk IDs from the source and each chunk's content hash.
+    IDs survive restarts (unlike the salted built-in hash()) and do not shift when
+    chunks are inserted earlier in the document; repeated chunks get a counter.
+    """
+    chunk_ids = []
+    occurrences = {}
+    for chunk in chunks:
+        digest = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16]
+        seen = occurrences.get(digest, 0)
+        occurrences[digest] = seen + 1
+        chunk_ids.append(f"{source}_{digest}" if seen == 0 else f"{source}_{digest}_{seen}")
+    return chunk_ids
+
+async def _store_chunks(collection, collection_name: str, source_field: str, source: str, chunks: List[str],
+                        base_metadata: Dict[str, Any], reingest: bool = False) -> Dict[str, Any]:
+    """
+    Embed and write the chunks of one source, returning counts for the ingestion result.
+    Chunks whose IDs are already stored are skipped, and so are near-duplicates of stored
+    chunks (repeated navigation, footers) when deduplication is enabled. With reingest=True the chunks stored
+    for the source are diffed against the new set: only new chunks are embedded and added,
+    unchanged chunks whose metadata moved are updated in place, and chunks no longer
+    present are deleted.
+    """
+    results, cache_hits = await _store_chunk_batch(collection, collection_name, [{
+        "source_field": source_field,
+        "source": source,
+        "chunks": chunks,
+        "base_metadata": base_metadata
+    }], reingest)
+    results[0]["embedding_cache_hits"] = cache_hits
+    return results[0]
+
+async def _store_chunk_batch(collection, collection_name: str, documents: List[Dict[str, Any]],
+                             reingest: bool = False):
+    """
+    Write several sources' chunks with one encode call and one write per Chroma operation.
+    Each document is {"source_field", "source", "chunks", "base_metadata"} with a distinct
+    source; the per-source diffing is the same as _store_chunks. Returns (per-document
+    results, embedding cache hits for the batch).
+    """
+    plans = []
+    for document in documents:
+        chunks = document["chunks"]
+        base_metadata = document["base_metadata"]
+        ingested_at = _timestamp_to_epoch(base_metadata.get("timestamp")) or time.time()
+        
+        # Create chunk-specific metadata
+        chunk_metadatas = []
+        for i, chunk in enumerate(chunks):
+            chunk_meta = base_metadata.copy()
+            chunk_meta.update({
+                "chunk_index": i,
+                "chunk_length": len(chunk),
+                "token_count": len(chunk.split()),  # Rough token estimate
+                "ingested_at": ingested_at
+            })
+            chunk_metadatas.append(chunk_meta)
+        plans.append({**document, "chunk_ids": _make_chunk_ids(document["source"], chunks), "metadatas": chunk_metadatas})
+    
+    # Look up what is already stored (the whole source when re-ingesting)
+    if reingest:
+        for plan in plans:
+            existing = await _run_in_worker("ingest", collection.get, where={plan["source_field"]: plan["source"]},
+                                            include=['metadatas'])
+            plan["stored"] = dict(zip(existing.get('ids') or [], existing.get('metadatas') or []))
+    else:
+        all_ids = [chunk_id for plan in plans for chunk_id in plan["chunk_ids"]]
+        existing = await _run_in_worker("ingest", collection.get, ids=all_ids, include=['metadatas'])
+        stored = dict(zip(existing.get('ids') or [], existing.get('metadatas') or []))
+        for plan in plans:
+            plan["stored"] = {chunk_id: stored[chunk_id] for chunk_id in plan["chunk_ids"] if chunk_id in stored}
+    sidecars = await _run_in_worker("ingest", _prepare_sidecar_writes, collection, collection_name)
+    
+    def _without_timestamp(meta):
+        return {k: v for k, v in (meta or {}).items() if k not in ("timestamp", "ingested_at")}
+    
+    for plan in plans:
+        chunk_ids, stored = plan["chunk_ids"], plan["stored"]
+        plan["new"] = [i for i, chunk_id in enumerate(chunk_ids) if chunk_id not in stored]
+        plan["moved"] = []
+        plan["stale"] = []
+        if reingest:
+            plan["moved"] = [
+                i for i, chunk_id in enumerate(chunk_ids)
+                if chunk_id in stored and _without_timestamp(stored[chunk_id]) != _without_timestamp(plan["metadatas"][i])
+            ]
+            current_ids = set(chunk_ids)
+            plan["stale"] = [chunk_id for chunk_id in stored if chunk_id not in current_ids]
+    
+    # Skip new chunks that nearly duplicate a stored chunk or an earlier chunk of this batch
+    dedup_config = _get_dedup_config()
+    fingerprints = {}
+    for plan in plans:
+        plan["near_duplicates"] = []
+    if dedup_config["enabled"]:
+        candidates = [(plan["chunk_ids"][i], plan["source"], plan["chunks"][i]) for plan in plans for i in plan["new"]]
+        if candidates:
+            duplicates, fingerprints = await _run_in_worker(
+                "ingest", _find_near_duplicates, collection_name, candidates,
+                [chunk_id for plan in plans for chunk_id in plan["stale"]], sidecars["fingerprints"], dedup_config
+            )
+            for plan in plans:
+                plan["near_duplicates"] = [i for i in plan["new"] if plan["chunk_ids"][i] in duplicates]
+                plan["new"] = [i for i in plan["new"] if plan["chunk_ids"][i] not in duplicates]
+    
+    new_ids = [plan["chunk_ids"][i] for plan in plans for i in plan["new"]]
+    new_chunks = [plan["chunks"][i] for plan in plans for i in plan["new"]]
+    new_metadatas = [plan["metadatas"][i] for plan in plans for i in plan["new"]]
+    moved_ids = [plan["chunk_ids"][i] for plan in plans for i in plan["moved"]]
+    moved_metadatas = [plan["metadatas"][i] for plan in plans for i in plan["moved"]]
+    stale_ids = [chunk_id for plan in plans for chunk_id in plan["stale"]]
+    
+    cache_hits = 0
+    embeddings = []
+    if new_ids:
+        # Generate embeddings (unchanged chunks come from the embedding cache)
+        embeddings, cache_hits = await _encode_chunks(new_chunks, lane="ingest")
+        
+        # Add to ChromaDB (reduced to the collection's index dimension)
+        layout = sidecars["vectors"] or {"index_dimension": None, "rescore_precision": "none"}
+        await _run_in_worker(
+            "ingest",
+            collection.add,
+            documents=new_chunks,
+            embeddings=_truncate_embeddings(embeddings, layout["index_dimension"]),
+            metadatas=new_metadatas,
+            ids=new_ids
+        )
+    
+    if moved_ids:
+        await _run_in_worker("ingest", collection.update, ids=moved_ids, metadatas=moved_metadatas)
+    
+    if stale_ids:
+        await _run_in_worker("ingest", collection.delete, ids=stale_ids)
+    
+    if new_ids or moved_ids or stale_ids:
+        _invalidate_search_results(collection_name)
+    
+    # Keep full-precision rescore vectors, the per-source summary and the keyword index in step
+    layout = sidecars["vectors"]
+    if layout and layout["rescore_precision"] != "none" and (new_ids or stale_ids):
+        await _run_in_worker(
+            "ingest",
+            _rescore_store_write,
+            collection_name,
+            layout["rescore_precision"],
+            dict(zip(new_ids, embeddings)),
+            stale_ids
+        )
+    
+    if sidecars["lexical"] and (new_ids or stale_ids):
+        await _run_in_worker("ingest", _lexical_index_write, collection_name, new_ids, new_chunks, stale_ids)
+    
+    if sidecars["fingerprints"] and (fingerprints or stale_ids):
+        added = [(plan["chunk_ids"][i], plan["source"], fingerprints[plan["chunk_ids"][i]])
+                 for plan in plans for i in plan["new"] if plan["chunk_ids"][i] in fingerprints]
+        await _run_in_worker("ingest", _fingerprint_index_write, collection_name, added, stale_ids)
+    
+    if sidecars["summary"]:
+        for plan in plans:
+            await _run_in_worker(
+                "ingest",
+                _apply_summary_delta,
+                collection_name,
+                plan["source"],
+                plan["base_metadata"].get("source_type", "unknown"),
+                [plan["metadatas"][i] for i in plan["new"]],
+                [plan["stored"][chunk_id] for chunk_id in plan["stale"]],
+                plan["base_metadata"].get("timestamp")
+            )
+    
+    results = [{
+        "chunk_ids": [chunk_id for i, chunk_id in enumerate(plan["chunk_ids"]) if i not in plan["near_duplicates"]],
+        "chunks_added": len(plan["new"]),
+        "chunks_updated": len(plan["moved"]),
+        "chunks_deleted": len(plan["stale"]),
+        "near_duplicates_skipped": len(plan["near_duplicates"])
+    } for plan in plans]
+    return results, cache_hits
+
+def _iter_collection_pages(collection, include: List[str], page_size: int = 5000):
+    """Yield a collection's records page by page instead of loading them all at once."""
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=page_size, offset=offset)
+        page_length = len(page.get('ids') or page.get('metadatas') or [])
+        if page_length:
+            yield page
+        if page_length < page_size:
+            break
+        offset += page_size
+
+def _summarize_metadatas(metadatas: List[Dict[str, Any]], source_stats: Dict[str, Dict[str, Any]]):
+    """Fold chunk metadata into per-source totals (updates source_stats in place)."""
+    for meta in metadatas:
+        if not meta:
+            continue
+            
+        # Get source identifier
+        source = meta.get('source_url') or meta.get('source_name', 'unknown')
+        source_type = meta.get('source_type', 'unknown')
+        timestamp = meta.get('timestamp')
+        
+        if source not in source_stats:
+            source_stats[source] = {
+                "source": source,
+                "source_type": source_type,
+                "first_added": timestamp,
+                "last_updated": timestamp,
+                "chunk_count": 0,
+                "total_characters": 0,
+                "total_tokens": 0
+            }
+        
+        # Update stats
+        source_stats[source]["chunk_count"] += 1
+        source_stats[source]["total_characters"] += meta.get('chunk_length', 0)
+        source_stats[source]["total_tokens"] += meta.get('token_count', 0)
+        
+        # Update timestamps
+        if timestamp:
+            if not source_stats[source]["first_added"] or timestamp < source_stats[source]["first_added"]:
+                source_stats[source]["first_added"] = timestamp
+            if not source_stats[source]["last_updated"] or timestamp > source_stats[source]["last_updated"]:
+                source_stats[source]["last_updated"] = timestamp
+
+def _rebuild_collection_summary(collection_name: str) -> Dict[str, Dict[str, Any]]:
+    """Recompute a collection's per-source summary from Chroma and mark it tracked (runs inside a worker)."""
+    client = _initialize_chroma()
+    collection = client.get_collection(collection_name)
+    
+    source_stats = {}
+    for page in _iter_collection_pages(collection, include=['metadatas']):
+        _summarize_metadatas(page.get('metadatas') or [], source_stats)
+    _write_collection_summary(collection_name, source_stats)
+    return source_stats
+
+def _write_collection_summary(collection_name: str, source_stats: Dict[str, Dict[str, Any]]):
+    """Replace a collection's summary rows with source_stats and mark it tracked."""
+    with _open_sidecar(SUMMARY_FILE, SUMMARY_SCHEMA) as conn:
+        conn.execute("DELETE FROM source_summary WHERE collection = ?", (collection_name,))
+        conn.executemany(
+            """INSERT INTO source_summary (collection, source, source_type, chunk_count, total_characters,
+                                           total_tokens, first_added, last_updated)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(collection_name, s["source"], s["source_type"], s["chunk_count"], s["total_characters"],
+              s["total_tokens"], s["first_added"], s["last_updated"]) for s in source_stats.values()]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO tracked_collections (collection, rebuilt_at) VALUES (?, ?)",
+            (collection_name, datetime.now().isoformat())
+        )
+
+def _backfill_ingested_at(collection_name: str) -> int:
+    """
+    Give chunks stored before ingested_at existed a value parsed from their timestamp,
+    so date-range filters see them (runs inside a worker). Returns the number updated.
+    """
+    collection = _initialize_chroma().get_collection(collection_name)
+    updated = 0
+    for page in _iter_collection_pages(collection, include=['metadatas']):
+        ids, metadatas = [], []
+        for chunk_id, meta in zip(page.get('ids') or [], page.get('metadatas') or []):
+            if meta and "ingested_at" not in meta and _timestamp_to_epoch(meta.get("timestamp")) is not None:
+                ids.append(chunk_id)
+                metadatas.append({**meta, "ingested_at": _timestamp_to_epoch(meta["timestamp"])})
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+            updated += len(ids)
+    return updated
+
+def _timestamp_to_epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Convert a stored ISO timestamp to epoch seconds (None if missing or unparseable)."""
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def _parse_time_bound(value: Union[str, int, float]) -> float:
+    """
+    Parse an added_after/added_before bound into epoch seconds. Accepts epoch numbers,
+    ISO dates or datetimes ("2024-06-01", "2024-06-01T12:00:00") and relative ages
+    ("30m", "12h", "7d", "2w" ago).
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid time bound: {value!r}")
+    if isinstance(value, (int, float)):
+        return float(value)
+    
+    text = str(value).strip().lower()
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([mhdw])", text)
+    if match:
+        return time.time() - float(match.group(1)) * RELATIVE_TIME_UNITS[match.group(2)]
+    epoch = _timestamp_to_epoch(str(value).strip())
+    if epoch is None:
+        raise ValueError(f"Invalid time bound: {value!r} (use an ISO date, epoch seconds or an age like '7d')")
+    return epoch
+
+def _normalize_where(where: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a metadata filter and put it in the form Chroma expects: one condition per
+    dict, several top-level fields combined with $and.
+    """
+    if not isinstance(where, dict) or not where:
+        raise ValueError("where must be a non-empty object")
+    
+    def _check_value(field, value, operator):
+        if operator in ("$in", "$nin"):
+            if not isinstance(value, list) or not value or not all(isinstance(v, (str, int, float, bool)) for v in value):
+                raise ValueError(f"{field}: {operator} needs a non-empty list of strings, numbers or booleans")
+        elif not isinstance(value, (str, int, float, bool)):
+            raise ValueError(f"{field}: filter values must be strings, numbers or booleans")
+    
+    clauses = []
+    for field, condition in where.items():
+        if field in ("$and", "$or"):
+            if not isinstance(condition, list) or len(condition) < 2:
+                raise ValueError(f"{field} needs a list of at least two conditions")
+            clauses.append({field: [_normalize_where(item) for item in condition]})
+        elif field.startswith("$"):
+            raise ValueError(f"Unsupported operator '{field}'")
+        elif isinstance(condition, dict):
+            if len(condition) != 1 or next(iter(condition)) not in WHERE_OPERATORS:
+                raise ValueError(f"{field}: use exactly one of {', '.join(WHERE_OPERATORS)}")
+            operator, value = next(iter(condition.items()))
+            _check_value(field, value, operator)
+            clauses.append({field: {operator: value}})
+        else:
+            _check_value(field, condition, "$eq")
+            clauses.append({field: condition})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _build_search_filter(where: Optional[Dict[str, Any]], added_after=None, added_before=None) -> Optional[Dict[str, Any]]:
+    """Combine a metadata filter and ingestion-time bounds into one Chroma where clause."""
+    clauses = []
+    if where:
+        clauses.append(_normalize_where(where))
+    if added_after is not None:
+        clauses.append({"ingested_at": {"$gte": _parse_time_bound(added_after)}})
+    if added_before is not None:
+        clauses.append({"ingested_at": {"$lt": _parse_time_bound(added_before)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _prepare_sidecar_writes(collection, collection_name: str) -> Dict[str, bool]:
+    """
+    Decide which sidecar stores a write should update (runs inside a worker).
+    Returns {"summary": bool, "lexical": bool, "fingerprints": bool, "vectors": layout or None}: True for stores
+    already tracking the collection; an empty collection becomes tracked here (and gets
+    its vector layout). Writes to untracked collections are picked up by the next
+    rebuild instead.
+    """
+    empty = None
+    
+    def _collection_is_empty():
+        nonlocal empty
+        if empty is None:
+            empty = collection.count() == 0
+        return empty
+    
+    with _open_sidecar(SUMMARY_FILE, SUMMARY_SCHEMA) as conn:
+        summary = bool(conn.execute("SELECT 1 FROM tracked_collections WHERE collection = ?", (collection_name,)).fetchone())
+        if not summary and _collection_is_empty():
+            conn.execute(
+                "INSERT OR REPLACE INTO tracked_collections (collection, rebuilt_at) VALUES (?, ?)",
+                (collection_name, datetime.now().isoformat())
+            )
+            summary = True
+    
+    with _open_sidecar(LEXICAL_INDEX_FILE, LEXICAL_SCHEMA) as conn:
+        lexical = bool(conn.execute("SELECT 1 FROM lexical_collections WHERE collection = ?", (collection_name,)).fetchone())
+        if not lexical and _collection_is_empty():
+            _create_lexical_table(conn, collection_name)
+            lexical = True
+    
+    with _open_sidecar(FINGERPRINT_FILE, FINGERPRINT_SCHEMA) as conn:
+        fingerprints = bool(conn.execute("SELECT 1 FROM fingerprint_collections WHERE collection = ?",
+                                         (collection_name,)).fetchone())
+        if not fingerprints and _collection_is_empty():
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprint_collections (collection, built_at) VALUES (?, ?)",
+                (collection_name, datetime.now().isoformat())
+            )
+            fingerprints = True
+    
+    with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+        row = conn.execute(
+            "SELECT index_dimension, rescore_precision FROM vector_layouts WHERE collection = ?", (collection_name,)
+        ).fetchone()
+        if row is not None:
+            vectors = {"index_dimension": row[0], "rescore_precision": row[1]}
+        elif _collection_is_empty():
+            vectors = _record_vector_layout(conn, collection_name)
+        else:
+            vectors = None  # Predates layouts: full-dimension index, no rescore vectors
+    
+    return {"summary": summary, "lexical": lexical, "fingerprints": fingerprints, "vectors": vectors}
+
+def _apply_summary_delta(collection_name: str, source: str, source_type: str,
+                         added_metadatas: List[Dict[str, Any]], removed_metadatas: List[Dict[str, Any]],
+                         timestamp: Optional[str]):
+    """Add written chunks to (and subtract deleted chunks from) a source's summary row."""
+    chunk_delta = len(added_metadatas) - len(removed_metadatas)
+    character_delta = (sum(m.get('chunk_length', 0) for m in added_metadatas)
+                       - sum((m or {}).get('chunk_length', 0) for m in removed_metadatas))
+    token_delta = (sum(m.get('token_count', 0) for m in added_metadatas)
+                   - sum((m or {}).get('token_count', 0) for m in removed_metadatas))
+    
+    with _open_sidecar(SUMMARY_FILE, SUMMARY_SCHEMA) as conn:
+        conn.execute(
+            """INSERT INTO source_summary (collection, source, source_type, chunk_count, total_characters,
+                                           total_tokens, first_added, last_updated)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (collection, source) DO UPDATE SET
+                   source_type = excluded.source_type,
+                   chunk_count = chunk_count + excluded.chunk_count,
+                   total_characters = total_characters + excluded.total_characters,
+                   total_tokens = total_tokens + excluded.total_tokens,
+                   first_added = COALESCE(MIN(first_added, excluded.first_added), first_added, excluded.first_added),
+                   last_updated = COALESCE(MAX(last_updated, excluded.last_updated), last_updated, excluded.last_updated)""",
+            (collection_name, source, source_type, chunk_delta, character_delta, token_delta, timestamp, timestamp)
+        )
+        conn.execute(
+            "DELETE FROM source_summary WHERE collection = ? AND source = ? AND chunk_count <= 0",
+            (collection_name, source)
+        )
+
+def _get_collection_sources(collection_name: str) -> List[Dict[str, Any]]:
+    """Get per-source totals from the summary, rebuilding it first if the collection is untracked."""
+    with _open_sidecar(SUMMARY_FILE, SUMMARY_SCHEMA) as conn:
+        tracked = conn.execute("SELECT 1 FROM tracked_collections WHERE collection = ?", (collection_name,)).fetchone()
+        if tracked:
+            rows = conn.execute(
+                """SELECT source, source_type, first_added, last_updated, chunk_count, total_characters, total_tokens
+                   FROM source_summary WHERE collection = ? ORDER BY chunk_count DESC""",
+                (collection_name,)
+            ).fetchall()
+            columns = ["source", "source_type", "first_added", "last_updated",
+                       "chunk_count", "total_characters", "total_tokens"]
+            return [dict(zip(columns, row)) for row in rows]
+    
+    source_stats = _rebuild_collection_summary(collection_name)
+    return sorted(source_stats.values(), key=lambda x: x["chunk_count"], reverse=True)
+
+def _get_collection_totals(collection_name: str):
+    """Get (chunk_count, sources, source_types) for a collection from the summary (runs inside a worker)."""
+    with _open_sidecar(SUMMARY_FILE, SUMMARY_SCHEMA) as conn:
+        tracked = conn.execute("SELECT 1 FROM tracked_collections WHERE collection = ?", (collection_name,)).fetchone()
+        if tracked:
+            chunk_count, source_count = conn.execute(
+                "SELECT COALESCE(SUM(chunk_count), 0), COUNT(*) FROM source_summary WHERE collection = ?",
+                (collection_name,)
+            ).fetchone()
+            source_types = [row[0] for row in conn.execute(
+                "SELECT DISTINCT source_type FROM source_summary WHERE collection = ?", (collection_name,)
+            )]
+            return chunk_count, source_count, source_types
+    
+    source_stats = _rebuild_collection_summary(collection_name)
+    return (
+        sum(s["chunk_count"] for s in source_stats.values()),
+        len(source_stats),
+        list(set(s["source_type"] for s in source_stats.values()))
+    )
+
+def _list_collection_names() -> List[str]:
+    """List collection names (runs inside a worker)."""
+    client = _initialize_chroma()
+    try:
+        collections = client.list_collections()
+        return [col.name for col in collections] if collections else []
+    except Exception:
+        return []
+
+def _lexical_table_name(collection_name: str) -> str:
+    """Get the FTS5 table holding a collection's keyword index."""
+    return "fts_" + hashlib.sha1(collection_name.encode("utf-8")).hexdigest()[:16]
+
+def _lexical_rowid(doc_id: str) -> int:
+    """Map a chunk ID to a stable FTS5 rowid so chunks can be replaced or deleted by ID."""
+    return int.from_bytes(hashlib.sha256(doc_id.encode("utf-8")).digest()[:8], "big", signed=True)
+
+def _create_lexical_table(conn, collection_name: str) -> str:
+    """Create a collection's (empty) FTS5 table and mark the collection tracked."""
+    table_name = _lexical_table_name(collection_name)
+    conn.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {table_name} '
+        f'USING fts5(doc_id UNINDEXED, content, tokenize="{LEXICAL_TOKENIZER}")'
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO lexical_collections (collection, table_name, built_at) VALUES (?, ?, ?)",
+        (collection_name, table_name, datetime.now().isoformat())
+    )
+    return table_name
+
+def _lexical_index_write(collection_name: str, added_ids: List[str], added_documents: List[str],
+                         removed_ids: List[str]):
+    """Add written chunks to (and remove deleted chunks from) a collection's keyword index."""
+    table_name = _lexical_table_name(collection_name)
+    with _open_sidecar(LEXICAL_INDEX_FILE, LEXICAL_SCHEMA) as conn:
+        conn.executemany(
+            f"DELETE FROM {table_name} WHERE rowid = ?",
+            [(_lexical_rowid(doc_id),) for doc_id in list(removed_ids) + list(added_ids)]
+        )
+        conn.executemany(
+            f"INSERT INTO {table_name} (rowid, doc_id, content) VALUES (?, ?, ?)",
+            [(_lexical_rowid(doc_id), doc_id, document) for doc_id, document in zip(added_ids, added_documents)]
+        )
+
+def _rebuild_lexical_index(collection_name: str, collection=None) -> int:
+    """Recompute a collection's keyword index from Chroma and mark it tracked (runs inside a worker)."""
+    if collection is None:
+        collection = _initialize_chroma().get_collection(collection_name)
+    
+    indexed = 0
+    with _open_sidecar(LEXICAL_INDEX_FILE, LEXICAL_SCHEMA) as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {_lexical_table_name(collection_name)}")
+        table_name = _create_lexical_table(conn, collection_name)
+        for page in _iter_collection_pages(collection, include=['documents']):
+            rows = [(_lexical_rowid(doc_id), doc_id, document or "")
+                    for doc_id, document in zip(page.get('ids') or [], page.get('documents') or [])]
+            conn.executemany(f"INSERT OR REPLACE INTO {table_name} (rowid, doc_id, content) VALUES (?, ?, ?)", rows)
+            indexed += len(rows)
+    return indexed
+
+def _lexical_match_expression(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 expression matching any of its terms."""
+    terms = list(dict.fromkeys(re.findall(r"[\w\-]+", query.lower())))
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+def _lexical_search(collection_name: str, query: str, limit: int) -> Optional[List[tuple]]:
+    """
+    Rank a collection's chunks by BM25 for the query (runs inside a worker).
+    Returns (chunk_id, bm25_score) pairs, best first; higher scores are better.
+    Returns None while the collection has no keyword index yet (see _schedule_lexical_build).
+    """
+    expression = _lexical_match_expression(query)
+    if expression is None:
+        return []
+    
+    table_name = _lexical_table_name(collection_name)
+    with _open_sidecar(LEXICAL_INDEX_FILE, LEXICAL_SCHEMA) as conn:
+        if not conn.execute("SELECT 1 FROM lexical_collections WHERE collection = ?", (collection_name,)).fetchone():
+            return None
+        rows = conn.execute(
+            f"SELECT doc_id, bm25({table_name}) FROM {table_name} WHERE {table_name} MATCH ? "
+            f"ORDER BY bm25({table_name}) LIMIT ?",
+            (expression, limit)
+        ).fetchall()
+    # FTS5's bm25() is negative, lower meaning more relevant
+    return [(doc_id, -score) for doc_id, score in rows]
+
+async def _build_lexical_index(collection_name: str):
+    """Build a missing keyword index on the ingest lane, logging rather than raising failures."""
+    try:
+        indexed = await _run_in_worker("ingest", _rebuild_lexical_index, collection_name)
+        logging.getLogger(__name__).info(f"Built keyword index for '{collection_name}' ({indexed} chunks)")
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Could not build keyword index for '{collection_name}': {e}")
+
+def _schedule_lexical_build(collection_name: str):
+    """
+    Start building a collection's keyword index in the background unless a build is
+    already running on this event loop. Searches fall back to vector results meanwhile.
+    """
+    loop = asyncio.get_running_loop()
+    task = _lexical_builds.get(collection_name)
+    if task is not None and not task.done() and task.get_loop() is loop:
+        return
+    task = loop.create_task(_build_lexical_index(collection_name))
+    _lexical_builds[collection_name] = task
+    
+    def forget(done):
+        if _lexical_builds.get(collection_name) is done:
+            del _lexical_builds[collection_name]
+    task.add_done_callback(forget)
+
+def _reciprocal_rank_fusion(rankings: List[List[str]], k: int) -> List[tuple]:
+    """Fuse ranked ID lists with RRF: each list contributes 1 / (k + rank) per ID."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def _get_dedup_config() -> Dict[str, Any]:
+    """Get near-duplicate detection settings, filling in defaults missing from older config files."""
+    dedup_config = {
+        "enabled": True,
+        "similarity_threshold": 0.8,
+        "shingle_size": 3
+    }
+    dedup_config.update(_load_config().get("deduplication", {}))
+    return dedup_config
+
+def _minhash_signatures(texts: List[str], shingle_size: int):
+    """
+    Compute MinHash signatures (uint32 array, one row per text) over lower-cased word shingles.
+    Words are hashed once with a stable hash and shingle hashes are mixed from them in
+    numpy, so signatures match across processes and cost about as much as tokenizing.
+    """
+    import numpy as np
+    
+    seeds = np.frombuffer(b"".join(hashlib.blake2b(f"kb-minhash-{i}".encode("ascii"), digest_size=16).digest()
+                                   for i in range(MINHASH_PERMUTATIONS)), dtype="<u8").reshape(-1, 2)
+    multipliers = seeds[:, 0] | np.uint64(1)
+    offsets = seeds[:, 1]
+    word_hashes = {}
+    
+    def word_hash(word):
+        value = word_hashes.get(word)
+        if value is None:
+            value = word_hashes[word] = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+        return value
+    
+    signatures = np.empty((len(texts), MINHASH_PERMUTATIONS), dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for row, text in enumerate(texts):
+            words = np.array([word_hash(word) for word in re.findall(r"\w+", text.lower())] or [0], dtype=np.uint64)
+            width = min(shingle_size, len(words))
+            shingles = np.zeros(len(words) - width + 1, dtype=np.uint64)
+            for offset in range(width):
+                shingles = shingles * np.uint64(0x100000001B3) + words[offset:len(words) - width + 1 + offset]
+            # Multiply-shift hashing: the high 32 bits of a * x + b for each permutation
+            hashed = (np.unique(shingles)[:, None] * multipliers + offsets) >> np.uint64(32)
+            signatures[row] = hashed.min(axis=0)
+    return signatures
+
+def _band_keys(signature) -> List[int]:
+    """Hash each LSH band of a signature to a signed 64-bit key (SQLite integers are signed)."""
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    return [int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+                           "big", signed=True)
+            for band in range(MINHASH_BANDS)]
+
+def _find_near_duplicates(collection_name: str, candidates: List[tuple], ignored_ids: List[str],
+                          use_index: bool, dedup_config: Dict[str, Any]):
+    """
+    Check new chunks, given as (chunk_id, source, text) in ingestion order, against the
+    collection's fingerprint index (when use_index) and against each other.
+    Returns ({duplicate chunk_id: kept chunk_id}, {kept chunk_id: signature}).
+    ignored_ids are stored chunks about to be deleted, which must not absorb new ones.
+    """
+    import numpy as np
+    
+    threshold = float(dedup_config["similarity_threshold"])
+    signatures = _minhash_signatures([text for _, _, text in candidates], max(1, int(dedup_config["shingle_size"])))
+    ignored = set(ignored_ids)
+    batch_bands = {}
+    duplicates = {}
+    kept = {}
+    
+    with contextlib.ExitStack() as stack:
+        conn = stack.enter_context(_open_sidecar(FINGERPRINT_FILE, FINGERPRINT_SCHEMA)) if use_index else None
+        for (chunk_id, _, _), signature in zip(candidates, signatures):
+            keys = _band_keys(signature)
+            matches = {}
+            if conn is not None:
+                rows = conn.execute(
+                    "SELECT f.chunk_id, f.signature FROM chunk_fingerprints f WHERE f.collection = ? AND f.chunk_id IN "
+                    "(SELECT chunk_id FROM fingerprint_bands WHERE collection = ? AND (band, band_key) IN "
+                    f"(VALUES {', '.join(['(?, ?)'] * MINHASH_BANDS)}))",
+                    (collection_name, collection_name, *[value for band, key in enumerate(keys) for value in (band, key)])
+                ).fetchall()
+                matches = {stored_id: np.frombuffer(blob, dtype="<u4") for stored_id, blob in rows
+                           if stored_id not in ignored}
+            for band, key in enumerate(keys):
+                matches.update(batch_bands.get((band, key), {}))
+            
+            match = next((other_id for other_id, other in matches.items()
+                          if np.mean(signature == other) >= threshold), None)
+            if match is not None:
+                duplicates[chunk_id] = match
+                continue
+            kept[chunk_id] = signature
+            for band, key in enumerate(keys):
+                batch_bands.setdefault((band, key), {})[chunk_id] = signature
+    return duplicates, kept
+
+def _write_fingerprints(conn, collection_name: str, added: List[tuple]):
+    """Insert (chunk_id, source, signature) rows and their LSH band keys."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO chunk_fingerprints (collection, chunk_id, source, signature) VALUES (?, ?, ?, ?)",
+        [(collection_name, chunk_id, source, signature.astype("<u4").tobytes()) for chunk_id, source, signature in added]
+    )
+    conn.executemany(
+        "INSERT INTO fingerprint_bands (collection, band, band_key, chunk_id) VALUES (?, ?, ?, ?)",
+        [(collection_name, band, key, chunk_id)
+         for chunk_id, _, signature in added for band, key in enumerate(_band_keys(signature))]
+    )
+
+def _fingerprint_index_write(collection_name: str, added: List[tuple], removed_ids: List[str]):
+    """Add (chunk_id, source, signature) entries for written chunks and drop deleted chunks."""
+    with _open_sidecar(FINGERPRINT_FILE, FINGERPRINT_SCHEMA) as conn:
+        for table in ("chunk_fingerprints", "fingerprint_bands"):
+            conn.executemany(f"DELETE FROM {table} WHERE collection = ? AND chunk_id = ?",
+                             [(collection_name, chunk_id) for chunk_id in list(removed_ids) + [a[0] for a in added]])
+        _write_fingerprints(conn, collection_name, added)
+
+def _rebuild_fingerprint_index(collection_name: str, collection=None) -> int:
+    """Recompute a collection's fingerprint index from Chroma and mark it tracked (runs inside a worker)."""
+    if collection is None:
+        collection = _initialize_chroma().get_collection(collection_name)
+    shingle_size = max(1, int(_get_dedup_config()["shingle_size"]))
+    
+    indexed = 0
+    with _open_sidecar(FINGERPRINT_FILE, FINGERPRINT_SCHEMA) as conn:
+        for table in ("chunk_fingerprints", "fingerprint_bands"):
+            conn.execute(f"DELETE FROM {table} WHERE collection = ?", (collection_name,))
+        for page in _iter_collection_pages(collection, include=['documents', 'metadatas']):
+            ids = page.get('ids') or []
+            metadatas = page.get('metadatas') or [None] * len(ids)
+            signatures = _minhash_signatures([document or "" for document in page.get('documents') or []], shingle_size)
+            _write_fingerprints(conn, collection_name, [
+                (chunk_id, (meta or {}).get('source_url') or (meta or {}).get('source_name'), signature)
+                for chunk_id, meta, signature in zip(ids, metadatas, signatures)
+            ])
+            indexed += len(ids)
+        conn.execute(
+            "INSERT OR REPLACE INTO fingerprint_collections (collection, built_at) VALUES (?, ?)",
+            (collection_name, datetime.now().isoformat())
+        )
+    return indexed
+
+def _get_hybrid_config() -> Dict[str, Any]:
+    """Get hybrid search settings, with defaults for older config files."""
+    search_config = _load_config().get("search", {})
+    hybrid_config = search_config.get("hybrid", {})
+    return {
+        "default_mode": search_config.get("default_mode", "vector"),
+        "rrf_k": hybrid_config.get("rrf_k", 60),
+        "candidate_multiplier": hybrid_config.get("candidate_multiplier", 4),
+        "max_candidates": hybrid_config.get("max_candidates", 100)
+    }
+
+def _get_rerank_config() -> Dict[str, Any]:
+    """Get re-ranking settings, filling in defaults missing from older config files."""
+    rerank_config = {
+        "default": "none",
+        "candidate_multiplier": 4,
+        "max_candidates": 50,
+        "mmr_lambda": 0.5,
+        "cross_encoder_model": "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        "cross_encoder_batch_size": 16,
+        "latency_budget_ms": 250
+    }
+    rerank_config.update(_load_config().get("search", {}).get("rerank", {}))
+    return rerank_config
+
+def _rerank_candidate_count(limit: int, rerank_config: Dict[str, Any]) -> int:
+    """Number of candidates to retrieve so the re-ranking stage has something to choose from."""
+    return max(limit, min(limit * int(rerank_config["candidate_multiplier"]), int(rerank_config["max_candidates"])))
+
+def _initialize_cross_encoder():
+    """Load the cross-encoder re-ranking model once, silently (like the embedding model)."""
+    global _cross_encoder
+    if _cross_encoder is not None:
+        return _cross_encoder
+    
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        raise ImportError("sentence-transformers not available. Install with: pip install sentence-transformers")
+    
+    with _cross_encoder_lock:
+        if _cross_encoder is None:
+            with suppress_stdout_stderr():
+                from sentence_transformers import CrossEncoder
+                _cross_encoder = CrossEncoder(_get_rerank_config()["cross_encoder_model"])
+    return _cross_encoder
+
+def _cross_encoder_scores(query: str, documents: List[str], budget_ms: float, batch_size: int) -> List[Optional[float]]:
+    """
+    Score (query, document) pairs in candidate order, stopping before a batch that would
+    overrun budget_ms (the first batch always runs). Unscored documents get None.
+    """
+    model = _initialize_cross_encoder()
+    scores: List[Optional[float]] = [None] * len(documents)
+    started = time.perf_counter()
+    slowest_batch = 0.0
+    for offset in range(0, len(documents), batch_size):
+        elapsed = (time.perf_counter() - started) * 1000
+        if offset and elapsed + slowest_batch > budget_ms:
+            break
+        batch_started = time.perf_counter()
+        batch = documents[offset:offset + batch_size]
+        batch_scores = model.predict([(query, document) for document in batch])
+        scores[offset:offset + len(batch)] = [float(score) for score in batch_scores]
+        slowest_batch = max(slowest_batch, (time.perf_counter() - batch_started) * 1000)
+    return scores
+
+def _mmr_order(relevance: List[Optional[float]], embeddings: List[List[float]], mmr_lambda: float, count: int) -> List[int]:
+    """
+    Pick count candidates by maximal marginal relevance: each step takes the candidate
+    maximizing lambda * relevance - (1 - lambda) * (max cosine similarity to those
+    already picked). Relevance is min-max scaled so it is comparable to cosine similarity.
+    """
+    import numpy as np
+    
+    values = np.array([np.nan if r is None else r for r in relevance], dtype=np.float64)
+    floor = np.nanmin(values) if not np.all(np.isnan(values)) else 0.0
+    values = np.where(np.isnan(values), floor, values)
+    spread = values.max() - values.min()
+    values = (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+    
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms > 0, norms, 1.0)
+    similarity = vectors @ vectors.T
+    
+    selected = []
+    max_similarity = np.full(len(values), -np.inf)
+    available = np.ones(len(values), dtype=bool)
+    for _ in range(min(count, len(values))):
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        scores = np.where(available, mmr_lambda * values - (1 - mmr_lambda) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    return selected
+
+async def _rerank_results(query: str, results: List[Dict[str, Any]], limit: int, rerank: str,
+                          rerank_config: Dict[str, Any], score_field: str):
+    """
+    Re-rank a candidate pool and cut it to limit, returning (results, rerank stats).
+    The cross-encoder re-orders candidates by relevance within latency_budget_ms;
+    MMR then picks diverse results using the candidates' "_embedding" (removed here).
+    """
+    stats = {"mode": rerank, "candidates": len(results), "latency_ms": {}}
+    embeddings = [result.pop("_embedding", None) for result in results]
+    relevance = [result.get(score_field) for result in results]
+    for result in results:
+        result["retrieval_rank"] = result["rank"]
+    
+    if "cross_encoder" in rerank and results:
+        started = time.perf_counter()
+        scores = await _run_in_worker(
+            "search", _cross_encoder_scores, query, [result["content"] for result in results],
+            float(rerank_config["latency_budget_ms"]), max(1, int(rerank_config["cross_encoder_batch_size"])),
+            cpu_bound=True
+        )
+        stats["latency_ms"]["cross_encoder"] = round((time.perf_counter() - started) * 1000, 2)
+        scored = sorted((i for i, score in enumerate(scores) if score is not None), key=lambda i: scores[i], reverse=True)
+        order = scored + [i for i, score in enumerate(scores) if score is None]
+        for i in scored:
+            results[i]["rerank_score"] = scores[i]
+        stats["cross_encoder_scored"] = len(scored)
+        stats["budget_exhausted"] = len(scored) < len(results)
+        results = [results[i] for i in order]
+        embeddings = [embeddings[i] for i in order]
+        relevance = [scores[i] for i in order]
+    
+    if "mmr" in rerank and results:
+        if any(embedding is None for embedding in embeddings):
+            stats["mmr_skipped"] = "candidate embeddings unavailable"
+        else:
+            started = time.perf_counter()
+            order = _mmr_order(relevance, embeddings, float(rerank_config["mmr_lambda"]), limit)
+            results = [results[i] for i in order]
+            stats["latency_ms"]["mmr"] = round((time.perf_counter() - started) * 1000, 2)
+    
+    results = results[:limit]
+    for rank, result in enumerate(results, start=1):
+        result["rank"] = rank
+    return results, stats
+
+def _drop_collection_sidecars(collection_name: str):
+    """Remove a collection's rows from every sidecar store (summary, keyword, vectors, fingerprints)."""
+    with _open_sidecar(SUMMARY_FILE, SUMMARY_SCHEMA) as conn:
+        conn.execute("DELETE FROM source_summary WHERE collection = ?", (collection_name,))
+        conn.execute("DELETE FROM tracked_collections WHERE collection = ?", (collection_name,))
+    with _open_sidecar(LEXICAL_INDEX_FILE, LEXICAL_SCHEMA) as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {_lexical_table_name(collection_name)}")
+        conn.execute("DELETE FROM lexical_collections WHERE collection = ?", (collection_name,))
+    with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+        conn.execute("DELETE FROM vector_layouts WHERE collection = ?", (collection_name,))
+        conn.execute("DELETE FROM rescore_vectors WHERE collection = ?", (collection_name,))
+    with _open_sidecar(FINGERPRINT_FILE, FINGERPRINT_SCHEMA) as conn:
+        for table in ("fingerprint_collections", "chunk_fingerprints", "fingerprint_bands"):
+            conn.execute(f"DELETE FROM {table} WHERE collection = ?", (collection_name,))
+
+def _export_snapshot(collection_name: str, output_dir: Path, page_size: int) -> Dict[str, Any]:
+    """
+    Write a collection snapshot to output_dir page by page (runs inside a worker).
+    Returns the manifest.
+    """
+    import numpy as np
+    
+    collection = _initialize_chroma().get_collection(collection_name)
+    layout = _get_vector_layout(collection_name)
+    precision = layout["rescore_precision"] if layout else "none"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    count = 0
+    dimension = None
+    rescore_dimension = None
+    rescore_files = None
+    with contextlib.ExitStack() as stack:
+        embeddings_file = stack.enter_context(open(output_dir / SNAPSHOT_FILES["embeddings"], "wb"))
+        records_file = stack.enter_context(gzip.open(output_dir / SNAPSHOT_FILES["records"], "wt", encoding="utf-8",
+                                                     compresslevel=6))
+        if precision != "none":
+            rescore_files = (stack.enter_context(open(output_dir / SNAPSHOT_FILES["rescore_vectors"], "wb")),
+                             stack.enter_context(open(output_dir / SNAPSHOT_FILES["rescore_scales"], "wb")))
+            conn = stack.enter_context(_open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA))
+            # Every row needs the same width, including those of chunks without a stored vector
+            stored_width = conn.execute(
+                "SELECT length(vector) FROM rescore_vectors WHERE collection = ? LIMIT 1", (collection_name,)
+            ).fetchone()
+            row_bytes = stored_width[0] if stored_width else 0
+            rescore_dimension = row_bytes // (1 if precision == "int8" else 4)
+        
+        for page in _iter_collection_pages(collection, include=['embeddings', 'documents', 'metadatas'],
+                                           page_size=page_size):
+            ids = page['ids']
+            vectors = np.asarray(page['embeddings'], dtype="<f4")
+            if dimension is None:
+                dimension = vectors.shape[1]
+            elif vectors.shape[1] != dimension:
+                raise ValueError(f"Collection '{collection_name}' mixes embedding dimensions")
+            embeddings_file.write(vectors.tobytes())
+            for chunk_id, document, meta in zip(ids, page['documents'], page['metadatas']):
+                records_file.write(json.dumps({"id": chunk_id, "document": document, "metadata": meta},
+                                              ensure_ascii=False) + "\n")
+            
+            if rescore_files:
+                stored = {}
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    stored.update((chunk_id, (blob, scale)) for chunk_id, blob, scale in conn.execute(
+                        f"SELECT chunk_id, vector, scale FROM rescore_vectors WHERE collection = ? "
+                        f"AND chunk_id IN ({','.join('?' * len(batch))})",
+                        [collection_name, *batch]
+                    ))
+                for chunk_id in ids:
+                    blob, scale = stored.get(chunk_id, (None, float("nan")))
+                    if blob is not None and len(blob) != row_bytes:
+                        raise ValueError(f"Collection '{collection_name}' mixes rescore vector sizes")
+                    # Chunks without a rescore vector get a zero row and a NaN scale
+                    rescore_files[0].write(blob if blob is not None else bytes(row_bytes))
+                    rescore_files[1].write(array("f", [scale]).tobytes())
+            count += len(ids)
+    
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "collection": collection_name,
+        "created_at": datetime.now().isoformat(),
+        "count": count,
+        "dimension": dimension or 0,
+        "dtype": "float32",
+        "byte_order": "little",
+        "embedding_model": _load_config()["embedding"]["model_name"],
+        "vector_layout": layout,
+        "rescore": {"precision": precision, "dimension": rescore_dimension} if rescore_files else None,
+        "files": {name: filename for name, filename in SNAPSHOT_FILES.items()
+                  if name != "manifest" and (rescore_files or not name.startswith("rescore"))}
+    }
+    (output_dir / SNAPSHOT_FILES["manifest"]).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+def _read_snapshot_manifest(snapshot_dir: Path) -> Dict[str, Any]:
+    """Load and check a snapshot manifest and the size of its embeddings file."""
+    manifest_path = snapshot_dir / SNAPSHOT_FILES["manifest"]
+    if not manifest_path.exists():
+        raise ValueError(f"No snapshot manifest in {snapshot_dir}")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')} v{manifest.get('version')}")
+    expected_bytes = manifest["count"] * manifest["dimension"] * 4
+    actual_bytes = (snapshot_dir / manifest["files"]["embeddings"]).stat().st_size
+    if actual_bytes != expected_bytes:
+        raise ValueError(f"Embeddings file holds {actual_bytes} bytes, expected {expected_bytes}")
+    return manifest
+
+def _import_snapshot(snapshot_dir: Path, manifest: Dict[str, Any], collection_name: str, overwrite: bool,
+                     batch_size: int) -> Dict[str, Any]:
+    """
+    Bulk-load a snapshot into a collection batch by batch (runs inside a worker).
+    Stored embeddings are written as they are, so the embedding model is never loaded;
+    the summary, keyword, rescore and fingerprint stores are filled in the same pass.
+    """
+    import numpy as np
+    
+    client = _initialize_chroma()
+    if collection_name in _list_collection_names():
+        if client.get_collection(collection_name).count() and not overwrite:
+            raise ValueError(f"Collection '{collection_name}' already has chunks; pass overwrite=True to replace it")
+        client.delete_collection(collection_name)
+    _drop_collection_sidecars(collection_name)
+    collection = client.get_or_create_collection(collection_name)
+    
+    layout = manifest.get("vector_layout") or {"index_dimension": None, "rescore_precision": "none"}
+    rescore = manifest.get("rescore")
+    with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO vector_layouts (collection, index_dimension, rescore_precision, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (collection_name, layout["index_dimension"], rescore["precision"] if rescore else "none",
+             datetime.now().isoformat())
+        )
+    with _open_sidecar(LEXICAL_INDEX_FILE, LEXICAL_SCHEMA) as conn:
+        _create_lexical_table(conn, collection_name)
+    dedup_config = _get_dedup_config()
     
-    with suppress_stdout_stderr():
-        import chromadb
-        from chromadb.config import Settings
-        
-        config = _load_config()
-        db_path = config["storage"]["database_path"]
-        
-        # Ensure directory exists
-        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    dimension = manifest["dimension"]
+    rescore_row_bytes = 0
+    if rescore:
+        rescore_row_bytes = (rescore["dimension"] or 0) * (1 if rescore["precision"] == "int8" else 4)
+    
+    loaded = 0
+    rescore_loaded = 0
+    source_stats = {}
+    with contextlib.ExitStack() as stack:
+        embeddings_file = stack.enter_context(open(snapshot_dir / manifest["files"]["embeddings"], "rb"))
+        records_file = stack.enter_context(gzip.open(snapshot_dir / manifest["files"]["records"], "rt",
+                                                     encoding="utf-8"))
+        if rescore:
+            rescore_files = (stack.enter_context(open(snapshot_dir / manifest["files"]["rescore_vectors"], "rb")),
+                             stack.enter_context(open(snapshot_dir / manifest["files"]["rescore_scales"], "rb")))
         
-        # Initialize persistent client
-        _chroma_client = chromadb.PersistentClient(
-            path=db_path,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
+        while True:
+            records = [json.loads(line) for _, line in zip(range(batch_size), records_file)]
+            if not records:
+                break
+            vectors = np.frombuffer(embeddings_file.read(len(records) * dimension * 4), dtype="<f4")
+            if len(vectors) != len(records) * dimension:
+                raise ValueError("Embeddings file ended before the records file")
+            ids = [record["id"] for record in records]
+            documents = [record["document"] for record in records]
+            metadatas = [record["metadata"] for record in records]
+            
+            collection.add(ids=ids, embeddings=vectors.reshape(len(records), dimension).tolist(),
+                           documents=documents, metadatas=metadatas)
+            _lexical_index_write(collection_name, ids, documents, [])
+            _summarize_metadatas(metadatas, source_stats)
+            
+            if rescore:
+                blobs = rescore_files[0].read(len(records) * rescore_row_bytes)
+                scales = array("f")
+                scales.frombytes(rescore_files[1].read(len(records) * 4))
+                rows = [(collection_name, chunk_id, blobs[i * rescore_row_bytes:(i + 1) * rescore_row_bytes], scale)
+                        for i, (chunk_id, scale) in enumerate(zip(ids, scales)) if scale == scale]
+                with _open_sidecar(VECTOR_STORE_FILE, VECTOR_STORE_SCHEMA) as conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO rescore_vectors (collection, chunk_id, vector, scale) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                rescore_loaded += len(rows)
+            
+            if dedup_config["enabled"]:
+                signatures = _minhash_signatures([document or "" for document in documents],
+                                                 max(1, int(dedup_config["shingle_size"])))
+                with _open_sidecar(FINGERPRINT_FILE, FINGERPRINT_SCHEMA) as conn:
+                    _write_fingerprints(conn, collection_name, [
+                        (chunk_id, (meta or {}).get('source_url') or (meta or {}).get('source_name'), signature)
+                        for chunk_id, meta, signature in zip(ids, metadatas, signatures)
+                    ])
+            loaded += len(records)
+    
+    if dedup_config["enabled"]:
+        with _open_sidecar(FINGERPRINT_FILE, FINGERPRINT_SCHEMA) as conn:
+            conn.execute("INSERT OR REPLACE INTO fingerprint_collections (collection, built_at) VALUES (?, ?)",
+                         (collection_name, datetime.now().isoformat()))
+    _write_collection_summary(collection_name, source_stats)
+    return {"chunks_imported": loaded, "rescore_vectors_imported": rescore_loaded, "source_count": len(source_stats)}
+
+def _get_snapshot_config() -> Dict[str, Any]:
+    """Get snapshot export/import settings, filling in defaults missing from older config files."""
+    snapshot_config = {
+        "directory": None,
+        "page_size": 5000,
+        "import_batch_size": 1000
+    }
+    snapshot_config.update(_load_config().get("snapshots", {}))
+    return snapshot_config
+
+def _get_snapshot_dir() -> Path:
+    """Get the directory snapshots are confined to (snapshots.directory, default knowledge_base/snapshots)."""
+    directory = _get_snapshot_config()["directory"]
+    return Path(directory).expanduser() if directory else _get_kb_dir() / SNAPSHOT_DIR
+
+def _resolve_snapshot_path(path: str) -> Path:
+    """
+    Resolve a caller-supplied snapshot path (relative to the snapshots directory, or
+    absolute) and refuse anything that lands outside that directory.
+    """
+    root = _get_snapshot_dir().resolve()
+    resolved = (root / Path(path).expanduser()).resolve()
+    if root not in resolved.parents:
+        raise ValueError(f"Snapshot paths must be inside the snapshots directory: {root}")
+    return resolved
+
+def _get_jobs_config() -> Dict[str, Any]:
+    """Get background job settings, filling in defaults missing from older config files."""
+    jobs_config = {
+        "max_concurrent_jobs": 2,
+        "max_pending_jobs": 100,
+        "max_items_per_job": 10000
+    }
+    jobs_config.update(_load_config().get("jobs", {}))
+    return jobs_config
+
+def _create_job(collection_name: str, reingest: bool, items: List[Dict[str, Any]]) -> str:
+    """Persist a new queued job and its items, returning the job ID."""
+    job_id = uuid.uuid4().hex
+    with _open_sidecar(JOBS_FILE, JOBS_SCHEMA) as conn:
+        conn.execute(
+            "INSERT INTO jobs (job_id, status, collection, reingest, total_items, created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+            (job_id, collection_name, int(reingest), len(items), datetime.now().isoformat())
+        )
+        conn.executemany(
+            "INSERT INTO job_items (job_id, item_index, kind, source, content, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+            [(job_id, i, item["kind"], item["source"], item.get("content"), json.dumps(item.get("metadata") or {}))
+             for i, item in enumerate(items)]
+        )
+    return job_id
+
+def _count_active_jobs() -> int:
+    """Count jobs that are queued or running."""
+    with _open_sidecar(JOBS_FILE, JOBS_SCHEMA) as conn:
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+def _recover_unfinished_jobs() -> List[str]:
+    """Requeue jobs interrupted by a restart, oldest first; items that were mid-flight run again."""
+    with _open_sidecar(JOBS_FILE, JOBS_SCHEMA) as conn:
+        conn.execute(
+            """UPDATE job_items SET status = 'pending'
+               WHERE status = 'running' AND job_id IN (SELECT job_id FROM jobs WHERE status IN ('queued', 'running'))"""
+        )
+        return [row[0] for row in conn.execute(
+            "SELECT job_id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        )]
+
+def _start_job(job_id: str):
+    """Mark a job running and return (job row, pending items)."""
+    with _open_sidecar(JOBS_FILE, JOBS_SCHEMA) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) WHERE job_id = ?",
+            (datetime.now().isoformat(), job_id)
+        )
+        job = conn.execute("SELECT collection, reingest FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        items = conn.execute(
+            """SELECT item_index, kind, source, content, metadata FROM job_items
+               WHERE job_id = ? AND status IN ('pending', 'running') ORDER BY item_index""",
+            (job_id,)
+        ).fetchall()
+    return job, items
+
+def _update_job_item(job_id: str, item_index: int, status: str, chunks_added: int = 0, error: Optional[str] = None):
+    """Record an item's progress; finished items drop their stored text."""
+    with _open_sidecar(JOBS_FILE, JOBS_SCHEMA) as conn:
+        if status == "running":
+            conn.execute(
+                "UPDATE job_items SET status = 'running' WHERE job_id = ? AND item_index = ?", (job_id, item_index)
             )
+        else:
+            conn.execute(
+                """UPDATE job_items SET status = ?, chunks_added = ?, error = ?, content = NULL
+                   WHERE job_id = ? AND item_index = ?""",
+                (status, chunks_added, error, job_id, item_index)
+            )
+
+def _finish_job(job_id: str) -> str:
+    """Set a job's final status from its items: completed, completed_with_errors or failed."""
+    with _open_sidecar(JOBS_FILE, JOBS_SCHEMA) as conn:
+        total, failed = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(status = 'failed'), 0) FROM job_items WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if failed == 0:
+            status = "completed"
+        elif failed < total:
+            status = "completed_with_errors"
+        else:
+            status = "failed"
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+            (status, datetime.now().isoformat(), job_id)
         )
-    
-    return _chroma_client
+    return status
 
-def _initialize_embedding_model():
-    """Initialize embedding model with complete output suppression."""
-    global _embedding_model
-    if _embedding_model is not None:
-        return _embedding_model
+def _describe_job(conn, job_row: tuple, include_errors: bool) -> Dict[str, Any]:
+    """Build a job's status report from its row and item counts."""
+    job_id, status, collection, total_items, created_at, started_at, finished_at = job_row
+    counts = dict(conn.execute(
+        "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+    ).fetchall())
+    chunks_added = conn.execute(
+        "SELECT COALESCE(SUM(chunks_added), 0) FROM job_items WHERE job_id = ?", (job_id,)
+    ).fetchone()[0]
+    done = counts.get("completed", 0) + counts.get("failed", 0)
     
-    if not SENTENCE_TRANSFORMERS_AVAILABLE:
-        raise ImportError("sentence-transformers not available. Install with: pip install sentence-transformers")
+    job = {
+        "job_id": job_id,
+        "job_status": status,
+        "collection": collection,
+        "progress": {
+            "total_items": total_items,
+            "completed_items": counts.get("completed", 0),
+            "failed_items": counts.get("failed", 0),
+            "pending_items": total_items - done,
+            "percent": round(100 * done / total_items, 1) if total_items else 100.0
+        },
+        "chunks_added": chunks_added,
+        "created_at": created_at,
+        "started_at": started_at,
+        "finished_at": finished_at
+    }
+    if include_errors:
+        job["errors"] = [
+            {"source": source, "error": error}
+            for source, error in conn.execute(
+                """SELECT source, error FROM job_items WHERE job_id = ? AND status = 'failed'
+                   ORDER BY item_index LIMIT 20""",
+                (job_id,)
+            )
+        ]
+    return job
+
+def _get_job_report(job_id: Optional[str], limit: int):
+    """Get one job's report (None if unknown), or the most recent jobs when job_id is None."""
+    columns = "job_id, status, collection, total_items, created_at, started_at, finished_at"
+    with _open_sidecar(JOBS_FILE, JOBS_SCHEMA) as conn:
+        if job_id is not None:
+            row = conn.execute(f"SELECT {columns} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return _describe_job(conn, row, include_errors=True) if row else None
+        rows = conn.execute(f"SELECT {columns} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_describe_job(conn, row, include_errors=False) for row in rows]
+
+async def _ensure_job_workers() -> asyncio.Queue:
+    """
+    Start the job worker pool on the running event loop (once per loop), requeueing
+    jobs left unfinished by a previous run. Returns the job queue.
+    """
+    loop = asyncio.get_running_loop()
+    state = _job_state
+    if state["loop"] is not loop:
+        queue = asyncio.Queue()
+        state.update(loop=loop, queue=queue, workers=set())
+        for _ in range(max(1, int(_get_jobs_config()["max_concurrent_jobs"]))):
+            worker = loop.create_task(_job_worker(queue))
+            state["workers"].add(worker)
+            worker.add_done_callback(state["workers"].discard)
+        for job_id in await _run_in_worker("ingest", _recover_unfinished_jobs):
+            queue.put_nowait(job_id)
+    return state["queue"]
+
+async def _stop_job_workers():
+    """Cancel the job workers; unfinished jobs stay persisted and resume on the next start."""
+    workers = list(_job_state["workers"])
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    _job_state.update(loop=None, queue=None, workers=set())
+
+@contextlib.asynccontextmanager
+async def lifespan(server=None):
+    """
+    FastMCP lifespan that resumes jobs left unfinished by a previous run as soon as the
+    server starts, rather than on the next submit_kb_ingestion/get_kb_job_status call.
+    The workers belong to the server's event loop and keep running between sessions.
+    """
+    if CHROMADB_AVAILABLE and (_get_kb_dir() / JOBS_FILE).exists():
+        try:
+            await _ensure_job_workers()
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Could not resume ingestion jobs: {e}")
+    yield {}
+
+async def _job_worker(queue: asyncio.Queue):
+    """Run queued jobs one at a time."""
+    while True:
+        job_id = await queue.get()
+        try:
+            await _run_ingestion_job(job_id)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Ingestion job {job_id} stopped: {e}")
+        finally:
+            queue.task_done()
+
+async def _run_ingestion_job(job_id: str):
+    """Ingest a job's remaining items through add_url_to_kb/add_text_to_kb, recording each result."""
+    job, items = await _run_in_worker("ingest", _start_job, job_id)
+    if job is None:
+        return
+    collection_name, reingest = job[0], bool(job[1])
     
-    with suppress_stdout_stderr():
-        from sentence_transformers import SentenceTransformer
-        
-        config = _load_config()
-        model_name = config["embedding"]["model_name"]
-        
-        # Suppress transformers logging
-        os.environ["TRANSFORMERS_VERBOSITY"] = "error"
-        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    for item_index, kind, source, content, metadata in items:
+        await _run_in_worker("ingest", _update_job_item, job_id, item_index, "running")
+        try:
+            if kind == "url":
+                result = await add_url_to_kb(source, collection_name, json.loads(metadata) or None, reingest)
+            else:
+                result = await add_text_to_kb(content, source, collection_name, json.loads(metadata) or None, reingest)
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
         
-        # Model loading happens silently
-        _embedding_model = SentenceTransformer(model_name)
+        if result.get("status") == "success":
+            await _run_in_worker("ingest", _update_job_item, job_id, item_index, "completed",
+                                 result.get("chunks_added", 0))
+        else:
+            await _run_in_worker("ingest", _update_job_item, job_id, item_index, "failed", 0,
+                                 result.get("error", "unknown error"))
     
-    return _embedding_model
+    await _run_in_worker("ingest", _finish_job, job_id)
 
-def _initialize_text_splitter():
-    """Initialize text splitter."""
-    global _text_splitter
-    if _text_splitter is not None:
-        return _text_splitter
+def _get_bulk_ingestion_config() -> Dict[str, Any]:
+    """Get bulk URL ingestion settings, filling in defaults missing from older config files."""
+    bulk_config = {
+        "max_urls": 5000,
+        "crawl_batch_size": 10,
+        "max_concurrent_crawls": 3,
+        "queue_size": 16,
+        "embed_batch_size": 256
+    }
+    bulk_config.update(_load_config().get("bulk_ingestion", {}))
+    return bulk_config
+
+async def _run_url_pipeline(urls: List[str], collection, collection_name: str, metadata: Optional[Dict[str, Any]],
+                            reingest: bool, bulk_config: Dict[str, Any]):
+    """
+    Stream URLs through crawl -> chunk -> embed/write stages connected by bounded queues,
+    so a slow stage holds back the ones before it instead of buffering whole pages.
+    Returns (per-URL results in input order, per-stage stats).
+    """
+    from tools.crawl4ai_tool import crawl_multiple_webpages
     
-    if not LANGCHAIN_AVAILABLE:
-        raise ImportError("langchain-text-splitters not available. Install with: pip install langchain-text-splitters")
+    queue_size = max(1, int(bulk_config["queue_size"]))
+    page_queue = asyncio.Queue(maxsize=queue_size)
+    document_queue = asyncio.Queue(maxsize=queue_size)
+    chunk_workers = max(1, int(_get_worker_config().get("chunk_workers", 2)))
     
-    with suppress_stdout_stderr():
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
-        
-        config = _load_config()
-        chunking_config = config["chunking"]
+    results = {url: {"url": url, "status": "pending"} for url in urls}
+    stages = {
+        stage: {"items": 0, "chunks": 0, "failed": 0, "busy_seconds": 0.0}
+        for stage in ("crawl", "chunk", "write")
+    }
+    stages["write"]["embedding_cache_hits"] = 0
+    
+    def _fail(stage, url, error):
+        stages[stage]["failed"] += 1
+        results[url] = {"url": url, "status": "error", "error": error}
+    
+    async def crawl_stage():
+        try:
+            batch_size = max(1, int(bulk_config["crawl_batch_size"]))
+            for start in range(0, len(urls), batch_size):
+                batch = urls[start:start + batch_size]
+                started = time.perf_counter()
+                try:
+                    crawl_result = await crawl_multiple_webpages(
+                        batch,
+                        output_format="markdown",
+                        max_concurrent=int(bulk_config["max_concurrent_crawls"])
+                    )
+                except Exception as e:
+                    crawl_result = {"error": str(e), "status": "error"}
+                stages["crawl"]["busy_seconds"] += time.perf_counter() - started
+                
+                pages = crawl_result.get("results") or {}
+                for url in batch:
+                    page = pages.get(url) or {"error": crawl_result.get("error", "No crawl result returned")}
+                    if "error" in page:
+                        _fail("crawl", url, f"Failed to scrape URL: {page['error']}")
+                        continue
+                    content = page.get("markdown", "")
+                    if not content or len(content.strip()) < 50:
+                        _fail("crawl", url, "No meaningful content extracted from URL")
+                        continue
+                    stages["crawl"]["items"] += 1
+                    await page_queue.put((url, content))
+        finally:
+            for _ in range(chunk_workers):
+                await page_queue.put(None)
+    
+    async def chunk_worker():
+        while True:
+            item = await page_queue.get()
+            if item is None:
+                return
+            url, content = item
+            started = time.perf_counter()
+            try:
+                chunks = await _run_in_worker("chunk", _split_text_sync, content, cpu_bound=True)
+            except Exception as e:
+                _fail("chunk", url, f"Chunking failed: {str(e)}")
+                continue
+            finally:
+                stages["chunk"]["busy_seconds"] += time.perf_counter() - started
+            if not chunks:
+                _fail("chunk", url, "No chunks generated from content")
+                continue
+            
+            stages["chunk"]["items"] += 1
+            stages["chunk"]["chunks"] += len(chunks)
+            base_metadata = {
+                "source_url": url,
+                "source_type": "webpage",
+                "timestamp": datetime.now().isoformat(),
+                "collection": collection_name,
+                "total_chunks": len(chunks),
+                "content_length": len(content)
+            }
+            if metadata:
+                base_metadata.update(metadata)
+            await document_queue.put({"source_field": "source_url", "source": url, "chunks": chunks,
+                                      "base_metadata": base_metadata})
+    
+    async def chunk_stage():
+        try:
+            await asyncio.gather(*[chunk_worker() for _ in range(chunk_workers)])
+        finally:
+            await document_queue.put(None)
+    
+    async def write_batch(documents):
+        started = time.perf_counter()
+        try:
+            batch_results, cache_hits = await _store_chunk_batch(collection, collection_name, documents, reingest)
+        except Exception as e:
+            for document in documents:
+                _fail("write", document["source"], f"Failed to store chunks: {str(e)}")
+            return
+        finally:
+            stages["write"]["busy_seconds"] += time.perf_counter() - started
         
-        _text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunking_config["chunk_size"],
-            chunk_overlap=chunking_config["chunk_overlap"],
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        stages["write"]["embedding_cache_hits"] += cache_hits
+        for document, result in zip(documents, batch_results):
+            stages["write"]["items"] += 1
+            stages["write"]["chunks"] += len(document["chunks"])
+            results[document["source"]] = {
+                "url": document["source"],
+                "status": "success",
+                "chunks_added": result["chunks_added"],
+                "chunks_updated": result["chunks_updated"],
+                "chunks_deleted": result["chunks_deleted"],
+                "near_duplicates_skipped": result["near_duplicates_skipped"]
+            }
     
-    return _text_splitter
+    async def write_stage():
+        embed_batch_size = max(1, int(bulk_config["embed_batch_size"]))
+        batch = []
+        batch_chunks = 0
+        while True:
+            document = await document_queue.get()
+            if document is None:
+                break
+            batch.append(document)
+            batch_chunks += len(document["chunks"])
+            if batch_chunks >= embed_batch_size:
+                await write_batch(batch)
+                batch, batch_chunks = [], 0
+        if batch:
+            await write_batch(batch)
+    
+    await asyncio.gather(crawl_stage(), chunk_stage(), write_stage())
+    
+    for stats in stages.values():
+        stats["items_per_second"] = round(stats["items"] / stats["busy_seconds"], 2) if stats["busy_seconds"] else 0.0
+        stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+    return list(results.values()), stages
 
 async def setup_knowledge_base() -> Dict[str, Any]:
     """
@@ -194,9 +3273,10 @@ async def setup_knowledge_base() -> Dict[str, Any]:
         missing_deps = []
         if not CHROMADB_AVAILABLE:
             missing_deps.append("chromadb")
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
-            missing_deps.append("sentence-transformers")
-        if not LANGCHAIN_AVAILABLE:
+        backend = _get_embedding_backend()
+        if not _embedding_backend_available(backend):
+            missing_deps.append(EMBEDDING_BACKENDS[backend])
+        if not _chunker_available():
             missing_deps.append("langchain-text-splitters")
         
         if missing_deps:
@@ -219,7 +3299,7 @@ async def setup_knowledge_base() -> Dict[str, Any]:
         # Initialize components with output suppression
         with suppress_stdout_stderr():
             client = _initialize_chroma()
-            embedding_model = _initialize_embedding_model()
+            embedding_status = _get_embedding_model_status()
             text_splitter = _initialize_text_splitter()
             
             # Test basic functionality
@@ -236,7 +3316,7 @@ async def setup_knowledge_base() -> Dict[str, Any]:
             
             # Test embedding
             test_text = "This is a test document for RAG setup."
-            test_embedding = embedding_model.encode([test_text])
+            test_embedding = _encode_sync([test_text])
             
             # Test chunking
             test_chunks = text_splitter.split_text("This is a longer test document. It should be split into chunks. Each chunk should maintain some context.")
@@ -244,14 +3324,14 @@ async def setup_knowledge_base() -> Dict[str, Any]:
             # Add test data
             test_collection.add(
                 documents=[test_text],
-                embeddings=test_embedding.tolist(),
+                embeddings=test_embedding,
                 metadatas=[{"test": True, "timestamp": datetime.now().isoformat()}],
                 ids=["test_doc_1"]
             )
             
             # Test query
             query_results = test_collection.query(
-                query_embeddings=test_embedding.tolist(),
+                query_embeddings=test_embedding,
                 n_results=1
             )
             
@@ -285,6 +3365,7 @@ async def setup_knowledge_base() -> Dict[str, Any]:
             "components": {
                 "chroma_client": "initialized",
                 "embedding_model": "loaded",
+                "embedding_mode": embedding_status["mode"],
                 "text_splitter": "configured",
                 "default_collection": "ready"
             },
@@ -317,9 +3398,10 @@ async def get_kb_health() -> Dict[str, Any]:
         }
         
         # Check dependencies
+        backend = _get_embedding_backend()
         health_status["components"]["dependencies"] = {
             "chromadb": CHROMADB_AVAILABLE,
-            "sentence_transformers": SENTENCE_TRANSFORMERS_AVAILABLE,
+            EMBEDDING_BACKENDS[backend].split()[0].replace("-", "_"): _embedding_backend_available(backend),
             "langchain_text_splitters": LANGCHAIN_AVAILABLE
         }
         
@@ -360,16 +3442,23 @@ async def get_kb_health() -> Dict[str, Any]:
                 }
             
             # Check embedding model
-            embedding_model = _initialize_embedding_model()
-            health_status["components"]["embedding_model"] = {
-                "status": "loaded",
-                "model_name": config["embedding"]["model_name"]
-            }
+            health_status["components"]["embedding_model"] = _get_embedding_model_status()
             
             # Check text splitter
             text_splitter = _initialize_text_splitter()
             health_status["components"]["text_splitter"] = "configured"
         
+        # Worker pool queue depth and latency
+        health_status["components"]["workers"] = _get_worker_metrics()
+        health_status["components"]["warmup"] = dict(_warmup_state)
+        health_status["components"]["query_batching"] = _get_query_batching_metrics()
+        health_status["components"]["search_cache"] = _get_search_cache_metrics()
+        health_status["components"]["jobs"] = {
+            "active_jobs": await _run_in_worker("search", _count_active_jobs),
+            "job_workers": len(_job_state["workers"]),
+            "max_concurrent_jobs": _get_jobs_config()["max_concurrent_jobs"]
+        }
+        
         return health_status
         
     except Exception as e:
@@ -379,7 +3468,7 @@ async def get_kb_health() -> Dict[str, Any]:
             "timestamp": datetime.now().isoformat()
         }
 
-async def add_url_to_kb(url: str, collection_name: str = "default", metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+async def add_url_to_kb(url: str, collection_name: str = "default", metadata: Dict[str, Any] = None, reingest: bool = False) -> Dict[str, Any]:
     """
     Add URL content to the knowledge base by scraping and chunking it.
     
@@ -387,19 +3476,15 @@ async def add_url_to_kb(url: str, collection_name: str = "default", metadata: Di
         url: The URL to scrape and add
         collection_name: Collection to add content to
         metadata: Additional metadata to store with chunks
+        reingest: Replace chunks previously stored for this URL, embedding only
+                  the chunks that changed and deleting the ones that disappeared
     
     Returns:
         Dictionary with ingestion results
     """
     try:
-        # Initialize components with output suppression
-        with suppress_stdout_stderr():
-            client = _initialize_chroma()
-            embedding_model = _initialize_embedding_model()
-            text_splitter = _initialize_text_splitter()
-            
-            # Get or create collection
-            collection = client.get_or_create_collection(collection_name)
+        # Initialize components in the ingest worker lane
+        collection, text_splitter = await _run_in_worker("ingest", _open_ingest_collection, collection_name)
         
         # Import crawl4ai here to avoid circular imports
         try:
@@ -427,64 +3512,45 @@ async def add_url_to_kb(url: str, collection_name: str = "default", metadata: Di
                 "status": "error"
             }
         
-        # Process content with output suppression
-        with suppress_stdout_stderr():
-            # Chunk the content
-            chunks = text_splitter.split_text(content)
-            
-            if not chunks:
-                return {
-                    "error": "No chunks generated from content",
-                    "status": "error"
-                }
-            
-            # Generate embeddings
-            embeddings = embedding_model.encode(chunks, normalize_embeddings=True)
-            
-            # Prepare metadata for each chunk
-            base_metadata = {
-                "source_url": url,
-                "source_type": "webpage",
-                "timestamp": datetime.now().isoformat(),
-                "collection": collection_name,
-                "total_chunks": len(chunks),
-                "content_length": len(content)
+        # Chunk the content
+        chunks = await _run_in_worker("ingest", text_splitter.split_text, content)
+        
+        if not chunks:
+            return {
+                "error": "No chunks generated from content",
+                "status": "error"
             }
-            
-            # Add user-provided metadata
-            if metadata:
-                base_metadata.update(metadata)
-            
-            # Create chunk-specific metadata
-            chunk_metadatas = []
-            for i, chunk in enumerate(chunks):
-                chunk_meta = base_metadata.copy()
-                chunk_meta.update({
-                    "chunk_index": i,
-                    "chunk_length": len(chunk),
-                    "token_count": len(chunk.split())  # Rough token estimate
-                })
-                chunk_metadatas.append(chunk_meta)
-            
-            # Generate unique IDs for chunks
-            chunk_ids = [f"{url}_{i}_{hash(chunk) % 100000}" for i, chunk in enumerate(chunks)]
-            
-            # Add to ChromaDB
-            collection.add(
-                documents=chunks,
-                embeddings=embeddings.tolist(),
-                metadatas=chunk_metadatas,
-                ids=chunk_ids
-            )
+        
+        # Prepare metadata shared by all chunks
+        base_metadata = {
+            "source_url": url,
+            "source_type": "webpage",
+            "timestamp": datetime.now().isoformat(),
+            "collection": collection_name,
+            "total_chunks": len(chunks),
+            "content_length": len(content)
+        }
+        
+        # Add user-provided metadata
+        if metadata:
+            base_metadata.update(metadata)
+        
+        # Embed and write the chunks (diffed against stored chunks when re-ingesting)
+        write_result = await _store_chunks(collection, collection_name, "source_url", url, chunks, base_metadata, reingest)
         
         return {
             "status": "success",
             "message": f"Successfully added URL content to knowledge base",
             "url": url,
             "collection": collection_name,
-            "chunks_added": len(chunks),
+            "chunks_added": write_result["chunks_added"],
+            "chunks_updated": write_result["chunks_updated"],
+            "chunks_deleted": write_result["chunks_deleted"],
+            "near_duplicates_skipped": write_result["near_duplicates_skipped"],
+            "embedding_cache_hits": write_result["embedding_cache_hits"],
+            "reingest": reingest,
             "total_characters": len(content),
-            "chunk_ids": chunk_ids[:5]  # Show first 5 IDs
+            "chunk_ids": write_result["chunk_ids"][:5]  # Show first 5 IDs
         }
         
     except Exception as e:
@@ -493,7 +3559,7 @@ async def add_url_to_kb(url: str, collection_name: str = "default", metadata: Di
             "status": "error"
         }
 
-async def add_text_to_kb(text: str, source_name: str, collection_name: str = "default", metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+async def add_text_to_kb(text: str, source_name: str, collection_name: str = "default", metadata: Dict[str, Any] = None, reingest: bool = False) -> Dict[str, Any]:
     """
     Add plain text directly to the knowledge base.
     
@@ -502,6 +3568,8 @@ async def add_text_to_kb(text: str, source_name: str, collection_name: str = "de
         source_name: Name/identifier for this text source
         collection_name: Collection to add content to
         metadata: Additional metadata to store with chunks
+        reingest: Replace chunks previously stored for this source, embedding only
+                  the chunks that changed and deleting the ones that disappeared
     
     Returns:
         Dictionary with ingestion results
@@ -514,93 +3582,482 @@ async def add_text_to_kb(text: str, source_name: str, collection_name: str = "de
                 "status": "error"
             }
         
-        # Initialize components and process with complete output suppression
-        with suppress_stdout_stderr():
-            client = _initialize_chroma()
-            embedding_model = _initialize_embedding_model()
-            text_splitter = _initialize_text_splitter()
-            
-            # Get or create collection
-            collection = client.get_or_create_collection(collection_name)
-            
-            # Chunk the content
-            chunks = text_splitter.split_text(text)
-            
-            if not chunks:
-                return {
-                    "error": "No chunks generated from text",
-                    "status": "error"
-                }
-            
-            # Generate embeddings
-            embeddings = embedding_model.encode(chunks, normalize_embeddings=True)
-            
-            # Prepare metadata for each chunk
-            base_metadata = {
-                "source_name": source_name,
-                "source_type": "text",
-                "timestamp": datetime.now().isoformat(),
-                "collection": collection_name,
-                "total_chunks": len(chunks),
-                "content_length": len(text)
+        # Initialize components and process in the ingest worker lane
+        collection, text_splitter = await _run_in_worker("ingest", _open_ingest_collection, collection_name)
+        
+        # Chunk the content
+        chunks = await _run_in_worker("ingest", text_splitter.split_text, text)
+        
+        if not chunks:
+            return {
+                "error": "No chunks generated from text",
+                "status": "error"
             }
-            
-            # Add user-provided metadata
-            if metadata:
-                base_metadata.update(metadata)
-            
-            # Create chunk-specific metadata
-            chunk_metadatas = []
-            for i, chunk in enumerate(chunks):
-                chunk_meta = base_metadata.copy()
-                chunk_meta.update({
-                    "chunk_index": i,
-                    "chunk_length": len(chunk),
-                    "token_count": len(chunk.split())  # Rough token estimate
-                })
-                chunk_metadatas.append(chunk_meta)
-            
-            # Generate unique IDs for chunks
-            chunk_ids = [f"{source_name}_{i}_{hash(chunk) % 100000}" for i, chunk in enumerate(chunks)]
-            
-            # Add to ChromaDB
-            collection.add(
-                documents=chunks,
-                embeddings=embeddings.tolist(),
-                metadatas=chunk_metadatas,
-                ids=chunk_ids
-            )
+        
+        # Prepare metadata shared by all chunks
+        base_metadata = {
+            "source_name": source_name,
+            "source_type": "text",
+            "timestamp": datetime.now().isoformat(),
+            "collection": collection_name,
+            "total_chunks": len(chunks),
+            "content_length": len(text)
+        }
+        
+        # Add user-provided metadata
+        if metadata:
+            base_metadata.update(metadata)
+        
+        # Embed and write the chunks (diffed against stored chunks when re-ingesting)
+        write_result = await _store_chunks(collection, collection_name, "source_name", source_name, chunks, base_metadata, reingest)
         
         return {
             "status": "success",
             "message": f"Successfully added text content to knowledge base",
             "source_name": source_name,
             "collection": collection_name,
-            "chunks_added": len(chunks),
+            "chunks_added": write_result["chunks_added"],
+            "chunks_updated": write_result["chunks_updated"],
+            "chunks_deleted": write_result["chunks_deleted"],
+            "near_duplicates_skipped": write_result["near_duplicates_skipped"],
+            "embedding_cache_hits": write_result["embedding_cache_hits"],
+            "reingest": reingest,
             "total_characters": len(text),
-            "chunk_ids": chunk_ids[:5]  # Show first 5 IDs
+            "chunk_ids": write_result["chunk_ids"][:5]  # Show first 5 IDs
+        }
+        
+    except Exception as e:
+        return {
+            "error": f"Failed to add text: {str(e)}",
+            "status": "error"
+        }
+
+async def add_urls_to_kb(urls: List[str], collection_name: str = "default", metadata: Dict[str, Any] = None,
+                         reingest: bool = False) -> Dict[str, Any]:
+    """
+    Add many URLs to the knowledge base in one call.
+    
+    URLs are crawled concurrently in batches, chunked in the chunk worker pool and
+    embedded/written in batches of chunks, with bounded queues between the stages.
+    
+    Args:
+        urls: The URLs to scrape and add
+        collection_name: Collection to add content to
+        metadata: Additional metadata to store with every URL's chunks
+        reingest: Replace chunks previously stored for each URL
+    
+    Returns:
+        Dictionary with per-URL results, totals and per-stage throughput
+    """
+    try:
+        urls = list(dict.fromkeys(url.strip() for url in (urls or []) if isinstance(url, str) and url.strip()))
+        if not urls:
+            return {
+                "error": "Provide at least one URL",
+                "status": "error"
+            }
+        
+        bulk_config = _get_bulk_ingestion_config()
+        if len(urls) > bulk_config["max_urls"]:
+            return {
+                "error": f"Too many URLs ({len(urls)}); the limit is {bulk_config['max_urls']} per call "
+                         f"(use submit_kb_ingestion for larger loads)",
+                "status": "error"
+            }
+        
+        try:
+            import tools.crawl4ai_tool  # noqa: F401
+        except ImportError:
+            return {
+                "error": "crawl_multiple_webpages tool not available",
+                "status": "error"
+            }
+        
+        collection, _ = await _run_in_worker("ingest", _open_ingest_collection, collection_name)
+        
+        started = time.perf_counter()
+        url_results, stage_stats = await _run_url_pipeline(urls, collection, collection_name, metadata, reingest, bulk_config)
+        elapsed = time.perf_counter() - started
+        
+        succeeded = [r for r in url_results if r["status"] == "success"]
+        return {
+            "status": "success",
+            "message": f"Added {len(succeeded)} of {len(urls)} URLs to knowledge base",
+            "collection": collection_name,
+            "urls_submitted": len(urls),
+            "urls_ingested": len(succeeded),
+            "urls_failed": len(urls) - len(succeeded),
+            "chunks_added": sum(r["chunks_added"] for r in succeeded),
+            "chunks_updated": sum(r["chunks_updated"] for r in succeeded),
+            "chunks_deleted": sum(r["chunks_deleted"] for r in succeeded),
+            "near_duplicates_skipped": sum(r["near_duplicates_skipped"] for r in succeeded),
+            "embedding_cache_hits": stage_stats["write"]["embedding_cache_hits"],
+            "reingest": reingest,
+            "elapsed_seconds": round(elapsed, 3),
+            "urls_per_second": round(len(succeeded) / elapsed, 2) if elapsed else 0.0,
+            "stage_stats": stage_stats,
+            "results": url_results
+        }
+        
+    except Exception as e:
+        return {
+            "error": f"Failed to add URLs: {str(e)}",
+            "status": "error"
+        }
+
+def _format_result_metadata(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a chunk's stored metadata for a search result."""
+    result_metadata = {
+        "source": meta.get("source_url") or meta.get("source_name", "unknown"),
+        "source_type": meta.get("source_type", "unknown"),
+        "timestamp": meta.get("timestamp"),
+        "chunk_index": meta.get("chunk_index"),
+        "chunk_length": meta.get("chunk_length"),
+        "token_count": meta.get("token_count")
+    }
+    
+    # Add custom metadata fields
+    custom_fields = {k: v for k, v in meta.items() 
+                   if k not in ['source_url', 'source_name', 'source_type', 'timestamp', 
+                              'chunk_index', 'chunk_length', 'token_count', 'collection', 'ingested_at']}
+    if custom_fields:
+        result_metadata["custom"] = custom_fields
+    return result_metadata
+
+async def _search_vector(collection, collection_name: str, query_embedding: List[float], limit: int,
+                         include_metadata: bool, where: Optional[Dict[str, Any]] = None,
+                         with_embeddings: bool = False):
+    """
+    Run a vector search on one collection, returning (formatted results, search_stats).
+    with_embeddings attaches each chunk's vector as "_embedding" for the re-ranking stage.
+    """
+    # Rescored at full precision when the collection keeps rescore vectors
+    search_results = await _query_vectors(collection, collection_name, query_embedding, limit, where,
+                                          include_embeddings=with_embeddings)
+    
+    # Process results
+    if not search_results['documents'] or not search_results['documents'][0]:
+        return [], {}
+    
+    # Format results
+    formatted_results = []
+    documents = search_results['documents'][0]
+    metadatas = search_results['metadatas'][0] if include_metadata else [{}] * len(documents)
+    distances = search_results['distances'][0]
+    
+    for i, (doc, meta, distance) in enumerate(zip(documents, metadatas, distances)):
+        result = {
+            "rank": i + 1,
+            "content": doc,
+            "similarity_score": float(1 - distance),  # Convert distance to similarity
+            "distance": float(distance)
+        }
+        
+        if include_metadata and meta:
+            result["metadata"] = _format_result_metadata(meta)
+        if with_embeddings:
+            result["_embedding"] = search_results['embeddings'][0][i]
+        
+        formatted_results.append(result)
+    
+    search_stats = {
+        "embedding_model": _load_config()["embedding"]["model_name"],
+        "similarity_threshold": min(distances) if distances else 0,
+        "max_similarity": max([r["similarity_score"] for r in formatted_results]) if formatted_results else 0
+    }
+    if "rescored_candidates" in search_results:
+        search_stats["rescored_candidates"] = search_results["rescored_candidates"]
+    return formatted_results, search_stats
+
+async def _search_hybrid(collection, collection_name: str, query: str, query_embedding: Optional[List[float]],
+                         limit: int, include_metadata: bool, mode: str, hybrid_config: Dict[str, Any],
+                         where: Optional[Dict[str, Any]] = None, with_embeddings: bool = False):
+    """
+    Run a keyword or hybrid search on one collection, returning (formatted results, search_stats).
+    Each retriever fetches limit * candidate_multiplier candidates; hybrid mode fuses
+    the vector and BM25 rankings with reciprocal rank fusion. The keyword index holds
+    no metadata, so with a where filter BM25 candidates are checked against Chroma.
+    A collection without a keyword index yet gets one built in the background and is
+    served vector results until it is ready (search_stats["fallback"] == "vector").
+    """
+    candidate_limit = min(limit * hybrid_config["candidate_multiplier"], hybrid_config["max_candidates"])
+    candidate_limit = max(candidate_limit, limit)
+    
+    lexical_hits = await _run_in_worker("search", _lexical_search, collection_name, query.strip(), candidate_limit)
+    lexical_ready = lexical_hits is not None
+    if not lexical_ready:
+        _schedule_lexical_build(collection_name)
+        lexical_hits = []
+        if query_embedding is None:
+            query_embedding = await _encode_query(query.strip())
+    
+    records = {}
+    vector_ids = []
+    if mode == "hybrid" or not lexical_ready:
+        vector_results = await _query_vectors(collection, collection_name, query_embedding, candidate_limit, where,
+                                              include_embeddings=with_embeddings)
+        vector_ids = list((vector_results.get('ids') or [[]])[0])
+        embeddings = vector_results['embeddings'][0] if with_embeddings and vector_ids else [None] * len(vector_ids)
+        for doc_id, doc, meta, distance, embedding in zip(
+            vector_ids,
+            (vector_results.get('documents') or [[]])[0],
+            (vector_results.get('metadatas') or [[]])[0],
+            (vector_results.get('distances') or [[]])[0],
+            embeddings
+        ):
+            records[doc_id] = {"document": doc, "metadata": meta, "distance": distance, "embedding": embedding}
+    
+    if where and lexical_hits:
+        matching = await _run_in_worker("search", collection.get, ids=[doc_id for doc_id, _ in lexical_hits],
+                                        where=where, include=[])
+        allowed = set(matching.get('ids') or [])
+        lexical_hits = [(doc_id, score) for doc_id, score in lexical_hits if doc_id in allowed]
+    lexical_ids = [doc_id for doc_id, _ in lexical_hits]
+    bm25_scores = dict(lexical_hits)
+    
+    fused = _reciprocal_rank_fusion([vector_ids, lexical_ids], hybrid_config["rrf_k"])[:limit]
+    
+    # Keyword-only hits still need their text and metadata from Chroma
+    missing_ids = [doc_id for doc_id, _ in fused if doc_id not in records]
+    if missing_ids:
+        include = ['documents', 'metadatas'] + (['embeddings'] if with_embeddings else [])
+        fetched = await _run_in_worker("search", collection.get, ids=missing_ids, include=include)
+        fetched_ids = fetched.get('ids') or []
+        fetched_embeddings = fetched['embeddings'] if with_embeddings and fetched_ids else [None] * len(fetched_ids)
+        for doc_id, doc, meta, embedding in zip(fetched_ids, fetched.get('documents') or [],
+                                                fetched.get('metadatas') or [], fetched_embeddings):
+            records[doc_id] = {"document": doc, "metadata": meta, "distance": None, "embedding": embedding}
+    
+    vector_ranks = {doc_id: rank for rank, doc_id in enumerate(vector_ids, start=1)}
+    lexical_ranks = {doc_id: rank for rank, doc_id in enumerate(lexical_ids, start=1)}
+    
+    formatted_results = []
+    for doc_id, fusion_score in fused:
+        record = records.get(doc_id)
+        if record is None:
+            continue  # Indexed chunk no longer in Chroma
+        distance = record["distance"]
+        result = {
+            "rank": len(formatted_results) + 1,
+            "content": record["document"],
+            "similarity_score": float(1 - distance) if distance is not None else None,
+            "distance": float(distance) if distance is not None else None,
+            "bm25_score": float(bm25_scores[doc_id]) if doc_id in bm25_scores else None,
+            "vector_rank": vector_ranks.get(doc_id),
+            "lexical_rank": lexical_ranks.get(doc_id)
         }
+        if mode == "hybrid":
+            result["fusion_score"] = float(fusion_score)
         
-    except Exception as e:
+        if include_metadata and record["metadata"]:
+            result["metadata"] = _format_result_metadata(record["metadata"])
+        if with_embeddings:
+            result["_embedding"] = record["embedding"]
+        
+        formatted_results.append(result)
+    
+    similarities = [r["similarity_score"] for r in formatted_results if r["similarity_score"] is not None]
+    search_stats = {
+        "mode": mode,
+        "vector_candidates": len(vector_ids),
+        "lexical_candidates": len(lexical_ids),
+        "max_similarity": max(similarities) if similarities else 0
+    }
+    if not lexical_ready:
+        search_stats["lexical_index"] = "building"
+        search_stats["fallback"] = "vector"
+    if mode == "hybrid" or not lexical_ready:
+        search_stats["embedding_model"] = _load_config()["embedding"]["model_name"]
+        search_stats["rrf_k"] = hybrid_config["rrf_k"]
+    return formatted_results, search_stats
+
+async def _search_collection(collection, collection_name: str, query: str, query_embedding: Optional[List[float]],
+                             limit: int, include_metadata: bool, mode: str, hybrid_config: Dict[str, Any],
+                             where: Optional[Dict[str, Any]] = None, rerank: str = "none",
+                             rerank_config: Optional[Dict[str, Any]] = None, with_embeddings: bool = False):
+    """
+    Search one collection in the given mode, returning (formatted results, search_stats).
+    With rerank, a larger candidate pool is retrieved and re-ranked down to limit.
+    Results are served from the short-TTL result cache while the collection is unchanged.
+    """
+    started = time.perf_counter()
+    result_cache = _get_search_cache_config()["results"]
+    use_cache = result_cache["enabled"] and not with_embeddings
+    cache_key = (collection_name, _normalize_query(query), limit, mode, include_metadata,
+                 json.dumps(where, sort_keys=True) if where else None, rerank)
+    if use_cache:
+        cached = _cached_search_results(cache_key)
+        if cached is not None:
+            cached[1]["result_cache_hit"] = True
+            cached[1]["latency_ms"] = {"result_cache": round((time.perf_counter() - started) * 1000, 2)}
+            return cached
+    generation = _collection_generation(collection_name)
+    
+    fetch_limit = limit
+    if rerank != "none":
+        rerank_config = rerank_config or _get_rerank_config()
+        fetch_limit = _rerank_candidate_count(limit, rerank_config)
+    fetch_embeddings = with_embeddings or "mmr" in rerank
+    
+    if mode == "vector":
+        results, search_stats = await _search_vector(collection, collection_name, query_embedding, fetch_limit,
+                                                     include_metadata, where, fetch_embeddings)
+    else:
+        results, search_stats = await _search_hybrid(collection, collection_name, query, query_embedding, fetch_limit,
+                                                     include_metadata, mode, hybrid_config, where, fetch_embeddings)
+    search_stats["latency_ms"] = {"retrieval": round((time.perf_counter() - started) * 1000, 2)}
+    
+    if rerank != "none":
+        score_field = MERGE_SCORE_FIELDS[search_stats.get("fallback", mode)]
+        results, rerank_stats = await _rerank_results(query, results, limit, rerank, rerank_config, score_field)
+        search_stats["latency_ms"].update(rerank_stats.pop("latency_ms"))
+        search_stats["rerank"] = rerank_stats
+    outcome = (results, search_stats)
+    
+    # Fallback results are not cached, so the keyword index is used as soon as it is built
+    if use_cache and "fallback" not in search_stats:
+        _store_search_results(cache_key, outcome, generation, float(result_cache["ttl_seconds"]),
+                              max(1, int(result_cache["max_entries"])))
+    return outcome
+
+async def _search_collections(query: str, collection_names: List[str], query_embedding: Optional[List[float]],
+                              limit: int, include_metadata: bool, mode: str,
+                              hybrid_config: Dict[str, Any], where: Optional[Dict[str, Any]] = None,
+                              rerank: str = "none") -> Dict[str, Any]:
+    """
+    Fan a search out over several collections and merge the results into one ranking.
+    The query is embedded once by the caller; collections are searched concurrently
+    (at most search_workers at a time) and results are ordered by the mode's score
+    (keyword results by RRF over their per-collection rank, as BM25 is corpus-relative).
+    With rerank, each collection contributes candidates and the merged pool is re-ranked once.
+    """
+    rerank_config = _get_rerank_config() if rerank != "none" else None
+    fetch_limit = _rerank_candidate_count(limit, rerank_config) if rerank_config else limit
+    semaphore = asyncio.Semaphore(max(1, int(_get_worker_config().get("search_workers", 2))))
+    
+    async def search_one(name):
+        started = time.perf_counter()
+        async with semaphore:
+            try:
+                collection, _ = await _run_in_worker("search", _open_search_collection, name)
+                if collection is None:
+                    return name, None, {"error": "not found"}
+                results, stats = await _search_collection(collection, name, query, query_embedding, fetch_limit,
+                                                          include_metadata, mode, hybrid_config, where,
+                                                          with_embeddings="mmr" in rerank)
+            except Exception as e:
+                return name, None, {"error": str(e), "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+        timing = {"results": len(results), "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+        if "fallback" in stats:
+            timing["fallback"] = stats["fallback"]
+        return name, results, timing
+    
+    outcomes = await asyncio.gather(*[search_one(name) for name in collection_names])
+    
+    per_collection = {}
+    merged = []
+    missing = []
+    for name, results, timing in outcomes:
+        per_collection[name] = timing
+        if results is None:
+            if timing.get("error") == "not found":
+                missing.append(name)
+            continue
+        for result in results:
+            result["collection"] = name
+            result["collection_rank"] = result["rank"]
+            merged.append(result)
+    
+    searched = [name for name in collection_names if name not in missing]
+    if not searched:
         return {
-            "error": f"Failed to add text: {str(e)}",
-            "status": "error"
+            "error": f"None of the requested collections were found: {', '.join(collection_names)}",
+            "status": "error",
+            "available_collections": await _run_in_worker("search", _list_collection_names)
         }
+    
+    score_field = MERGE_SCORE_FIELDS[mode]
+    if mode == "keyword":
+        # BM25 scores depend on each collection's own term statistics, so keyword
+        # results are merged by RRF over their rank within their collection instead
+        score_field = "fusion_score"
+        for result in merged:
+            result["fusion_score"] = 1.0 / (hybrid_config["rrf_k"] + result["collection_rank"])
+    merged.sort(key=lambda r: r[score_field] if r[score_field] is not None else float("-inf"), reverse=True)
+    merged = merged[:fetch_limit]
+    for rank, result in enumerate(merged, start=1):
+        result["rank"] = rank
+    
+    search_stats = {
+        "mode": mode,
+        "merged_by": score_field,
+        "collections_searched": len(searched),
+        "per_collection": per_collection
+    }
+    if mode == "keyword":
+        search_stats["rrf_k"] = hybrid_config["rrf_k"]
+    if rerank_config:
+        merged, rerank_stats = await _rerank_results(query, merged, limit, rerank, rerank_config, score_field)
+        search_stats["latency_ms"] = rerank_stats.pop("latency_ms")
+        search_stats["rerank"] = rerank_stats
+    if query_embedding is not None:
+        search_stats["embedding_model"] = _load_config()["embedding"]["model_name"]
+    if missing:
+        search_stats["missing_collections"] = missing
+    
+    response = {
+        "status": "success",
+        "query": query,
+        "collections": searched,
+        "mode": mode,
+        "results": merged,
+        "total_results": len(merged),
+        "search_stats": search_stats
+    }
+    if where:
+        response["filter"] = where
+    fallback = [name for name in searched if "fallback" in per_collection[name]]
+    if fallback:
+        response["fallback"] = {"mode": "vector", "collections": fallback,
+                                "reason": "keyword index is still being built"}
+    if not merged:
+        response["message"] = "No results found"
+    return response
 
-async def search_kb(query: str, collection_name: str = "default", limit: int = 5, include_metadata: bool = True) -> Dict[str, Any]:
+async def search_kb(query: str, collection_name: Union[str, List[str]] = "default", limit: int = 5,
+                    include_metadata: bool = True, mode: Optional[str] = None,
+                    where: Optional[Dict[str, Any]] = None, added_after: Optional[Union[str, float]] = None,
+                    added_before: Optional[Union[str, float]] = None,
+                    rerank: Optional[str] = None) -> Dict[str, Any]:
     """
     Search the knowledge base for content relevant to the query.
     
     Args:
         query: The search query text
-        collection_name: Collection to search in
+        collection_name: Collection to search in; a list of collections or "*" (all
+                         collections) searches each and merges the results by score
         limit: Maximum number of results to return
         include_metadata: Whether to include metadata in results
+        mode: "vector" (semantic similarity), "keyword" (BM25 over chunk text) or
+              "hybrid" (both, fused with reciprocal rank fusion). Defaults to search.default_mode.
+        where: Metadata filter applied inside ChromaDB, e.g. {"source_type": "webpage"},
+               {"project": {"$in": ["alpha", "beta"]}} or {"$or": [{...}, {...}]}
+        added_after: Only chunks ingested at or after this time (ISO date/datetime,
+                     epoch seconds, or an age such as "7d", "12h")
+        added_before: Only chunks ingested before this time (same formats)
+        rerank: Re-ranking stage over a larger candidate pool: "none", "mmr" (diversify
+                near-duplicate results), "cross_encoder" (re-score with a cross-encoder
+                within latency_budget_ms) or "cross_encoder+mmr". Defaults to search.rerank.default.
     
     Returns:
         Dictionary with search results and metadata
     """
     try:
+        started = time.perf_counter()
+        hybrid_config = _get_hybrid_config()
+        mode = (mode or hybrid_config["default_mode"]).lower()
+        rerank = (rerank or _get_rerank_config()["default"]).lower()
+        
         # Validate inputs
         if not query or len(query.strip()) < 3:
             return {
@@ -614,87 +4071,86 @@ async def search_kb(query: str, collection_name: str = "default", limit: int = 5
                 "status": "error"
             }
         
-        # Initialize components and search with output suppression
-        with suppress_stdout_stderr():
-            client = _initialize_chroma()
-            embedding_model = _initialize_embedding_model()
-            
-            # Check if collection exists
-            try:
-                collection = client.get_collection(collection_name)
-            except Exception:
+        if mode not in SEARCH_MODES:
+            return {
+                "error": f"Mode must be one of: {', '.join(SEARCH_MODES)}",
+                "status": "error"
+            }
+        
+        if rerank not in RERANK_MODES:
+            return {
+                "error": f"Rerank must be one of: {', '.join(RERANK_MODES)}",
+                "status": "error"
+            }
+        
+        try:
+            where_filter = _build_search_filter(where, added_after, added_before)
+        except ValueError as e:
+            return {
+                "error": f"Invalid filter: {str(e)}",
+                "status": "error"
+            }
+        
+        # Fan out over several collections, embedding the query once
+        if isinstance(collection_name, list) or collection_name == "*":
+            if collection_name == "*":
+                collection_names = await _run_in_worker("search", _list_collection_names)
+            else:
+                collection_names = list(dict.fromkeys(collection_name))
+            if not collection_names:
                 return {
-                    "error": f"Collection '{collection_name}' not found",
-                    "status": "error",
-                    "available_collections": [col.name for col in client.list_collections()]
+                    "error": "No collections to search",
+                    "status": "error"
                 }
-            
-            # Generate query embedding
-            query_embedding = embedding_model.encode([query.strip()], normalize_embeddings=True)
-            
-            # Search the collection
-            search_results = collection.query(
-                query_embeddings=query_embedding.tolist(),
-                n_results=limit,
-                include=['documents', 'metadatas', 'distances']
-            )
+            embed_started = time.perf_counter()
+            query_embedding = await _encode_query(query.strip()) if mode != "keyword" else None
+            embed_ms = round((time.perf_counter() - embed_started) * 1000, 2)
+            response = await _search_collections(query, collection_names, query_embedding, limit, include_metadata,
+                                                 mode, hybrid_config, where_filter, rerank)
+            if "search_stats" in response:
+                latency = response["search_stats"].setdefault("latency_ms", {})
+                latency.update(embed=embed_ms, total=round((time.perf_counter() - started) * 1000, 2))
+            return response
         
-        # Process results
-        if not search_results['documents'] or not search_results['documents'][0]:
+        # Check if collection exists (search worker lane)
+        collection, available_collections = await _run_in_worker("search", _open_search_collection, collection_name)
+        if collection is None:
             return {
-                "status": "success",
-                "query": query,
-                "collection": collection_name,
-                "results": [],
-                "total_results": 0,
-                "message": "No results found"
+                "error": f"Collection '{collection_name}' not found",
+                "status": "error",
+                "available_collections": available_collections
             }
         
-        # Format results
-        formatted_results = []
-        documents = search_results['documents'][0]
-        metadatas = search_results['metadatas'][0] if include_metadata else [{}] * len(documents)
-        distances = search_results['distances'][0]
+        # Generate query embedding (micro-batched with concurrent searches)
+        embed_started = time.perf_counter()
+        query_embedding = await _encode_query(query.strip()) if mode != "keyword" else None
+        embed_ms = round((time.perf_counter() - embed_started) * 1000, 2)
         
-        for i, (doc, meta, distance) in enumerate(zip(documents, metadatas, distances)):
-            result = {
-                "rank": i + 1,
-                "content": doc,
-                "similarity_score": float(1 - distance),  # Convert distance to similarity
-                "distance": float(distance)
-            }
-            
-            if include_metadata and meta:
-                result["metadata"] = {
-                    "source": meta.get("source_url") or meta.get("source_name", "unknown"),
-                    "source_type": meta.get("source_type", "unknown"),
-                    "timestamp": meta.get("timestamp"),
-                    "chunk_index": meta.get("chunk_index"),
-                    "chunk_length": meta.get("chunk_length"),
-                    "token_count": meta.get("token_count")
-                }
-                
-                # Add custom metadata fields
-                custom_fields = {k: v for k, v in meta.items() 
-                               if k not in ['source_url', 'source_name', 'source_type', 'timestamp', 
-                                          'chunk_index', 'chunk_length', 'token_count', 'collection']}
-                if custom_fields:
-                    result["metadata"]["custom"] = custom_fields
-            
-            formatted_results.append(result)
+        formatted_results, search_stats = await _search_collection(
+            collection, collection_name, query, query_embedding, limit, include_metadata, mode, hybrid_config,
+            where_filter, rerank
+        )
+        search_stats["latency_ms"] = dict(search_stats.get("latency_ms", {}), embed=embed_ms,
+                                          total=round((time.perf_counter() - started) * 1000, 2))
         
-        return {
+        response = {
             "status": "success",
             "query": query,
-            "collection": collection_name,
-            "results": formatted_results,
-            "total_results": len(formatted_results),
-            "search_stats": {
-                "embedding_model": _load_config()["embedding"]["model_name"],
-                "similarity_threshold": min(distances) if distances else 0,
-                "max_similarity": max([r["similarity_score"] for r in formatted_results]) if formatted_results else 0
-            }
+            "collection": collection_name
         }
+        if mode != "vector":
+            response["mode"] = mode
+        if where_filter:
+            response["filter"] = where_filter
+        if "fallback" in search_stats:
+            response["fallback"] = {"mode": search_stats["fallback"], "reason": "keyword index is still being built"}
+        
+        if not formatted_results:
+            response.update(results=[], total_results=0, message="No results found")
+            return response
+        
+        response.update(results=formatted_results, total_results=len(formatted_results), search_stats=search_stats)
+        return response
         
     except Exception as e:
         return {
@@ -713,24 +4169,19 @@ async def list_kb_sources(collection_name: str = "default") -> Dict[str, Any]:
         Dictionary with source information
     """
     try:
-        # Initialize components with output suppression
-        with suppress_stdout_stderr():
-            client = _initialize_chroma()
-            
-            # Check if collection exists
-            try:
-                collection = client.get_collection(collection_name)
-            except Exception:
-                return {
-                    "error": f"Collection '{collection_name}' not found",
-                    "status": "error",
-                    "available_collections": [col.name for col in client.list_collections()]
-                }
-            
-            # Get all data from collection
-            all_data = collection.get(include=['metadatas'])
+        # Check if collection exists (search worker lane)
+        collection, available_collections = await _run_in_worker("search", _open_search_collection, collection_name)
+        if collection is None:
+            return {
+                "error": f"Collection '{collection_name}' not found",
+                "status": "error",
+                "available_collections": available_collections
+            }
+        
+        # Read per-source totals from the summary index (no full collection scan)
+        sorted_sources = await _run_in_worker("search", _get_collection_sources, collection_name)
         
-        if not all_data['metadatas']:
+        if not sorted_sources:
             return {
                 "status": "success",
                 "collection": collection_name,
@@ -740,44 +4191,7 @@ async def list_kb_sources(collection_name: str = "default") -> Dict[str, Any]:
                 "message": "No sources found in collection"
             }
         
-        # Analyze sources
-        source_stats = {}
-        total_chunks = len(all_data['metadatas'])
-        
-        for meta in all_data['metadatas']:
-            if not meta:
-                continue
-                
-            # Get source identifier
-            source = meta.get('source_url') or meta.get('source_name', 'unknown')
-            source_type = meta.get('source_type', 'unknown')
-            timestamp = meta.get('timestamp')
-            
-            if source not in source_stats:
-                source_stats[source] = {
-                    "source": source,
-                    "source_type": source_type,
-                    "first_added": timestamp,
-                    "last_updated": timestamp,
-                    "chunk_count": 0,
-                    "total_characters": 0,
-                    "total_tokens": 0
-                }
-            
-            # Update stats
-            source_stats[source]["chunk_count"] += 1
-            source_stats[source]["total_characters"] += meta.get('chunk_length', 0)
-            source_stats[source]["total_tokens"] += meta.get('token_count', 0)
-            
-            # Update timestamps
-            if timestamp:
-                if not source_stats[source]["first_added"] or timestamp < source_stats[source]["first_added"]:
-                    source_stats[source]["first_added"] = timestamp
-                if not source_stats[source]["last_updated"] or timestamp > source_stats[source]["last_updated"]:
-                    source_stats[source]["last_updated"] = timestamp
-        
-        # Sort sources by chunk count (most chunks first)
-        sorted_sources = sorted(source_stats.values(), key=lambda x: x["chunk_count"], reverse=True)
+        total_chunks = sum(source["chunk_count"] for source in sorted_sources)
         
         return {
             "status": "success",
@@ -806,56 +4220,43 @@ async def get_kb_stats() -> Dict[str, Any]:
         Dictionary with detailed knowledge base statistics
     """
     try:
-        # Initialize components with output suppression
-        with suppress_stdout_stderr():
-            client = _initialize_chroma()
-            config = _load_config()
-            
-            # Get all collections
+        config = _load_config()
+        
+        # Get all collections (search worker lane)
+        collection_names = await _run_in_worker("search", _list_collection_names)
+        
+        # Analyze each collection
+        collection_stats = {}
+        total_chunks = 0
+        total_sources = 0
+        all_source_types = set()
+        
+        for collection_name in collection_names:
             try:
-                collections = client.list_collections()
-                collection_names = [col.name for col in collections] if collections else []
-            except Exception:
-                collection_names = []
-            
-            # Analyze each collection
-            collection_stats = {}
-            total_chunks = 0
-            total_sources = 0
-            all_source_types = set()
-            
-            for collection_name in collection_names:
-                try:
-                    collection = client.get_collection(collection_name)
-                    collection_data = collection.get(include=['metadatas'])
-                    
-                    chunks_in_collection = len(collection_data.get('metadatas', []))
-                    sources_in_collection = set()
-                    source_types_in_collection = set()
-                    
-                    for meta in collection_data.get('metadatas', []):
-                        if meta:
-                            source = meta.get('source_url') or meta.get('source_name', 'unknown')
-                            sources_in_collection.add(source)
-                            source_types_in_collection.add(meta.get('source_type', 'unknown'))
-                    
-                    collection_stats[collection_name] = {
-                        "chunk_count": chunks_in_collection,
-                        "source_count": len(sources_in_collection),
-                        "source_types": list(source_types_in_collection)
-                    }
-                    
-                    total_chunks += chunks_in_collection
-                    total_sources += len(sources_in_collection)
-                    all_source_types.update(source_types_in_collection)
-                    
-                except Exception as e:
-                    collection_stats[collection_name] = {
-                        "error": str(e),
-                        "chunk_count": 0,
-                        "source_count": 0,
-                        "source_types": []
-                    }
+                chunks_in_collection, sources_in_collection, source_types_in_collection = await _run_in_worker(
+                    "search", _get_collection_totals, collection_name
+                )
+                
+                collection_stats[collection_name] = {
+                    "chunk_count": chunks_in_collection,
+                    "source_count": sources_in_collection,
+                    "source_types": source_types_in_collection
+                }
+                vector_layout = await _run_in_worker("search", _get_vector_layout, collection_name)
+                if vector_layout:
+                    collection_stats[collection_name]["vector_storage"] = vector_layout
+                
+                total_chunks += chunks_in_collection
+                total_sources += sources_in_collection
+                all_source_types.update(source_types_in_collection)
+                
+            except Exception as e:
+                collection_stats[collection_name] = {
+                    "error": str(e),
+                    "chunk_count": 0,
+                    "source_count": 0,
+                    "source_types": []
+                }
         
         # Get system info
         embedding_model_name = config["embedding"]["model_name"]
@@ -872,10 +4273,12 @@ async def get_kb_stats() -> Dict[str, Any]:
                 "source_types": list(all_source_types)
             },
             "collections": collection_stats,
+            "embedding_cache": await _run_in_worker("search", _get_embedding_cache_stats),
             "configuration": {
                 "embedding_model": embedding_model_name,
                 "chunk_size": chunk_size,
                 "chunk_overlap": chunk_overlap,
+                "chunking_strategy": config["chunking"].get("strategy", "fixed_size"),
                 "database_path": config["storage"]["database_path"]
             },
             "performance_metrics": {
@@ -891,17 +4294,313 @@ async def get_kb_stats() -> Dict[str, Any]:
             "status": "error"
         }
 
+async def rebuild_kb_summary(collection_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Rebuild the per-source summary index from ChromaDB.
+    Use after copying a chroma_db directory or if list_kb_sources/get_kb_stats
+    look out of date. Scans the collection(s) page by page, gives chunks
+    stored before date-range filters existed their numeric ingested_at, and
+    rebuilds the near-duplicate fingerprint index when deduplication is enabled.
+    
+    Args:
+        collection_name: Collection to rebuild (all collections if not given)
+    
+    Returns:
+        Dictionary with per-collection source and chunk counts
+    """
+    try:
+        if collection_name:
+            collection_names = [collection_name]
+        else:
+            collection_names = await _run_in_worker("search", _list_collection_names)
+        
+        rebuilt = {}
+        for name in collection_names:
+            source_stats = await _run_in_worker("ingest", _rebuild_collection_summary, name)
+            rebuilt[name] = {
+                "source_count": len(source_stats),
+                "chunk_count": sum(s["chunk_count"] for s in source_stats.values()),
+                "ingested_at_backfilled": await _run_in_worker("ingest", _backfill_ingested_at, name)
+            }
+            if rebuilt[name]["ingested_at_backfilled"]:
+                _invalidate_search_results(name)
+            if _get_dedup_config()["enabled"]:
+                rebuilt[name]["fingerprints_indexed"] = await _run_in_worker("ingest", _rebuild_fingerprint_index, name)
+        
+        return {
+            "status": "success",
+            "message": f"Rebuilt summary for {len(rebuilt)} collection(s)",
+            "collections": rebuilt
+        }
+        
+    except Exception as e:
+        return {
+            "error": f"Failed to rebuild summary: {str(e)}",
+            "status": "error"
+        }
+
+async def export_kb_collection(collection_name: str = "default", output_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Export one collection as a snapshot directory that import_kb_collection can load on
+    another host without re-embedding.
+    
+    The snapshot holds the stored embeddings as one contiguous float32 array, chunk IDs,
+    documents and metadata as gzipped JSON lines, full-precision rescore vectors when the
+    collection keeps them, and a manifest.json describing the layout and embedding model.
+    
+    Args:
+        collection_name: Collection to export
+        output_path: Directory to write, inside the snapshots directory (default: <collection>-<time>)
+    
+    Returns:
+        Dictionary with the snapshot path, chunk count and size
+    """
+    try:
+        collection, available_collections = await _run_in_worker("search", _open_search_collection, collection_name)
+        if collection is None:
+            return {
+                "error": f"Collection '{collection_name}' not found",
+                "status": "error",
+                "available_collections": available_collections
+            }
+        
+        try:
+            output_dir = _resolve_snapshot_path(
+                output_path or f"{collection_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            )
+        except ValueError as e:
+            return {
+                "error": str(e),
+                "status": "error"
+            }
+        if output_dir.exists() and any(output_dir.iterdir()):
+            return {
+                "error": f"Output directory is not empty: {output_dir}",
+                "status": "error"
+            }
+        
+        started = time.perf_counter()
+        manifest = await _run_in_worker("ingest", _export_snapshot, collection_name, output_dir,
+                                        int(_get_snapshot_config()["page_size"]))
+        
+        return {
+            "status": "success",
+            "message": f"Exported {manifest['count']} chunks from '{collection_name}'",
+            "collection": collection_name,
+            "snapshot_path": str(output_dir),
+            "chunk_count": manifest["count"],
+            "dimension": manifest["dimension"],
+            "embedding_model": manifest["embedding_model"],
+            "size_bytes": sum(f.stat().st_size for f in output_dir.iterdir()),
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+        
+    except Exception as e:
+        return {
+            "error": f"Failed to export collection: {str(e)}",
+            "status": "error"
+        }
+
+async def import_kb_collection(snapshot_path: str, collection_name: Optional[str] = None,
+                               overwrite: bool = False) -> Dict[str, Any]:
+    """
+    Load a snapshot written by export_kb_collection into a collection.
+    
+    Chunks are bulk-loaded in batches with their stored embeddings, so the embedding
+    model is not loaded. The snapshot must come from the same embedding model as this
+    knowledge base; the collection keeps the snapshot's vector layout.
+    
+    Args:
+        snapshot_path: Snapshot directory, inside the snapshots directory
+        collection_name: Target collection (default: the exported collection's name)
+        overwrite: Replace the target collection if it already has chunks
+    
+    Returns:
+        Dictionary with import counts
+    """
+    try:
+        try:
+            snapshot_dir = _resolve_snapshot_path(snapshot_path)
+        except ValueError as e:
+            return {
+                "error": str(e),
+                "status": "error"
+            }
+        try:
+            manifest = _read_snapshot_manifest(snapshot_dir)
+        except (ValueError, OSError, KeyError, json.JSONDecodeError) as e:
+            return {
+                "error": f"Invalid snapshot: {str(e)}",
+                "status": "error"
+            }
+        
+        model_name = _load_config()["embedding"]["model_name"]
+        if manifest["embedding_model"] != model_name:
+            return {
+                "error": f"Snapshot was embedded with '{manifest['embedding_model']}' but this knowledge base "
+                         f"uses '{model_name}'",
+                "status": "error"
+            }
+        
+        collection_name = collection_name or manifest["collection"]
+        started = time.perf_counter()
+        try:
+            counts = await _run_in_worker("ingest", _import_snapshot, snapshot_dir, manifest, collection_name,
+                                          overwrite, max(1, int(_get_snapshot_config()["import_batch_size"])))
+        except ValueError as e:
+            return {
+                "error": str(e),
+                "status": "error"
+            }
+        finally:
+            _invalidate_search_results(collection_name)
+        elapsed = time.perf_counter() - started
+        
+        return {
+            "status": "success",
+            "message": f"Imported {counts['chunks_imported']} chunks into '{collection_name}'",
+            "collection": collection_name,
+            "source_collection": manifest["collection"],
+            **counts,
+            "elapsed_seconds": round(elapsed, 3),
+            "chunks_per_second": round(counts["chunks_imported"] / elapsed, 2) if elapsed else 0.0
+        }
+        
+    except Exception as e:
+        return {
+            "error": f"Failed to import snapshot: {str(e)}",
+            "status": "error"
+        }
+
+async def submit_kb_ingestion(urls: Optional[List[str]] = None, texts: Optional[List[Dict[str, Any]]] = None,
+                              collection_name: str = "default", metadata: Dict[str, Any] = None,
+                              reingest: bool = False) -> Dict[str, Any]:
+    """
+    Queue URLs and/or texts for background ingestion and return a job ID immediately.
+    
+    Args:
+        urls: URLs to crawl and add (as with add_url_to_kb)
+        texts: Texts to add, each {"text": ..., "source_name": ..., "metadata": {...} (optional)}
+        collection_name: Collection to add content to
+        metadata: Additional metadata stored with every item's chunks
+        reingest: Replace chunks previously stored for each source
+    
+    Returns:
+        Dictionary with the job ID; poll get_kb_job_status for progress
+    """
+    try:
+        urls = urls or []
+        texts = texts or []
+        if not urls and not texts:
+            return {
+                "error": "Provide at least one URL or text to ingest",
+                "status": "error"
+            }
+        
+        items = []
+        for url in urls:
+            if not isinstance(url, str) or not url.strip():
+                return {
+                    "error": f"Invalid URL: {url!r}",
+                    "status": "error"
+                }
+            items.append({"kind": "url", "source": url.strip(), "metadata": metadata})
+        
+        for i, entry in enumerate(texts):
+            if not isinstance(entry, dict) or not entry.get("text") or not entry.get("source_name"):
+                return {
+                    "error": f"Text entry {i} must include 'text' and 'source_name'",
+                    "status": "error"
+                }
+            item_metadata = dict(metadata or {})
+            item_metadata.update(entry.get("metadata") or {})
+            items.append({"kind": "text", "source": entry["source_name"], "content": entry["text"],
+                          "metadata": item_metadata})
+        
+        jobs_config = _get_jobs_config()
+        if len(items) > jobs_config["max_items_per_job"]:
+            return {
+                "error": f"Too many items in one job ({len(items)}); the limit is {jobs_config['max_items_per_job']}",
+                "status": "error"
+            }
+        
+        queue = await _ensure_job_workers()
+        if await _run_in_worker("ingest", _count_active_jobs) >= jobs_config["max_pending_jobs"]:
+            return {
+                "error": f"Too many pending ingestion jobs (limit {jobs_config['max_pending_jobs']}); try again later",
+                "status": "error"
+            }
+        
+        job_id = await _run_in_worker("ingest", _create_job, collection_name, reingest, items)
+        queue.put_nowait(job_id)
+        
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "job_status": "queued",
+            "collection": collection_name,
+            "total_items": len(items),
+            "message": f"Queued {len(items)} items; poll get_kb_job_status('{job_id}') for progress"
+        }
+        
+    except Exception as e:
+        return {
+            "error": f"Failed to submit ingestion job: {str(e)}",
+            "status": "error"
+        }
+
+async def get_kb_job_status(job_id: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+    """
+    Get the progress of a background ingestion job, or list recent jobs.
+    
+    Args:
+        job_id: Job to report on; omit to list the most recent jobs
+        limit: Number of jobs to list when job_id is omitted
+    
+    Returns:
+        Dictionary with job status, item progress, chunks added and item errors
+    """
+    try:
+        # Polling also restarts workers for jobs persisted before a restart
+        await _ensure_job_workers()
+        
+        report = await _run_in_worker("search", _get_job_report, job_id, limit)
+        if job_id is None:
+            return {
+                "status": "success",
+                "jobs": report,
+                "total_jobs": len(report)
+            }
+        if report is None:
+            return {
+                "error": f"Job '{job_id}' not found",
+                "status": "error"
+            }
+        return {"status": "success", **report}
+        
+    except Exception as e:
+        return {
+            "error": f"Failed to get job status: {str(e)}",
+            "status": "error"
+        }
+
 def register(mcp_instance):
     """Register ALL RAG knowledge base tools with the MCP server"""
     
     # Check if dependencies are available
-    if not all([CHROMADB_AVAILABLE, SENTENCE_TRANSFORMERS_AVAILABLE, LANGCHAIN_AVAILABLE]):
+    try:
+        backend = _get_embedding_backend()
+        backend_available = _embedding_backend_available(backend)
+    except ValueError:
+        backend, backend_available = None, False
+    chunker_available = _chunker_available()
+    if not all([CHROMADB_AVAILABLE, backend_available, chunker_available]):
         missing = []
         if not CHROMADB_AVAILABLE:
             missing.append("chromadb")
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
-            missing.append("sentence-transformers")
-        if not LANGCHAIN_AVAILABLE:
+        if not backend_available:
+            missing.append(EMBEDDING_BACKENDS.get(backend, "a supported embedding.model_type"))
+        if not chunker_available:
             missing.append("langchain-text-splitters")
         
         return
@@ -914,8 +4613,18 @@ def register(mcp_instance):
     # Card 2: Content Ingestion
     mcp_instance.tool()(add_url_to_kb)
     mcp_instance.tool()(add_text_to_kb)
+    mcp_instance.tool()(add_urls_to_kb)
     
     # Card 3: Search & Retrieval
     mcp_instance.tool()(search_kb)
     mcp_instance.tool()(list_kb_sources)
-    mcp_instance.tool()(get_kb_stats)
\ No newline at end of file
+    mcp_instance.tool()(get_kb_stats)
+    
+    # Background ingestion jobs
+    mcp_instance.tool()(submit_kb_ingestion)
+    mcp_instance.tool()(get_kb_job_status)
+    
+    # Maintenance
+    mcp_instance.tool()(rebuild_kb_summary)
+    mcp_instance.tool()(export_kb_collection)
+    mcp_instance.tool()(import_kb_collection)
\ No newline at end of file